@@ -0,0 +1,310 @@
+"""
+无界面批量检测（产线使用）
+
+不依赖 PySide6，直接调用检测服务器接口完成整批检测：
+    上传    只上传服务器样本组中缺少的图片（服务器上有多余样本时清空后重传）
+    推理    启动模型推理，按 ETag 轮询推理进度
+    下载    推理出一张就提交一张结果图下载，多线程并发
+    判定    按 DEFECT_THRESHOLD（项目元数据中的 defect_threshold 或 --threshold）判定正常 / 异常
+    保存    推理结果到达即写入项目的检测结果库（<项目>/detect/results.db），界面中可直接查看
+监视模式（--watch）持续扫描样本文件夹，相机写完的新图片按批次检测，每批只在服务器上保留本批图片，
+已处理文件名集合随文件夹内容裁剪，内存占用不随运行时间增长，每批输出吞吐统计
+
+用法:
+    python batch_detect.py <项目路径> <样本文件夹> <模型名>
+    python batch_detect.py <项目路径> <样本文件夹> <模型名> --watch --batch-size 32
+    python batch_detect.py <项目路径> <样本文件夹> <模型名> --group line1 --threshold 0.6 --workers 8
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import config
+import tracing
+from http_client import HttpServer, local_name
+from path_utils import is_image, join_path
+from result_store import get_result_store, status_of, to_score
+
+logger = logging.getLogger("batch_detect")
+
+MIN_POLL_INTERVAL = 0.25 # 推理进度轮询间隔（秒），进度无变化时逐步加倍
+MAX_POLL_INTERVAL = 2.0
+INFER_TIMEOUT = 3600 # 单批推理的最长等待时间（秒）
+
+
+def load_project(project_path):
+    """
+    读取项目元数据并设置 config 中的项目路径，返回元数据（不存在时为空字典）
+    """
+    config.PROJECT_METADATA_PATH = join_path(project_path, config.PROJECT_METADATA_FILE)
+    config.SAMPLE_PATH = join_path(project_path, config.SAMPLE_FOLDER)
+    config.MODEL_PATH = join_path(project_path, config.MODEL_FOLDER)
+    config.DETECT_PATH = join_path(project_path, config.DETECT_FOLDER)
+    metadata = {}
+    if os.path.exists(config.PROJECT_METADATA_PATH):
+        with open(config.PROJECT_METADATA_PATH, "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+    else:
+        logger.warning(f"元数据文件不存在: {config.PROJECT_METADATA_PATH}")
+    config.PROJECT_METADATA = metadata
+    if "defect_threshold" in metadata:
+        config.DEFECT_THRESHOLD = metadata["defect_threshold"]
+    return metadata
+
+
+class ThroughputStats:
+    """
+    吞吐统计：累计图片数、异常数、各阶段耗时，以及最近一批的速率
+    """
+    STAGES = ("upload", "infer", "download")
+
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.batches = 0
+        self.images = 0
+        self.defects = 0
+        self.stage_seconds = dict.fromkeys(self.STAGES, 0.0)
+
+    def add_batch(self, images, defects, stage_seconds):
+        self.batches += 1
+        self.images += images
+        self.defects += defects
+        for stage, seconds in stage_seconds.items():
+            self.stage_seconds[stage] += seconds
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.start_time
+        rate = self.images / elapsed if elapsed > 0 else 0.0
+        stages = ", ".join(f"{stage} {seconds:.1f}s" for stage, seconds in self.stage_seconds.items())
+        return (f"共 {self.batches} 批 {self.images} 张，异常 {self.defects} 张，"
+                f"用时 {elapsed:.1f}s，{rate:.2f} 张/秒（{stages}）")
+
+
+class BatchDetector:
+    """
+    一个样本组的批量检测：上传、推理、并发下载结果、判定并写入检测结果库
+    """
+    def __init__(self, model_name, group_name, sample_folder, threshold=None, workers=4):
+        self.model_name = model_name
+        self.group_name = group_name
+        self.sample_folder = sample_folder
+        self.threshold = config.DEFECT_THRESHOLD if threshold is None else threshold
+        self.workers = workers
+        self.save_path = join_path(config.DETECT_PATH, group_name)
+        self.result_store = get_result_store()
+        self.http_server = HttpServer()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch-detect")
+        self.stats = ThroughputStats()
+        self.model_id = None
+        self.group_id = None
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    def prepare(self):
+        """查询模型和样本组ID，样本组不存在时在服务器上创建"""
+        self.model_id = self.http_server.get_model_id(self.model_name)
+        if not self.model_id:
+            raise RuntimeError(f"未找到模型：{self.model_name}")
+        status = self.http_server.get_model_status(self.model_name)
+        if status != 2:
+            raise RuntimeError(f"模型 {self.model_name} 当前不可用于推理（状态 {status}），请先完成训练")
+        self.group_id = self.http_server.get_group_id(self.group_name)
+        if not self.group_id:
+            self.http_server.add_group(self.group_name)
+            self.group_id = self.http_server.get_group_id(self.group_name)
+            if not self.group_id:
+                raise RuntimeError(f"创建样本组失败：{self.group_name}")
+        os.makedirs(self.save_path, exist_ok=True)
+
+    # -------------------- 上传 --------------------
+    def upload(self, file_names, replace=False):
+        """
+        上传图片到服务器样本组
+
+        Args:
+            file_names: 本地图片名列表
+            replace: 为 True 时先清空服务器样本组，只保留本批图片（监视模式）；
+                     否则只上传服务器缺少的图片，服务器上有本地不存在的样本时清空后重传
+
+        Returns:
+            实际上传的图片数
+        """
+        if replace:
+            self.http_server.clear_group(self.group_id)
+            missing = list(file_names)
+        else:
+            server_names = {local_name(name) for name in self.http_server.get_sample_list(self.group_id)}
+            local_names = set(file_names)
+            if server_names - local_names:
+                logger.info(f"服务器样本组中有 {len(server_names - local_names)} 张本地不存在的图片，清空后重新上传")
+                self.http_server.clear_group(self.group_id)
+                missing = list(file_names)
+            else:
+                missing = [name for name in file_names if name not in server_names]
+        futures = [self.executor.submit(self.http_server.upload_sample, join_path(self.sample_folder, name), self.group_id)
+                   for name in missing]
+        for future in futures:
+            future.result() # 任一上传失败则整批失败
+        return len(missing)
+
+    # -------------------- 推理与下载 --------------------
+    def infer_and_download(self, expected_names):
+        """
+        启动推理并等待完成，推理出的结果立即写入结果库并提交下载
+
+        Args:
+            expected_names: 本批的本地图片名集合，只收集这些图片的结果
+
+        Returns:
+            (检测记录列表, 推理耗时, 推理结束后等待下载的耗时)
+        """
+        records = []
+        downloads = []
+
+        def on_results(new_results):
+            new_records = []
+            for img_info in new_results:
+                if local_name(img_info["img_filename"]) not in expected_names:
+                    continue
+                new_records.append(self.to_record(img_info))
+                downloads.append(self.executor.submit(self.http_server.download_result_images,
+                                                      img_info["img_filename"], img_info["result_name"], self.save_path))
+            # 新到达的结果立即写入结果库
+            self.result_store.upsert(self.group_name, new_records)
+            records.extend(new_records)
+
+        self.http_server.infer_model(self.model_id, self.group_id)
+        infer_start = time.perf_counter()
+        self.http_server.wait_inference(self.model_id, self.model_name, on_results, timeout=INFER_TIMEOUT,
+                                        min_interval=MIN_POLL_INTERVAL, max_interval=MAX_POLL_INTERVAL)
+        infer_seconds = time.perf_counter() - infer_start
+        wait(downloads)
+        for future in downloads:
+            future.result()
+        return records, infer_seconds, time.perf_counter() - infer_start - infer_seconds
+
+    # -------------------- 结果 --------------------
+    def to_record(self, img_info):
+        """推理信息 -> 检测记录（与界面检测保存的格式一致）"""
+        score = to_score(img_info.get("score", 0))
+        return {
+            "file_name": img_info.get("img_filename"),
+            "score": score,
+            "status": status_of(score, self.threshold),
+            "alias_name": img_info.get("result_name"),
+            "origin_name": local_name(img_info.get("img_filename")),
+        }
+
+    def run_batch(self, file_names, replace=False):
+        """检测一批图片，返回本批的检测记录"""
+        batch_start = time.perf_counter()
+        with tracing.span("batch.upload", cat="batch", images=len(file_names)):
+            uploaded = self.upload(file_names, replace=replace)
+        upload_seconds = time.perf_counter() - batch_start
+        with tracing.span("batch.infer", cat="batch"):
+            records, infer_seconds, download_seconds = self.infer_and_download(set(file_names))
+        defects = sum(record["status"] == "异常" for record in records)
+        self.stats.add_batch(len(records), defects, {"upload": upload_seconds, "infer": infer_seconds,
+                                                    "download": download_seconds})
+        elapsed = time.perf_counter() - batch_start
+        logger.info(f"批次完成: {len(records)} 张（上传 {uploaded} 张），异常 {defects} 张，"
+                    f"上传 {upload_seconds:.1f}s / 推理 {infer_seconds:.1f}s / 下载收尾 {download_seconds:.1f}s，"
+                    f"{len(records) / elapsed if elapsed > 0 else 0:.2f} 张/秒")
+        if len(records) < len(file_names):
+            logger.warning(f"有 {len(file_names) - len(records)} 张图片没有推理结果")
+        return records
+
+
+def list_images(folder):
+    return sorted(name for name in os.listdir(folder) if is_image(name))
+
+
+def watch_folder(detector, batch_size, scan_interval):
+    """
+    持续扫描样本文件夹，新图片大小在两次扫描间不再变化（相机已写完）后按批检测，Ctrl+C 结束
+    """
+    processed = detector.result_store.origin_names(detector.group_name) # 已检测的图片名，重启后不重复检测
+    last_sizes = {} # 上一次扫描时未处理图片的大小 {图片名: 字节数}
+    logger.info(f"开始监视: {detector.sample_folder}（每批最多 {batch_size} 张）")
+    while True:
+        sizes = {}
+        with os.scandir(detector.sample_folder) as entries:
+            for entry in entries:
+                if entry.is_file() and is_image(entry.name):
+                    sizes[entry.name] = entry.stat().st_size
+        # 已从文件夹移走的图片不再记录，保证内存不随运行时间增长
+        processed &= sizes.keys()
+        ready = sorted(name for name, size in sizes.items()
+                       if name not in processed and size > 0 and last_sizes.get(name) == size)
+        last_sizes = {name: size for name, size in sizes.items() if name not in processed}
+        if not ready:
+            time.sleep(scan_interval)
+            continue
+        batch = ready[:batch_size]
+        try:
+            detector.run_batch(batch, replace=True)
+        except Exception as e:
+            logger.error(f"批次检测失败，稍后重试: {str(e)}")
+            time.sleep(scan_interval)
+            continue
+        processed.update(batch)
+        logger.info(detector.stats.summary())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="无界面批量检测")
+    parser.add_argument("project", help="项目路径（包含 metadata.json）")
+    parser.add_argument("samples", help="待检测图片所在文件夹")
+    parser.add_argument("model", help="服务器上的模型名")
+    parser.add_argument("--group", help="服务器样本组名 / 检测结果目录名，默认使用样本文件夹名")
+    parser.add_argument("--threshold", type=float, help="缺陷判定阈值，默认取项目元数据中的 defect_threshold")
+    parser.add_argument("--workers", type=int, default=4, help="并发上传 / 下载线程数")
+    parser.add_argument("--watch", action="store_true", help="监视文件夹，持续检测新图片")
+    parser.add_argument("--batch-size", type=int, default=32, help="监视模式下每批最多检测的图片数")
+    parser.add_argument("--scan-interval", type=float, default=1.0, help="监视模式下扫描文件夹的间隔（秒）")
+    parser.add_argument("--host", help="检测服务器地址，默认使用 config.HOSTNAME")
+    parser.add_argument("--port", type=int, help="检测服务器端口，默认使用 config.PORT")
+    parser.add_argument("--log-level", default="INFO", help="日志级别")
+    args = parser.parse_args()
+
+    tracing.setup_logging(args.log_level)
+    tracing.init_from_config()
+    if args.host:
+        config.HOSTNAME = args.host
+    if args.port:
+        config.PORT = args.port
+    if not os.path.isdir(args.samples):
+        logger.error(f"样本文件夹不存在: {args.samples}")
+        return 1
+    load_project(args.project)
+    group_name = args.group or os.path.basename(os.path.normpath(args.samples))
+    detector = BatchDetector(args.model, group_name, args.samples, args.threshold, args.workers)
+    try:
+        detector.prepare()
+        if args.watch:
+            watch_folder(detector, args.batch_size, args.scan_interval)
+        else:
+            file_names = list_images(args.samples)
+            if not file_names:
+                logger.error(f"样本文件夹中没有图片: {args.samples}")
+                return 1
+            detector.run_batch(file_names)
+            print(f"检测结果已保存: {detector.result_store.db_path}（样本组 {group_name}）")
+    except KeyboardInterrupt:
+        logger.info("已停止")
+    except Exception as e:
+        logger.error(f"批量检测失败: {str(e)}")
+        return 1
+    finally:
+        detector.close()
+        print(detector.stats.summary())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
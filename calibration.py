@@ -0,0 +1,236 @@
+"""
+判定阈值校准
+
+用样本组中生成的 MVTec 格式测试集（test/good、test/defect_*、ground_truth/defect_*）评估已训练的模型：
+    上传    测试集图片上传到服务器的校准样本组 <样本组>_calibration（每次校准前清空）
+    推理    启动推理并等待完成，结果到达即提交 _3 异常图下载（只下载这一种）
+    评估    图片级 ROC / PR、AUROC、AP；像素级 AUROC、AUPR、PRO（逐图并行统计直方图，不保留全部掩码）
+    保存    各图片得分和建议阈值写入模型组 model.json 的 calibration 字段，指标写入 metrics 字段，
+            异常图保存在 <模型组>/calibration/heatmaps
+判定阈值按目标误拒率从正常样本得分的经验分布中选取（evaluation.propose_threshold），可在界面中即时调整
+
+本模块不依赖 Qt
+"""
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+
+import config
+from evaluation import auc, average_precision, evaluate_pixels, pr_curve, propose_threshold, roc_curve
+from http_client import HttpServer, local_name
+from path_utils import is_image, join_path
+from result_store import to_score
+
+logger = logging.getLogger(__name__)
+
+CALIBRATION_FOLDER = "calibration"
+GROUND_TRUTH_FOLDER = "ground_truth"
+HEATMAP_INDEX = 3 # 结果图中的异常图编号
+DEFAULT_TARGET_FRR = 0.01
+
+
+def collect_test_set(group_path):
+    """
+    收集样本组的测试集
+
+    不同缺陷类型下的文件名会重复（defect_0.jpg ...），上传名加上类别前缀；
+    服务器文件名以 '-' 分隔前缀，上传名中的 '-' 替换为 '_'
+
+    Returns:
+        [{'upload_name', 'path', 'category', 'label' (0 正常 / 1 缺陷), 'mask_path' (没有掩码时为 None)}]
+    """
+    test_root = join_path(group_path, config.SAMPLE_LABEL_TEST)
+    if not os.path.isdir(test_root):
+        return []
+    samples = []
+    for category in sorted(os.listdir(test_root)):
+        folder = join_path(test_root, category)
+        if not os.path.isdir(folder):
+            continue
+        label = 0 if category == "good" else 1
+        for name in sorted(os.listdir(folder)):
+            if not is_image(name):
+                continue
+            mask_path = None
+            if label:
+                mask_path = join_path(group_path, GROUND_TRUTH_FOLDER, category, os.path.splitext(name)[0] + ".png")
+                if not os.path.exists(mask_path):
+                    mask_path = None
+            samples.append({
+                "upload_name": f"{category}__{name}".replace("-", "_"),
+                "path": join_path(folder, name),
+                "category": category,
+                "label": label,
+                "mask_path": mask_path,
+            })
+    return samples
+
+
+def load_model_info(model_name, key):
+    """读取模型组 model.json 中的一个字段（calibration / metrics），没有时返回 None"""
+    model_file = join_path(config.MODEL_PATH, model_name, config.MODEL_INFO_FILE)
+    if not os.path.exists(model_file):
+        return None
+    with open(model_file, "r", encoding="utf-8") as f:
+        return json.load(f).get(key)
+
+
+def save_model_info(model_name, **fields):
+    """更新模型组 model.json 中的字段，其余字段保持不变"""
+    model_file = join_path(config.MODEL_PATH, model_name, config.MODEL_INFO_FILE)
+    model = {}
+    if os.path.exists(model_file):
+        with open(model_file, "r", encoding="utf-8") as f:
+            model = json.load(f)
+    model.update(fields)
+    with open(model_file, "w", encoding="utf-8") as f:
+        json.dump(model, f, ensure_ascii=False, indent=4)
+
+
+def image_curves(calibration):
+    """由校准结果中的得分计算 (ROC 曲线 (fpr, tpr), PR 曲线 (recall, precision))"""
+    good, defect = calibration["scores"]["good"], calibration["scores"]["defect"]
+    labels = [0] * len(good) + [1] * len(defect)
+    fpr, tpr, _ = roc_curve(labels, good + defect)
+    precision, recall, _ = pr_curve(labels, good + defect)
+    return (fpr, tpr), (recall, precision)
+
+
+def format_metrics(metrics, detailed=False):
+    """
+    指标记录的显示文字，没有记录时返回空字符串
+
+    Args:
+        detailed: 为 False 时只显示主要指标（用于列表），为 True 时显示全部指标
+    """
+    if not metrics:
+        return ""
+    def value(key):
+        number = metrics.get(key)
+        return "--" if number is None else f"{number:.3f}"
+    if not detailed:
+        return f"AUROC {value('image_auroc')} · PRO {value('pixel_pro')}"
+    return (f"图片级 AUROC: {value('image_auroc')}　AP: {value('image_ap')}\n"
+            f"像素级 AUROC: {value('pixel_auroc')}　AUPR: {value('pixel_aupr')}　PRO: {value('pixel_pro')}\n"
+            f"评估时间: {metrics.get('time', '--')}　样本组: {metrics.get('sample_group', '--')}　"
+            f"正常 {metrics.get('good_count', 0)} 张 / 缺陷 {metrics.get('defect_count', 0)} 张")
+
+
+class ThresholdCalibration:
+    """
+    一个模型组在一个样本组测试集上的校准
+    """
+    def __init__(self, model_name, sample_group, workers=4, progress=None):
+        """
+        Args:
+            model_name: 模型组名（需已训练完成）
+            sample_group: 样本组名（需已生成测试集）
+            workers: 并发上传 / 下载线程数
+            progress: 进度回调 progress(阶段名, 已完成数, 总数)
+        """
+        self.model_name = model_name
+        self.sample_group = sample_group
+        self.group_path = join_path(config.SAMPLE_PATH, sample_group)
+        self.heatmap_path = join_path(config.MODEL_PATH, model_name, CALIBRATION_FOLDER, "heatmaps")
+        self.workers = workers
+        self.progress = progress or (lambda stage, done, total: None)
+        self.http_server = HttpServer()
+        self.metrics = None
+
+    def run(self):
+        """
+        执行校准并保存结果
+
+        Returns:
+            校准结果（同 model.json 中的 calibration 字段）
+        """
+        samples = collect_test_set(self.group_path)
+        if not any(sample["label"] == 0 for sample in samples) or not any(sample["label"] for sample in samples):
+            raise RuntimeError("测试集中需要同时包含正常和缺陷样本，请先生成测试集")
+        self.infer(samples)
+        scored = [sample for sample in samples if "score" in sample]
+        if len(scored) < len(samples):
+            logger.warning(f"{len(samples) - len(scored)} 张测试图片没有推理结果，已跳过")
+        calibration = self.evaluate(scored)
+        save_model_info(self.model_name, calibration=calibration, metrics=self.metrics)
+        return calibration
+
+    def infer(self, samples):
+        """上传测试集并推理，得分写入各样本的 'score'，异常图并发下载到 heatmap_path"""
+        model_id = self.http_server.get_model_id(self.model_name)
+        if not model_id:
+            raise RuntimeError(f"未找到模型：{self.model_name}")
+        status = self.http_server.get_model_status(self.model_name)
+        if status != 2:
+            raise RuntimeError(f"模型 {self.model_name} 尚未训练完成（状态 {status}）")
+        group_name = f"{self.sample_group}_calibration"
+        group_id = self.http_server.get_group_id(group_name)
+        if group_id:
+            self.http_server.clear_group(group_id)
+        else:
+            self.http_server.add_group(group_name)
+            group_id = self.http_server.get_group_id(group_name)
+            if not group_id:
+                raise RuntimeError(f"创建校准样本组失败：{group_name}")
+        os.makedirs(self.heatmap_path, exist_ok=True)
+
+        by_name = {sample["upload_name"]: sample for sample in samples}
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="calibration") as executor:
+            uploads = [executor.submit(self.http_server.upload_sample, sample["path"], group_id, sample["upload_name"])
+                       for sample in samples]
+            for done, future in enumerate(uploads, 1):
+                future.result()
+                self.progress("上传测试集", done, len(samples))
+
+            downloads = []
+            def on_results(new_results):
+                for img_info in new_results:
+                    sample = by_name.get(local_name(img_info["img_filename"]))
+                    if sample is None:
+                        continue
+                    sample["score"] = to_score(img_info.get("score"))
+                    downloads.append(executor.submit(self.http_server.download_result_images, img_info["img_filename"],
+                                                     img_info["result_name"], self.heatmap_path, (HEATMAP_INDEX,)))
+                self.progress("推理", sum("score" in sample for sample in samples), len(samples))
+
+            self.http_server.infer_model(model_id, group_id)
+            self.http_server.wait_inference(model_id, self.model_name, on_results)
+            wait(downloads)
+            for future in downloads:
+                future.result()
+
+    def evaluate(self, samples):
+        """计算图片级和像素级指标，返回校准结果，指标记录保存在 self.metrics"""
+        good = [sample["score"] for sample in samples if sample["label"] == 0]
+        defect = [sample["score"] for sample in samples if sample["label"]]
+        calibration = {
+            "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "sample_group": self.sample_group,
+            "scores": {"good": good, "defect": defect},
+        }
+        (fpr, tpr), (recall, precision) = image_curves(calibration)
+        calibration["image_auroc"] = auc(fpr, tpr)
+        calibration["image_ap"] = average_precision(precision, recall)
+        calibration["proposal"] = propose_threshold(good, defect, DEFAULT_TARGET_FRR)
+        calibration["target_frr"] = DEFAULT_TARGET_FRR
+
+        # 像素级：异常图和掩码逐图并行统计后合并
+        items = []
+        for sample in samples:
+            if sample["label"] and not sample["mask_path"]:
+                continue # 缺陷图片没有掩码，无法区分正常 / 缺陷像素
+            heatmap = join_path(self.heatmap_path, f"{os.path.splitext(sample['upload_name'])[0]}_{HEATMAP_INDEX}.png")
+            items.append((heatmap, sample["mask_path"], sample["path"]))
+        pixels = evaluate_pixels(items, progress=lambda done, total: self.progress("计算像素指标", done, total))
+        self.metrics = {
+            "time": calibration["time"],
+            "sample_group": self.sample_group,
+            "good_count": len(good),
+            "defect_count": len(defect),
+            "image_auroc": calibration["image_auroc"],
+            "image_ap": calibration["image_ap"],
+            **pixels.summary(),
+        }
+        return calibration
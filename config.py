@@ -46,11 +46,26 @@ MODEL_INFO_FILE = 'model.json'
 DETECT_FOLDER = 'detect'
 DETECT_PATH = None
 DETECT_SAMPLE_GROUP = None
-DETECT_LIST = None
+SNAPSHOT_FOLDER = 'snapshots' # 样本组数据集版本（内容寻址的文件库 + 每个版本的清单）
 
 # 检测阈值设置
 DEFECT_THRESHOLD = 0.5  # 默认阈值为0.5，高于此值判断为异常
+DEFECT_RULES_FILE = "" # 缺陷类型判定规则表（JSON 文件，格式见 defect_classify.load_rules），为空时使用内置规则
 
 # 参数配置
 TEST_RATIO = 0.1
+DUPLICATE_DISTANCE = 4 # pHash 汉明距离不超过该值（且 dHash 相近）的图片判为近重复
 IMAGE_FORMATS = "*.png *.jpg *.jpeg *.bmp *.gif *.tiff *.webp *.heic *.heif *.svg *.raw *.cr2 *.nef *.arw *.psd *.jp2 *.j2k *.dpx" # 支持的图片格式
+COMBINED_IMAGE_FORMAT = "png" # 检测结果合成图的保存格式：png（低压缩级别，写入快）或 webp（无损）
+UPLOAD_RESIZE_MARGIN = 1.25 # 上传训练样本前缩小到模型输入尺寸的多少倍（保留余量，服务器仍做最终缩放）；0 表示上传原图
+UPLOAD_FORMAT = "jpg" # 缩小后的上传格式：jpg / webp / png
+UPLOAD_QUALITY = 95 # jpg / webp 的编码质量
+REPORT_CHART_FORMAT = "png" # 报告图表的格式：png / jpg（PDF 和报告预览都可直接使用）
+REPORT_CHART_DPI = 150 # 报告图表的分辨率（每英寸像素数）
+REPORT_PDF_DPI = 150 # PDF 报告中图片的打印分辨率，嵌入前按显示尺寸缩小到该分辨率
+REPORT_PDF_JPEG_QUALITY = 85 # PDF 报告中图片重新编码为 JPEG 的质量
+REPORT_APPENDIX_MAX_IMAGES = 50 # PDF 报告附录中缺陷样本图像的最大数量，0 表示不生成附录
+
+# 调试配置
+LOG_LEVEL = "WARNING" # 日志级别：DEBUG / INFO / WARNING / ERROR，可用环境变量 VISIOCRAFT_LOG_LEVEL 覆盖
+TRACE_ENABLED = False # 是否记录性能追踪（span、计数器），可用环境变量 VISIOCRAFT_TRACE=1 开启
@@ -0,0 +1,285 @@
+"""
+样本组数据集版本（快照）
+
+生成测试集会清空并重写 test/*、ground_truth/*，要复现旧模型的训练数据只能整组复制。这里为样本组建立内容寻址的版本：
+    文件库    <项目>/snapshots/blobs/<哈希前两位>/<哈希>，每份内容只保存一次（只读）；
+              文件库中的文件是复制而不是硬链接，样本目录中原地改写的文件（imwrite、shutil.copy 覆盖）不会改动已保存的版本
+    清单      <项目>/snapshots/<样本组>/<版本号>.json，记录 {相对路径: [哈希, 大小]}，版本号由清单内容得到，
+              内容相同的数据集版本号相同；index.json 按创建顺序列出各版本的摘要
+    状态缓存  <项目>/snapshots/<样本组>/stat.json，记录 {相对路径: [修改时间, 大小, inode, 哈希]}，
+              创建版本时只对状态变化的文件计算哈希、写入文件库，耗时与变化的文件数成正比
+比较两个版本只需读取两份清单按路径比较哈希；恢复版本时从文件库硬链接（不能链接时复制）到目标目录
+编辑记录 .edits.json 随图片一起保存；近重复查找的哈希缓存等可重建的文件不保存
+
+用法:
+    python dataset_snapshot.py <项目路径> <样本组> create
+    python dataset_snapshot.py <项目路径> <样本组> list
+    python dataset_snapshot.py <项目路径> <样本组> diff <版本1> <版本2>
+    python dataset_snapshot.py <项目路径> <样本组> restore <版本> <目标目录>
+
+本模块不依赖 Qt
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import stat
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+import tracing
+from dedup import HASH_INDEX_FILE
+from edit_stack import EDIT_INDEX_FILE
+from path_utils import join_path
+
+logger = logging.getLogger(__name__)
+
+BLOB_FOLDER = "blobs"
+STAT_CACHE_FILE = "stat.json"
+INDEX_FILE = "index.json" # 版本列表（不含文件列表）
+HASH_CHUNK_SIZE = 1024 * 1024
+EXCLUDED_FILES = (HASH_INDEX_FILE,) # 可重建的缓存文件，不保存到版本中
+
+_lock = threading.Lock()
+
+
+def snapshot_root():
+    """项目的版本目录"""
+    return join_path(os.path.dirname(config.SAMPLE_PATH), config.SNAPSHOT_FOLDER)
+
+
+def group_folder(sample_group):
+    return join_path(snapshot_root(), sample_group)
+
+
+def blob_path(digest):
+    return join_path(snapshot_root(), BLOB_FOLDER, digest[:2], digest)
+
+
+def _read_json(path, default):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+
+def _scan(group_path):
+    """递归列出样本组中需要保存的文件 {相对路径: stat}"""
+    files = {}
+    stack = [""]
+    while stack:
+        relative = stack.pop()
+        with os.scandir(join_path(group_path, relative) if relative else group_path) as entries:
+            for entry in entries:
+                path = f"{relative}/{entry.name}" if relative else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(path)
+                elif entry.is_file():
+                    if entry.name in EXCLUDED_FILES or entry.name.endswith(".tmp"):
+                        continue
+                    if entry.name.startswith(".") and entry.name != EDIT_INDEX_FILE:
+                        continue
+                    files[path] = entry.stat()
+    return files
+
+
+def _hash_file(path):
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _store_blob(path, digest):
+    """将文件内容保存到文件库（已存在时跳过），保存的文件设为只读"""
+    target = blob_path(digest)
+    if os.path.exists(target):
+        return False
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    temp_path = f"{target}.{threading.get_ident()}.tmp"
+    shutil.copyfile(path, temp_path)
+    os.chmod(temp_path, stat.S_IREAD | stat.S_IRGRP | stat.S_IROTH)
+    os.replace(temp_path, target)
+    return True
+
+
+def snapshot_id(files):
+    """由清单内容得到版本号（内容相同的数据集版本号相同）"""
+    digest = hashlib.blake2b(digest_size=6)
+    for path in sorted(files):
+        digest.update(f"{path}\0{files[path][0]}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+@tracing.traced("sample.create_snapshot", cat="io")
+def create_snapshot(sample_group, group_path=None, workers=None, progress=None):
+    """
+    为样本组创建数据集版本（与最新版本内容相同时直接返回该版本）
+
+    Args:
+        group_path: 样本组目录，默认 config.SAMPLE_PATH/<样本组>
+        workers: 计算哈希、写入文件库的线程数
+        progress: 进度回调 progress(已处理数, 需要处理数)，只统计状态变化的文件
+
+    Returns:
+        清单 {"id", "group", "created", "parent", "file_count", "total_size", "files": {相对路径: [哈希, 大小]}}
+    """
+    group_path = group_path or join_path(config.SAMPLE_PATH, sample_group)
+    folder = group_folder(sample_group)
+    with _lock:
+        cache = _read_json(join_path(folder, STAT_CACHE_FILE), {})
+        current = _scan(group_path)
+        files, changed = {}, []
+        for path, info in current.items():
+            cached = cache.get(path)
+            if cached and cached[:3] == [info.st_mtime_ns, info.st_size, info.st_ino] and os.path.exists(blob_path(cached[3])):
+                files[path] = [cached[3], info.st_size]
+            else:
+                changed.append(path)
+
+        def store(path):
+            source = join_path(group_path, path)
+            digest = _hash_file(source)
+            _store_blob(source, digest)
+            return digest
+
+        workers = workers or min(8, (os.cpu_count() or 1) * 2)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="snapshot") as executor:
+            for done, (path, digest) in enumerate(zip(changed, executor.map(store, changed)), 1):
+                files[path] = [digest, current[path].st_size]
+                if progress:
+                    progress(done, len(changed))
+        cache = {path: [info.st_mtime_ns, info.st_size, info.st_ino, files[path][0]] for path, info in current.items()}
+        _write_json(join_path(folder, STAT_CACHE_FILE), cache)
+
+        snapshots = list_snapshots(sample_group)
+        manifest_id = snapshot_id(files)
+        if snapshots and snapshots[-1]["id"] == manifest_id:
+            latest = load_snapshot(sample_group, manifest_id)
+            if latest is not None:
+                return latest
+        manifest = {
+            "id": manifest_id,
+            "group": sample_group,
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "parent": snapshots[-1]["id"] if snapshots else None,
+            "file_count": len(files),
+            "total_size": sum(size for _, size in files.values()),
+            "files": files,
+        }
+        _write_json(join_path(folder, f"{manifest_id}.json"), manifest)
+        summary = {key: value for key, value in manifest.items() if key != "files"}
+        _write_json(join_path(folder, INDEX_FILE), [item for item in snapshots if item["id"] != manifest_id] + [summary])
+        logger.info(f"样本组 {sample_group} 创建版本 {manifest_id}：{len(files)} 个文件，{len(changed)} 个有变化")
+        return manifest
+
+
+def load_snapshot(sample_group, snapshot):
+    """读取版本清单，不存在时返回 None"""
+    return _read_json(join_path(group_folder(sample_group), f"{snapshot}.json"), None)
+
+
+def list_snapshots(sample_group):
+    """样本组的全部版本摘要（不含文件列表），按创建顺序排列"""
+    return _read_json(join_path(group_folder(sample_group), INDEX_FILE), [])
+
+
+def diff_snapshots(old, new):
+    """
+    比较两个版本清单
+
+    Returns:
+        {"added": [路径], "removed": [路径], "modified": [路径]}
+    """
+    old_files, new_files = old["files"], new["files"]
+    return {
+        "added": sorted(path for path in new_files if path not in old_files),
+        "removed": sorted(path for path in old_files if path not in new_files),
+        "modified": sorted(path for path, entry in new_files.items()
+                           if path in old_files and old_files[path][0] != entry[0]),
+    }
+
+
+def format_diff(diff):
+    return f"新增 {len(diff['added'])}，删除 {len(diff['removed'])}，修改 {len(diff['modified'])}"
+
+
+@tracing.traced("sample.restore_snapshot", cat="io")
+def restore_snapshot(sample_group, snapshot, dest_path):
+    """
+    将版本恢复到目录 dest_path（目录必须不存在或为空）：从文件库硬链接，不能链接时复制；
+    硬链接的文件为只读，改写前需先删除
+
+    Returns:
+        恢复的文件数
+    """
+    manifest = load_snapshot(sample_group, snapshot)
+    if manifest is None:
+        raise FileNotFoundError(f"样本组 {sample_group} 没有版本 {snapshot}")
+    if os.path.isdir(dest_path) and os.listdir(dest_path):
+        raise FileExistsError(f"目标目录不为空: {dest_path}")
+    for path, (digest, _) in manifest["files"].items():
+        target = join_path(dest_path, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            os.link(blob_path(digest), target)
+        except OSError:
+            shutil.copyfile(blob_path(digest), target)
+    return len(manifest["files"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="样本组数据集版本")
+    parser.add_argument("project", help="项目路径（包含 metadata.json）")
+    parser.add_argument("group", help="样本组名")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("create", help="创建版本")
+    subparsers.add_parser("list", help="列出版本")
+    diff_parser = subparsers.add_parser("diff", help="比较两个版本")
+    diff_parser.add_argument("old")
+    diff_parser.add_argument("new")
+    restore_parser = subparsers.add_parser("restore", help="恢复版本到目录")
+    restore_parser.add_argument("snapshot")
+    restore_parser.add_argument("dest")
+    args = parser.parse_args()
+
+    tracing.setup_logging("INFO")
+    config.SAMPLE_PATH = join_path(args.project, config.SAMPLE_FOLDER)
+    if args.command == "create":
+        manifest = create_snapshot(args.group)
+        print(f"{manifest['id']}  {manifest['file_count']} 个文件")
+    elif args.command == "list":
+        for manifest in list_snapshots(args.group):
+            print(f"{manifest['id']}  {manifest['created']}  {manifest['file_count']} 个文件  父版本 {manifest['parent']}")
+    elif args.command == "diff":
+        old, new = load_snapshot(args.group, args.old), load_snapshot(args.group, args.new)
+        if old is None or new is None:
+            print("版本不存在")
+            return 1
+        diff = diff_snapshots(old, new)
+        for kind, sign in (("added", "+"), ("removed", "-"), ("modified", "~")):
+            for path in diff[kind]:
+                print(f"{sign} {path}")
+        print(format_diff(diff))
+    else:
+        print(f"已恢复 {restore_snapshot(args.group, args.snapshot, args.dest)} 个文件到 {args.dest}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,316 @@
+"""
+样本组近重复图片检测
+
+重复和近似重复的训练图片会增大 PatchCore 记忆库和上传时间，却不增加信息。这里：
+    哈希    每张图片缩小解码（JPEG 在解码阶段按 1/8 缩小）后计算 64 位 dHash 和 pHash，
+            解码在线程池中并行，哈希按批用 NumPy 向量化计算（pHash 的 DCT 为批量矩阵乘法）
+    缓存    哈希保存在图片目录的边车索引 .hashes.json 中，键为 (修改时间, 文件大小, 编辑记录)，只重算变化的图片
+    检索    pHash 按 16 位分为 4 段建立多索引（multi-index hashing）：汉明距离 ≤ r 的两个哈希至少有一段
+            距离 ≤ r // 4，只需在各段的邻近桶中取候选，再用完整的 pHash / dHash 距离确认，无需两两比较
+    分组    按保留优先级依次取图片为保留图片，与其直接近重复的图片归入该组（不做传递合并）
+有编辑记录的图片按编辑后的图像计算哈希
+
+本模块不依赖 Qt
+"""
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import combinations
+
+import numpy as np
+
+import config
+import tracing
+from edit_stack import get_edits, load_edited, read_image
+from lazy_import import lazy_import
+from path_utils import is_image, join_path
+
+cv2 = lazy_import("cv2")
+logger = logging.getLogger(__name__)
+
+HASH_INDEX_FILE = ".hashes.json" # 边车哈希索引文件名
+HASH_SIZE = 8 # 哈希边长（64 位）
+PHASH_SIZE = 32 # pHash 的 DCT 输入边长
+INDEX_SEGMENTS = 4 # 多索引的分段数（每段 16 位）
+DHASH_DISTANCE = 8 # 近重复还需满足的 dHash 距离上限
+BATCH_SIZE = 512 # 每批向量化计算的图片数
+
+
+def _dct_matrix(size):
+    """正交 DCT-II 矩阵"""
+    n = np.arange(size)
+    matrix = np.cos(np.pi * (2 * n[None, :] + 1) * n[:, None] / (2 * size)) * np.sqrt(2 / size)
+    matrix[0] /= np.sqrt(2)
+    return matrix.astype(np.float32)
+
+_DCT_LOW = _dct_matrix(PHASH_SIZE)[:HASH_SIZE] # 只需要低频的前 8 行
+
+
+def _pack_bits(bits):
+    """(N, 64) 布尔数组 -> (N,) uint64"""
+    return np.packbits(bits.reshape(len(bits), -1), axis=1).view(">u8").ravel().astype(np.uint64)
+
+
+def dhash_batch(images):
+    """
+    批量 dHash：images 为 (N, 8, 9) 灰度图，比较每行相邻像素
+    """
+    images = np.asarray(images, dtype=np.float32)
+    return _pack_bits(images[:, :, 1:] > images[:, :, :-1])
+
+
+def phash_batch(images):
+    """
+    批量 pHash：images 为 (N, 32, 32) 灰度图，取二维 DCT 左上 8x8 低频系数与其中位数比较
+    """
+    images = np.asarray(images, dtype=np.float32)
+    low = _DCT_LOW @ images @ _DCT_LOW.T # (N, 8, 8)
+    flat = low.reshape(len(low), -1)
+    median = np.sort(flat[:, 1:], axis=1)[:, HASH_SIZE * HASH_SIZE // 2 - 1, None] # 中位数（不计直流分量，共 63 个系数）
+    return _pack_bits(flat > median)
+
+
+def hamming(a, b):
+    """两个（组）uint64 哈希的汉明距离"""
+    return np.bitwise_count(np.bitwise_xor(a, b))
+
+
+def _small_images(path):
+    """读取图片并缩小为 (dHash 输入, pHash 输入, 原图像素数（缩小解码时为估计值）)，读取失败时返回 None"""
+    scale = 1
+    if get_edits(path):
+        image = load_edited(path, cv2.IMREAD_GRAYSCALE)
+    else:
+        image, scale = read_image(path, cv2.IMREAD_REDUCED_GRAYSCALE_8), 8
+        if image is None or min(image.shape[:2]) < PHASH_SIZE:
+            image, scale = read_image(path, cv2.IMREAD_GRAYSCALE), 1
+    if image is None:
+        return None
+    return (cv2.resize(image, (HASH_SIZE + 1, HASH_SIZE), interpolation=cv2.INTER_AREA),
+            cv2.resize(image, (PHASH_SIZE, PHASH_SIZE), interpolation=cv2.INTER_AREA),
+            image.shape[0] * image.shape[1] * scale * scale)
+
+
+@tracing.traced("sample.compute_hashes", cat="image")
+def compute_hashes(paths, workers=None, progress=None):
+    """
+    并行解码、批量计算哈希
+
+    Returns:
+        {路径: (dhash, phash, 像素数)}，读取失败的图片不在结果中
+    """
+    workers = workers or min(8, (os.cpu_count() or 1) + 2)
+    result = {}
+    done = 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dedup") as executor:
+        for start in range(0, len(paths), BATCH_SIZE):
+            batch = paths[start:start + BATCH_SIZE]
+            smalls = [(path, small) for path, small in zip(batch, executor.map(_small_images, batch)) if small is not None]
+            if smalls:
+                dhashes = dhash_batch([small[0] for _, small in smalls])
+                phashes = phash_batch([small[1] for _, small in smalls])
+                for (path, small), dhash, phash in zip(smalls, dhashes, phashes):
+                    result[path] = (int(dhash), int(phash), small[2])
+            done += len(batch)
+            if progress:
+                progress(done, len(paths))
+    return result
+
+
+# -------------------- 哈希缓存 --------------------
+def _signature(path):
+    """判断缓存是否有效的签名：(修改时间, 文件大小, 编辑记录摘要)"""
+    stat = os.stat(path)
+    edits = get_edits(path)
+    digest = hashlib.sha1(json.dumps(edits, sort_keys=True).encode("utf-8")).hexdigest()[:12] if edits else ""
+    return [stat.st_mtime, stat.st_size, digest]
+
+
+def load_hashes(folder, names=None, workers=None, progress=None):
+    """
+    目录中图片的哈希（优先使用边车索引，变化的图片重新计算并写回索引）
+
+    Args:
+        names: 文件名列表，None 表示目录中的全部图片
+
+    Returns:
+        {文件名: (dhash, phash, 像素数)}
+    """
+    if names is None:
+        names = sorted(name for name in os.listdir(folder) if is_image(name))
+    index_file = join_path(folder, HASH_INDEX_FILE)
+    index = {}
+    if os.path.exists(index_file):
+        try:
+            with open(index_file, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取哈希索引失败，将重新计算: {str(e)}")
+    hashes, stale, signatures = {}, [], {}
+    for name in names:
+        path = join_path(folder, name)
+        try:
+            signatures[name] = _signature(path)
+        except OSError:
+            continue
+        entry = index.get(name)
+        if entry and entry["signature"] == signatures[name]:
+            hashes[name] = (int(entry["dhash"], 16), int(entry["phash"], 16), entry["pixels"])
+        else:
+            stale.append(name)
+    if stale:
+        computed = compute_hashes([join_path(folder, name) for name in stale], workers, progress)
+        for name in stale:
+            value = computed.get(join_path(folder, name))
+            if value is None:
+                continue
+            hashes[name] = value
+            index[name] = {"signature": signatures[name], "dhash": f"{value[0]:016x}", "phash": f"{value[1]:016x}",
+                           "pixels": value[2]}
+        # 去掉已删除图片的记录
+        index = {name: entry for name, entry in index.items() if os.path.exists(join_path(folder, name))}
+        temp_file = index_file + ".tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(temp_file, index_file)
+    elif progress:
+        progress(len(names), len(names))
+    return hashes
+
+
+# -------------------- 多索引检索 --------------------
+class MultiIndexHash:
+    """
+    64 位哈希的多索引汉明距离检索
+
+    哈希按 16 位分为 INDEX_SEGMENTS 段，每段按值排序；查询距离 r 时在每段中查找距离 ≤ r // 段数 的值
+    （翻转至多这么多位得到的全部值），候选再用完整距离过滤
+    """
+    def __init__(self, hashes):
+        self.hashes = np.asarray(hashes, dtype=np.uint64)
+        self.bits = 64 // INDEX_SEGMENTS
+        self.segments = []
+        for segment in range(INDEX_SEGMENTS):
+            values = ((self.hashes >> np.uint64(segment * self.bits)) & np.uint64((1 << self.bits) - 1)).astype(np.int64)
+            # 按段值分桶：桶 v 中的下标为 order[starts[v]:starts[v] + counts[v]]
+            order = np.argsort(values, kind="stable")
+            counts = np.bincount(values, minlength=1 << self.bits)
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            self.segments.append((values, order, starts, counts))
+
+    def _flip_masks(self, radius):
+        """段内翻转至多 radius 位的全部掩码"""
+        masks = [0]
+        for count in range(1, radius + 1):
+            masks += [sum(1 << bit for bit in flips) for flips in combinations(range(self.bits), count)]
+        return masks
+
+    def pairs(self, radius, queries=None):
+        """
+        距离 ≤ radius 的全部下标对 (i, j)
+
+        Args:
+            queries: 只查找这些下标与其它哈希的配对，None 表示全部两两配对（每对只出现一次，i < j）
+
+        Returns:
+            (K, 2) int64 数组
+        """
+        count = len(self.hashes)
+        full = queries is None
+        queries = np.arange(count) if full else np.asarray(queries, dtype=np.int64)
+        if count < 2 or not len(queries):
+            return np.empty((0, 2), dtype=np.int64)
+        candidates = []
+        for values, order, starts, counts in self.segments:
+            query_values = values[queries]
+            for mask in self._flip_masks(radius // INDEX_SEGMENTS):
+                keys = query_values ^ mask
+                sizes = counts[keys]
+                total = int(sizes.sum())
+                if not total:
+                    continue
+                # 展开每个查询对应的桶：第 k 个查询取 order[starts[keys[k]]:starts[keys[k]] + sizes[k]]
+                offsets = np.repeat(starts[keys] - np.concatenate(([0], np.cumsum(sizes)[:-1])), sizes)
+                pairs = np.stack([np.repeat(queries, sizes), order[offsets + np.arange(total)]], axis=1)
+                # 全部两两配对时每对会从两端各找到一次，只保留 i < j；再用完整距离过滤
+                pairs = pairs[pairs[:, 0] < pairs[:, 1]] if full else pairs[pairs[:, 0] != pairs[:, 1]]
+                pairs = pairs[hamming(self.hashes[pairs[:, 0]], self.hashes[pairs[:, 1]]) <= radius]
+                if len(pairs):
+                    candidates.append(pairs)
+        if not candidates:
+            return np.empty((0, 2), dtype=np.int64)
+        pairs = np.sort(np.concatenate(candidates), axis=1) # 同一对可能在多段中命中，只保留一次
+        return np.unique(pairs, axis=0)
+
+
+def _group_around_keepers(order, pairs):
+    """
+    按保留优先级分组：依次取尚未分组的图片作为保留图片，把与它直接近重复、尚未分组的图片归入该组。
+    与传递闭包（并查集）不同，逐渐变化的一串图片不会被合并成一组，组内每张图片都与保留的图片近似
+    """
+    neighbours = {}
+    for i, j in pairs.tolist():
+        neighbours.setdefault(i, []).append(j)
+        neighbours.setdefault(j, []).append(i)
+    rank = {index: position for position, index in enumerate(order)}
+    assigned = set()
+    groups = []
+    for keeper in order:
+        if keeper in assigned or keeper not in neighbours:
+            continue
+        assigned.add(keeper)
+        members = sorted((j for j in neighbours[keeper] if j not in assigned), key=rank.get)
+        if members:
+            assigned.update(members)
+            groups.append([keeper] + members)
+    return groups
+
+
+def find_duplicates(folder, names=None, distance=None, workers=None, progress=None):
+    """
+    查找目录中的近重复图片组
+
+    近重复：pHash 距离 ≤ distance（默认 config.DUPLICATE_DISTANCE）且 dHash 距离 ≤ DHASH_DISTANCE
+
+    Args:
+        names: 只查找这些图片（例如刚导入的图片）与目录中图片的近重复，None 表示检查全部图片
+
+    Returns:
+        [[文件名, ...]]，每组第一张为保留的图片：
+        指定 names 时优先保留原有图片，否则保留分辨率最高的一张（相同时保留文件较大、质量较高的一张）
+    """
+    distance = config.DUPLICATE_DISTANCE if distance is None else distance
+    report = (lambda done, total: progress("计算哈希", done, total)) if progress else None
+    hashes = load_hashes(folder, workers=workers, progress=report)
+    all_names = list(hashes)
+    if len(all_names) < 2:
+        return []
+    positions = {name: i for i, name in enumerate(all_names)}
+    dhashes = np.array([hashes[name][0] for name in all_names], dtype=np.uint64)
+    index = MultiIndexHash([hashes[name][1] for name in all_names])
+    if progress:
+        progress("查找近重复", 0, 1)
+    queries = None if names is None else [positions[name] for name in names if name in positions]
+    pairs = index.pairs(distance, queries)
+    pairs = pairs[hamming(dhashes[pairs[:, 0]], dhashes[pairs[:, 1]]) <= DHASH_DISTANCE]
+    if progress:
+        progress("查找近重复", 1, 1)
+
+    new_names = set(names or ())
+    def keep_order(name):
+        if names is not None:
+            return (name in new_names, name)
+        return (-hashes[name][2], -os.path.getsize(join_path(folder, name)), name)
+    order = sorted(range(len(all_names)), key=lambda i: keep_order(all_names[i]))
+    groups = [[all_names[i] for i in group] for group in _group_around_keepers(order, pairs)]
+    return sorted(groups, key=lambda group: group[0])
+
+
+def removable(groups, names=None):
+    """
+    近重复组中可以删除的图片：每组保留第一张；指定 names 时只删除其中的图片（不删除原有图片）
+    """
+    names = None if names is None else set(names)
+    return [name for group in groups for name in group[1:] if names is None or name in names]
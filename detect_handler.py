@@ -1,16 +1,14 @@
-import json
 import os
 import shutil
 import traceback
-import matplotlib.pyplot as plt
 import time
 from datetime import datetime
 import numpy as np
 import platform
-from PySide6.QtCore import Qt, QEvent, QObject, QThread, Signal
-from PySide6.QtGui import QPixmap, QIcon
+from PySide6.QtCore import Qt, QEvent, QObject, QThread, Signal, QPoint, QPointF, QRectF
+from PySide6.QtGui import QPixmap, QIcon, QPainter, QColor, QPen
 from PySide6.QtWidgets import (QWidget, QDialog, QMessageBox, QFileDialog, 
-                             QAbstractItemView, QTreeWidgetItem, QApplication, QVBoxLayout)
+                             QAbstractItemView, QTreeWidgetItem, QApplication, QVBoxLayout, QLabel)
 from PySide6.QtUiTools import QUiLoader
 
 import config
@@ -19,8 +17,11 @@ from http_server import HttpServer, HttpDetectSamples, UploadSampleGroup_HTTP
 from ssh_server import SSHServer, DefectSamples
 from utils import LoadingAnimation, ProgressDialog, check_detect_sample_group, show_message_box, join_path, is_image, update_metadata, copy_image, create_file_dialog
 from model_handler import ModelGroupDialog
+from project_index import get_project_index
+from result_compositor import find_combined, get_result_compositor
+from result_store import get_result_store, status_of, to_score
+from score_index import ScoreIndex
 from anomaly_gpt import AIChatDialog
-from detect_report import generate_pdf_report
 
 
 class DetectHandler(QObject):
@@ -42,6 +43,8 @@ class DetectHandler(QObject):
         self.init_sample_group()
         # 初始化模型组
         self.init_model_group()
+        # 初始化得分索引显示
+        self.init_score_view()
         # 初始化检测列表
         self.init_detect_list()
         # 初始化检测组件
@@ -71,12 +74,9 @@ class DetectHandler(QObject):
         # 添加阈值手动编辑功能
         self.ui.thresholdEditButton.clicked.connect(self.show_threshold_edit)
         self.ui.thresholdEditField.editingFinished.connect(self.on_threshold_edit_done)
-        
-        # 初始化检测列表
-        if config.DETECT_SAMPLE_GROUP:
-            detect_list_path = join_path(config.DETECT_PATH, config.DETECT_SAMPLE_GROUP, 'detect_list.json')
-            if os.path.exists(detect_list_path):
-                config.DETECT_LIST = json.load(open(detect_list_path))
+        # 列表徽标和计数按设置后的阈值同步
+        self.on_threshold_changed(self.ui.thresholdSlider.value())
+
     
     def init_ai_infer(self):
         """初始化 AI 判别功能"""
@@ -86,7 +86,8 @@ class DetectHandler(QObject):
     def on_ai_infer_clicked(self):
         """处理 AI 判别按钮点击事件，支持多图像分析"""
         # 检查是否有检测结果
-        if not config.DETECT_LIST:
+        result_store = get_result_store()
+        if not config.DETECT_SAMPLE_GROUP or not result_store.count(config.DETECT_SAMPLE_GROUP):
             show_message_box("提示", "请先进行图像检测", QMessageBox.Information)
             return
         
@@ -101,19 +102,14 @@ class DetectHandler(QObject):
             
             # 将当前图像作为唯一选择
             origin_name = os.path.basename(self.current_original_path)
-            image_info_list = [info for info in config.DETECT_LIST if info.get('origin_name') == origin_name]
+            image_info_list = result_store.get_many(config.DETECT_SAMPLE_GROUP, [origin_name])
             if not image_info_list:
                 show_message_box("错误", "未找到当前图像的检测结果信息", QMessageBox.Critical)
                 return
         else:
             # 从选中的图像项中提取图像信息
-            image_info_list = []
-            for item in selected_items:
-                origin_name = os.path.basename(item.image_path)
-                for info in config.DETECT_LIST:
-                    if info.get('origin_name') == origin_name:
-                        image_info_list.append(info)
-                        break
+            origin_names = [os.path.basename(item.image_path) for item in selected_items]
+            image_info_list = result_store.get_many(config.DETECT_SAMPLE_GROUP, origin_names)
             
             if not image_info_list:
                 show_message_box("错误", "未找到选中图像的检测结果信息", QMessageBox.Critical)
@@ -129,15 +125,103 @@ class DetectHandler(QObject):
         self.select_disabled()
 
     def on_threshold_changed(self, value):
-        """阈值变化时更新显示"""
+        """阈值变化时更新显示：计数、直方图，以及状态发生翻转的列表项徽标"""
         threshold = value / 100.0
         self.ui.thresholdValueLabel.setText(f"阈值: {threshold:.2f}")
+        if self.score_index is None:
+            return
+        # 只有得分落在新旧阈值之间的图片状态会翻转，二分查找即可定位
+        if threshold > self.badge_threshold:
+            self.set_badges(self.score_index.names_in_range(self.badge_threshold, threshold), "正常")
+        elif threshold < self.badge_threshold:
+            self.set_badges(self.score_index.names_in_range(threshold, self.badge_threshold), "异常")
+        self.badge_threshold = threshold
+        self.update_score_view(threshold)
+
+    def init_score_view(self):
+        """
+        初始化得分索引的显示：阈值设置中的异常 / 正常计数，拖动滑动条时浮动显示得分直方图
+        """
+        self.score_index = None
+        self.detect_items = {} # {原图名: 检测列表项}
+        self.badge_threshold = None # 列表徽标当前对应的阈值
+        self.threshold_count_label = QLabel(self.ui.thresholdSlider.parentWidget())
+        self.threshold_count_label.setGeometry(110, 70, 115, 16)
+        self.threshold_count_label.setStyleSheet(self.ui.thresholdValueLabel.styleSheet())
+        self.score_histogram = ScoreHistogramWidget(self.ui)
+        self.ui.thresholdSlider.sliderPressed.connect(self.show_score_histogram)
+        self.ui.thresholdSlider.sliderReleased.connect(self.score_histogram.hide)
+        # 检测过程中新到达的结果直接合并进索引
+        self.detect_samples_handler.on_results = self.on_new_results
+        self.detect_samples_handler.on_finished = self.on_detection_finished
+
+    def refresh_score_index(self):
+        """从检测结果库重建得分索引，并按当前阈值设置全部列表项的徽标"""
+        self.detect_items = {}
+        for index in range(self.ui.detectList.count()):
+            item = self.ui.detectList.item(index)
+            if hasattr(item, 'image_path'):
+                self.detect_items[os.path.basename(item.image_path)] = item
+        if self.sample_group:
+            self.score_index = ScoreIndex.from_store(get_result_store(), self.sample_group)
+        else:
+            self.score_index = ScoreIndex()
+        threshold = self.ui.thresholdSlider.value() / 100.0
+        self.set_badges(self.score_index.names_in_range(None, threshold), "正常")
+        self.set_badges(self.score_index.names_in_range(threshold, None), "异常")
+        self.badge_threshold = threshold
+        self.update_score_view(threshold)
+
+    def on_detection_finished(self, detect_group):
+        """检测结束：结果库已删除过期记录，重建当前样本组的得分索引"""
+        if self.sample_group == detect_group:
+            self.refresh_score_index()
+
+    def on_new_results(self, records):
+        """检测中新到达的结果：合并进得分索引，更新对应列表项的徽标和计数"""
+        if self.score_index is None or self.sample_group != self.detect_samples_handler.detect_group:
+            return
+        self.score_index.update(records)
+        for record in records:
+            item = self.detect_items.get(record['origin_name'])
+            if item:
+                item.set_status(status_of(to_score(record.get('score')), self.badge_threshold))
+        self.update_score_view(self.badge_threshold)
+
+    def set_badges(self, origin_names, status):
+        for name in origin_names:
+            item = self.detect_items.get(name)
+            if item:
+                item.set_status(status)
+
+    def update_score_view(self, threshold):
+        """更新异常 / 正常计数和直方图"""
+        defects, normals = self.score_index.counts(threshold)
+        self.threshold_count_label.setText(f"异常 {defects} / 正常 {normals}" if len(self.score_index) else "")
+        self.score_histogram.set_data(self.score_index.histogram(), threshold, defects, normals)
+
+    def show_score_histogram(self):
+        """在阈值滑动条下方显示得分直方图"""
+        slider = self.ui.thresholdSlider
+        self.score_histogram.move(slider.mapToGlobal(QPoint(0, slider.height() + 40)))
+        self.score_histogram.show()
+
+    def load_detect_list(self, with_animation=False):
+        """加载检测样本组的图片列表，并重建得分索引"""
+        loader = LoadImages(self.ui, self.group_path, 'detectList')
+        if with_animation:
+            loader.load_with_animation()
+        else:
+            loader.load_with_progress()
+        self.refresh_score_index()
     
     def apply_threshold(self):
         """应用新的阈值设置"""
         new_threshold = self.ui.thresholdSlider.value() / 100.0
         config.DEFECT_THRESHOLD = new_threshold
         update_metadata('defect_threshold', new_threshold)
+        if config.DETECT_SAMPLE_GROUP:
+            get_result_store().apply_threshold(config.DETECT_SAMPLE_GROUP, new_threshold)
         
         # 如果当前有显示结果，使用新阈值刷新显示
         if hasattr(self, 'has_result') and self.has_result:
@@ -263,6 +347,7 @@ class DetectHandler(QObject):
                 self.update_button_visibility()
                 # 清空图片列表
                 self.ui.detectList.clear()
+                self.refresh_score_index()
                 # 显示成功消息
                 show_message_box("成功", f"已创建样本组：{text}", QMessageBox.Information, self.ui)
             else: # 如果样本组已存在，显示错误消息
@@ -306,7 +391,7 @@ class DetectHandler(QObject):
                 except Exception as e:
                     print(f"从http_server加载图片失败: {str(e)}")
             # 加载样本组中的图片
-            LoadImages(self.ui, self.group_path, 'detectList').load_with_progress()
+            self.load_detect_list()
             # 更新按钮显示状态
             self.update_button_visibility()
             # 显示成功消息
@@ -348,6 +433,8 @@ class DetectHandler(QObject):
                     print(f"http_server删除样本组成功 ID={group_id}")
                 except Exception as e:
                     print(f"http_server删除样本组失败: {str(e)}")
+                # 删除该组的检测记录，同名重建的样本组不会带上旧结果
+                get_result_store().clear_group(sample_group)
                 # 如果删除的是当前样本组，清空当前样本组
                 if self.sample_group == sample_group:
                     config.DETECT_SAMPLE_GROUP = self.sample_group = None
@@ -434,7 +521,7 @@ class DetectHandler(QObject):
         self.ui.completeSamplesButton.clicked.connect(self.select_disabled)
         # 加载图片
         if self.sample_group:
-            LoadImages(self.ui, self.group_path, 'detectList').load_with_progress() # 加载图片列表
+            self.load_detect_list() # 加载图片列表
             self.update_button_visibility() # 更新按钮显示状态
 
     def fold(self):
@@ -509,28 +596,30 @@ class DetectHandler(QObject):
         删除选中的图片
         """
         selected_items = self.ui.detectList.selectedItems()
+        deleted_names = []
         for item in selected_items:
             print(f"删除原图: {item.image_path}")
             image_path = item.image_path
             if os.path.exists(image_path):
                 os.remove(image_path)  # 删除文件
-            # 如果有进行过检测，删除相关图片（可通过是否存在DETECT_LIST判断）
-            if config.DETECT_LIST:
+            # 如果有进行过检测，删除相关图片
+            detect_group_path = join_path(config.DETECT_PATH, config.DETECT_SAMPLE_GROUP)
+            if os.path.isdir(detect_group_path):
                 # 获取原图文件名（不含扩展名）
                 origin_name = os.path.basename(image_path)
                 base_name = os.path.splitext(origin_name)[0] + '_'
-                detect_group_path = join_path(config.DETECT_PATH, config.DETECT_SAMPLE_GROUP)  
                 # 查找并删除所有以该图片名开头的结果图片
                 for result_file in os.listdir(detect_group_path):
                     if result_file.startswith(base_name):
                         result_file_path = join_path(detect_group_path, result_file)
                         print(f"删除检测图: {result_file_path}")
                         os.remove(result_file_path)
-                config.DETECT_LIST = [info for info in config.DETECT_LIST if info.get('origin_name') != origin_name]
-                # 更新detect_list.json文件
-                with open(join_path(detect_group_path, 'detect_list.json'), 'w') as f:
-                    json.dump(config.DETECT_LIST, f, ensure_ascii=False, indent=4)
-        LoadImages(self.ui, self.group_path, 'detectList').load_with_animation()  # 重新加载图片列表
+                        get_result_compositor().invalidate(result_file_path)
+                deleted_names.append(origin_name)
+        # 一次性删除检测结果记录
+        if deleted_names:
+            get_result_store().delete(config.DETECT_SAMPLE_GROUP, deleted_names)
+        self.load_detect_list(with_animation=True)  # 重新加载图片列表
         self.clear_detail_frame()  # 清除detailFrame
         # 删除完图片后，重置选择模式为禁用状态
         self.select_disabled()
@@ -550,7 +639,7 @@ class DetectHandler(QObject):
                 if is_image(file_name):
                     file_path = join_path(folder, file_name)
                     copy_image(file_path, self.group_path)
-            LoadImages(self.ui, self.group_path, 'detectList').load_with_progress()  # 重新加载图片列表
+            self.load_detect_list()  # 重新加载图片列表
 
     def import_images(self):
         """
@@ -570,7 +659,7 @@ class DetectHandler(QObject):
         if files:
             for file_path in files:
                 copy_image(file_path, self.group_path)
-            LoadImages(self.ui, self.group_path, 'detectList').load_with_progress()  # 重新加载图片列表
+            self.load_detect_list()  # 重新加载图片列表
 
     def show_detect_image(self, item):
         """显示选中的检测图片，支持原图和结果图的切换显示"""
@@ -580,10 +669,10 @@ class DetectHandler(QObject):
         # 获取原图和结果图的路径
         original_path = item.image_path
         base_name = os.path.splitext(os.path.basename(original_path))[0]
-        result_path = join_path(config.DETECT_PATH, config.DETECT_SAMPLE_GROUP, f"{base_name}_combined.png")
+        result_path = find_combined(join_path(config.DETECT_PATH, config.DETECT_SAMPLE_GROUP), base_name)
         
         # 检查是否存在结果图
-        has_result = os.path.exists(result_path)
+        has_result = result_path is not None
         
         # 保存当前图像信息
         self.current_original_path = original_path
@@ -601,17 +690,19 @@ class DetectHandler(QObject):
 
     def update_image_display(self):
         """根据当前状态更新图片显示"""
+        # 结果图取合成图缓存中显示尺寸的图像（检测时已放入缓存），无需再次解码和缩放
+        image = None
         if self.show_result and self.has_result:
-            pixmap_path = self.current_result_path
+            image = get_result_compositor().display_image(self.current_result_path, self.ui.resultLabel.size())
+        if image is not None:
+            scaled_pixmap = QPixmap.fromImage(image)
         else:
-            pixmap_path = self.current_original_path
-            
-        # 缩放图片以适应显示区域
-        scaled_pixmap = QPixmap(pixmap_path).scaled(
-                self.ui.resultLabel.size(),
-                Qt.KeepAspectRatio,
-                Qt.SmoothTransformation
-            )
+            # 缩放图片以适应显示区域
+            scaled_pixmap = QPixmap(self.current_original_path).scaled(
+                    self.ui.resultLabel.size(),
+                    Qt.KeepAspectRatio,
+                    Qt.SmoothTransformation
+                )
         self.ui.resultLabel.setPixmap(scaled_pixmap)
         self.ui.resultLabel.setToolTip("点击图片切换显示原图和结果图" if self.has_result else "等待检测...")
             
@@ -620,31 +711,20 @@ class DetectHandler(QObject):
         if not self.has_result:
             return
         
-        for img_info in config.DETECT_LIST:
-            if img_info.get('origin_name') == os.path.basename(self.current_original_path):
-                # 获取分数
-                score = img_info.get('score')
-                if isinstance(score, str):
-                    try:
-                        score = float(score)
-                    except:
-                        score = 0.0
-                
-                # 根据阈值判断状态
-                is_defect = score > config.DEFECT_THRESHOLD
-                status_text = "异常" if is_defect else "正常"
-                status_color = "red" if is_defect else "green"
-                
-                # 更新UI显示
-                self.ui.resultBrowser.append(f"<b>检测样本名:</b> {img_info.get('origin_name', '未知')}")
-                self.ui.resultBrowser.append(f"<b>缺陷得分:</b> {score:.4f}")
-                self.ui.resultBrowser.append(f"<b>当前阈值:</b> {config.DEFECT_THRESHOLD:.2f}")
-                self.ui.resultBrowser.append(f"<b>检测状态:</b> <font color='{status_color}'>{status_text}</font>")
-                self.ui.resultBrowser.append(f"<b>结果保存位置:</b> {self.current_result_path}")
-                
-                # 更新状态（可能在阈值变化后状态发生变化）
-                img_info['status'] = status_text
-                return
+        # 按原图名查询检测记录（走索引）
+        img_info = get_result_store().get(config.DETECT_SAMPLE_GROUP, os.path.basename(self.current_original_path))
+        if img_info:
+            # 根据阈值判断状态
+            score = to_score(img_info.get('score'))
+            status_text = status_of(score)
+            status_color = "red" if status_text == "异常" else "green"
+            
+            # 更新UI显示
+            self.ui.resultBrowser.append(f"<b>检测样本名:</b> {img_info.get('origin_name', '未知')}")
+            self.ui.resultBrowser.append(f"<b>缺陷得分:</b> {score:.4f}")
+            self.ui.resultBrowser.append(f"<b>当前阈值:</b> {config.DEFECT_THRESHOLD:.2f}")
+            self.ui.resultBrowser.append(f"<b>检测状态:</b> <font color='{status_color}'>{status_text}</font>")
+            self.ui.resultBrowser.append(f"<b>结果保存位置:</b> {self.current_result_path}")
     
     def toggle_image(self):
         """切换原图和结果图的显示"""
@@ -681,6 +761,59 @@ class DetectHandler(QObject):
         dialog.exec()
 
 
+class ScoreHistogramWidget(QWidget):
+    """
+    得分直方图浮窗：阈值以上的区间标红，阈值位置画虚线，底部显示得分范围和异常 / 正常数量
+    """
+    def __init__(self, parent=None):
+        super().__init__(parent, Qt.ToolTip)
+        self.setFixedSize(260, 140)
+        self.histogram = None # (各区间数量, 区间边界)
+        self.threshold = 0.0
+        self.defects = 0
+        self.normals = 0
+
+    def set_data(self, histogram, threshold, defects, normals):
+        self.histogram = histogram
+        self.threshold = threshold
+        self.defects = defects
+        self.normals = normals
+        if self.isVisible():
+            self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor(255, 255, 255, 235))
+        painter.setPen(QColor("#cccccc"))
+        painter.drawRect(self.rect().adjusted(0, 0, -1, -1))
+        if self.histogram is None:
+            painter.setPen(QColor("#666666"))
+            painter.drawText(self.rect(), Qt.AlignCenter, "暂无检测结果")
+            return
+        counts, edges = self.histogram
+        margin, top, bottom = 10, 10, self.height() - 30
+        width = self.width() - 2 * margin
+        peak = max(int(counts.max()), 1)
+        bar_width = width / len(counts)
+        # 区间柱（区间整体在阈值以上为异常色）
+        for index, count in enumerate(counts):
+            height = (bottom - top) * count / peak
+            color = QColor("#e74c3c") if edges[index] >= self.threshold else QColor("#27ae60")
+            painter.fillRect(QRectF(margin + index * bar_width, bottom - height, max(bar_width - 1, 1), height), color)
+        # 阈值线
+        low, high = float(edges[0]), float(edges[-1])
+        position = (min(max(self.threshold, low), high) - low) / (high - low)
+        x = margin + position * width
+        painter.setPen(QPen(QColor("#1e3a8a"), 1.5, Qt.DashLine))
+        painter.drawLine(QPointF(x, top - 4), QPointF(x, bottom))
+        # 坐标和计数
+        painter.setPen(QColor("#333333"))
+        label_rect = QRectF(margin, bottom + 4, width, 20)
+        painter.drawText(label_rect, Qt.AlignLeft | Qt.AlignVCenter, f"{low:.2f}")
+        painter.drawText(label_rect, Qt.AlignRight | Qt.AlignVCenter, f"{high:.2f}")
+        painter.drawText(label_rect, Qt.AlignCenter, f"异常 {self.defects} / 正常 {self.normals}")
+
+
 class AnalysisWorker(QThread):
     """
     执行缺陷纹理分析的工作线程
@@ -700,10 +833,6 @@ class AnalysisWorker(QThread):
     
     def run(self):
         try:
-            # 设置Matplotlib使用非交互式后端，避免线程问题
-            import matplotlib
-            matplotlib.use('Agg')  # 使用非交互式后端
-            
             print(f"开始分析: 路径={self.detect_path}, 组={self.detect_group}, 网格划分={self.grid_size}×{self.grid_size}")
             
             # 创建分析器
@@ -804,13 +933,8 @@ class TextureAnalysisDialog(QDialog):
         self.ui.sampleGroupComboBox.clear()
         
         try:
-            # 检查检测路径是否存在
-            if not os.path.exists(self.detect_path):
-                return
-            
-            # 获取所有子目录
-            sample_groups = [d for d in os.listdir(self.detect_path) 
-                            if os.path.isdir(os.path.join(self.detect_path, d))]
+            # 从项目索引中获取所有检测组
+            sample_groups = [entry.name for entry in get_project_index().detect_groups()]
             
             # 添加到下拉框
             self.ui.sampleGroupComboBox.addItems(sample_groups)
@@ -1273,13 +1397,14 @@ class TextureAnalysisDialog(QDialog):
             item.setText(0, name)
             item.setText(1, value)
         
-        # 添加检测图像列表 (使用config.DETECT_LIST)
-        if config.DETECT_LIST:
+        # 添加检测图像列表（从检测结果库读取）
+        detect_list = get_result_store().list(report_data['detect_group'])
+        if detect_list:
             images_item = QTreeWidgetItem(basic_info)
             images_item.setText(0, "检测图像列表")
-            images_item.setText(1, f"{len(config.DETECT_LIST)}个图像")
+            images_item.setText(1, f"{len(detect_list)}个图像")
             
-            for img_info in config.DETECT_LIST:
+            for img_info in detect_list:
                 img_item = QTreeWidgetItem(images_item)
                 img_item.setText(0, img_info.get('origin_name', '未知'))
                 score = img_info.get('score', 'N/A')
@@ -1467,9 +1592,10 @@ class TextureAnalysisDialog(QDialog):
             histogram_chart = self.current_report.get('histogram_chart')
             pie_chart = self.current_report.get('pie_chart')
             
-            # 生成PDF报告直接到用户选择的路径
+            # 生成PDF报告直接到用户选择的路径（首次导出时才加载 reportlab 等依赖）
+            from detect_report import build_pdf_report
             report_path = os.path.dirname(report_file)
-            pdf_file = generate_pdf_report(
+            pdf_stats = build_pdf_report(
                 self.current_report['report_data'], 
                 report_path,
                 chart_file,
@@ -1477,6 +1603,7 @@ class TextureAnalysisDialog(QDialog):
                 pie_chart,
                 output_filename=user_selected_path  # 传递用户选择的路径
             )
+            pdf_file = pdf_stats['path'] if pdf_stats else None
             
             # 关闭进度对话框
             progress_dialog.close()
@@ -1486,11 +1613,13 @@ class TextureAnalysisDialog(QDialog):
                 # 保存PDF文件路径到current_report
                 self.current_report['pdf_report'] = pdf_file
                 
-                # 弹出提示框询问用户是否要查看PDF
+                # 弹出提示框询问用户是否要查看PDF（附文件大小和耗时）
+                from report_pdf import format_size
                 reply = QMessageBox.question(
                     self, 
                     "导出成功", 
-                    f"PDF报告已生成并保存到:\n{pdf_file}\n\n是否立即查看?",
+                    f"PDF报告已生成并保存到:\n{pdf_file}\n"
+                    f"（{format_size(pdf_stats['size'])}，{pdf_stats['pages']}页，用时{pdf_stats['seconds']:.1f}秒）\n\n是否立即查看?",
                     QMessageBox.Yes | QMessageBox.No, 
                     QMessageBox.Yes
                 )
@@ -1,30 +1,43 @@
 import os
+import itertools
 import json
+import logging
+import shutil
+import tempfile
 import numpy as np
 import cv2
-from matplotlib import pyplot as plt
 from collections import Counter, defaultdict
 from sklearn.cluster import DBSCAN
 from datetime import datetime
 import traceback
 
 import config
+import tracing
+from defect_classify import (FEATURE_DTYPE, MAIN_TYPES, POSITION_DTYPE, classify_regions, join_regions, load_rules,
+                             promote_image_types)
+from report_charts import chart_path, draw_histogram_chart, draw_pie_chart, draw_position_chart, render_charts, warm_up
+from result_store import get_result_store
 from utils import join_path
 
+logger = logging.getLogger(__name__)
+
+
+def decode_image(path, flags):
+    """使用np.fromfile和cv2.imdecode读取图像（支持中文路径），并记录解码耗时"""
+    with tracing.span("image.decode", cat="image"):
+        return cv2.imdecode(np.fromfile(path, np.uint8), flags)
+
 # 添加必要的导入
 try:
-    from reportlab.lib.pagesizes import A4
     from reportlab.lib import colors
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.units import inch, cm
-    from reportlab.pdfbase import pdfmetrics
-    from reportlab.pdfbase.ttfonts import TTFont
-    from io import BytesIO
+    from reportlab.platypus import Paragraph, Spacer, PageBreak, Table, TableStyle
+    from reportlab.lib.units import cm
+    from report_pdf import (appendix_flowables, build_pdf, get_styles, register_fonts, report_image,
+                            resolve_result_path, select_appendix_samples)
     HAS_REPORTLAB = True
 except ImportError:
     HAS_REPORTLAB = False
-    print("警告: 未安装reportlab库，PDF报告功能不可用")
+    logger.warning("警告: 未安装reportlab库，PDF报告功能不可用")
 
 
 class DefectTextureAnalyzer:
@@ -47,6 +60,7 @@ class DefectTextureAnalyzer:
             raise ValueError("未指定检测样本组")
             
         # 设置路径
+        self.detect_root = detect_path
         self.detect_path = join_path(detect_path, self.detect_group)
         
         # 如果直接指定了result_path，则使用它，否则使用默认路径
@@ -65,9 +79,9 @@ class DefectTextureAnalyzer:
         self.report_path = report_path or join_path(self.detect_path, 'reports')
         
         # 显示路径信息进行调试
-        print(f"检测路径: {self.detect_path}")
-        print(f"结果路径: {self.result_path}")
-        print(f"报告路径: {self.report_path}")
+        logger.debug(f"检测路径: {self.detect_path}")
+        logger.debug(f"结果路径: {self.result_path}")
+        logger.debug(f"报告路径: {self.report_path}")
         
         # 创建报告目录
         os.makedirs(self.report_path, exist_ok=True)
@@ -76,8 +90,9 @@ class DefectTextureAnalyzer:
         self.image_count = 0  # 总图像数
         self.defect_images = []  # 存储缺陷图像信息
         self.heatmap_data = []   # 存储热图数据
-        self.texture_features = []  # 存储缺陷特征
-        self.defect_positions = []  # 存储缺陷位置
+        self.image_names = []  # 缺陷图像文件名，下标为 image_id
+        self.texture_features = np.zeros(0, FEATURE_DTYPE)  # 缺陷特征（列式，按 region_id 与位置关联）
+        self.defect_positions = np.zeros(0, POSITION_DTYPE)  # 缺陷位置（列式）
         self.cluster_results = None  # 聚类结果
         self.best_sample = None  # 最佳样本（得分最高的图片）
         self.best_sample_path = None  # 最佳样本原图路径
@@ -95,6 +110,7 @@ class DefectTextureAnalyzer:
         if self.progress_callback:
             self.progress_callback(value, message)
     
+    @tracing.traced("report.load_images", cat="report")
     def load_defect_images(self, threshold=0.5):
         """
         根据检测得分加载异常热图图像
@@ -108,7 +124,7 @@ class DefectTextureAnalyzer:
         # 检查路径是否存在
         if not os.path.exists(self.result_path):
             error_msg = f"结果路径不存在: {self.result_path}"
-            print(error_msg)
+            logger.error(error_msg)
             self.update_progress(30, error_msg)
             return 0
         
@@ -120,13 +136,13 @@ class DefectTextureAnalyzer:
             
             # 如果找不到热图，则获取所有图像文件
             if not all_image_files:
-                print("未找到热图文件，尝试加载所有图像文件")
+                logger.warning("未找到热图文件，尝试加载所有图像文件")
                 all_image_files = [f for f in os.listdir(self.result_path) 
                               if f.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp'))]
             
             # 如果还是找不到图像，使用更宽松的匹配
             if not all_image_files:
-                print("使用宽松匹配搜索图像文件")
+                logger.debug("使用宽松匹配搜索图像文件")
                 all_image_files = []
                 for f in os.listdir(self.result_path):
                     try:
@@ -135,35 +151,30 @@ class DefectTextureAnalyzer:
                             file_path = join_path(self.result_path, f)
                             try:
                                 # 使用np.fromfile和cv2.imdecode处理可能的中文路径
-                                img_array = np.fromfile(file_path, np.uint8)
-                                img = cv2.imdecode(img_array, cv2.IMREAD_UNCHANGED)
+                                img = decode_image(file_path, cv2.IMREAD_UNCHANGED)
                             except Exception:
                                 img = None
                             if img is not None:
                                 all_image_files.append(f)
                     except Exception as e:
-                        print(f"检查文件 {f} 时出错: {str(e)}")
+                        logger.error(f"检查文件 {f} 时出错: {str(e)}")
         
             self.image_count = len(all_image_files)
-            print(f"找到 {self.image_count} 个图像文件")
+            logger.debug(f"找到 {self.image_count} 个图像文件")
             
             if self.image_count == 0:
                 self.update_progress(30, "未找到图像文件")
                 return 0
             
-            # 加载detect_list.json获取得分信息
+            # 从检测结果库获取得分信息
             detect_list = []
-            print(f"self.detect_path: {self.detect_path}")
-            detect_list_path = join_path(self.detect_path, 'detect_list.json')
-            if os.path.exists(detect_list_path):
-                try:
-                    detect_list = json.load(open(detect_list_path))
-                    config.DETECT_LIST = detect_list
-                    print(f"加载了 {len(detect_list)} 个检测结果记录")
-                except Exception as e:
-                    print(f"读取detect_list.json出错: {str(e)}")
-                else:
-                    print(f"未找到检测结果文件: {detect_list_path}")
+            try:
+                detect_list = get_result_store(self.detect_root).list(self.detect_group)
+                logger.debug(f"加载了 {len(detect_list)} 个检测结果记录")
+            except Exception as e:
+                logger.error(f"读取检测结果出错: {str(e)}")
+            if not detect_list:
+                logger.warning(f"未找到检测结果: {self.detect_group}")
             
             # 创建文件名到得分的映射
             score_map = {}
@@ -190,12 +201,12 @@ class DefectTextureAnalyzer:
                 score_map[file_name] = score
             
             if self.best_sample:
-                print(f"得分最高的样本是: {self.best_sample}, 得分: {best_score}")
+                logger.debug(f"得分最高的样本是: {self.best_sample}, 得分: {best_score}")
                 # 尝试找到样本原图路径
                 potential_path = join_path(config.SAMPLE_PATH, self.detect_group, self.best_sample)
                 if os.path.exists(potential_path):
                     self.best_sample_path = potential_path
-                    print(f"找到最佳样本原图路径: {self.best_sample_path}")
+                    logger.debug(f"找到最佳样本原图路径: {self.best_sample_path}")
             
             # 筛选出超过阈值的图像文件
             defect_image_files = []
@@ -212,14 +223,14 @@ class DefectTextureAnalyzer:
                             score = score_map[original_name]
                             # 检查得分是否超过阈值
                             if score >= threshold:
-                                print(f"图像 {image_file} 得分为 {score}，超过阈值 {threshold}，添加到缺陷列表")
+                                logger.debug(f"图像 {image_file} 得分为 {score}，超过阈值 {threshold}，添加到缺陷列表")
                                 defect_image_files.append(image_file)
                             else:
-                                print(f"图像 {image_file} 得分为 {score}，低于阈值 {threshold}，跳过")
+                                logger.debug(f"图像 {image_file} 得分为 {score}，低于阈值 {threshold}，跳过")
                             break
                     else:
                         # 如果找不到匹配的原始文件名，默认添加
-                        print(f"无法在检测列表中找到 {image_file} 对应的原始文件名，将其添加到缺陷列表")
+                        logger.warning(f"无法在检测列表中找到 {image_file} 对应的原始文件名，将其添加到缺陷列表")
                         defect_image_files.append(image_file)
                 else:
                     # 如果文件名格式不符合预期，默认添加
@@ -228,24 +239,23 @@ class DefectTextureAnalyzer:
             # 处理每个超过阈值的缺陷图像
             for i, image_file in enumerate(defect_image_files):
                 image_path = join_path(self.result_path, image_file)
-                print(f"处理缺陷图像: {image_path}")
+                logger.debug(f"处理缺陷图像: {image_path}")
                 
                 # 检查文件是否存在且可读
                 if not os.path.exists(image_path):
-                    print(f"图像文件不存在: {image_path}")
+                    logger.warning(f"图像文件不存在: {image_path}")
                     continue
                 
                 try:
                     # 修复中文路径问题：使用正确编码方式处理路径
                     # 方法1: 使用np.fromfile读取二进制数据，然后用cv2.imdecode解码
-                    img_array = np.fromfile(image_path, np.uint8)
-                    test_img = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
+                    test_img = decode_image(image_path, cv2.IMREAD_COLOR)
                     
                     if test_img is None:
-                        print(f"无法读取图像: {image_path}")
+                        logger.warning(f"无法读取图像: {image_path}")
                         continue
                 except Exception as e:
-                    print(f"读取图像失败: {image_path}, 错误: {str(e)}")
+                    logger.error(f"读取图像失败: {image_path}, 错误: {str(e)}")
                     continue
                 
                 # 添加缺陷图像
@@ -264,10 +274,11 @@ class DefectTextureAnalyzer:
         
         except Exception as e:
             error_msg = f"加载图像文件时出错: {str(e)}\n{traceback.format_exc()}"
-            print(error_msg)
+            logger.error(error_msg)
             self.update_progress(30, f"加载图像出错: {str(e)}")
             raise RuntimeError(error_msg)
     
+    @tracing.traced("report.extract_features", cat="report")
     def extract_defect_features(self, grid_size=8):
         """
         从热图中提取缺陷特征和位置，同时进行图像区域特征统计分析
@@ -278,27 +289,27 @@ class DefectTextureAnalyzer:
         try:
             self.update_progress(30, "开始提取缺陷特征...")
             self.heatmap_data = []
-            self.defect_positions = []
-            self.texture_features = []
+            self.image_names = [img_info['name'] for img_info in self.defect_images]
+            position_rows = []
+            feature_rows = []
             
             for img_idx, img_info in enumerate(self.defect_images):
                 # 读取热图
                 heatmap_path = img_info['heatmap_path']
-                print(f"读取热图: {heatmap_path}")
+                logger.debug(f"读取热图: {heatmap_path}")
                 
                 try:
                     # 使用np.fromfile和cv2.imdecode处理可能的中文路径
-                    img_array = np.fromfile(heatmap_path, np.uint8)
-                    heatmap = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
+                    heatmap = decode_image(heatmap_path, cv2.IMREAD_COLOR)
                     if heatmap is None:
-                        print(f"无法读取热图: {heatmap_path}")
+                        logger.warning(f"无法读取热图: {heatmap_path}")
                         continue
                 except Exception as e:
-                    print(f"读取热图失败: {heatmap_path}, 错误: {str(e)}")
+                    logger.error(f"读取热图失败: {heatmap_path}, 错误: {str(e)}")
                     continue
                     
                 # 输出图像形状以进行调试
-                print(f"热图形状: {heatmap.shape}")
+                logger.debug(f"热图形状: {heatmap.shape}")
                 
                 # 转换为灰度图
                 heatmap_gray = cv2.cvtColor(heatmap, cv2.COLOR_BGR2GRAY)
@@ -311,7 +322,7 @@ class DefectTextureAnalyzer:
                 
                 # 查找缺陷区域轮廓
                 contours, _ = cv2.findContours(heatmap_thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-                print(f"找到 {len(contours)} 个轮廓")
+                logger.debug(f"找到 {len(contours)} 个轮廓")
                 
                 # 处理每个轮廓
                 contour_count = 0
@@ -354,29 +365,15 @@ class DefectTextureAnalyzer:
                         # 在有效区域计算梯度均值
                         grad_mean = np.mean(grad_mag[mask > 0])
                         
-                        # 存储缺陷位置
-                        self.defect_positions.append({
-                            'image': img_info['name'],
-                            'center_x': center_x,
-                            'center_y': center_y,
-                            'width': w / heatmap.shape[1],
-                            'height': h / heatmap.shape[0],
-                            'area': area / (heatmap.shape[0] * heatmap.shape[1])
-                        })
-                        
-                        # 存储纹理特征
-                        self.texture_features.append({
-                            'image': img_info['name'],
-                            'position': (center_x, center_y),
-                            'mean': mean_val, # 均值
-                            'std': std_val, # 标准差
-                            'max': max_val, # 最大值
-                            'gradient': grad_mean, # 梯度均值
-                            'area': area # 面积
-                        })
+                        # 存储缺陷位置和纹理特征（以 region_id 关联）
+                        region_id = len(position_rows)
+                        position_rows.append((region_id, img_idx, center_x, center_y, w / heatmap.shape[1],
+                                              h / heatmap.shape[0], area / (heatmap.shape[0] * heatmap.shape[1])))
+                        feature_rows.append((region_id, img_idx, center_x, center_y, mean_val, std_val, max_val,
+                                             grad_mean, area))
                 
                 # 输出有效轮廓数量
-                print(f"有效轮廓数量: {contour_count}")
+                logger.debug(f"有效轮廓数量: {contour_count}")
                 
                 # 存储热图数据
                 self.heatmap_data.append({
@@ -406,29 +403,28 @@ class DefectTextureAnalyzer:
                 
                 # 如果找到了原始图像名称，尝试加载它
                 if original_name:
-                    print(f"尝试读取原始图像: {original_path}")
+                    logger.debug(f"尝试读取原始图像: {original_path}")
                     if os.path.exists(original_path):
                         try:
                             # 使用np.fromfile和cv2.imdecode处理可能的中文路径
-                            img_array = np.fromfile(original_path, np.uint8)
-                            original_image = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
+                            original_image = decode_image(original_path, cv2.IMREAD_COLOR)
                             if original_image is not None:
-                                print(f"成功加载原始图像: {original_path}")
+                                logger.debug(f"成功加载原始图像: {original_path}")
                             else:
-                                print(f"无法读取原始图像: {original_path}")
+                                logger.warning(f"无法读取原始图像: {original_path}")
                         except Exception as e:
-                            print(f"读取原始图像失败: {original_path}, 错误: {str(e)}")
+                            logger.error(f"读取原始图像失败: {original_path}, 错误: {str(e)}")
                             original_image = None
                     else:
-                        print(f"未找到热图 {image_name} 对应的原始图像")
+                        logger.warning(f"未找到热图 {image_name} 对应的原始图像")
                 else:
-                    print(f"未找到热图 {image_name} 对应的原始图像")
+                    logger.warning(f"未找到热图 {image_name} 对应的原始图像")
                 
                 # 分析网格 - 现在优先使用原始图像进行分析
                 try:
                     # 新逻辑：必须使用原始图像进行分析，热图仅用于确定异常区域
                     if original_image is None:
-                        print(f"警告：无法找到热图 {image_name} 对应的原始图像，跳过此图像的分析")
+                        logger.warning(f"警告：无法找到热图 {image_name} 对应的原始图像，跳过此图像的分析")
                         continue
                     
                     # 使用原始图像进行分析
@@ -477,7 +473,7 @@ class DefectTextureAnalyzer:
                         adjusted_grid_size = min(8, min(height // 4, width // 4))
                         cell_height = height // adjusted_grid_size
                         cell_width = width // adjusted_grid_size
-                        print(f"网格太小，调整为{adjusted_grid_size}×{adjusted_grid_size}网格，每个区域大小为{cell_height}×{cell_width}像素")
+                        logger.debug(f"网格太小，调整为{adjusted_grid_size}×{adjusted_grid_size}网格，每个区域大小为{cell_height}×{cell_width}像素")
                         grid_size = adjusted_grid_size
                     
                     # 创建两个列表分别存储异常区域和正常区域的特征
@@ -532,7 +528,7 @@ class DefectTextureAnalyzer:
                                     normal_grid_edges.append(edge_density)
                 
                 except Exception as e:
-                    print(f"处理图像 {img_info['name']} 的网格区域时出错: {str(e)}")
+                    logger.error(f"处理图像 {img_info['name']} 的网格区域时出错: {str(e)}")
                 
                 # 更新进度
                 progress = 30 + int((img_idx + 1) / len(self.defect_images) * 30)  # 30%-60%的进度用于特征提取
@@ -611,15 +607,18 @@ class DefectTextureAnalyzer:
                 }
             }
             
+            self.defect_positions = np.array(position_rows, dtype=POSITION_DTYPE)
+            self.texture_features = np.array(feature_rows, dtype=FEATURE_DTYPE)
             self.update_progress(60, f"已提取缺陷特征: {len(self.defect_positions)}个，分析了{len(all_means)}个网格区域")
             return len(self.defect_positions)
             
         except Exception as e:
             error_msg = f"提取缺陷特征时出错: {str(e)}\n{traceback.format_exc()}"
-            print(error_msg)
+            logger.error(error_msg)
             self.update_progress(60, f"提取特征出错: {str(e)}")
             raise RuntimeError(error_msg)
 
+    @tracing.traced("report.cluster", cat="report")
     def cluster_defect_positions(self, eps=0.1, min_samples=3):
         """
         聚类分析缺陷位置，找出缺陷频繁出现的区域
@@ -631,8 +630,8 @@ class DefectTextureAnalyzer:
         try:
             self.update_progress(60, "开始聚类分析...")
             
-            if not self.defect_positions:
-                print("没有缺陷位置数据可供聚类")
+            if len(self.defect_positions) == 0:
+                logger.warning("没有缺陷位置数据可供聚类")
                 self.cluster_results = {
                     'total_defects': 0,
                     'clusters': [],
@@ -640,9 +639,9 @@ class DefectTextureAnalyzer:
                 }
                 return self.cluster_results
                 
-            print(f"进行聚类分析，数据点数量: {len(self.defect_positions)}")
+            logger.debug(f"进行聚类分析，数据点数量: {len(self.defect_positions)}")
             # 提取位置坐标
-            positions = np.array([[d['center_x'], d['center_y']] for d in self.defect_positions])
+            positions = np.column_stack([self.defect_positions['center_x'], self.defect_positions['center_y']])
             
             # 使用DBSCAN聚类
             clustering = DBSCAN(eps=eps, min_samples=min_samples).fit(positions)
@@ -652,7 +651,7 @@ class DefectTextureAnalyzer:
             
             # 统计每个簇的数量
             cluster_counts = Counter(labels[labels >= 0])
-            print(f"聚类结果：{len(cluster_counts)}个聚类")
+            logger.debug(f"聚类结果：{len(cluster_counts)}个聚类")
             
             # 准备结果
             clusters = []
@@ -686,197 +685,71 @@ class DefectTextureAnalyzer:
             
         except Exception as e:
             error_msg = f"聚类分析时出错: {str(e)}\n{traceback.format_exc()}"
-            print(error_msg)
+            logger.error(error_msg)
             self.update_progress(70, f"聚类分析出错: {str(e)}")
             raise RuntimeError(error_msg)
     
+    @tracing.traced("report.analyze_texture", cat="report")
     def analyze_defect_texture(self):
         """
         分析缺陷特征，判断缺陷类型（基于亮度特征）
+        
+        判定规则见 defect_classify.DEFAULT_RULES（可由 config.DEFECT_RULES_FILE 替换），整列向量化计算
         """
         try:
             self.update_progress(70, "开始分析缺陷类型...")
             
-            if not self.texture_features:
-                print("没有缺陷特征数据可供分析")
+            if len(self.texture_features) == 0:
+                logger.warning("没有缺陷特征数据可供分析")
                 return {
                     'texture_counts': {},
                     'defect_details': []
                 }
             
-            print(f"分析缺陷类型，缺陷数量: {len(self.texture_features)}")
+            logger.debug(f"分析缺陷类型，缺陷数量: {len(self.texture_features)}")
             
-            # 定义亮度阈值
-            LOW_BRIGHTNESS_THRESHOLD = 80  # 低亮度阈值
-            HIGH_BRIGHTNESS_THRESHOLD = 180  # 高亮度阈值
-            EXTREME_BRIGHTNESS_THRESHOLD = 220  # 极高亮度阈值
+            # 按 region_id 关联缺陷位置，取归一化面积和形状比例
+            features = self.texture_features
+            normalized_area, aspect_ratio = join_regions(features, self.defect_positions)
             
-            # 创建缺陷位置字典，方便查找
-            defect_pos_map = {}
-            for pos in self.defect_positions:
-                key = f"{pos['image']}_{pos['center_x']}_{pos['center_y']}"
-                defect_pos_map[key] = pos
+            # 基于亮度和形状特征的缺陷分类（主要类型 + 详细类型）
+            main_ids, detail_ids, detail_names = classify_regions(
+                features['max'], normalized_area, aspect_ratio, load_rules(config.DEFECT_RULES_FILE))
             
-            defect_types = []
-            for feature in self.texture_features:
-                # 提取特征并转换为Python原生类型
-                mean_val = float(feature['mean'])      # 亮度均值
-                max_val = float(feature['max'])        # 最大亮度值
-                
-                # 查找对应的归一化面积
-                pos_key = f"{feature['image']}_{feature['position'][0]}_{feature['position'][1]}"
-                pos_data = defect_pos_map.get(pos_key)
-                
-                if pos_data:
-                    # 使用defect_positions中已经归一化的面积
-                    normalized_area = float(pos_data['area'])
-                else:
-                    # 如果找不到对应数据，使用texture_features中的面积（可能需要归一化）
-                    # 这里假设面积是像素数，设置一个非常小的默认值
-                    normalized_area = float(feature['area']) / 88888 # 假设平均图像大小约为88888像素
-                
-                # 打印面积值，用于调试
-                # print(f"缺陷归一化面积: {normalized_area}, 原始面积: {feature['area']}")
-                
-                # 形状特征
-                aspect_ratio = 1.0  # 默认值
-                if pos_data:
-                    width = float(pos_data['width'])
-                    height = float(pos_data['height'])
-                    if height > 0:
-                        aspect_ratio = width / height
-                print(f"最大亮度值: {max_val}, 亮度均值: {mean_val}, 归一化面积: {normalized_area}, 形状比例: {aspect_ratio}")
-                # 基于亮度和形状特征的缺陷分类（详细分类）
-                # 判定条件根据样本数据进行调整：
-                # 000-002为严重损坏样本，003-006为正常/轻微污染样本，007-021为中度缺陷/轻度异常样本
-                
-                # 打印特征信息用于调试
-                print(f"样本: {feature['image']}, 最大亮度值: {max_val}, 亮度均值: {mean_val}, 归一化面积: {normalized_area}, 形状比例: {aspect_ratio}")
-                
-                # 严重损坏类别判断 - 降低阈值以识别更多严重损坏
-                if normalized_area > 0.02 and max_val > 195:  # 原为0.03/210，降低面积和亮度阈值
-                    main_type = "严重损坏"
-                    detail_type = "大缺口"
-                elif normalized_area > 0.015 and max_val > 190:  # 原为0.02/200，降低面积和亮度阈值
-                    main_type = "严重损坏"
-                    detail_type = "大面积缺陷"
-                # 中度缺陷类别判断
-                elif normalized_area > 0.006 and max_val > 185:  # 原为0.01/210
-                    main_type = "中度缺陷"
-                    if aspect_ratio > 1.8:  # 细长形状
-                        detail_type = "划痕"
-                    elif normalized_area > 0.01:
-                        detail_type = "大面积缺陷"
-                    else:
-                        detail_type = "小缺口"
-                elif normalized_area > 0.003 and max_val > 180:  # 原为0.007/210
-                    main_type = "中度缺陷"
-                    if aspect_ratio > 1.8:
-                        detail_type = "划痕"
-                    else:
-                        detail_type = "小缺口"
-                # 轻度异常类别判断
-                elif normalized_area > 0.002 and max_val > 160:  # 原为0.005/170
-                    main_type = "轻度异常"
-                    if normalized_area > 0.004:  # 添加大面积异常的判断
-                        detail_type = "大面积异常"
-                    else:
-                        detail_type = "小面积异常"
-                elif max_val > 175:  # 原为190
-                    main_type = "轻度异常"
-                    detail_type = "小面积异常"
-                # 轻微污染或正常
-                else:
-                    main_type = "轻微污染"
-                    if normalized_area > 0.004:  # 添加大面积污染的判断
-                        detail_type = "大面积污染"
-                    else:
-                        detail_type = "小面积污染"
-                
-                defect_types.append({
-                    'image': feature['image'],
-                    'position': (float(feature['position'][0]), float(feature['position'][1])),
-                    'defect_type': detail_type,  # 详细类型
-                    'main_type': main_type,      # 主要类型
-                    'mean': float(mean_val),
-                    'max': float(max_val),
-                    'area': float(feature['area']),
-                    'normalized_area': normalized_area,
-                    'aspect_ratio': float(aspect_ratio)
-                })
-            
-            # 统计各主要类型和详细类型缺陷的数量
-            main_type_counts = Counter([item['main_type'] for item in defect_types])
-            detail_type_counts = Counter([item['defect_type'] for item in defect_types])
+            # 统计各主要类型和详细类型缺陷的数量（按首次出现的顺序）
+            def count_by(ids, names):
+                first_seen = np.unique(ids, return_index=True)[1]
+                counts = np.bincount(ids, minlength=len(names))
+                return {names[i]: int(counts[i]) for i in ids[np.sort(first_seen)]}
+            main_type_counts = count_by(main_ids, MAIN_TYPES)
+            detail_type_counts = count_by(detail_ids, detail_names)
             
-            print(f"主要缺陷类型分布: {dict(main_type_counts)}")
-            print(f"详细缺陷类型分布: {dict(detail_type_counts)}")
+            logger.debug(f"主要缺陷类型分布: {main_type_counts}")
+            logger.debug(f"详细缺陷类型分布: {detail_type_counts}")
             
-            # 计算每个图像的缺陷类型分布
-            image_defect_types = {}
-            for defect in defect_types:
-                image_name = defect['image']
-                main_type = defect['main_type']
-                
-                if image_name not in image_defect_types:
-                    image_defect_types[image_name] = []
-                
-                image_defect_types[image_name].append(main_type)
-            
-            # 定义缺陷类型晋升规则
-            def determine_sample_type(defect_counts):
-                """基于缺陷数量分布确定样本的最终缺陷类型，实现缺陷类型的晋升"""
-                # 将缺陷类型计数转换为字典
-                counts = Counter(defect_counts)
-                
-                # 将多个低级别缺陷转换为少量高级别缺陷
-                # 1. 先统计各类型实际数量
-                light_pollution_count = counts.get("轻微污染", 0)  # 轻微污染数量
-                light_anomaly_count = counts.get("轻度异常", 0)    # 轻度异常数量
-                moderate_defect_count = counts.get("中度缺陷", 0)  # 中度缺陷数量
-                severe_damage_count = counts.get("严重损坏", 0)    # 严重损坏数量
-                
-                print(f"原始缺陷统计 - 轻微污染: {light_pollution_count}, 轻度异常: {light_anomaly_count}, 中度缺陷: {moderate_defect_count}, 严重损坏: {severe_damage_count}")
-                
-                # 2. 转换计算 - 实现"2个低级别=1个高级别"的转换逻辑
-                # 轻微污染转换为轻度异常
-                extra_light_anomaly = light_pollution_count // 2
-                light_anomaly_count += extra_light_anomaly
-                
-                # 轻度异常转换为中度缺陷
-                extra_moderate_defect = light_anomaly_count // 2
-                moderate_defect_count += extra_moderate_defect
-                
-                # 中度缺陷转换为严重损坏
-                extra_severe_damage = moderate_defect_count // 2
-                severe_damage_count += extra_severe_damage
-                
-                print(f"转换后缺陷统计 - 轻度异常: {light_anomaly_count}, 中度缺陷: {moderate_defect_count}, 严重损坏: {severe_damage_count}")
-                
-                # 3. 确定最终缺陷类型（取最严重的类型）
-                if severe_damage_count > 0:
-                    return "严重损坏"
-                elif moderate_defect_count > 0:
-                    return "中度缺陷"
-                elif light_anomaly_count > 0:
-                    return "轻度异常"
-                else:
-                    return "轻微污染"
-                        
-            # 对每个图像，综合考虑所有缺陷区域确定主要缺陷类型
-            image_main_type = {}
-            for image_name, types in image_defect_types.items():
-                # 应用晋升规则，而非仅取最严重的单个缺陷
-                final_type = determine_sample_type(types)
-                image_main_type[image_name] = final_type
-                
-                # 打印每个样本的缺陷分布和最终判定结果
-                type_counts = Counter(types)
-                print(f"样本[{image_name}]缺陷分布: {dict(type_counts)}，最终判定为: {final_type}")
+            # 对每个图像，综合考虑所有缺陷区域确定主要缺陷类型（2个低级别缺陷晋升为1个高级别缺陷）
+            final_ids = promote_image_types(features['image_id'], main_ids, len(self.image_names))
+            image_ids = features['image_id'][np.sort(np.unique(features['image_id'], return_index=True)[1])]
+            image_main_type = {self.image_names[i]: MAIN_TYPES[final_ids[i]] for i in image_ids}
             
             # 统计每种主要缺陷类型有多少个样本
-            sample_main_type_counts = Counter(image_main_type.values())
-            print(f"样本主要缺陷类型分布: {dict(sample_main_type_counts)}")
+            sample_main_type_counts = dict(Counter(image_main_type.values()))
+            logger.debug(f"样本主要缺陷类型分布: {sample_main_type_counts}")
+            
+            defect_types = [{
+                'image': self.image_names[image_id],
+                'position': (center_x, center_y),
+                'defect_type': detail_names[detail_id],  # 详细类型
+                'main_type': MAIN_TYPES[main_id],        # 主要类型
+                'mean': mean_val,
+                'max': max_val,
+                'area': area,
+                'normalized_area': area_ratio,
+                'aspect_ratio': ratio
+            } for image_id, center_x, center_y, detail_id, main_id, mean_val, max_val, area, area_ratio, ratio in zip(
+                features['image_id'].tolist(), features['center_x'].tolist(), features['center_y'].tolist(),
+                detail_ids.tolist(), main_ids.tolist(), features['mean'].tolist(), features['max'].tolist(),
+                features['area'].tolist(), normalized_area.tolist(), aspect_ratio.tolist())]
             
             # 生成主要类型与详细类型的映射关系描述
             type_description = {
@@ -888,10 +761,10 @@ class DefectTextureAnalyzer:
             
             # 返回分析结果，保持键名兼容
             defect_analysis = {
-                'texture_counts': dict(main_type_counts),  # 使用原键名但返回主要类型计数
-                'defect_type_counts': dict(detail_type_counts),  # 详细类型计数
-                'main_type_counts': dict(main_type_counts),  # 主要类型计数
-                'sample_main_type_counts': dict(sample_main_type_counts),  # 样本主要类型计数
+                'texture_counts': main_type_counts,  # 使用原键名但返回主要类型计数
+                'defect_type_counts': detail_type_counts,  # 详细类型计数
+                'main_type_counts': main_type_counts,  # 主要类型计数
+                'sample_main_type_counts': sample_main_type_counts,  # 样本主要类型计数
                 'defect_details': defect_types,
                 'type_description': type_description,  # 添加类型描述
                 'image_main_type': image_main_type  # 每张图像的主要缺陷类型
@@ -902,22 +775,25 @@ class DefectTextureAnalyzer:
             
         except Exception as e:
             error_msg = f"缺陷类型分析时出错: {str(e)}\n{traceback.format_exc()}"
-            print(error_msg)
+            logger.error(error_msg)
             self.update_progress(80, f"缺陷类型分析出错: {str(e)}")
             raise RuntimeError(error_msg)
     
+    @tracing.traced("report.total", cat="report")
     def generate_report(self):
         """
         生成缺陷分析报告
         """
         try:
+            # 提前启动图表进程，与数据分析同时进行
+            warm_up()
             self.update_progress(30, "开始加载缺陷图像...")
             
             # 1. 加载缺陷图像 (从load_defect_images方法移入的逻辑)
             defect_count = self.load_defect_images(self.threshold)  # 使用类的threshold属性
             if defect_count == 0:
                 error_msg = "没有足够的缺陷图像用于分析"
-                print(error_msg)
+                logger.error(error_msg)
                 self.update_progress(100, "所有检测样本良好，无需生成缺陷检测报告!")
                 return None
             
@@ -926,7 +802,7 @@ class DefectTextureAnalyzer:
             feature_count = self.extract_defect_features(self.grid_size)  # 使用类的grid_size属性
             if feature_count == 0:
                 error_msg = "未能提取到有效的缺陷特征"
-                print(error_msg)
+                logger.error(error_msg)
                 self.update_progress(100, error_msg)
                 raise ValueError(error_msg)
             
@@ -943,9 +819,9 @@ class DefectTextureAnalyzer:
             self.update_progress(80, "分析完毕，开始生成报告...")
             
             # 检查是否有足够的数据
-            if not self.defect_positions or not self.texture_features:
+            if len(self.defect_positions) == 0 or len(self.texture_features) == 0:
                 error_msg = "没有足够的缺陷数据用于分析"
-                print(error_msg)
+                logger.error(error_msg)
                 raise ValueError(error_msg)
                 
             # 准备报告数据
@@ -957,6 +833,7 @@ class DefectTextureAnalyzer:
                 'position_clusters': self.cluster_results,
                 'texture_analysis': texture_analysis,
                 'patch_statistics': self.patch_statistics,
+                'result_path': self.result_path,
                 'timestamp': datetime.now().strftime("%Y%m%d_%H%M%S")
             }
             
@@ -965,375 +842,59 @@ class DefectTextureAnalyzer:
             with open(report_file, 'w', encoding='utf-8') as f:
                 json.dump(report, f, ensure_ascii=False, indent=2)
                 
-            # 生成缺陷位置分布图
-            chart_path = self.generate_defect_position_chart(report, report['timestamp'])
-            self.update_progress(90, "缺陷位置分布图生成完成")
-            
-            # 生成统计图表
-            chart_paths = self.generate_statistical_charts(report)
+            # 并行生成缺陷位置分布图和统计图表
+            self.update_progress(90, "正在生成图表...")
+            chart_paths = self.generate_charts(report)
             
             self.update_progress(100, "报告生成完成")
             
             return {
                 'report_file': report_file,
-                'chart_file': chart_path,
                 'report_data': report,
                 **chart_paths
             }
             
         except Exception as e:
             error_msg = f"生成报告时出错: {str(e)}\n{traceback.format_exc()}"
-            print(error_msg)
+            logger.error(error_msg)
             self.update_progress(100, f"生成报告出错: {str(e)}")
             raise RuntimeError(error_msg)
 
-    def generate_defect_position_chart(self, report, timestamp):
+    def generate_charts(self, report):
         """
-        生成缺陷位置分布图
-        
-        Args:
-            report: 报告数据
-            timestamp: 时间戳
-        """
-        try:
-            # 设置matplotlib中文字体支持
-            plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'SimSun', 'Arial Unicode MS']  # 中文字体
-            plt.rcParams['axes.unicode_minus'] = False  # 解决负号显示问题
-            plt.rcParams['font.family'] = 'sans-serif'  # 设置字体族
-            
-            # 创建图形
-            fig = plt.figure(figsize=(10, 10))
-            plt.suptitle(f"缺陷位置分析报告 - {self.detect_group}", fontsize=16)
-            
-            # 创建单个图表
-            ax = plt.subplot(1, 1, 1)
-            ax.set_title("缺陷位置分布热图")
-            
-            # 尝试加载最佳样本图片作为背景
-            background_loaded = False
-            background_width = 50  # 默认宽度
-            background_height = 50  # 默认高度
-            
-            if self.best_sample_path and os.path.exists(self.best_sample_path):
-                try:
-                    # 读取图像并转换为RGB
-                    # 使用np.fromfile和cv2.imdecode处理可能的中文路径
-                    img_array = np.fromfile(self.best_sample_path, np.uint8)
-                    background_img = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
-                    background_img = cv2.cvtColor(background_img, cv2.COLOR_BGR2RGB)
-                    background_width = background_img.shape[1]
-                    background_height = background_img.shape[0]
-                    
-                    # 显示背景图像
-                    ax.imshow(background_img, aspect='auto')
-                    background_loaded = True
-                    print(f"成功加载背景图像: {self.best_sample_path}")
-                except Exception as e:
-                    print(f"加载背景图像失败: {str(e)}")
-            else:
-                print(f"未找到背景图像或路径无效: {self.best_sample_path}")
-                
-                # 尝试使用第一个热图作为背景
-                if self.defect_images:
-                    try:
-                        sample_path = self.defect_images[0].get('heatmap_path')
-                        if sample_path and os.path.exists(sample_path):
-                            # 使用np.fromfile和cv2.imdecode处理可能的中文路径
-                            img_array = np.fromfile(sample_path, np.uint8)
-                            background_img = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
-                            background_img = cv2.cvtColor(background_img, cv2.COLOR_BGR2RGB)
-                            background_width = background_img.shape[1]
-                            background_height = background_img.shape[0]
-                            
-                            # 显示背景图像
-                            ax.imshow(background_img, aspect='auto')
-                            background_loaded = True
-                            print(f"使用第一个热图作为背景: {sample_path}")
-                    except Exception as e:
-                        print(f"加载替代背景图像失败: {str(e)}")
-            
-            # 如果背景加载失败，使用白色背景
-            if not background_loaded:
-                ax.set_facecolor('white')
-                ax.set_xlim(0, background_width)
-                ax.set_ylim(0, background_height)
-                print("使用白色背景")
-            
-            # 创建热力图
-            heatmap = np.zeros((50, 50))
-            for pos in self.defect_positions:
-                x = int(pos['center_x'] * 49)
-                y = int(pos['center_y'] * 49)
-                heatmap[y, x] += 1
-                
-            # 应用高斯模糊平滑热力图
-            heatmap = cv2.GaussianBlur(heatmap, (5, 5), 0)
-            
-            # 显示热力图，设置透明度
-            im = ax.imshow(heatmap, cmap='hot', interpolation='nearest', alpha=0.7, extent=[0, background_width, background_height, 0])
-            plt.colorbar(im, ax=ax, label='缺陷频率')
-            
-            # 在图上标注缺陷聚类中心
-            for i, cluster in enumerate(report['position_clusters']['clusters']):
-                center = cluster['center']
-                count = cluster['count']
-                
-                # 计算实际坐标
-                x = center[0] * background_width
-                y = center[1] * background_height
-                
-                # 绘制聚类中心
-                ax.plot(x, y, 'go', markersize=18, alpha=0.7)
-                ax.annotate(f"C{i+1}: {count}个", 
-                            xy=(x, y), 
-                            xytext=(x+30, y+30),
-                            color='white',
-                            fontweight='bold',
-                            fontsize=18,
-                            bbox=dict(facecolor='black', alpha=0.5))
-            
-            # 保存图形
-            plt.tight_layout(rect=[0, 0, 1, 0.95])
-            fig_path = join_path(self.report_path, f"defect_analysis_{timestamp}.png")
-            plt.savefig(fig_path, dpi=150)
-            plt.close()
-            
-            return fig_path
-            
-        except Exception as e:
-            error_msg = f"生成可视化报告时出错: {str(e)}\n{traceback.format_exc()}"
-            print(error_msg)
-            # 创建一个简单的错误图像
-            ax = plt.subplots(figsize=(10, 6))
-            ax.text(0.5, 0.5, f"Error generating report: {str(e)}", 
-                   ha='center', va='center', fontsize=12)
-            ax.axis('off')
-            fig_path = join_path(self.report_path, f"defect_analysis_error_{timestamp}.png")
-            plt.savefig(fig_path, dpi=100)
-            plt.close()
-            return fig_path
+        并行生成报告图表：缺陷位置分布图、网格区域特征直方图、缺陷类型饼图
 
-    def generate_statistical_charts(self, report):
-        """
-        生成统计图表并保存到指定路径
-        
         Args:
             report: 报告数据字典
-        
+
         Returns:
-            包含图表文件路径的字典
+            {"chart_file", "histogram_chart", "pie_chart"}，没有数据的图表不生成
         """
-        try:
-            import time
-            import matplotlib.pyplot as plt
-            import os
-            
-            # 设置matplotlib中文字体支持
-            plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'SimSun', 'Arial Unicode MS']  # 中文字体
-            plt.rcParams['axes.unicode_minus'] = False  # 解决负号显示问题
-            plt.rcParams['font.family'] = 'sans-serif'  # 设置字体族
-            
-            # 使用与其他报告图表相同的时间戳格式
-            timestamp = report['timestamp']
-            chart_paths = {}
-            
-            # 1. 生成网格区域特征统计直方图
-            if 'patch_statistics' in report and report['patch_statistics']:
-                try:
-                    # 获取统计数据
-                    patch_stats = report['patch_statistics']
-                    
-                    # 创建一个临时的图像文件存储直方图
-                    plt.figure(figsize=(8, 10))
-                    
-                    # 绘制区域亮度直方图（使用均值：方差丢失了亮度的绝对水平信息，相同方差的区域可能一个是亮区一个是暗区）
-                    plt.subplot(3, 1, 1)
-                    plt.title('区域亮度分布')
-                    mean_bins = patch_stats.get('mean_bin_edges', [])
-                    normal_means = patch_stats.get('normal_means', [])
-                    anomaly_means = patch_stats.get('anomaly_means', [])
-                    
-                    if normal_means or anomaly_means:
-                        # 使用相同的bin设置来保证正常和异常区域的直方图可比较
-                        bin_count = 20
-                        min_val = min(normal_means + anomaly_means) if normal_means + anomaly_means else 0
-                        max_val = max(normal_means + anomaly_means) if normal_means + anomaly_means else 1
-                        bin_range = (min_val, max_val)
-                        
-                        # 分别绘制正常和异常区域的直方图
-                        if normal_means:
-                            plt.hist(normal_means, bins=bin_count, range=bin_range, alpha=0.7, color='green', 
-                                    density=True, label='正常区域', edgecolor='black', linewidth=0.5)
-                        
-                        if anomaly_means:
-                            plt.hist(anomaly_means, bins=bin_count, range=bin_range, alpha=0.7, color='red', 
-                                    density=True, label='异常区域', edgecolor='black', linewidth=0.5)
-                        
-                        plt.legend()
-                    elif len(mean_bins) >= 2:
-                        # 如果没有按正常/异常分类的数据，则使用总体数据
-                        bin_centers = [(mean_bins[i] + mean_bins[i+1])/2 for i in range(len(mean_bins)-1)]
-                        hist_values = patch_stats.get('mean_histogram', [])
-                        
-                        # 将直方图数据转换为出现频率
-                        total_regions = sum(hist_values)
-                        if total_regions > 0:
-                            frequency = [count / total_regions for count in hist_values]
-                        else:
-                            frequency = hist_values
-                        
-                        # 区分正常和异常区域，显示实际分布的叠加效果而非完全分离
-                        plt.bar(bin_centers, frequency, width=(mean_bins[1]-mean_bins[0])*0.8, 
-                            color='lightgray', alpha=0.7, label='总体分布')
-                        plt.legend()
-                    else:
-                        plt.text(0.5, 0.5, '无均值数据', ha='center', va='center')
-                    
-                    plt.grid(True, alpha=0.3)
-                    plt.xlabel('亮度值')
-                    plt.ylabel('出现频率')
-                    
-                    # 绘制区域纹理复杂度直方图（使用方差：不同纹理复杂度的区域可能有相同的均值，无法区分平滑区域和复杂但亮度平衡的纹理区域）
-                    plt.subplot(3, 1, 2)
-                    plt.title('区域纹理复杂度分布')
-                    var_bins = patch_stats.get('variance_bin_edges', [])
-                    normal_variances = patch_stats.get('normal_variances', [])
-                    anomaly_variances = patch_stats.get('anomaly_variances', [])
-                    
-                    if normal_variances or anomaly_variances:
-                        # 使用相同的bin设置来保证正常和异常区域的直方图可比较
-                        bin_count = 20
-                        min_val = min(normal_variances + anomaly_variances) if normal_variances + anomaly_variances else 0
-                        max_val = max(normal_variances + anomaly_variances) if normal_variances + anomaly_variances else 1
-                        bin_range = (min_val, max_val)
-                        
-                        # 分别绘制正常和异常区域的直方图
-                        if normal_variances:
-                            plt.hist(normal_variances, bins=bin_count, range=bin_range, alpha=0.7, color='green', 
-                                    density=True, label='正常区域', edgecolor='black', linewidth=0.5)
-                        
-                        if anomaly_variances:
-                            plt.hist(anomaly_variances, bins=bin_count, range=bin_range, alpha=0.7, color='red', 
-                                    density=True, label='异常区域', edgecolor='black', linewidth=0.5)
-                        
-                        plt.legend()
-                    elif len(var_bins) >= 2:
-                        # 如果没有按正常/异常分类的数据，则使用总体数据
-                        bin_centers = [(var_bins[i] + var_bins[i+1])/2 for i in range(len(var_bins)-1)]
-                        hist_values = patch_stats.get('variance_histogram', [])
-                        
-                        # 将直方图数据转换为出现频率
-                        total_regions = sum(hist_values)
-                        if total_regions > 0:
-                            frequency = [count / total_regions for count in hist_values]
-                        else:
-                            frequency = hist_values
-                        
-                        # 显示总体分布而非完全分离的正常/异常区域
-                        plt.bar(bin_centers, frequency, width=(var_bins[1]-var_bins[0])*0.8, 
-                            color='lightgray', alpha=0.7, label='总体分布')
-                        plt.legend()
-                    else:
-                        plt.text(0.5, 0.5, '无方差数据', ha='center', va='center')
-                    
-                    plt.grid(True, alpha=0.3)
-                    plt.xlabel('纹理复杂度值')
-                    plt.ylabel('出现频率')
-                    
-                    # 绘制区域边缘密度直方图（使用Sobel边缘检测算子计算边缘密度）
-                    plt.subplot(3, 1, 3)
-                    plt.title('区域边缘密度分布')
-                    edge_bins = patch_stats.get('edges_bin_edges', [])
-                    normal_edges = patch_stats.get('normal_edges', [])
-                    anomaly_edges = patch_stats.get('anomaly_edges', [])
-                    
-                    if normal_edges or anomaly_edges:
-                        # 使用相同的bin设置来保证正常和异常区域的直方图可比较
-                        bin_count = 20
-                        min_val = min(normal_edges + anomaly_edges) if normal_edges + anomaly_edges else 0
-                        max_val = max(normal_edges + anomaly_edges) if normal_edges + anomaly_edges else 1
-                        bin_range = (min_val, max_val)
-                        
-                        # 分别绘制正常和异常区域的直方图
-                        if normal_edges:
-                            plt.hist(normal_edges, bins=bin_count, range=bin_range, alpha=0.7, color='green', 
-                                    density=True, label='正常区域', edgecolor='black', linewidth=0.5)
-                        
-                        if anomaly_edges:
-                            plt.hist(anomaly_edges, bins=bin_count, range=bin_range, alpha=0.7, color='red', 
-                                    density=True, label='异常区域', edgecolor='black', linewidth=0.5)
-                        
-                        plt.legend()
-                    elif len(edge_bins) >= 2:
-                        # 如果没有按正常/异常分类的数据，则使用总体数据
-                        bin_centers = [(edge_bins[i] + edge_bins[i+1])/2 for i in range(len(edge_bins)-1)]
-                        hist_values = patch_stats.get('edges_histogram', [])
-                        
-                        # 将直方图数据转换为出现频率
-                        total_regions = sum(hist_values)
-                        if total_regions > 0:
-                            frequency = [count / total_regions for count in hist_values]
-                        else:
-                            frequency = hist_values
-                        
-                        # 显示总体分布
-                        plt.bar(bin_centers, frequency, width=(edge_bins[1]-edge_bins[0])*0.8, 
-                            color='lightgray', alpha=0.7, label='总体分布')
-                        plt.legend()
-                    else:
-                        plt.text(0.5, 0.5, '无边缘密度数据', ha='center', va='center')
-                    
-                    plt.grid(True, alpha=0.3)
-                    plt.xlabel('边缘密度值')
-                    plt.ylabel('出现频率')
-                    
-                    # 保存直方图文件之前设置tight_layout
-                    plt.tight_layout()
-                    
-                    # 保存直方图文件
-                    os.makedirs(self.report_path, exist_ok=True)
-                    histogram_path = os.path.join(self.report_path, f"grid_histogram_{timestamp}.png")
-                    plt.savefig(histogram_path)
-                    plt.close()
-                    
-                    chart_paths['histogram_chart'] = histogram_path
-                    print(f"区域特征直方图已保存: {histogram_path}")
-                    
-                except Exception as e:
-                    print(f"生成区域统计图表时出错: {str(e)}")
-            
-            # 2. 生成缺陷类型分布饼图
-            sample_main_type_counts = report['texture_analysis'].get('sample_main_type_counts', {})
-            if sample_main_type_counts:
-                try:
-                    # 创建缺陷类型分布的饼图
-                    plt.figure(figsize=(7, 5))
-                    labels = list(sample_main_type_counts.keys())
-                    sizes = list(sample_main_type_counts.values())
-                    colors = ['#1976D2', '#4CAF50', '#FF9800', '#9C27B0', '#F44336', '#00BCD4', '#FFEB3B'][:len(labels)]
-                    
-                    plt.pie(sizes, labels=labels, colors=colors, autopct='%1.1f%%', 
-                            shadow=False, startangle=90, textprops={'fontsize': 10})
-                    plt.axis('equal')
-                    plt.title('缺陷类型分布（基于样本数量）', fontsize=12)
-                    
-                    # 保存饼图文件
-                    os.makedirs(self.report_path, exist_ok=True)
-                    pie_chart_path = os.path.join(self.report_path, f"texture_pie_{timestamp}.png")
-                    plt.savefig(pie_chart_path, dpi=120, bbox_inches='tight')
-                    plt.close()
-                    
-                    chart_paths['pie_chart'] = pie_chart_path
-                    print(f"缺陷类型饼图已保存: {pie_chart_path}")
-                    
-                except Exception as e:
-                    print(f"生成缺陷类型饼图时出错: {str(e)}")
-            
-            return chart_paths
-            
-        except Exception as e:
-            print(f"生成统计图表时出错: {str(e)}")
-            return {}
+        timestamp = report['timestamp']
+        os.makedirs(self.report_path, exist_ok=True)
+
+        # 缺陷位置热力图（50x50，高斯平滑）
+        heatmap = np.zeros((50, 50))
+        np.add.at(heatmap, ((self.defect_positions['center_y'] * 49).astype(int),
+                            (self.defect_positions['center_x'] * 49).astype(int)), 1)
+        heatmap = cv2.GaussianBlur(heatmap, (5, 5), 0)
+        # 背景图：最佳样本，没有时使用第一张热图
+        background_paths = [self.best_sample_path]
+        if self.defect_images:
+            background_paths.append(self.defect_images[0].get('heatmap_path'))
+        jobs = {
+            'chart_file': (draw_position_chart, chart_path(self.report_path, f"defect_analysis_{timestamp}"),
+                           (f"缺陷位置分析报告 - {self.detect_group}", heatmap.tolist(),
+                            report['position_clusters']['clusters'], background_paths))
+        }
+        if report.get('patch_statistics'):
+            jobs['histogram_chart'] = (draw_histogram_chart, chart_path(self.report_path, f"grid_histogram_{timestamp}"),
+                                       (report['patch_statistics'],))
+        sample_main_type_counts = report['texture_analysis'].get('sample_main_type_counts', {})
+        if sample_main_type_counts:
+            jobs['pie_chart'] = (draw_pie_chart, chart_path(self.report_path, f"texture_pie_{timestamp}"),
+                                 (sample_main_type_counts,))
+        return render_charts(jobs)
 
 
 def generate_pdf_report(report_data, report_path, chart_file=None, histogram_chart=None, pie_chart=None, output_filename=None):
@@ -1351,87 +912,35 @@ def generate_pdf_report(report_data, report_path, chart_file=None, histogram_cha
     Returns:
         PDF报告文件路径，如果生成失败则返回None
     """
+    stats = build_pdf_report(report_data, report_path, chart_file, histogram_chart, pie_chart, output_filename)
+    return stats['path'] if stats else None
+
+
+@tracing.traced("report.pdf", cat="report")
+def build_pdf_report(report_data, report_path, chart_file=None, histogram_chart=None, pie_chart=None,
+                     output_filename=None, appendix_images=None):
+    """
+    生成PDF格式的缺陷分析报告，并返回文件大小和耗时
+    
+    图片按打印分辨率缩小并压缩为 JPEG 后嵌入（见 report_pdf），正文之后附缺陷样本图像附录
+    
+    Args:
+        与 generate_pdf_report 相同
+        appendix_images: 附录中的缺陷样本数上限，默认 config.REPORT_APPENDIX_MAX_IMAGES，0 表示不生成附录
+    
+    Returns:
+        {"path": 路径, "size": 文件字节数, "pages": 页数, "seconds": 耗时, "appendix_images": 附录样本数}，
+        如果生成失败则返回None
+    """
     if not HAS_REPORTLAB:
-        print("未安装reportlab库，无法生成PDF报告")
+        logger.warning("未安装reportlab库，无法生成PDF报告")
         return None
         
+    image_folder = tempfile.mkdtemp(prefix="report_pdf_") # 压缩后的嵌入图片，生成完毕后删除
     try:
-        # 创建中文支持
-        try:
-            # 尝试注册中文字体
-            pdfmetrics.registerFont(TTFont('SimSun', 'simsun.ttc'))
-            pdfmetrics.registerFont(TTFont('SimHei', 'simhei.ttf'))
-            cn_font_name = 'SimSun'
-        except:
-            # 如果中文字体注册失败，使用默认字体
-            cn_font_name = 'Helvetica'
-            print("未找到中文字体，使用默认字体")
-            
-        # 创建自定义样式
-        styles = getSampleStyleSheet()
-        
-        # 修改样式名称，避免冲突
-        styles.add(ParagraphStyle(
-            name='ReportTitle',  # 改为ReportTitle避免与Title冲突
-            fontName=cn_font_name,
-            fontSize=18,
-            alignment=1,  # 居中
-            spaceAfter=12
-        ))
-        styles.add(ParagraphStyle(
-            name='ReportHeading1',  # 改为ReportHeading1避免与Heading1冲突
-            fontName=cn_font_name,
-            fontSize=16,
-            spaceAfter=10
-        ))
-        styles.add(ParagraphStyle(
-            name='ReportHeading2',  # 改为ReportHeading2避免与Heading2冲突
-            fontName=cn_font_name,
-            fontSize=14,
-            spaceAfter=12,  # 增加底部间距
-            spaceBefore=12  # 增加顶部间距
-        ))
-        styles.add(ParagraphStyle(
-            name='ReportNormal',  # 改为ReportNormal避免与Normal冲突
-            fontName=cn_font_name,
-            fontSize=12,
-            leading=16
-        ))
-        # 添加图片说明样式
-        styles.add(ParagraphStyle(
-            name='ImageCaption',
-            fontName=cn_font_name,
-            fontSize=10,  # 较小的字体
-            alignment=1,  # 居中
-            spaceAfter=20,  # 增加更多的底部间距
-            textColor=colors.gray
-        ))
-        # 添加斜体样式
-        styles.add(ParagraphStyle(
-            name='ReportItalic',
-            fontName=cn_font_name,
-            fontSize=10,
-            leading=14,
-            italic=True,  # 斜体
-            textColor=colors.darkgrey
-        ))
-        # 添加注释样式
-        styles.add(ParagraphStyle(
-            name='ReportNote',
-            fontName=cn_font_name,
-            fontSize=9,
-            leading=12,
-            italic=True,
-            textColor=colors.grey
-        ))
-        # 添加粗体样式
-        styles.add(ParagraphStyle(
-            name='ReportBold',
-            fontName=cn_font_name,
-            fontSize=12,
-            leading=16,
-            fontWeight='bold'  # 粗体
-        ))
+        # 中文字体和样式只注册、创建一次
+        cn_font_name = register_fonts()
+        styles = get_styles()
         
         # 确保报告目录存在
         os.makedirs(report_path, exist_ok=True)
@@ -1443,16 +952,6 @@ def generate_pdf_report(report_data, report_path, chart_file=None, histogram_cha
         else:
             pdf_filename = os.path.join(report_path, f"defect_analysis_report_{timestamp}.pdf")
         
-        # 创建PDF文档
-        doc = SimpleDocTemplate(
-            pdf_filename,
-            pagesize=A4,
-            rightMargin=1*cm,
-            leftMargin=1*cm,
-            topMargin=2*cm,
-            bottomMargin=2*cm
-        )
-        
         # 准备报告内容
         content = []
         
@@ -1557,7 +1056,7 @@ def generate_pdf_report(report_data, report_path, chart_file=None, histogram_cha
         # 添加缺陷位置热图
         if chart_file and os.path.exists(chart_file):
             try:
-                img = Image(chart_file, width=15*cm, height=15*cm)
+                img = report_image(chart_file, image_folder, width=15*cm, height=15*cm)
                 content.append(img)
                 content.append(Paragraph("图1. 缺陷位置分布热图（颜色越亮表示缺陷出现频率越高，绿色圆点表示聚类中心）", styles['ImageCaption']))
             except Exception as e:
@@ -1731,7 +1230,7 @@ def generate_pdf_report(report_data, report_path, chart_file=None, histogram_cha
                         content.append(Spacer(1, 0.3*cm))
                         
                         try:
-                            img = Image(histogram_chart, width=15*cm, height=15*cm)
+                            img = report_image(histogram_chart, image_folder, width=15*cm, height=15*cm)
                             content.append(img)
                             content.append(Paragraph("图2. 基于原始图像的区域特征直方图（显示不同区域的亮度、纹理复杂度和边缘密度分布）", styles['ImageCaption']))
                         except Exception as e:
@@ -1754,7 +1253,7 @@ def generate_pdf_report(report_data, report_path, chart_file=None, histogram_cha
             # 添加缺陷类型饼图
             if pie_chart and os.path.exists(pie_chart):
                 try:
-                    img = Image(pie_chart, width=12*cm, height=10*cm)
+                    img = report_image(pie_chart, image_folder, width=12*cm, height=10*cm)
                     content.append(img)
                     content.append(Paragraph("图3. 缺陷类型分布饼图", styles['ImageCaption']))
                 except Exception as e:
@@ -1941,12 +1440,32 @@ def generate_pdf_report(report_data, report_path, chart_file=None, histogram_cha
         disclaimer = "注: 本报告中的分析结论和建议基于当前样本数据，实际生产问题可能更为复杂，请结合具体情况进行判断。"
         content.append(Paragraph(disclaimer, styles['ReportNote']))
         
-        # 生成PDF
-        doc.build(content)
-        return pdf_filename
+        # 缺陷样本附录（数量有上限），图片在排版时才逐个准备
+        if appendix_images is None:
+            appendix_images = config.REPORT_APPENDIX_MAX_IMAGES
+        samples = select_appendix_samples(report_data['texture_analysis'], appendix_images)
+        if samples:
+            content.append(PageBreak())
+            content.append(Paragraph("附录 缺陷样本图像", styles['ReportHeading1']))
+            total_samples = len(report_data['texture_analysis'].get('image_main_type', {})) or len(samples)
+            content.append(Paragraph(
+                f"按缺陷严重程度列出前{len(samples)}个缺陷样本（共{total_samples}个），左为检测结果图，右为缺陷热图。",
+                styles['ReportNormal']
+            ))
+            content.append(Spacer(1, 0.3*cm))
+        
+        # 生成PDF（正文之后按需生成附录内容）
+        result_path = resolve_result_path(report_data, report_path)
+        appendix = appendix_flowables(result_path, samples, styles, image_folder)
+        stats = build_pdf(pdf_filename, itertools.chain(content, appendix),
+                          title=f"缺陷分析报告 - {report_data['detect_group']}")
+        stats['appendix_images'] = len(samples)
+        return stats
         
     except Exception as e:
         error_msg = f"生成PDF报告时出错: {str(e)}\n{traceback.format_exc()}"
-        print(error_msg)
+        logger.error(error_msg)
         return None
+    finally:
+        shutil.rmtree(image_folder, ignore_errors=True)
 
@@ -0,0 +1,318 @@
+"""
+样本图片的非破坏性编辑
+
+裁剪、旋转、去背景不再直接覆盖原图，而是作为操作记录追加到图片所在目录的边车索引 .edits.json 中：
+    {文件名: [{"op": "crop", "rect": [x, y, w, h]}, {"op": "rotate", "angle": 角度}, {"op": "background", "rect": [...]}]}
+每个操作的坐标都基于前面操作完成后的图像。需要编辑后的图像时（显示、缩略图、上传、增强、生成测试集），
+全部操作先融合为一个仿射变换和输出尺寸，再对原图做一次解码、一次变换、一次编码：
+    - 只有裁剪和 90° 倍数的旋转时直接切片 / 转置像素，不插值，编辑本身无损
+    - 其它角度的旋转用一次 warpAffine 完成，多次旋转不会累积插值误差
+渲染结果缓存在项目目录 cache/edits 中，文件名包含 (原图路径, 修改时间, 操作列表) 的哈希，
+原图或操作变化后自动重新渲染；没有编辑记录的图片直接使用原图
+
+本模块不依赖 Qt
+"""
+import hashlib
+import json
+import logging
+import math
+import os
+import shutil
+import threading
+
+import numpy as np
+
+import config
+import tracing
+from lazy_import import lazy_import
+from path_utils import join_path
+
+cv2 = lazy_import("cv2")
+logger = logging.getLogger(__name__)
+
+EDIT_INDEX_FILE = ".edits.json" # 边车索引文件名（以 . 开头，不会被当作图片列出或上传）
+CACHE_FOLDER = "cache/edits" # 渲染结果缓存目录（相对项目目录）
+FILL_COLOR = 255 # 旋转后空白区域的填充值（白色）
+JPEG_QUALITY = 95 # 渲染结果保存为 JPEG 时的质量
+
+_lock = threading.Lock()
+_indexes = {} # {目录: (索引文件修改时间, {文件名: [操作]})}
+
+
+# -------------------- 边车索引 --------------------
+def index_path(image_path):
+    """图片所在目录的边车索引路径"""
+    return join_path(os.path.dirname(image_path), EDIT_INDEX_FILE)
+
+
+def _load_index(folder):
+    """读取目录的边车索引（按文件修改时间缓存），调用方需持有 _lock"""
+    path = join_path(folder, EDIT_INDEX_FILE)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return {}
+    cached = _indexes.get(folder)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"读取编辑记录失败: {path}: {str(e)}")
+        index = {}
+    _indexes[folder] = (mtime, index)
+    return index
+
+
+def _save_index(folder, index):
+    """写入目录的边车索引（先写临时文件再替换），调用方需持有 _lock"""
+    path = join_path(folder, EDIT_INDEX_FILE)
+    index = {name: ops for name, ops in index.items() if ops}
+    if not index:
+        if os.path.exists(path):
+            os.remove(path)
+        _indexes.pop(folder, None)
+        return
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=4)
+    os.replace(temp_path, path)
+    _indexes[folder] = (os.path.getmtime(path), index)
+
+
+def get_edits(image_path):
+    """图片的操作列表（副本），没有编辑时返回空列表"""
+    with _lock:
+        ops = _load_index(os.path.dirname(image_path)).get(os.path.basename(image_path), [])
+        return [dict(op) for op in ops]
+
+
+def has_edits(image_path):
+    return bool(get_edits(image_path))
+
+
+def push_edits(image_path, *ops):
+    """
+    追加操作（不修改原图）
+
+    Args:
+        ops: {"op": "crop" / "background", "rect": [x, y, w, h]} 或 {"op": "rotate", "angle": 角度}
+             坐标基于当前编辑结果，角度为顺时针度数（与 QGraphicsItem.setRotation 一致），
+             紧接在旋转之后的旋转与其合并
+    """
+    ops = [normalize_op(op) for op in ops]
+    ops = [op for op in ops if op is not None]
+    if not ops:
+        return
+    folder, name = os.path.dirname(image_path), os.path.basename(image_path)
+    with _lock:
+        index = dict(_load_index(folder))
+        stack = [dict(op) for op in index.get(name, [])]
+        for op in ops:
+            if op["op"] == "rotate" and stack and stack[-1]["op"] == "rotate":
+                # 连续的旋转合并为一次（画布按合并后的角度扩大一次）
+                merged = normalize_op({"op": "rotate", "angle": stack.pop()["angle"] + op["angle"]})
+                if merged is not None:
+                    stack.append(merged)
+            else:
+                stack.append(op)
+        index[name] = stack
+        _save_index(folder, index)
+
+
+def clear_edits(image_path):
+    """清除图片的全部编辑（恢复原图）"""
+    folder, name = os.path.dirname(image_path), os.path.basename(image_path)
+    with _lock:
+        index = dict(_load_index(folder))
+        if index.pop(name, None) is not None:
+            _save_index(folder, index)
+
+
+def normalize_op(op):
+    """规范化操作（取整、去掉无效操作），无效时返回 None"""
+    kind = op.get("op")
+    if kind in ("crop", "background"):
+        x, y, w, h = (int(round(value)) for value in op["rect"])
+        if w <= 0 or h <= 0:
+            return None
+        return {"op": kind, "rect": [x, y, w, h]}
+    if kind == "rotate":
+        angle = float(op["angle"]) % 360
+        if abs(angle) < 1e-6 or abs(angle - 360) < 1e-6:
+            return None
+        return {"op": "rotate", "angle": round(angle, 6)}
+    raise ValueError(f"未知的编辑操作: {kind}")
+
+
+# -------------------- 融合 --------------------
+def _translate(x, y):
+    return np.array([[1, 0, x], [0, 1, y], [0, 0, 1]], dtype=np.float64)
+
+
+def fuse(ops, width, height):
+    """
+    将操作列表融合为一个仿射变换
+
+    坐标以像素角点为原点（像素 i 覆盖 [i, i + 1)），裁剪区域与当前图像范围取交集，
+    旋转绕中心进行并扩大画布以容纳整张图
+
+    Returns:
+        (3x3 变换矩阵（原图坐标 -> 结果坐标）, 结果宽, 结果高)
+    """
+    matrix = np.eye(3)
+    for op in ops:
+        if op["op"] in ("crop", "background"):
+            x, y, w, h = op["rect"]
+            left, top = min(max(x, 0), width), min(max(y, 0), height)
+            right, bottom = min(max(x + w, left), width), min(max(y + h, top), height)
+            if right - left <= 0 or bottom - top <= 0:
+                continue # 裁剪区域在图像之外，忽略
+            matrix = _translate(-left, -top) @ matrix
+            width, height = right - left, bottom - top
+        elif op["op"] == "rotate":
+            radians = math.radians(op["angle"])
+            cos, sin = math.cos(radians), math.sin(radians)
+            if abs(cos) < 1e-9:
+                cos = 0.0
+            if abs(sin) < 1e-9:
+                sin = 0.0
+            new_width = int(math.ceil(abs(width * cos) + abs(height * sin) - 1e-6))
+            new_height = int(math.ceil(abs(width * sin) + abs(height * cos) - 1e-6))
+            rotation = np.array([[cos, -sin, 0], [sin, cos, 0], [0, 0, 1]]) # y 轴向下，正角度为顺时针
+            matrix = _translate(new_width / 2, new_height / 2) @ rotation @ _translate(-width / 2, -height / 2) @ matrix
+            width, height = new_width, new_height
+    return matrix, width, height
+
+
+def _quarter_turns(matrix):
+    """线性部分为 90° 倍数的旋转时返回顺时针转动次数 (0-3)，否则返回 None"""
+    linear = matrix[:2, :2]
+    if not np.allclose(linear, np.round(linear), atol=1e-9):
+        return None
+    for turns, expected in enumerate(([[1, 0], [0, 1]], [[0, -1], [1, 0]], [[-1, 0], [0, -1]], [[0, 1], [-1, 0]])):
+        if np.array_equal(np.round(linear), expected):
+            return turns
+    return None
+
+
+def apply_edits(image, ops):
+    """
+    对已解码的图像应用操作列表（一次完成），返回新图像；没有有效操作时返回原图像
+    """
+    height, width = image.shape[:2]
+    matrix, out_width, out_height = fuse(ops, width, height)
+    if np.allclose(matrix, np.eye(3)) and (out_width, out_height) == (width, height):
+        return image
+    turns = _quarter_turns(matrix)
+    if turns is not None:
+        # 90° 倍数旋转 + 整数平移：转置像素后切片，不插值
+        rotated = np.rot90(image, -turns) # 负数为顺时针
+        h, w = rotated.shape[:2]
+        canonical = [np.eye(3), [[0, -1, height], [1, 0, 0], [0, 0, 1]],
+                     [[-1, 0, width], [0, -1, height], [0, 0, 1]], [[0, 1, 0], [-1, 0, width], [0, 0, 1]]][turns]
+        offset = (matrix @ np.linalg.inv(np.asarray(canonical, dtype=np.float64)))[:2, 2]
+        if np.allclose(offset, np.round(offset), atol=1e-6):
+            left, top = int(round(-offset[0])), int(round(-offset[1]))
+            if 0 <= left and 0 <= top and left + out_width <= w and top + out_height <= h:
+                return np.ascontiguousarray(rotated[top:top + out_height, left:left + out_width])
+    # 任意角度：像素中心坐标下的一次仿射变换
+    centered = _translate(-0.5, -0.5) @ matrix @ _translate(0.5, 0.5)
+    channels = 1 if image.ndim == 2 else image.shape[2]
+    border = (FILL_COLOR,) * channels if channels < 4 else (FILL_COLOR,) * 3 + (0,) # 带透明通道时填充透明
+    return cv2.warpAffine(image, centered[:2], (out_width, out_height), flags=cv2.INTER_LINEAR,
+                          borderMode=cv2.BORDER_CONSTANT, borderValue=border)
+
+
+# -------------------- 读写与缓存 --------------------
+def read_image(path, flags=None):
+    """读取图片（支持中文路径），失败时返回 None"""
+    try:
+        data = np.fromfile(path, dtype=np.uint8)
+    except OSError:
+        return None
+    if not data.size:
+        return None
+    return cv2.imdecode(data, cv2.IMREAD_UNCHANGED if flags is None else flags)
+
+
+def write_image(path, image):
+    """保存图片（支持中文路径），按扩展名编码"""
+    ext = os.path.splitext(path)[1].lower() or ".png"
+    params = [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY] if ext in (".jpg", ".jpeg") else []
+    ok, data = cv2.imencode(ext, image, params)
+    if not ok:
+        raise IOError(f"图片编码失败: {path}")
+    temp_path = f"{path}.tmp{ext}"
+    data.tofile(temp_path)
+    os.replace(temp_path, path)
+
+
+def cache_folder():
+    """渲染结果缓存目录（项目目录下），未打开项目时使用样本目录旁的 cache"""
+    root = os.path.dirname(config.SAMPLE_PATH) if config.SAMPLE_PATH else os.getcwd()
+    return join_path(root, CACHE_FOLDER)
+
+
+def _cache_name(image_path, ops):
+    source = os.path.abspath(image_path).replace("\\", "/")
+    prefix = hashlib.sha1(source.encode("utf-8")).hexdigest()[:16]
+    key = json.dumps([os.path.getmtime(image_path), ops], sort_keys=True)
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+    return prefix, f"{prefix}_{digest}{os.path.splitext(image_path)[1].lower()}"
+
+
+@tracing.traced("sample.render_edits", cat="image")
+def rendered_path(image_path):
+    """
+    编辑后的图片路径：没有编辑时返回原图路径，否则返回（必要时先渲染的）缓存文件路径；
+    上传、导出、显示都使用该路径
+    """
+    ops = get_edits(image_path)
+    if not ops or not os.path.exists(image_path):
+        return image_path
+    prefix, name = _cache_name(image_path, ops)
+    folder = cache_folder()
+    path = join_path(folder, name)
+    if os.path.exists(path):
+        return path
+    image = read_image(image_path)
+    if image is None:
+        logger.warning(f"读取图片失败，使用原图: {image_path}")
+        return image_path
+    os.makedirs(folder, exist_ok=True)
+    write_image(path, apply_edits(image, ops))
+    # 删除该图片过期的渲染结果
+    for old in os.listdir(folder):
+        if old.startswith(prefix + "_") and old != name:
+            try:
+                os.remove(join_path(folder, old))
+            except OSError:
+                pass
+    return path
+
+
+def load_edited(image_path, flags=None):
+    """
+    读取编辑后的图像（ndarray），失败时返回 None；
+    已有渲染缓存时直接读取缓存，否则解码原图后在内存中应用编辑（不写缓存）
+    """
+    ops = get_edits(image_path)
+    if not ops or not os.path.exists(image_path):
+        return read_image(image_path, flags)
+    prefix, name = _cache_name(image_path, ops)
+    cached = join_path(cache_folder(), name)
+    if os.path.exists(cached):
+        return read_image(cached, flags)
+    image = read_image(image_path, flags)
+    return None if image is None else apply_edits(image, ops)
+
+
+def export_image(image_path, dest_path):
+    """将编辑后的图片保存到 dest_path（没有编辑时直接复制原图，不重新编码）"""
+    source = rendered_path(image_path)
+    if os.path.splitext(source)[1].lower() == os.path.splitext(dest_path)[1].lower():
+        shutil.copyfile(source, dest_path)
+    else:
+        write_image(dest_path, read_image(source))
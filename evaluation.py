@@ -0,0 +1,396 @@
+"""
+检测效果评估（测试集上的图片级 / 像素级指标）
+
+图片级: 按得分排序一次性计算 ROC / PR 曲线、AUROC、AP，并按目标误拒率给出判定阈值
+像素级: 将 _3 异常图还原为 0-255 的异常等级，与 ground_truth 掩码逐图累加到 256 个等级的直方图中，
+        内存占用只与等级数和单张图片有关，与测试集大小无关；各图片在线程池中并行统计后合并：
+    - 正常 / 缺陷像素直方图：由各等级的反向累计得到像素级 ROC / PR 曲线、AUROC、AUPR
+    - PRO（Per-Region Overlap）：掩码按连通域划分缺陷区域，每个区域在各等级下的覆盖率累加后取平均
+
+服务器的得分没有固定范围（可能为负数），因此阈值直接取自测试集得分的经验分布，而不是固定的 0-1 区间
+
+本模块不依赖 Qt
+"""
+import logging
+import math
+import os
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+
+from lazy_import import lazy_import
+
+cv2 = lazy_import("cv2")
+
+LEVELS = 256 # 异常图等级数（8 位图）
+CHUNK_PIXELS = 1 << 20 # 逐块统计时每块的最大像素数
+PRO_FPR_LIMIT = 0.3 # PRO 曲线积分的误检率上限（MVTec AD 的惯例）
+
+logger = logging.getLogger(__name__)
+
+
+# -------------------- 图片级 --------------------
+def _cumulative_counts(labels, scores):
+    """
+    按得分从高到低，在每个不同得分处统计 (阈值, 累计检出缺陷数, 累计误检正常数)
+    """
+    labels = np.asarray(labels, dtype=bool)
+    scores = np.asarray(scores, dtype=np.float64)
+    order = np.argsort(-scores, kind="mergesort")
+    scores, labels = scores[order], labels[order]
+    # 相同得分只保留最后一个位置
+    last = np.r_[np.flatnonzero(np.diff(scores)), len(scores) - 1] if len(scores) else np.empty(0, dtype=np.int64)
+    tps = np.cumsum(labels)[last]
+    fps = last + 1 - tps
+    return scores[last], tps, fps
+
+
+def roc_curve(labels, scores):
+    """
+    ROC 曲线（得分 >= 阈值判为缺陷）
+
+    Args:
+        labels: 每张图片是否为缺陷（1 / True 为缺陷）
+        scores: 每张图片的得分
+
+    Returns:
+        (误检率 fpr, 检出率 tpr, 阈值 thresholds)，从 (0, 0) 开始
+    """
+    thresholds, tps, fps = _cumulative_counts(labels, scores)
+    positives = tps[-1] if len(tps) else 0
+    negatives = fps[-1] if len(fps) else 0
+    tpr = np.r_[0.0, tps / positives] if positives else np.zeros(len(tps) + 1)
+    fpr = np.r_[0.0, fps / negatives] if negatives else np.zeros(len(fps) + 1)
+    return fpr, tpr, np.r_[np.inf, thresholds]
+
+
+def pr_curve(labels, scores):
+    """
+    PR 曲线
+
+    Returns:
+        (查准率 precision, 查全率 recall, 阈值 thresholds)，从 recall=0, precision=1 开始
+    """
+    thresholds, tps, fps = _cumulative_counts(labels, scores)
+    positives = tps[-1] if len(tps) else 0
+    precision = np.r_[1.0, tps / np.maximum(tps + fps, 1)]
+    recall = np.r_[0.0, tps / positives] if positives else np.zeros(len(tps) + 1)
+    return precision, recall, np.r_[np.inf, thresholds]
+
+
+def auc(x, y):
+    """梯形法求曲线下面积（x 需单调）"""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if len(x) < 2:
+        return 0.0
+    return float(abs(np.sum(np.diff(x) * (y[1:] + y[:-1]) / 2)))
+
+
+def average_precision(precision, recall):
+    """AP：各召回率增量处的查准率加权和"""
+    return float(np.sum(np.diff(recall) * np.asarray(precision)[1:]))
+
+
+def propose_threshold(good_scores, defect_scores, target_frr=0.01):
+    """
+    按目标误拒率给出判定阈值（得分 > 阈值判为异常，与 result_store.status_of 一致）
+
+    取正常样本得分的经验分位点，使被误判为异常的正常样本比例不超过 target_frr
+
+    Args:
+        good_scores: 正常样本得分
+        defect_scores: 缺陷样本得分
+        target_frr: 目标误拒率（正常样本被判为异常的比例）
+
+    Returns:
+        {'threshold', 'frr' 实际误拒率, 'miss_rate' 漏检率, 'recall' 检出率}，没有正常样本时返回 None
+    """
+    good = np.sort(np.asarray(good_scores, dtype=np.float64))
+    defect = np.asarray(defect_scores, dtype=np.float64)
+    if not len(good):
+        return None
+    allowed = int(math.floor(len(good) * max(target_frr, 0.0) + 1e-9)) # 允许误拒的正常样本数
+    threshold = float(good[max(len(good) - allowed - 1, 0)])
+    miss_rate = float(np.mean(defect <= threshold)) if len(defect) else 0.0
+    return {
+        "threshold": threshold,
+        "frr": float(np.mean(good > threshold)),
+        "miss_rate": miss_rate,
+        "recall": 1.0 - miss_rate if len(defect) else 0.0,
+    }
+
+
+# -------------------- 异常图 --------------------
+_jet_cube = None
+
+def _jet_lookup_cube():
+    """
+    JET 伪彩色的反查表：BGR 各通道量化到 32 级，每个格子对应最近的 JET 颜色的等级（只构建一次）
+    """
+    global _jet_cube
+    if _jet_cube is None:
+        palette = cv2.applyColorMap(np.arange(LEVELS, dtype=np.uint8).reshape(1, -1), cv2.COLORMAP_JET)
+        palette = palette.reshape(-1, 3).astype(np.int32)
+        axis = np.arange(32, dtype=np.int32) * 8 + 4 # 每个量化格子的中心值
+        grid = np.stack(np.meshgrid(axis, axis, axis, indexing="ij"), axis=-1).reshape(-1, 1, 3)
+        cube = np.empty(len(grid), dtype=np.uint8)
+        for start in range(0, len(grid), 4096): # 分块求最近颜色，避免一次生成 32768x256x3 的临时数组
+            diff = grid[start:start + 4096] - palette
+            cube[start:start + 4096] = np.argmin(np.einsum("ijk,ijk->ij", diff, diff), axis=1)
+        _jet_cube = cube.reshape(32, 32, 32)
+    return _jet_cube
+
+
+def anomaly_map_to_levels(image):
+    """
+    异常图转换为 0-255 的异常等级：灰度图直接使用，JET 伪彩色图按颜色反查等级
+
+    Args:
+        image: cv2 读入的异常图（灰度或 BGR）
+    """
+    if image.ndim == 2:
+        return image
+    if image.shape[2] == 4:
+        image = image[:, :, :3]
+    if np.array_equal(image[:, :, 0], image[:, :, 1]) and np.array_equal(image[:, :, 1], image[:, :, 2]):
+        return image[:, :, 0].copy()
+    quantized = image >> 3
+    return _jet_lookup_cube()[quantized[:, :, 0], quantized[:, :, 1], quantized[:, :, 2]]
+
+
+def read_image(path, flags=None):
+    """读取图片（支持中文路径），flags 默认 cv2.IMREAD_UNCHANGED，失败时返回 None"""
+    if flags is None:
+        flags = cv2.IMREAD_UNCHANGED
+    try:
+        data = np.fromfile(path, dtype=np.uint8)
+    except OSError:
+        return None
+    return cv2.imdecode(data, flags) if data.size else None
+
+
+def image_shape(path):
+    """图片的 (高, 宽)，读取失败时返回 None"""
+    image = read_image(path, cv2.IMREAD_GRAYSCALE)
+    return None if image is None else image.shape[:2]
+
+
+def load_anomaly_map(path, shape=None):
+    """
+    读取异常图并转换为异常等级，给出 shape (高, 宽) 时缩放到该尺寸（与掩码对齐）
+    """
+    image = read_image(path)
+    if image is None:
+        return None
+    levels = anomaly_map_to_levels(image)
+    if shape is not None and levels.shape[:2] != tuple(shape):
+        levels = cv2.resize(levels, (shape[1], shape[0]), interpolation=cv2.INTER_LINEAR)
+    return levels
+
+
+def load_mask(path):
+    """读取 ground_truth 掩码，返回布尔数组（非零为缺陷），失败时返回 None"""
+    mask = read_image(path, cv2.IMREAD_GRAYSCALE)
+    return None if mask is None else mask > 127
+
+
+# -------------------- 像素级 --------------------
+class PixelMetricAccumulator:
+    """
+    逐图累加像素级统计，最后计算像素级 ROC / PR 和 PRO 曲线
+
+    每张图只保留 256 个等级的计数，处理完即可释放图片；多个累加器可以 merge 合并（并行计算时每个任务一个）
+    """
+    def __init__(self):
+        self.normal_hist = np.zeros(LEVELS, dtype=np.int64) # 各等级的正常像素数
+        self.defect_hist = np.zeros(LEVELS, dtype=np.int64) # 各等级的缺陷像素数
+        self.region_overlap_sum = np.zeros(LEVELS, dtype=np.float64) # 各等级下所有缺陷区域覆盖率之和
+        self.region_count = 0 # 缺陷区域（连通域）总数
+        self.images = 0
+
+    def add(self, levels, mask=None):
+        """
+        累加一张图片
+
+        Args:
+            levels: uint8 异常等级图
+            mask: 同尺寸布尔掩码，None 表示正常图片（全部为正常像素）
+        """
+        self.images += 1
+        levels = np.ascontiguousarray(levels, dtype=np.uint8)
+        if mask is None or not mask.any():
+            self._add_normal(levels, None)
+            return
+        self._add_normal(levels, mask)
+        count, labels = cv2.connectedComponents(mask.astype(np.uint8), connectivity=8)
+        if count <= 1:
+            return
+        # 只取缺陷像素：(区域编号, 等级) 组合计数得到每个区域的等级直方图
+        region_levels = labels[mask].astype(np.int64) * LEVELS + levels[mask]
+        region_hist = np.bincount(region_levels, minlength=count * LEVELS).reshape(count, LEVELS)[1:]
+        self.defect_hist += region_hist.sum(axis=0)
+        # 反向累加：等级 >= l 的像素数，除以区域面积即为阈值 l 下的覆盖率
+        covered = np.cumsum(region_hist[:, ::-1], axis=1)[:, ::-1]
+        self.region_overlap_sum += (covered / covered[:, :1]).sum(axis=0)
+        self.region_count += count - 1
+
+    def _add_normal(self, levels, mask):
+        """逐行分块统计正常像素的等级直方图，控制临时数组大小"""
+        rows = max(CHUNK_PIXELS // max(levels.shape[1], 1), 1)
+        for start in range(0, levels.shape[0], rows):
+            block = levels[start:start + rows]
+            if mask is not None:
+                block = block[~mask[start:start + rows]]
+            self.normal_hist += np.bincount(block.ravel(), minlength=LEVELS)
+
+    def merge(self, other):
+        """合并另一个累加器的统计"""
+        self.normal_hist += other.normal_hist
+        self.defect_hist += other.defect_hist
+        self.region_overlap_sum += other.region_overlap_sum
+        self.region_count += other.region_count
+        self.images += other.images
+        return self
+
+    def _exceed_counts(self):
+        """各等级阈值（等级 >= l 判为缺陷）下的 (检出缺陷像素数, 误检正常像素数)，按等级从高到低"""
+        return np.cumsum(self.defect_hist[::-1]), np.cumsum(self.normal_hist[::-1])
+
+    def roc_curve(self):
+        """
+        像素级 ROC 曲线
+
+        Returns:
+            (误检率 fpr, 检出率 tpr)，从 (0, 0) 开始；缺少正常或缺陷像素时返回 None
+        """
+        tps, fps = self._exceed_counts()
+        if not tps[-1] or not fps[-1]:
+            return None
+        return np.r_[0.0, fps / fps[-1]], np.r_[0.0, tps / tps[-1]]
+
+    def pr_curve(self):
+        """
+        像素级 PR 曲线
+
+        Returns:
+            (查准率 precision, 查全率 recall)，从 recall=0, precision=1 开始；没有缺陷像素时返回 None
+        """
+        tps, fps = self._exceed_counts()
+        if not tps[-1]:
+            return None
+        return np.r_[1.0, tps / np.maximum(tps + fps, 1)], np.r_[0.0, tps / tps[-1]]
+
+    def auroc(self):
+        curve = self.roc_curve()
+        return None if curve is None else auc(*curve)
+
+    def aupr(self):
+        curve = self.pr_curve()
+        return None if curve is None else average_precision(*curve)
+
+    def pro_curve(self):
+        """
+        PRO 曲线
+
+        Returns:
+            (误检率 fpr, 平均区域覆盖率 pro)，按误检率升序（等级从高到低），从 (0, 0) 开始；没有缺陷区域时返回 None
+        """
+        normal_total = self.normal_hist.sum()
+        if not self.region_count or not normal_total:
+            return None
+        fpr = np.cumsum(self.normal_hist[::-1]) / normal_total
+        pro = self.region_overlap_sum[::-1] / self.region_count
+        return np.r_[0.0, fpr], np.r_[0.0, pro]
+
+    def pro_auc(self, limit=PRO_FPR_LIMIT):
+        """误检率 [0, limit] 区间内 PRO 曲线下面积，按 limit 归一化到 0-1"""
+        curve = self.pro_curve()
+        if curve is None:
+            return None
+        fpr, pro = curve
+        end = int(np.searchsorted(fpr, limit, side="right"))
+        x, y = fpr[:end], pro[:end]
+        if end < len(fpr): # 在 limit 处插值截断
+            x = np.r_[x, limit]
+            y = np.r_[y, np.interp(limit, fpr, pro)]
+        return auc(x, y) / limit
+
+    def summary(self):
+        """像素级指标 {'pixel_auroc', 'pixel_aupr', 'pixel_pro', 'pixel_images', 'pixel_regions'}，无法计算的为 None"""
+        return {
+            "pixel_auroc": self.auroc(),
+            "pixel_aupr": self.aupr(),
+            "pixel_pro": self.pro_auc(),
+            "pixel_images": self.images,
+            "pixel_regions": self.region_count,
+        }
+
+
+def accumulate_image(heatmap_path, mask_path=None, image_path=None):
+    """
+    读取一张异常图（及掩码）并统计为一个累加器
+
+    异常图缩放到掩码尺寸；正常图片没有掩码时缩放到原图尺寸，使所有图片的像素按同一分辨率统计
+
+    Args:
+        heatmap_path: _3 异常图路径
+        mask_path: ground_truth 掩码路径，None 表示正常图片
+        image_path: 原图路径（正常图片用于确定尺寸）
+
+    Returns:
+        PixelMetricAccumulator，读取失败时返回 None
+    """
+    mask = None
+    if mask_path:
+        mask = load_mask(mask_path)
+        if mask is None:
+            return None
+        shape = mask.shape
+    else:
+        shape = image_shape(image_path) if image_path else None
+    levels = load_anomaly_map(heatmap_path, shape)
+    if levels is None:
+        return None
+    accumulator = PixelMetricAccumulator()
+    accumulator.add(levels, mask)
+    return accumulator
+
+
+def evaluate_pixels(items, workers=None, progress=None):
+    """
+    并行统计整个测试集的像素级指标
+
+    解码、缩放和连通域标记在 OpenCV 中释放 GIL，按图片分配到线程池；同时在处理的图片数不超过 2 倍线程数，
+    内存占用与测试集大小无关
+
+    Args:
+        items: [(异常图路径, 掩码路径或 None, 原图路径)]
+        workers: 线程数，默认 CPU 核数
+        progress: 进度回调 progress(已完成数, 总数)
+
+    Returns:
+        合并后的 PixelMetricAccumulator
+    """
+    items = list(items)
+    workers = workers or os.cpu_count() or 1
+    total = PixelMetricAccumulator()
+    pending = set()
+    done_count = 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pixel-metrics") as executor:
+        for index, item in enumerate(items):
+            pending.add(executor.submit(accumulate_image, *item))
+            if len(pending) < workers * 2 and index < len(items) - 1:
+                continue
+            # 达到在途上限或已全部提交时，收取已完成的结果
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED if index < len(items) - 1 else ALL_COMPLETED)
+            for future in finished:
+                accumulator = future.result()
+                if accumulator is None:
+                    logger.warning("读取异常图或掩码失败，已跳过一张图片")
+                else:
+                    total.merge(accumulator)
+                done_count += 1
+                if progress:
+                    progress(done_count, len(items))
+    return total
@@ -0,0 +1,703 @@
+"""
+HTTP 服务器客户端：封装检测服务器的全部接口
+
+本模块不依赖 Qt，界面（http_server）和无界面的命令行工具（batch_detect）共用
+"""
+import json
+import logging
+import os
+import time
+import config
+import tracing
+from typing import Optional
+from urllib.parse import urlparse
+from lazy_import import lazy_import
+from path_utils import join_path
+
+requests = lazy_import("requests") # 第一次发起请求时才加载
+logger = logging.getLogger(__name__)
+
+INFERRING_STATUS = 3 # 模型状态：推理中
+
+def inference_finished(percentage, model_status):
+    """推理是否结束：进度已满且模型不再是推理中状态（界面的进度订阅和 wait_inference 共用该判定）"""
+    return percentage >= 1.0 and model_status != INFERRING_STATUS
+
+def local_name(server_name):
+    """服务器样本名 xxx-yyy.png（带上传时加的前缀）-> 本地图片名 yyy.png，结果库的 origin_name 即为该名称"""
+    return server_name.split("-")[-1]
+
+def http_request(method, url, **kwargs):
+    """
+    发送 HTTP 请求，启用追踪时记录各接口的耗时和收发字节数
+    """
+    if not tracing.is_enabled():
+        return requests.request(method, url, **kwargs)
+    endpoint = urlparse(url).path.split("/")[1]
+    with tracing.span(f"http.{endpoint}", cat="http", method=method) as sp:
+        response = requests.request(method, url, **kwargs)
+        body = response.request.body
+        sent = len(body) if isinstance(body, (bytes, str)) else 0
+        received = 0 if kwargs.get("stream") else len(response.content)
+        sp.set(status=response.status_code, sent=sent, received=received)
+    tracing.count(f"http.{endpoint}.bytes_sent", sent)
+    tracing.count(f"http.{endpoint}.bytes_received", received)
+    return response
+
+class HttpServer:        
+    # -------------------- 大模型操作 --------------------
+    def anomaly_gpt_infer(self, img_list, question = "", normal_img_list = [], history = []):
+        """
+        使用大模型进行推理
+
+        Args:
+            img_list: 待推理图像列表（必填）
+            question: 问题（选填）
+            normal_img_list: 正常图像列表（选填）
+            history: 历史记录（选填）[ 1号图对话记录[[question1, answer11], [question2,answer21],...], 2号图对话记录[[question1, answer12], [question2,answer22],...], ...]
+
+        Returns:
+            返回推理结果，同时生成结果图像，后缀是 __1.png （俩下划线）
+            结果格式: [
+                'The image shows a bottle of mineral water.',
+                ...
+            ]
+        """
+        url = f"http://{config.HOSTNAME}:{config.PORT}/anomaly_gpt_infer"
+        try:
+            response = http_request("POST", url, json={"img_list": img_list, "question": question, "normal_img_list": normal_img_list, "history": history})
+            if response.status_code == 200:
+                return response.json()
+            else:
+                raise Exception(f"大模型推理失败: HTTP错误: {response.status_code} - {response.text}")
+        except Exception as e:
+            logger.error(f"大模型推理失败: {str(e)}")
+            raise
+
+    # -------------------- 模型操作 --------------------
+    def add_model(self, model):
+        """
+        添加模型
+        
+        Args:
+            model: {
+                "name": 模型名称,
+                "input_h": 输入高度,
+                "input_w": 输入宽度,
+                "end_acc": 结束精度,
+                "layers": 层数列表_形如'[layer1, ...]'字符串,
+                "patchsize": 补丁大小,
+                "embed_dimension": 嵌入维度
+            }
+            
+        Returns:
+            新建模型的ID
+        """
+        url = f"http://{config.HOSTNAME}:{config.PORT}/add_model"
+        try:
+            response = http_request("POST", url, json=model)
+            if response.status_code == 200:
+                logger.debug(f"添加模型: {model['name']} -> {url}")
+                return response.json()
+            else:
+                raise Exception(f"添加模型失败: HTTP错误: {response.status_code} - {response.text}")
+        except Exception as e:
+            logger.error(f"添加模型失败: {str(e)}")
+            raise
+    
+    def delete_model(self, model_id):
+        """
+        删除模型
+        
+        Args:
+            model_id: 模型ID
+            
+        Returns:
+            删除结果
+        """
+        url = f"http://{config.HOSTNAME}:{config.PORT}/delete_model/{model_id}"
+        try:
+            response = http_request("DELETE", url)
+            if response.status_code == 200:
+                logger.debug(f"删除模型: {model_id} -> {url}")
+                return response.json()
+            else:
+                raise Exception(f"删除模型失败: HTTP错误: {response.status_code} - {response.text}")
+        except Exception as e:
+            logger.error(f"删除模型失败: {str(e)}")
+            raise
+
+    def update_model(self, model_id, model):
+        """
+        更新模型
+        """
+        url = f"http://{config.HOSTNAME}:{config.PORT}/update_model/{model_id}"
+        try:
+            response = http_request("POST", url, json=model)
+            if response.status_code == 200:
+                logger.debug(f"成功更新模型 {model_id} : {model}")
+                return response.json()
+            else:
+                raise Exception(f"更新模型参数失败: HTTP错误: {response.status_code} - {response.text}")
+        except Exception as e:
+            logger.error(f"更新模型参数失败: {str(e)}")
+            raise
+
+    def list_model(self):
+        """
+        获取模型列表
+        
+        Returns:
+            模型列表：[{
+                'id': 模型ID,
+                'input_h': 输入高度,
+                'input_w': 输入宽度,
+                'end_acc': 结束精度,
+                'embed_dimension': 嵌入维度,
+                'patchsize': 补丁大小,
+                'name': 模型名称,
+                'layers': 层数列表,
+                'status': 状态，0是新建的 1是已经训练中 2是训练结束 3是推理中，推理结束回到原状态
+            }]
+        """
+        url = f"http://{config.HOSTNAME}:{config.PORT}/list_model"
+        try:
+            response = http_request("GET", url)
+            if response.status_code == 200:
+                logger.debug(f"获取模型列表: {url}")
+                return response.json()
+            else:
+                raise Exception(f"获取模型列表失败: HTTP错误: {response.status_code} - {response.text}")
+        except Exception as e:
+            logger.error(f"获取模型列表失败: {str(e)}")
+            raise
+    
+    def get_model_id(self, model_name):
+        """
+        根据模型名称获取模型ID
+        """
+        model_list = self.list_model()
+        for model in model_list:
+            if model.get("name") == model_name:
+                logger.debug(f"模型名称匹配成功: {model_name} -> {model.get('id')}")
+                return model.get("id")
+        logger.warning(f"http_server无该模型: {model_list}")
+        return None    
+    
+    def get_model(self, model_name):
+        """
+        根据模型名称获取模型
+        """
+        model_list = self.list_model()
+        for model in model_list:
+            if model.get("name") == model_name:
+                logger.debug(f"获取模型: {model}")
+                return model
+        logger.warning(f"http_server无该模型: {model_list}")
+        return None
+    
+    def get_model_status(self, model_name):
+        """
+        根据模型名称获取模型状态：0-新建的，1-训练中，2-训练完成，3-推理中
+        """
+        model_list = self.list_model()
+        for model in model_list:
+            if model.get("name") == model_name:
+                logger.debug(f"获取模型状态: {model_name} -> {model.get('status')}")
+                return model.get("status")
+        logger.warning(f"http_server无该模型: {model_list}")
+        return None
+
+    def train_model(self, model_id, group_id):
+        """
+        训练模型
+        
+        Args:
+            model_id: 模型ID
+            group_id: 样本组ID
+            
+        Returns:
+            训练任务提交结果
+        """
+        url = f"http://{config.HOSTNAME}:{config.PORT}/train_model/{model_id}"
+        try:
+            params = {'group_id': group_id}
+            response = http_request("POST", url, params=params)
+            if response.status_code == 200:
+                logger.debug(f"开始训练模型: 模型ID={model_id} -> {url}")
+                return response.json()
+            else:
+                raise Exception(f"开始训练模型失败: HTTP错误: {response.status_code} - {response.text}")
+        except Exception as e:
+            logger.error(f"开始训练模型失败: {str(e)}")
+            raise
+
+    def finish_model(self, model_id):
+        """
+        结束模型训练
+        
+        Args:
+            model_id: 模型ID
+            
+        Returns:
+            结束训练结果
+        """
+        url = f"http://{config.HOSTNAME}:{config.PORT}/finish_model/{model_id}"
+        try:
+            response = http_request("POST", url)
+            if response.status_code == 200:
+                logger.debug(f"结束模型训练: 模型ID={model_id} -> {url}")
+                return response.json()
+            else:
+                raise Exception(f"结束模型训练失败: HTTP错误: {response.status_code} - {response.text}")
+        except Exception as e:
+            logger.error(f"结束模型训练失败: {str(e)}")
+            raise
+        
+    def train_info(self, model_id):
+        """
+        获取模型训练完成后的图像列表
+        
+        Args:
+            model_id: 模型ID
+            
+        Returns:
+            已训练的图像列表 ['image1.jpg', 'image2.jpg', ...]
+        """
+        url = f"http://{config.HOSTNAME}:{config.PORT}/train_info/{model_id}"
+        try:
+            response = http_request("POST", url)
+            if response.status_code == 200:
+                logger.debug(f"获取已训练的图像列表: 模型ID={model_id} -> {url}")
+                return response.json()
+            else:
+                raise Exception(f"获取已训练的图像列表失败: HTTP错误: {response.status_code} - {response.text}")
+        except Exception as e:
+            logger.error(f"获取已训练的图像列表失败: {str(e)}")
+            raise
+
+    def train_process(self, model_id):
+        """
+        获取模型训练实时信息
+        
+        Args:
+            model_id: 模型ID
+            
+        Returns:
+            训练信息 {
+                "p_true": 真实样本概率,
+                "p_fake": 生成样本概率,
+                "loss": 损失,
+                "epoch": 当前训练轮数,
+                "distance_loss": 距离损失,
+                "begin_time": 开始时间,
+                "end_time": 结束时间
+            }
+        """
+        url = f"http://{config.HOSTNAME}:{config.PORT}/train_process/{model_id}"
+        try:
+            response = http_request("POST", url)
+            if response.status_code == 200:
+                logger.debug(f"获取模型训练信息: 模型ID={model_id} -> {url}")
+                return response.json()
+            else:
+                raise Exception(f"获取模型训练信息失败: HTTP错误: {response.status_code} - {response.text}")
+        except Exception as e:
+            logger.error(f"获取模型训练信息失败: {str(e)}")
+            raise
+
+    def infer_model(self, model_id, group_id):
+        """
+        使用模型进行推理
+        
+        Args:
+            model_id: 模型ID
+            group_id: 样本组ID
+            
+        Returns:
+            推理任务提交结果
+        """
+        url = f"http://{config.HOSTNAME}:{config.PORT}/infer_model/{model_id}"
+        try:
+            params = {'group_id': group_id}
+            response = http_request("POST", url, params=params)
+            if response.status_code == 200:
+                logger.debug(f"开始模型推理: 模型ID={model_id} -> {url}")
+                return response.json()
+            else:
+                raise Exception(f"开始模型推理失败: HTTP错误: {response.status_code} - {response.text}")
+        except Exception as e:
+            logger.error(f"开始模型推理失败: {str(e)}")
+            raise
+
+    def infer_info(self, model_id):
+        """
+        获取模型推理完成后的图像列表（相当于infer_process的最终状态）
+        
+        Args:
+            model_id: 模型ID
+            
+        Returns: 
+            已推理的图像列表：[{
+                'id': 所属的样本组ID,
+                'bm_score': 边界框得分（无用）,
+                'score': 得分,
+                'model_id': 模型ID,
+                'img_filename': 图像文件名
+            }]
+            注：推理结果的图像名为原图加后缀，其中_0.png是前景分割图，_1.png是结果图，_2.png是背景过滤后的结果图，_3.png是异常图，_4.png是背景过滤后的异常图
+        """
+        url = f"http://{config.HOSTNAME}:{config.PORT}/infer_info/{model_id}"
+        try:
+            response = http_request("POST", url)
+            if response.status_code == 200:
+                logger.debug(f"获取已推理的图像列表: 模型ID={model_id} -> {url}")
+                return response.json()
+            else:
+                raise Exception(f"获取已推理的图像列表失败: HTTP错误: {response.status_code} - {response.text}")
+        except Exception as e:
+            logger.error(f"获取已推理的图像列表失败: {str(e)}")
+            raise
+    
+    def infer_process(self, model_id):
+        """
+        获取模型推理实时信息
+        
+        Args:
+            model_id: 模型ID
+            
+        Returns:
+            推理信息：{
+                'inferPercentage': 推理进度,
+                'have_infer_img_list': [{
+                    'img_filename': 图像文件名,
+                    'result_name': 结果图文件名前缀,
+                    'score': 得分
+                }]
+            }
+            注：推理结果的图像名为result_name加后缀，其中_0.png是前景分割图，_1.png是结果图，_2.png是背景过滤后的结果图，_3.png是异常图，_4.png是背景过滤后的异常图
+        """
+        url = f"http://{config.HOSTNAME}:{config.PORT}/infer_process/{model_id}"
+        try:
+            response = http_request("POST", url)
+            if response.status_code == 200:
+                logger.debug(f"获取模型推理信息: 模型ID={model_id} -> {url}")
+                return response.json()
+            else:
+                raise Exception(f"获取模型推理信息失败: HTTP错误: {response.status_code} - {response.text}")
+        except Exception as e:
+            logger.error(f"获取模型推理信息失败: {str(e)}")
+            raise
+
+    def poll_process(self, kind, model_id, etag=None):
+        """
+        带 If-None-Match 的进度查询，数据未变化时服务器可返回 304 而不传输进度内容
+
+        Args:
+            kind: "train_process" 或 "infer_process"
+            model_id: 模型ID
+            etag: 上一次响应的 ETag（服务器不支持时为 None）
+
+        Returns:
+            (进度信息, ETag)，服务器返回 304 时进度信息为 None
+        """
+        url = f"http://{config.HOSTNAME}:{config.PORT}/{kind}/{model_id}"
+        headers = {"If-None-Match": etag} if etag else {}
+        response = http_request("POST", url, headers=headers, timeout=10)
+        if response.status_code == 304:
+            return None, etag
+        if response.status_code != 200:
+            raise Exception(f"获取进度失败: HTTP错误: {response.status_code} - {response.text}")
+        return response.json(), response.headers.get("ETag")
+
+    def stream_process(self, kind, model_id, on_response=None):
+        """
+        订阅进度事件流（SSE）: GET /events/{kind}/{model_id}
+
+        Args:
+            kind: "train_process" 或 "infer_process"
+            model_id: 模型ID
+            on_response: 建立连接后以 response 为参数回调，便于其他线程关闭连接
+
+        Yields:
+            事件内容 {"version": 版本号, "status": 模型状态, "data": 进度信息}
+
+        Raises:
+            服务器不支持事件流（非 200）或连接失败时抛出异常
+        """
+        url = f"http://{config.HOSTNAME}:{config.PORT}/events/{kind}/{model_id}"
+        response = http_request("GET", url, stream=True, timeout=(5, 60), headers={"Accept": "text/event-stream"})
+        try:
+            if response.status_code != 200:
+                raise Exception(f"服务器不支持事件流: HTTP错误: {response.status_code}")
+            if on_response:
+                on_response(response)
+            response.encoding = "utf-8"
+            data_lines = []
+            for line in response.iter_lines(decode_unicode=True):
+                if line:
+                    if line.startswith("data:"):
+                        data_lines.append(line[5:].strip())
+                    continue
+                # 空行表示一个事件结束
+                if data_lines:
+                    yield json.loads("\n".join(data_lines))
+                    data_lines = []
+        finally:
+            response.close()
+
+    def wait_inference(self, model_id, model_name, on_results=None, timeout=3600, min_interval=0.25, max_interval=2.0):
+        """
+        等待推理完成：按 ETag 轮询推理进度，进度无变化时逐步加大轮询间隔
+
+        Args:
+            model_id: 模型ID
+            model_name: 模型名（用于查询模型状态）
+            on_results: 每次出现新的推理结果时，以新结果列表为参数回调
+            timeout: 最长等待时间（秒），超时抛出 TimeoutError
+
+        Returns:
+            全部推理结果 [{'img_filename', 'result_name', 'score'}]
+        """
+        start = time.perf_counter()
+        results = {} # {服务器图片名: 推理信息}
+        etag = None
+        percentage = 0
+        interval = min_interval
+        while True:
+            data, etag = self.poll_process("infer_process", model_id, etag)
+            if data is not None:
+                percentage = data.get("inferPercentage", 0)
+                new_results = [img_info for img_info in data.get("have_infer_img_list", [])
+                               if img_info.get("result_name") and img_info.get("img_filename") not in results]
+                for img_info in new_results:
+                    results[img_info["img_filename"]] = img_info
+                if new_results and on_results:
+                    on_results(new_results)
+                interval = min_interval
+            else:
+                interval = min(interval * 2, max_interval)
+            # 进度已满且模型不再是推理中状态时推理结束（进度未变化返回 304 时也要检查状态；进度未满时不查询状态）
+            if percentage >= 1.0 and inference_finished(percentage, self.get_model_status(model_name)):
+                return list(results.values())
+            if time.perf_counter() - start > timeout:
+                raise TimeoutError(f"推理超时（{timeout}s），已完成 {len(results)} 张")
+            time.sleep(interval)
+
+    def download_result_images(self, origin_name, alias_name, save_path, indices=range(5)):
+        """
+        下载五种结果热图：_0.png, _1.png, _2.png, _3.png, _4.png
+
+        Args:
+            origin_name: 服务器原图名 xxx-yyy.png
+            alias_name: 结果图别名前缀 zzz
+            save_path: 保存路径
+            indices: 要下载的结果图后缀编号，默认全部五种
+
+        Returns:
+            xxx-yyy.png -> yyy 本地初始图名
+        """
+        base_name = os.path.splitext(local_name(origin_name))[0] # 返回原图名
+        for i in indices:
+            result_name = f"{alias_name}_{i}.png"
+            rename = f"{base_name}_{i}.png"
+            try:
+                content = self.download_sample(result_name)
+                full_path = join_path(save_path, rename)
+                # 确保目录存在，写入
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                with open(full_path, 'wb') as f:
+                    f.write(content)
+                logger.debug(f"下载热图成功: {result_name} -> {full_path}")
+            except Exception as e:
+                logger.error(f"下载热图失败({i}): {str(e)}")
+        return base_name
+
+
+    # -------------------- 样本组操作 --------------------
+        
+    def upload_sample(self, file_path, group_id: Optional[int], filename=None):
+        """
+        通过HTTP接口上传单个文件
+        
+        Args:
+            file_path: 文件路径
+            group_id: 组ID，可选
+            filename: 上传后的文件名，默认使用本地文件名
+        
+        Returns:
+            上传文件的文件名
+        """
+        url = f"http://{config.HOSTNAME}:{config.PORT}/upload_sample"
+        try:
+            with open(file_path, 'rb') as f:
+                filename = filename or os.path.basename(file_path)
+                files = {'file': (filename, f, 'image/jpeg')}
+                # 添加组ID参数作为URL参数，而不是表单数据
+                params = {'group_id': group_id}
+                response = http_request("POST", url, files=files, params=params)
+                if response.status_code == 200:
+                    logger.debug(f"上传文件: {file_path} -> {url}")
+                    return response.json()["filename"]
+                else:
+                    raise Exception(f"上传文件失败: HTTP错误: {response.status_code} - {response.text}")
+        except Exception as e:
+            logger.error(f"上传文件失败: {str(e)}")
+            raise
+
+    def get_sample_list(self, group_id):
+        """
+        获取指定组的样本名列表
+        
+        Args:
+            group_id: 组ID
+            
+        Returns:
+            样本名称列表
+        """
+        url = f"http://{config.HOSTNAME}:{config.PORT}/get_sample_list/{group_id}"
+        try:
+            response = http_request("GET", url)
+            if response.status_code == 200:
+                logger.debug(f"获取样本列表: {url}")
+                return response.json()
+            else:
+                raise Exception(f"获取样本列表失败: HTTP错误: {response.status_code} - {response.text}")
+        except Exception as e:
+            logger.error(f"获取样本列表失败: {str(e)}")
+            raise
+
+    def download_sample(self, filename):
+        """
+        下载样本文件
+        
+        Args:
+            filename: 文件名
+            
+        Returns:
+            文件内容的二进制数据
+        """
+        url = f"http://{config.HOSTNAME}:{config.PORT}/download_sample"
+        try:
+            response = http_request("GET", url, json={"filename": filename})
+            if response.status_code == 200:
+                logger.debug(f"下载样本: {filename} -> {url}")
+                return response.content  # 返回二进制内容而不是JSON
+            else:
+                raise Exception(f"下载样本失败: HTTP错误: {response.status_code} - {response.text}")
+        except Exception as e:
+            logger.error(f"下载样本失败: {str(e)}")
+            raise
+            
+    def save_downloaded_sample(self, filename, save_path):
+        """
+        下载样本并保存到指定路径（去掉前缀）
+        
+        Args:
+            filename: 文件名（有前缀，用-连接）
+            save_path: 保存路径
+            
+        Returns:
+            保存文件的完整路径
+        """
+        content = self.download_sample(filename)
+        full_path = join_path(save_path, local_name(filename)) # 去掉前缀
+        # 确保目录存在，写入
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, 'wb') as f:
+            f.write(content)
+        return full_path
+
+    def add_group(self, group_name):
+        """
+        添加组
+        
+        Args:
+            group_name: 组名
+            
+        Returns:
+            新建组的ID
+        """
+        url = f"http://{config.HOSTNAME}:{config.PORT}/add_group"
+        try:
+            response = http_request("POST", url, json={"group_name": group_name})
+            if response.status_code == 200:
+                logger.debug(f"添加组: {group_name} -> {url}")
+                return response.json()
+            else:
+                raise Exception(f"添加组失败: HTTP错误: {response.status_code} - {response.text}")
+        except Exception as e:
+            logger.error(f"添加组失败: {str(e)}")
+            raise
+
+    def delete_group(self, group_id):
+        """
+        删除组
+        
+        Args:
+            group_id: 组ID
+        """
+        url = f"http://{config.HOSTNAME}:{config.PORT}/delete_group/{group_id}"
+        try:
+            response = http_request("DELETE", url)
+            if response.status_code == 200:
+                logger.debug(f"删除组: {group_id} -> {url}")
+                return response.json()
+            else:
+                raise Exception(f"删除组失败: HTTP错误: {response.status_code} - {response.text}")
+        except Exception as e:
+            logger.error(f"删除组失败: {str(e)}")
+            raise
+
+    def clear_group(self, group_id):
+        """
+        清空组
+        
+        Args:
+            group_id: 组ID
+        """
+        url = f"http://{config.HOSTNAME}:{config.PORT}/clear_group/{group_id}"
+        try:
+            response = http_request("DELETE", url)
+            if response.status_code == 200:
+                logger.debug(f"清空组: {group_id} -> {url}")
+                return response.json()
+            else:
+                raise Exception(f"清空组失败: HTTP错误: {response.status_code} - {response.text}")
+        except Exception as e:
+            logger.error(f"清空组失败: {str(e)}")
+            raise
+    
+    def get_group_list(self):
+        """
+        获取所有组的列表
+        
+        Returns:
+            组列表：[{
+                "id": 组ID,
+                "group_name": 组名
+            }]
+        """
+        url = f"http://{config.HOSTNAME}:{config.PORT}/get_group_list"
+        try:
+            response = http_request("GET", url)
+            if response.status_code == 200:
+                logger.debug(f"获取组列表: {url}")
+                return response.json()
+            else:
+                raise Exception(f"获取组列表失败: HTTP错误: {response.status_code} - {response.text}")
+        except Exception as e:
+            logger.error(f"获取组列表失败: {str(e)}")
+            raise
+
+    def get_group_id(self, group_name):
+        """
+        根据组名获取组ID
+        """
+        group_list = self.get_group_list()
+        for group in group_list:
+            if group.get("group_name") == group_name:
+                logger.debug(f"组名匹配成功: {group_name} -> {group.get('id')}")
+                return group.get("id")
+        logger.warning(f"http_server无该样本组: {group_list}")
+        return None
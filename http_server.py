@@ -1,580 +1,50 @@
-import json
+import logging
 import os
+import threading
 import time
-import requests
+import warnings
 import config
-from typing import Optional
+import tracing
 from PySide6.QtWidgets import QMessageBox, QWidget, QHBoxLayout, QVBoxLayout, QLabel
-from utils import LoadingAnimation, ProgressDialog, check_detect_sample_group, check_model_group, is_image, join_path, show_message_box
-from PySide6.QtCore import QTimer, Qt
-from PySide6.QtGui import QPixmap, QPainter, QFont
+from http_client import INFERRING_STATUS, HttpServer, inference_finished, local_name
+from result_compositor import combined_path, get_result_compositor
+from result_store import get_result_store, status_of, to_score
+from upload_transform import covers, prepare_uploads
+from utils import LoadingAnimation, ProgressDialog, check_detect_sample_group, check_model_group, get_metadata, is_image, join_path, show_message_box, update_metadata
+from PySide6.QtCore import QThread, Signal
+from PySide6.QtGui import QPixmap
 
-class HttpServer:        
-    # -------------------- 大模型操作 --------------------
-    def anomaly_gpt_infer(self, img_list, question = "", normal_img_list = [], history = []):
-        """
-        使用大模型进行推理
-
-        Args:
-            img_list: 待推理图像列表（必填）
-            question: 问题（选填）
-            normal_img_list: 正常图像列表（选填）
-            history: 历史记录（选填）[ 1号图对话记录[[question1, answer11], [question2,answer21],...], 2号图对话记录[[question1, answer12], [question2,answer22],...], ...]
-
-        Returns:
-            返回推理结果，同时生成结果图像，后缀是 __1.png （俩下划线）
-            结果格式: [
-                'The image shows a bottle of mineral water.',
-                ...
-            ]
-        """
-        url = f"http://{config.HOSTNAME}:{config.PORT}/anomaly_gpt_infer"
-        try:
-            response = requests.post(url, json={"img_list": img_list, "question": question, "normal_img_list": normal_img_list, "history": history})
-            if response.status_code == 200:
-                return response.json()
-            else:
-                raise Exception(f"大模型推理失败: HTTP错误: {response.status_code} - {response.text}")
-        except Exception as e:
-            print(f"大模型推理失败: {str(e)}")
-            raise
-
-    # -------------------- 模型操作 --------------------
-    def add_model(self, model):
-        """
-        添加模型
-        
-        Args:
-            model: {
-                "name": 模型名称,
-                "input_h": 输入高度,
-                "input_w": 输入宽度,
-                "end_acc": 结束精度,
-                "layers": 层数列表_形如'[layer1, ...]'字符串,
-                "patchsize": 补丁大小,
-                "embed_dimension": 嵌入维度
-            }
-            
-        Returns:
-            新建模型的ID
-        """
-        url = f"http://{config.HOSTNAME}:{config.PORT}/add_model"
-        try:
-            response = requests.post(url, json=model)
-            if response.status_code == 200:
-                print(f"添加模型: {model['name']} -> {url}")
-                return response.json()
-            else:
-                raise Exception(f"添加模型失败: HTTP错误: {response.status_code} - {response.text}")
-        except Exception as e:
-            print(f"添加模型失败: {str(e)}")
-            raise
-    
-    def delete_model(self, model_id):
-        """
-        删除模型
-        
-        Args:
-            model_id: 模型ID
-            
-        Returns:
-            删除结果
-        """
-        url = f"http://{config.HOSTNAME}:{config.PORT}/delete_model/{model_id}"
-        try:
-            response = requests.delete(url)
-            if response.status_code == 200:
-                print(f"删除模型: {model_id} -> {url}")
-                return response.json()
-            else:
-                raise Exception(f"删除模型失败: HTTP错误: {response.status_code} - {response.text}")
-        except Exception as e:
-            print(f"删除模型失败: {str(e)}")
-            raise
-
-    def update_model(self, model_id, model):
-        """
-        更新模型
-        """
-        url = f"http://{config.HOSTNAME}:{config.PORT}/update_model/{model_id}"
-        try:
-            response = requests.post(url, json=model)
-            if response.status_code == 200:
-                print(f"成功更新模型 {model_id} : {model}")
-                return response.json()
-            else:
-                raise Exception(f"更新模型参数失败: HTTP错误: {response.status_code} - {response.text}")
-        except Exception as e:
-            print(f"更新模型参数失败: {str(e)}")
-            raise
-
-    def list_model(self):
-        """
-        获取模型列表
-        
-        Returns:
-            模型列表：[{
-                'id': 模型ID,
-                'input_h': 输入高度,
-                'input_w': 输入宽度,
-                'end_acc': 结束精度,
-                'embed_dimension': 嵌入维度,
-                'patchsize': 补丁大小,
-                'name': 模型名称,
-                'layers': 层数列表,
-                'status': 状态，0是新建的 1是已经训练中 2是训练结束 3是推理中，推理结束回到原状态
-            }]
-        """
-        url = f"http://{config.HOSTNAME}:{config.PORT}/list_model"
-        try:
-            response = requests.get(url)
-            if response.status_code == 200:
-                print(f"获取模型列表: {url}")
-                return response.json()
-            else:
-                raise Exception(f"获取模型列表失败: HTTP错误: {response.status_code} - {response.text}")
-        except Exception as e:
-            print(f"获取模型列表失败: {str(e)}")
-            raise
-    
-    def get_model_id(self, model_name):
-        """
-        根据模型名称获取模型ID
-        """
-        model_list = self.list_model()
-        for model in model_list:
-            if model.get("name") == model_name:
-                print(f"模型名称匹配成功: {model_name} -> {model.get('id')}")
-                return model.get("id")
-        print(f"http_server无该模型: {model_list}")
-        return None    
-    
-    def get_model(self, model_name):
-        """
-        根据模型名称获取模型
-        """
-        model_list = self.list_model()
-        for model in model_list:
-            if model.get("name") == model_name:
-                print(f"获取模型: {model}")
-                return model
-        print(f"http_server无该模型: {model_list}")
-        return None
-    
-    def get_model_status(self, model_name):
-        """
-        根据模型名称获取模型状态：0-新建的，1-训练中，2-训练完成，3-推理中
-        """
-        model_list = self.list_model()
-        for model in model_list:
-            if model.get("name") == model_name:
-                print(f"获取模型状态: {model_name} -> {model.get('status')}")
-                return model.get("status")
-        print(f"http_server无该模型: {model_list}")
-        return None
-
-    def train_model(self, model_id, group_id):
-        """
-        训练模型
-        
-        Args:
-            model_id: 模型ID
-            group_id: 样本组ID
-            
-        Returns:
-            训练任务提交结果
-        """
-        url = f"http://{config.HOSTNAME}:{config.PORT}/train_model/{model_id}"
-        try:
-            params = {'group_id': group_id}
-            response = requests.post(url, params=params)
-            if response.status_code == 200:
-                print(f"开始训练模型: 模型ID={model_id} -> {url}")
-                return response.json()
-            else:
-                raise Exception(f"开始训练模型失败: HTTP错误: {response.status_code} - {response.text}")
-        except Exception as e:
-            print(f"开始训练模型失败: {str(e)}")
-            raise
-
-    def finish_model(self, model_id):
-        """
-        结束模型训练
-        
-        Args:
-            model_id: 模型ID
-            
-        Returns:
-            结束训练结果
-        """
-        url = f"http://{config.HOSTNAME}:{config.PORT}/finish_model/{model_id}"
-        try:
-            response = requests.post(url)
-            if response.status_code == 200:
-                print(f"结束模型训练: 模型ID={model_id} -> {url}")
-                return response.json()
-            else:
-                raise Exception(f"结束模型训练失败: HTTP错误: {response.status_code} - {response.text}")
-        except Exception as e:
-            print(f"结束模型训练失败: {str(e)}")
-            raise
-        
-    def train_info(self, model_id):
-        """
-        获取模型训练完成后的图像列表
-        
-        Args:
-            model_id: 模型ID
-            
-        Returns:
-            已训练的图像列表 ['image1.jpg', 'image2.jpg', ...]
-        """
-        url = f"http://{config.HOSTNAME}:{config.PORT}/train_info/{model_id}"
-        try:
-            response = requests.post(url)
-            if response.status_code == 200:
-                print(f"获取已训练的图像列表: 模型ID={model_id} -> {url}")
-                return response.json()
-            else:
-                raise Exception(f"获取已训练的图像列表失败: HTTP错误: {response.status_code} - {response.text}")
-        except Exception as e:
-            print(f"获取已训练的图像列表失败: {str(e)}")
-            raise
-
-    def train_process(self, model_id):
-        """
-        获取模型训练实时信息
-        
-        Args:
-            model_id: 模型ID
-            
-        Returns:
-            训练信息 {
-                "p_true": 真实样本概率,
-                "p_fake": 生成样本概率,
-                "loss": 损失,
-                "epoch": 当前训练轮数,
-                "distance_loss": 距离损失,
-                "begin_time": 开始时间,
-                "end_time": 结束时间
-            }
-        """
-        url = f"http://{config.HOSTNAME}:{config.PORT}/train_process/{model_id}"
-        try:
-            response = requests.post(url)
-            if response.status_code == 200:
-                print(f"获取模型训练信息: 模型ID={model_id} -> {url}")
-                return response.json()
-            else:
-                raise Exception(f"获取模型训练信息失败: HTTP错误: {response.status_code} - {response.text}")
-        except Exception as e:
-            print(f"获取模型训练信息失败: {str(e)}")
-            raise
-
-    def infer_model(self, model_id, group_id):
-        """
-        使用模型进行推理
-        
-        Args:
-            model_id: 模型ID
-            group_id: 样本组ID
-            
-        Returns:
-            推理任务提交结果
-        """
-        url = f"http://{config.HOSTNAME}:{config.PORT}/infer_model/{model_id}"
-        try:
-            params = {'group_id': group_id}
-            response = requests.post(url, params=params)
-            if response.status_code == 200:
-                print(f"开始模型推理: 模型ID={model_id} -> {url}")
-                return response.json()
-            else:
-                raise Exception(f"开始模型推理失败: HTTP错误: {response.status_code} - {response.text}")
-        except Exception as e:
-            print(f"开始模型推理失败: {str(e)}")
-            raise
-
-    def infer_info(self, model_id):
-        """
-        获取模型推理完成后的图像列表（相当于infer_process的最终状态）
-        
-        Args:
-            model_id: 模型ID
-            
-        Returns: 
-            已推理的图像列表：[{
-                'id': 所属的样本组ID,
-                'bm_score': 边界框得分（无用）,
-                'score': 得分,
-                'model_id': 模型ID,
-                'img_filename': 图像文件名
-            }]
-            注：推理结果的图像名为原图加后缀，其中_0.png是前景分割图，_1.png是结果图，_2.png是背景过滤后的结果图，_3.png是异常图，_4.png是背景过滤后的异常图
-        """
-        url = f"http://{config.HOSTNAME}:{config.PORT}/infer_info/{model_id}"
-        try:
-            response = requests.post(url)
-            if response.status_code == 200:
-                print(f"获取已推理的图像列表: 模型ID={model_id} -> {url}")
-                return response.json()
-            else:
-                raise Exception(f"获取已推理的图像列表失败: HTTP错误: {response.status_code} - {response.text}")
-        except Exception as e:
-            print(f"获取已推理的图像列表失败: {str(e)}")
-            raise
-    
-    def infer_process(self, model_id):
-        """
-        获取模型推理实时信息
-        
-        Args:
-            model_id: 模型ID
-            
-        Returns:
-            推理信息：{
-                'inferPercentage': 推理进度,
-                'have_infer_img_list': [{
-                    'img_filename': 图像文件名,
-                    'result_name': 结果图文件名前缀,
-                    'score': 得分
-                }]
-            }
-            注：推理结果的图像名为result_name加后缀，其中_0.png是前景分割图，_1.png是结果图，_2.png是背景过滤后的结果图，_3.png是异常图，_4.png是背景过滤后的异常图
-        """
-        url = f"http://{config.HOSTNAME}:{config.PORT}/infer_process/{model_id}"
-        try:
-            response = requests.post(url)
-            if response.status_code == 200:
-                print(f"获取模型推理信息: 模型ID={model_id} -> {url}")
-                return response.json()
-            else:
-                raise Exception(f"获取模型推理信息失败: HTTP错误: {response.status_code} - {response.text}")
-        except Exception as e:
-            print(f"获取模型推理信息失败: {str(e)}")
-            raise
-    
-    def download_result_images(self, origin_name, alias_name, save_path):
-        """
-        下载五种结果热图：_0.png, _1.png, _2.png, _3.png, _4.png
-
-        Args:
-            origin_name: 服务器原图名 xxx-yyy.png
-            alias_name: 结果图别名前缀 zzz
-            save_path: 保存路径
-
-        Returns:
-            xxx-yyy.png -> yyy 本地初始图名
-        """
-        base_name = os.path.splitext(origin_name)[0].split("-")[-1] # 返回原图名
-        for i in range(5):
-            result_name = f"{alias_name}_{i}.png"
-            rename = f"{base_name}_{i}.png"
-            try:
-                content = self.download_sample(result_name)
-                full_path = join_path(save_path, rename)
-                # 确保目录存在，写入
-                os.makedirs(os.path.dirname(full_path), exist_ok=True)
-                with open(full_path, 'wb') as f:
-                    f.write(content)
-                print(f"下载热图成功: {result_name} -> {full_path}")
-            except Exception as e:
-                print(f"下载热图失败({i}): {str(e)}")
-        return base_name
-
-
-    # -------------------- 样本组操作 --------------------
-        
-    def upload_sample(self, file_path, group_id: Optional[int]):
-        """
-        通过HTTP接口上传单个文件
-        
-        Args:
-            file_path: 文件路径
-            group_id: 组ID，可选
-        
-        Returns:
-            上传文件的文件名
-        """
-        url = f"http://{config.HOSTNAME}:{config.PORT}/upload_sample"
-        try:
-            with open(file_path, 'rb') as f:
-                filename = os.path.basename(file_path)
-                files = {'file': (filename, f, 'image/jpeg')}
-                # 添加组ID参数作为URL参数，而不是表单数据
-                params = {'group_id': group_id}
-                response = requests.post(url, files=files, params=params)
-                if response.status_code == 200:
-                    print(f"上传文件: {file_path} -> {url}")
-                    return response.json()["filename"]
-                else:
-                    raise Exception(f"上传文件失败: HTTP错误: {response.status_code} - {response.text}")
-        except Exception as e:
-            print(f"上传文件失败: {str(e)}")
-            raise
+logger = logging.getLogger(__name__)
 
-    def get_sample_list(self, group_id):
-        """
-        获取指定组的样本名列表
-        
-        Args:
-            group_id: 组ID
-            
-        Returns:
-            样本名称列表
-        """
-        url = f"http://{config.HOSTNAME}:{config.PORT}/get_sample_list/{group_id}"
-        try:
-            response = requests.get(url)
-            if response.status_code == 200:
-                print(f"获取样本列表: {url}")
-                return response.json()
-            else:
-                raise Exception(f"获取样本列表失败: HTTP错误: {response.status_code} - {response.text}")
-        except Exception as e:
-            print(f"获取样本列表失败: {str(e)}")
-            raise
 
-    def download_sample(self, filename):
-        """
-        下载样本文件
-        
-        Args:
-            filename: 文件名
-            
-        Returns:
-            文件内容的二进制数据
-        """
-        url = f"http://{config.HOSTNAME}:{config.PORT}/download_sample"
-        try:
-            response = requests.get(url, json={"filename": filename})
-            if response.status_code == 200:
-                print(f"下载样本: {filename} -> {url}")
-                return response.content  # 返回二进制内容而不是JSON
-            else:
-                raise Exception(f"下载样本失败: HTTP错误: {response.status_code} - {response.text}")
-        except Exception as e:
-            print(f"下载样本失败: {str(e)}")
-            raise
-            
-    def save_downloaded_sample(self, filename, save_path):
-        """
-        下载样本并保存到指定路径（去掉前缀）
-        
-        Args:
-            filename: 文件名（有前缀，用-连接）
-            save_path: 保存路径
-            
-        Returns:
-            保存文件的完整路径
-        """
-        content = self.download_sample(filename)
-        full_path = join_path(save_path, filename.split("-")[-1]) # 去掉前缀
-        # 确保目录存在，写入
-        os.makedirs(os.path.dirname(full_path), exist_ok=True)
-        with open(full_path, 'wb') as f:
-            f.write(content)
-        return full_path
-
-    def add_group(self, group_name):
-        """
-        添加组
-        
-        Args:
-            group_name: 组名
-            
-        Returns:
-            新建组的ID
-        """
-        url = f"http://{config.HOSTNAME}:{config.PORT}/add_group"
-        try:
-            response = requests.post(url, json={"group_name": group_name})
-            if response.status_code == 200:
-                print(f"添加组: {group_name} -> {url}")
-                return response.json()
-            else:
-                raise Exception(f"添加组失败: HTTP错误: {response.status_code} - {response.text}")
-        except Exception as e:
-            print(f"添加组失败: {str(e)}")
-            raise
-
-    def delete_group(self, group_id):
-        """
-        删除组
-        
-        Args:
-            group_id: 组ID
-        """
-        url = f"http://{config.HOSTNAME}:{config.PORT}/delete_group/{group_id}"
-        try:
-            response = requests.delete(url)
-            if response.status_code == 200:
-                print(f"删除组: {group_id} -> {url}")
-                return response.json()
-            else:
-                raise Exception(f"删除组失败: HTTP错误: {response.status_code} - {response.text}")
-        except Exception as e:
-            print(f"删除组失败: {str(e)}")
-            raise
-
-    def clear_group(self, group_id):
-        """
-        清空组
-        
-        Args:
-            group_id: 组ID
-        """
-        url = f"http://{config.HOSTNAME}:{config.PORT}/clear_group/{group_id}"
-        try:
-            response = requests.delete(url)
-            if response.status_code == 200:
-                print(f"清空组: {group_id} -> {url}")
-                return response.json()
-            else:
-                raise Exception(f"清空组失败: HTTP错误: {response.status_code} - {response.text}")
-        except Exception as e:
-            print(f"清空组失败: {str(e)}")
-            raise
-    
-    def get_group_list(self):
-        """
-        获取所有组的列表
-        
-        Returns:
-            组列表：[{
-                "id": 组ID,
-                "group_name": 组名
-            }]
-        """
-        url = f"http://{config.HOSTNAME}:{config.PORT}/get_group_list"
-        try:
-            response = requests.get(url)
-            if response.status_code == 200:
-                print(f"获取组列表: {url}")
-                return response.json()
-            else:
-                raise Exception(f"获取组列表失败: HTTP错误: {response.status_code} - {response.text}")
-        except Exception as e:
-            print(f"获取组列表失败: {str(e)}")
-            raise
+def prepare_test_env(test_dir=None, image_folder="img", image_count=5, use_mock=True):
+    """
+    准备 API 测试环境
 
-    def get_group_id(self, group_name):
-        """
-        根据组名获取组ID
-        """
-        group_list = self.get_group_list()
-        for group in group_list:
-            if group.get("group_name") == group_name:
-                print(f"组名匹配成功: {group_name} -> {group.get('id')}")
-                return group.get("id")
-        print(f"http_server无该样本组: {group_list}")
-        return None
-            
+    Args:
+        test_dir: 测试目录，为 None 时在临时目录中生成合成样本图
+        image_folder: 测试图片所在的子目录名
+        image_count: 生成的合成样本图数量
+        use_mock: 是否启动本地模拟服务器并将 config 指向它（为 False 时访问 config.HOSTNAME）
 
-        
-def test_sample_api():
+    Returns:
+        (测试目录, 模拟服务器或 None)
+    """
+    mock = None
+    if use_mock:
+        from mock_server import MockState, start_in_background, use_mock_server
+        mock, _ = start_in_background(state=MockState(epoch_interval=0.05, total_epochs=20, infer_interval=0.02))
+        use_mock_server(mock)
+    if test_dir is None:
+        import tempfile
+        from mock_server import write_sample_images
+        test_dir = tempfile.mkdtemp(prefix="http_api_test_")
+        write_sample_images(join_path(test_dir, image_folder), image_count)
+    return test_dir, mock
+
+def test_sample_api(test_dir=None, use_mock=True):
     """
-    简单测试脚本，测试HTTP服务器API
+    简单测试脚本，测试HTTP服务器API（默认使用本地模拟服务器和合成样本图）
     测试流程: add_group -> get_group_list -> upload_sample -> get_sample_list -> 
             download_sample -> get_sample_list -> delete_group -> get_group_list
     """
@@ -583,7 +53,7 @@ def test_sample_api():
     server = HttpServer()
 
     # 0. 准备测试图片
-    test_dir = "B:/Development/GraduationDesign/app/test"
+    test_dir, mock = prepare_test_env(test_dir, "img2", use_mock=use_mock)
 
     image_dir = join_path(test_dir, "img2")
     test_images = os.listdir(image_dir)
@@ -639,11 +109,13 @@ def test_sample_api():
     groups = server.get_group_list()
     print(f"组列表: {groups}")
 
+    if mock:
+        mock.shutdown()
     print("\n======= 测试完成 =======") 
 
-def test_model_api():
+def test_model_api(test_dir=None, use_mock=True):
     """
-    测试模型操作相关的API:
+    测试模型操作相关的API（默认使用本地模拟服务器和合成样本图）:
     add_model -> list_model -> train_model -> train_info -> train_process -> infer_model -> infer_info -> infer_process -> delete_model -> list_model
     """
 
@@ -651,7 +123,8 @@ def test_model_api():
     server = HttpServer()
 
     # 0. 准备样本
-    test_dir = "B:/Development/GraduationDesign/app/test"
+    test_dir, mock = prepare_test_env(test_dir, "img", use_mock=use_mock)
+    poll_interval = 0.2 if mock else 5 # 模拟服务器训练很快，缩短查询间隔
     image_dir = join_path(test_dir, "img")
     download_dir = join_path(test_dir, "downloads")
     test_images = os.listdir(image_dir)[:2]
@@ -717,8 +190,8 @@ def test_model_api():
     # 循环查询训练进度
     while True:
         try:
-            # 等待5秒后再次查询
-            time.sleep(5)
+            # 等待一段时间后再次查询
+            time.sleep(poll_interval)
             train_info = server.train_info(model_id) # 已训练的图像列表，通过其数量除以测试图片总数，得到训练进度
             print(f"已训练的图像列表: {train_info}")
             train_process = server.train_process(model_id)
@@ -755,8 +228,8 @@ def test_model_api():
     # 循环查询推理进度
     while True:
         try:
-            # 等待1秒后再次查询
-            time.sleep(1)
+            # 等待一段时间后再次查询
+            time.sleep(min(poll_interval, 1))
             infer_info = server.infer_info(model_id)
             print(f"已推理的图像列表: {infer_info}")
             infer_process = server.infer_process(model_id)
@@ -772,12 +245,13 @@ def test_model_api():
         except Exception as e:
             print(f"获取推理信息失败: {str(e)}")
             break
-    # 根据infer_info下载热图
+    # 根据infer_process下载热图（结果图别名前缀只在infer_process中提供）
     print(f"测试下载热图 (模型ID: {model_id})")
+    img = None
     try:
-        for result in infer_info:
+        for result in infer_process.get("have_infer_img_list", []):
             img = result.get("img_filename")
-            server.download_result_images(img, download_dir)
+            server.download_result_images(img, result.get("result_name"), download_dir)
         print(f"下载热图结果: {img}")
     except Exception as e:
         print(f"下载{img}的结果热图失败: {str(e)}")
@@ -807,11 +281,22 @@ def test_model_api():
     else:
         print("模型已成功删除")
         
+    if mock:
+        mock.shutdown()
     print("\n======= 测试完成 =======")
 
 
 
 # ----------------------其它功能函数----------------------
+def is_upload_size_sufficient(sample_group, size):
+    """
+    样本组上次上传的尺寸是否足够训练需要的尺寸 size（None 为原图）；从未记录时视为已上传原图
+    """
+    upload_sizes = (config.PROJECT_METADATA or {}).get('upload_sizes') or {}
+    if sample_group not in upload_sizes:
+        return True
+    return covers(upload_sizes[sample_group], size)
+
 def is_sample_group_uploaded(sample_group):
         """
         检查当前样本组是否已上传到服务器
@@ -823,7 +308,6 @@ def is_sample_group_uploaded(sample_group):
         if not sample_group:
             return False
         # 对接 http_server: 检查样本组是否上传
-        group_path = join_path(config.SAMPLE_PATH, sample_group)
         try:
             # 连接服务器，检查样本组是否上传（样本数量是否相等）
             http_server = HttpServer()
@@ -832,14 +316,14 @@ def is_sample_group_uploaded(sample_group):
                 return False
             # 获取服务器上的样本列表
             sample_list = http_server.get_sample_list(group_id)
-            # 获取本地样本数量
-            local_count = len(os.listdir(group_path))
+            # 获取本地样本数量（查询项目索引，无需扫描目录）
+            from project_index import get_project_index
+            local_count = get_project_index().image_count(sample_group)
             # 样本数量相等或服务器数量更多，则认为已上传
-            print(sample_list)
-            print(len(sample_list))
+            logger.debug(f"服务器样本数量: {len(sample_list)}, 本地样本数量: {local_count}")
             return len(sample_list) >= local_count
         except Exception as e:
-            print(f"检查样本组上传状态失败: {str(e)}")
+            logger.error(f"检查样本组上传状态失败: {str(e)}")
             return False
 
 
@@ -848,10 +332,15 @@ class UploadSampleGroup_HTTP:
     """
     上传样本组到服务器的线程
     """
-    def __init__(self, ui, sample_group):
+    def __init__(self, ui, sample_group, size=None):
+        """
+        Args:
+            size: 上传尺寸 (宽, 高)，训练样本先缩小到该尺寸再上传（见 upload_transform.upload_size）；None 表示上传原图
+        """
         self.sample_group = sample_group
         self.group_path = join_path(config.SAMPLE_PATH, sample_group) 
         self.ui = ui
+        self.size = tuple(size) if size else None
 
     def run(self):
         # 创建进度条
@@ -865,7 +354,7 @@ class UploadSampleGroup_HTTP:
         total_files = len(files)
         if total_files == 0:
             show_message_box("警告", "样本组为空，请导入样本", QMessageBox.Warning)
-            return
+            return False
         # 更新进度条文本
         progressDialog.setLabelText(f"正在上传 {total_files} 个文件...")
         # 先清空组，再遍历并上传每个文件
@@ -875,18 +364,29 @@ class UploadSampleGroup_HTTP:
             http_server.clear_group(group_id)
         except Exception as e:
             show_message_box("错误", f"清空组失败: {str(e)}", QMessageBox.Critical)
-            return
-        for index, file_name in enumerate(files):
-            file_path = join_path(self.group_path, file_name)
-            # 上传文件，先清空组再上传(覆盖旧样本组)，若失败则停止
+            return False
+        # 记录上传尺寸（训练前据此判断是否需要重新上传更大的样本），上传完成前记为 [0, 0]
+        upload_sizes = get_metadata('upload_sizes') or {}
+        upload_sizes[self.sample_group] = [0, 0]
+        update_metadata('upload_sizes', upload_sizes)
+        # 后台线程池按顺序缩小图片，上传当前图片时后面的图片已在处理
+        file_paths = [join_path(self.group_path, file_name) for file_name in files]
+        for index, (file_path, upload_path) in enumerate(prepare_uploads(file_paths, self.size)):
+            file_name = os.path.basename(file_path)
+            # 上传文件，先清空组再上传(覆盖旧样本组)，若失败则停止；有编辑记录或缩小时上传处理后的图片，文件名不变
             try:
-                http_server.upload_sample(file_path, group_id)
+                if isinstance(upload_path, Exception):
+                    raise upload_path
+                http_server.upload_sample(upload_path, group_id, file_name)
             except Exception as e:
                 show_message_box("错误", f"上传失败: {str(e)}", QMessageBox.Critical)
-                return
+                return False
             # 更新进度条
             progress = int((index + 1) / total_files * 100)
             progressDialog.setValue(progress)
+        upload_sizes[self.sample_group] = list(self.size) if self.size else None
+        update_metadata('upload_sizes', upload_sizes)
+        return True
 
             
 
@@ -991,7 +491,7 @@ class PatchCoreParamMapper_Http:
             params["layers"] = str(params["layers"])
             
         # 返回的字典包含必要的六个参数
-        print(f"训练参数: {params}")
+        logger.debug(f"训练参数: {params}")
         return params
     
     def get_all_options(self):
@@ -1002,6 +502,145 @@ class PatchCoreParamMapper_Http:
             "training_speed": list(self.training_speed_options.keys())
         }
 
+class ProgressSubscriber(QThread):
+    """
+    训练 / 推理进度订阅线程
+
+    优先订阅服务器事件流（SSE），服务器不支持时退回到自适应轮询：
+    轮询携带 If-None-Match，数据有变化时以最短间隔轮询，无变化时间隔逐步翻倍。
+    进度和模型状态只在发生变化时通过信号发送到 GUI 线程
+    """
+    progress_signal = Signal(dict) # 进度信息变化
+    status_signal = Signal(object) # 模型状态变化
+    error_signal = Signal(str)
+
+    MIN_INTERVAL = 0.25 # 轮询最短间隔（秒）
+    MAX_INTERVAL = 4.0 # 轮询最长间隔（秒）
+    SHUTDOWN_WAIT = 100 # shutdown 时在 GUI 线程等待线程退出的最长时间（毫秒）
+    # 不支持事件流的服务器 {(主机, 端口)}，避免每次订阅都重复尝试
+    stream_unsupported = set()
+    # 已停止但线程尚未退出的订阅，保留引用直到 finished，避免线程运行中被回收
+    stopping = set()
+
+    def __init__(self, kind, model_id, model_name, use_stream=True):
+        """
+        Args:
+            kind: "train_process" 或 "infer_process"
+            model_id: 模型ID
+            model_name: 模型名称（轮询模式下用于查询模型状态）
+            use_stream: 是否尝试事件流
+        """
+        super().__init__()
+        self.kind = kind
+        self.model_id = model_id
+        self.model_name = model_name
+        self.use_stream = use_stream
+        self.http_server = HttpServer()
+        self.stop_event = threading.Event()
+        self.response = None # 当前事件流连接
+        self.last_data = None
+        self.last_status = None
+        # 任务进行中的模型状态，状态离开该值即视为任务结束
+        self.active_status = 1 if kind == "train_process" else INFERRING_STATUS
+
+    def stop(self):
+        """停止订阅（可在任意线程调用）"""
+        self.stop_event.set()
+        if self.response is not None:
+            try:
+                self.response.close()
+            except Exception:
+                pass
+
+    def shutdown(self):
+        """
+        在 GUI 线程停止订阅且不阻塞界面：断开信号，短暂等待线程退出；
+        线程仍阻塞在网络请求中时不再等待，由 finished 信号释放
+        """
+        self.stop()
+        with warnings.catch_warnings(): # 没有连接的信号断开时 PySide 会发出警告
+            warnings.simplefilter("ignore", RuntimeWarning)
+            for signal in (self.progress_signal, self.status_signal, self.error_signal):
+                try:
+                    signal.disconnect()
+                except (RuntimeError, TypeError):
+                    pass
+        if self.wait(self.SHUTDOWN_WAIT):
+            return
+        self.stopping.add(self)
+        self.finished.connect(self.release)
+        if self.isFinished(): # 连接前线程已退出
+            self.release()
+
+    def release(self):
+        """线程退出后释放引用"""
+        if self in self.stopping:
+            self.stopping.discard(self)
+            self.deleteLater()
+
+    def run(self):
+        if self.use_stream and self.subscribe_stream():
+            return
+        self.poll()
+
+    def subscribe_stream(self):
+        """
+        订阅事件流，任务正常结束返回 True；服务器不支持或连接中断返回 False（由调用者改为轮询）
+        """
+        server = (config.HOSTNAME, config.PORT)
+        if server in self.stream_unsupported:
+            return False
+        try:
+            def keep_response(response):
+                self.response = response
+            for event in self.http_server.stream_process(self.kind, self.model_id, on_response=keep_response):
+                if self.stop_event.is_set():
+                    return True
+                tracing.count(f"stream.{self.kind}.events")
+                self.publish(event.get("data"), event.get("status"))
+            # 服务器在任务结束后关闭连接
+            return self.stop_event.is_set() or (self.last_status is not None and self.last_status != self.active_status)
+        except Exception as e:
+            if self.stop_event.is_set():
+                return True
+            if self.response is None:
+                self.stream_unsupported.add(server)
+            logger.info(f"进度事件流不可用，改为轮询: {str(e)}")
+            return False
+        finally:
+            self.response = None
+
+    def poll(self):
+        """自适应轮询"""
+        etag = None
+        interval = self.MIN_INTERVAL
+        while not self.stop_event.is_set():
+            tick_start = time.perf_counter()
+            try:
+                data, etag = self.http_server.poll_process(self.kind, self.model_id, etag)
+                if data is not None and data != self.last_data:
+                    self.publish(data, None)
+                    interval = self.MIN_INTERVAL
+                else:
+                    # 进度不再变化时，任务可能已结束，此时才查询模型状态
+                    self.publish(None, self.http_server.get_model_status(self.model_name))
+                    interval = min(interval * 2, self.MAX_INTERVAL)
+            except Exception as e:
+                self.error_signal.emit(str(e))
+                interval = self.MAX_INTERVAL
+            tracing.record_span(f"poll.{self.kind}", tick_start, time.perf_counter(), cat="poll", args={"interval": interval})
+            self.stop_event.wait(interval)
+
+    def publish(self, data, status):
+        """只发送发生变化的进度和状态"""
+        if data is not None and data != self.last_data:
+            self.last_data = data
+            self.progress_signal.emit(data)
+        if status is not None and status != self.last_status:
+            self.last_status = status
+            self.status_signal.emit(status)
+
+
 class HttpDetectSamples:
     """
     使用HTTP服务器处理样本检测的类
@@ -1010,10 +649,19 @@ class HttpDetectSamples:
         self.ui = ui
         self.processed_files = set()  # 已处理的文件名集合
         self.http_server = HttpServer()
-        self.result_timer = None
+        self.subscriber = None # 推理进度订阅线程
+        self.infer_percentage = 0
+        self.image_list = []
         self.model_id = None
         self.group_id = None
         self.save_path = None  # 保存图片的路径
+        self.detect_group = None # 本次检测的样本组名
+        self.result_store = None # 检测结果库，结果到达即写入
+        self.on_results = None # 新结果回调 on_results(records)，用于更新界面中的得分索引
+        self.on_finished = None # 检测结束回调 on_finished(detect_group)，结果库已与本次检测一致
+        self.latest_combined = None # 最近一张提交合成的结果图路径，合成完成后显示
+        self.compositor = get_result_compositor()
+        self.compositor.composed.connect(self.on_composed)
 
     def disable_ui_controls(self):
         """禁用界面控件"""
@@ -1080,31 +728,32 @@ class HttpDetectSamples:
             
             # 清空已处理文件的记录
             self.processed_files.clear()
+            self.detect_group = config.DETECT_SAMPLE_GROUP
+            self.result_store = get_result_store()
                 
             # 启动推理
             infer_result = self.http_server.infer_model(self.model_id, self.group_id)
-            print(f"启动推理结果: {infer_result}")
+            logger.debug(f"启动推理结果: {infer_result}")
             
-            # 开始定时检查结果
-            self.result_timer = QTimer()
-            self.result_timer.timeout.connect(self.fetch_new_results)
-            self.result_timer.start(1000)  # 每秒检查一次
+            # 订阅推理进度，有新结果时才处理
+            self.infer_percentage = 0
+            self.image_list = []
+            self.subscriber = ProgressSubscriber("infer_process", self.model_id, config.MODEL_GROUP)
+            self.subscriber.progress_signal.connect(self.fetch_new_results)
+            self.subscriber.status_signal.connect(self.on_model_status)
+            self.subscriber.error_signal.connect(lambda e: logger.warning(f"获取检测结果失败: {e}"))
+            self.subscriber.start()
             
         except Exception as e:
             show_message_box("错误", f"启动检测失败: {str(e)}", QMessageBox.Critical)
-            print(f"启动检测失败: {str(e)}")
+            logger.error(f"启动检测失败: {str(e)}")
             self.enable_ui_controls()
 
-    def fetch_new_results(self):
-        """获取检测结果"""
+    @tracing.traced("detect.fetch_new_results", cat="poll")
+    def fetch_new_results(self, infer_process):
+        """处理订阅到的推理进度，下载并显示新的检测结果"""
         try:
-            if not self.model_id:
-                return
-                
-            # 获取推理实时信息
-            infer_process = self.http_server.infer_process(self.model_id)
-            print(f"infer_process: {infer_process}")
-            if not infer_process:
+            if not self.model_id or not infer_process:
                 return
             # 首次获取到推理信息，关闭加载动画
             if not self.has_infer_process:
@@ -1112,12 +761,13 @@ class HttpDetectSamples:
                 self.has_infer_process = True
             # 获取已推理的图像列表
             self.image_list = infer_process.get('have_infer_img_list', [])
+            new_records = []
             
             # 找出未处理的图像
             for img_info in self.image_list:
                 origin_name = img_info.get('img_filename') # 原图名
                 alias_name = img_info.get('result_name') # 服务器中结果图的别名前缀
-                print(f"alias_name: {alias_name}")
+                logger.debug(f"alias_name: {alias_name}")
                 if not alias_name or origin_name in self.processed_files:
                     continue
                 
@@ -1130,13 +780,11 @@ class HttpDetectSamples:
                     result_path = join_path(self.save_path, f"{base_name}_1.png")
                     heatmap_path = join_path(self.save_path, f"{base_name}_3.png")
                     
-                    # 显示原图，直接使用结果标签（最简单的方法）
                     if os.path.exists(result_path):
-                        # 合并三张图为一张图
-                        combined_pixmap = self.combine_images(original_path, result_path, heatmap_path)
-                        
-                        # 显示在原来的resultLabel上
-                        self.ui.resultLabel.setPixmap(combined_pixmap)
+                        # 在线程池中合并三张图为一张图，合成完成后显示在resultLabel上（见 on_composed）
+                        self.latest_combined = combined_path(self.save_path, base_name)
+                        self.compositor.submit(original_path, result_path, heatmap_path,
+                                               self.latest_combined, self.ui.resultLabel.size())
                         self.ui.resultLabel.setToolTip(f"检测结果保存在: {self.save_path}")
                         
                         # 显示检测信息
@@ -1155,167 +803,77 @@ class HttpDetectSamples:
                         self.ui.resultBrowser.append(f"<b>检测状态:</b> <font color='{status_color}'>{status_text}</font>")
                         self.ui.resultBrowser.append(f"<b>保存位置:</b> {self.save_path}")
                     else:
-                        print(f"结果图 {result_path} 不存在")
+                        logger.warning(f"结果图 {result_path} 不存在")
                     
                     # 标记为已处理
                     self.processed_files.add(origin_name)
+                    new_records.append(self.to_record(img_info))
                     
                 except Exception as e:
-                    print(f"处理图片结果失败: {str(e)}")
+                    logger.error(f"处理图片结果失败: {str(e)}")
+            
+            # 本次新到达的结果一次性写入结果库
+            self.result_store.upsert(self.detect_group, new_records)
+            if new_records and self.on_results:
+                self.on_results(new_records)
             
-            # 检查推理是否已完成
-            infer_percentage = infer_process.get('inferPercentage', 0)
-            if infer_percentage >= 1.0:
-                # 检查模型状态
-                model_status = self.http_server.get_model_status(config.MODEL_GROUP)
-                if model_status != 3:  # 不再是推理中状态
-                    self.end_detection("检测已完成")
+            # 记录推理进度，完成与否由模型状态决定
+            self.infer_percentage = infer_process.get('inferPercentage', 0)
+            if self.subscriber and self.subscriber.last_status is not None:
+                self.on_model_status(self.subscriber.last_status)
                     
         except Exception as e:
-            print(f"获取检测结果失败: {str(e)}")
+            logger.error(f"获取检测结果失败: {str(e)}")
+
+    def on_composed(self, path, image):
+        """合成图完成：检测过程中只显示最近一张结果"""
+        if path == self.latest_combined:
+            self.ui.resultLabel.setPixmap(QPixmap.fromImage(image))
+
+    def on_model_status(self, model_status):
+        """模型状态变化：推理进度已满且不再是推理中状态时结束检测"""
+        if self.model_id and inference_finished(self.infer_percentage, model_status):
+            self.end_detection("检测已完成")
 
     def end_detection(self, message="检测已完成"):
         """结束检测过程"""
-        if self.result_timer:
-            self.result_timer.stop()
-            self.result_timer = None
+        if self.subscriber:
+            self.subscriber.shutdown()
+            self.subscriber = None
             
         # 启用界面控件
         self.enable_ui_controls()
         
         show_message_box("提示", message, QMessageBox.Information)
 
-        # 将 image_list 存入本地
-        result = []
-        for image_info in self.image_list:
-            # 获取得分
-            score = image_info.get('score', 0)
-            if isinstance(score, str):
-                try:
-                    score = float(score)
-                except:
-                    score = 0.0
-            
-            # 使用配置的阈值判断是否异常
-            is_defect = score > config.DEFECT_THRESHOLD
-            status = "异常" if is_defect else "正常"
-            
-            result.append({
-                'file_name': image_info.get('img_filename'),
-                'score': score,
-                'status': status,
-                'alias_name': image_info.get('result_name'),
-                'origin_name': image_info.get('img_filename').split('-')[-1]
-            })
-        
-        config.DETECT_LIST = result
-        
-        # 保存结果到JSON文件
-        with open(join_path(self.save_path, "detect_list.json"), "w") as f:
-            json.dump(result, f, ensure_ascii=False, indent=4)
+        # 结果已在到达时逐条写入结果库，这里补写下载失败而未记录的图片
+        records = [self.to_record(image_info) for image_info in self.image_list
+                   if image_info.get('result_name') and image_info.get('img_filename') not in self.processed_files]
+        self.result_store.upsert(self.detect_group, records)
+        # 删除不在本次检测中的旧记录（组外删除的图片、同名重建的样本组），结果库与本次检测一致
+        current_names = {local_name(image_info['img_filename']) for image_info in self.image_list
+                         if image_info.get('img_filename')}
+        stale_names = self.result_store.origin_names(self.detect_group) - current_names
+        if stale_names:
+            self.result_store.delete(self.detect_group, stale_names)
+            logger.debug(f"删除 {len(stale_names)} 条过期检测记录: {self.detect_group}")
+        if self.on_finished:
+            self.on_finished(self.detect_group)
 
         # 清理
         self.model_id = None
         self.group_id = None
 
-    def combine_images(self, original_path, result_path, heatmap_path):
-        """
-        将三张图像水平合并为一张图像
-        总宽度适应resultLabel宽度，高度按等比例缩放
-        并保存合并后的图像
-        """
-        # 获取resultLabel的宽度
-        label_width = self.ui.resultLabel.width()
-        
-        # 加载三张图像
-        pixmaps = []
-        titles = ["原图", "检测结果", "热力图"]
-        paths = [original_path, result_path, heatmap_path]
-        
-        # 首先加载所有图像
-        for path in paths:
-            if os.path.exists(path):
-                pixmap = QPixmap(path)
-                if pixmap.isNull():
-                    # 如果图像加载失败，创建一个空白图像
-                    pixmap = QPixmap(200, 200)
-                    pixmap.fill(Qt.white)
-            else:
-                # 如果图像不存在，创建一个空白图像
-                pixmap = QPixmap(200, 200)
-                pixmap.fill(Qt.white)
-            
-            pixmaps.append(pixmap)
-        
-        # 确定每张图像在合并后的宽度比例(相同比例)
-        single_width = label_width // 3
-        
-        # 计算每张图像的缩放比例和最终高度
-        max_height = 0
-        scaled_pixmaps = []
-        
-        for pixmap in pixmaps:
-            if pixmap.width() > 0:  # 避免除以零错误
-                # 计算按宽度缩放的比例
-                scale_factor = single_width / pixmap.width()
-                # 计算缩放后的高度
-                scaled_height = int(pixmap.height() * scale_factor)
-                # 缩放图像
-                scaled_pixmap = pixmap.scaled(
-                    single_width, scaled_height, 
-                    Qt.KeepAspectRatio, Qt.SmoothTransformation
-                )
-                max_height = max(max_height, scaled_pixmap.height())
-            else:
-                scaled_pixmap = pixmap
-            
-            scaled_pixmaps.append(scaled_pixmap)
-        
-        # 创建一个足够大的图像来容纳所有图像和标题
-        TITLE_HEIGHT = 30  # 标题高度
-        result = QPixmap(label_width, max_height + TITLE_HEIGHT)
-        result.fill(Qt.white)  # 设置白色背景
-        
-        # 创建画师
-        painter = QPainter(result)
-        # 设置字体
-        font = QFont()
-        font.setBold(True)
-        font.setPointSize(12)
-        painter.setFont(font)
-        
-        # 绘制所有图像和标题
-        x_offset = 0
-        for i, pixmap in enumerate(scaled_pixmaps):
-            # 计算每个图像的宽度
-            img_width = single_width
-            
-            # 绘制标题
-            painter.drawText(
-                x_offset, 0, img_width, TITLE_HEIGHT, 
-                Qt.AlignCenter, titles[i]
-            )
-            
-            # 垂直居中绘制图像
-            y_offset = TITLE_HEIGHT + (max_height - pixmap.height()) // 2
-            painter.drawPixmap(x_offset, y_offset, pixmap)
-            
-            # 更新x偏移
-            x_offset += img_width
-        
-        # 完成绘制
-        painter.end()
-        
-        # 保存合并后的图像
-        result_file_path = ''
-        if original_path:
-            # 从原图路径提取文件名
-            base_name = os.path.splitext(os.path.basename(original_path))[0]
-            result_file_path = join_path(self.save_path, f"{base_name}_combined.png")
-            result.save(result_file_path, "PNG")
-            print(f"保存合并图像: {result_file_path}")
-        
-        return result
+    def to_record(self, image_info):
+        """推理信息 -> 检测结果记录"""
+        score = to_score(image_info.get('score', 0))
+        return {
+            'file_name': image_info.get('img_filename'),
+            'score': score,
+            'status': status_of(score),
+            'alias_name': image_info.get('result_name'),
+            'origin_name': local_name(image_info.get('img_filename'))
+        }
 
 if __name__ == "__main__":
     # test_sample_api()
@@ -0,0 +1,214 @@
+"""
+样本图片导入
+
+导入在线程池中并行进行，每个文件独立完成，进度逐个回调：
+    链接    不转换的图片优先创建硬链接（不复制数据，同一磁盘内几乎不耗时），跨磁盘或源文件只读时退回复制；
+            样本编辑不再改写原图（见 edit_stack），硬链接不会影响源文件
+    复制    shutil.copyfile（Linux 上为内核内复制），不再逐个修改文件权限
+    转换    HEIC / RAW / PSD 等格式，或选择了统一格式、缩小尺寸时，解码一次、缩小、编码一次；
+            缩小只缩不放，并保持宽高比，使宽、高都不小于模型输入尺寸（服务器缩放到输入尺寸时不会放大）
+导入的图片不覆盖样本组中已有的同名图片（编辑记录、渲染缓存按文件名关联），重名时在文件名后加序号
+HEIC 需要 pillow-heif，相机 RAW 需要 rawpy，PSD 需要 Pillow，均为可选依赖，只在导入这些格式时才加载
+
+本模块不依赖 Qt
+"""
+import importlib
+import logging
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+import tracing
+from edit_stack import read_image, write_image
+from lazy_import import lazy_import
+from path_utils import is_image, join_path, needs_transcode
+
+cv2 = lazy_import("cv2")
+logger = logging.getLogger(__name__)
+
+HEIF_EXTENSIONS = ('.heic', '.heif')
+RAW_EXTENSIONS = ('.raw', '.cr2', '.nef', '.arw', '.dng')
+TRANSCODE_FORMAT = "png" # 需要转换、但未指定统一格式时使用的格式（无损）
+OUTPUT_FORMATS = ("png", "jpg") # 可选的统一格式
+
+_name_lock = threading.Lock()
+
+
+def _optional(module_name, feature):
+    """导入可选依赖，未安装时给出需要安装的包"""
+    try:
+        return importlib.import_module(module_name)
+    except ImportError:
+        raise RuntimeError(f"导入{feature}需要安装 {module_name.split('.')[0].replace('_', '-')}") from None
+
+
+def decode(path):
+    """
+    解码图片为 BGR ndarray（8 位），支持可选依赖提供的格式；失败时抛出异常
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext in HEIF_EXTENSIONS:
+        pillow_heif = _optional("pillow_heif", " HEIC 图片")
+        heif = pillow_heif.open_heif(path, convert_hdr_to_8bit=True)
+        image = cv2.cvtColor(np.asarray(heif), cv2.COLOR_RGBA2BGR if heif.has_alpha else cv2.COLOR_RGB2BGR)
+    elif ext in RAW_EXTENSIONS:
+        rawpy = _optional("rawpy", "相机 RAW 图片")
+        with rawpy.imread(path) as raw:
+            image = cv2.cvtColor(raw.postprocess(use_camera_wb=True), cv2.COLOR_RGB2BGR)
+    elif ext in ('.psd', '.dpx'):
+        pil_image = _optional("PIL.Image", " PSD / DPX 图片")
+        with pil_image.open(path) as source:
+            image = cv2.cvtColor(np.asarray(source.convert("RGB")), cv2.COLOR_RGB2BGR)
+    else:
+        image = read_image(path, cv2.IMREAD_COLOR) # 同时按 EXIF 方向旋转
+    if image is None:
+        raise RuntimeError("无法解码图片")
+    return image
+
+
+def is_importable(file_name):
+    """可以导入的图片：可以直接读取的，或导入时转换格式的"""
+    return is_image(file_name) or needs_transcode(file_name)
+
+
+def fit_size(width, height, min_width, min_height):
+    """
+    保持宽高比缩小到宽、高分别不小于 (min_width, min_height) 的最小尺寸；已经足够小时不缩放
+    """
+    scale = max(min_width / width, min_height / height)
+    if scale >= 1:
+        return width, height
+    return max(min_width, round(width * scale)), max(min_height, round(height * scale))
+
+
+class ImportOptions:
+    """
+    导入选项
+
+    Attributes:
+        link: 不转换的图片是否优先使用硬链接
+        image_format: 统一转换的格式 "png" / "jpg"，None 表示保持原格式（只转换无法直接读取的格式）
+        target_size: 缩小到的模型输入尺寸 (input_w, input_h)，None 表示不缩小
+    """
+    def __init__(self, link=True, image_format=None, target_size=None):
+        self.link = link
+        self.image_format = image_format
+        self.target_size = tuple(target_size) if target_size else None
+
+    def to_dict(self):
+        return {"link": self.link, "image_format": self.image_format,
+                "target_size": list(self.target_size) if self.target_size else None}
+
+    @classmethod
+    def from_dict(cls, data):
+        data = data or {}
+        return cls(data.get("link", True), data.get("image_format"), data.get("target_size"))
+
+
+def _unique_name(name, reserved):
+    """
+    目标目录中不重名的文件名：不覆盖样本组中已有的图片（其编辑记录、渲染缓存都按文件名关联），
+    同一批导入转换后扩展名相同的文件也不会互相覆盖；reserved 为已占用的小写文件名集合
+    """
+    base, ext = os.path.splitext(name)
+    candidate, index = name, 1
+    with _name_lock:
+        while candidate.lower() in reserved:
+            candidate = f"{base}_{index}{ext}"
+            index += 1
+        reserved.add(candidate.lower())
+    return candidate
+
+
+def _link_or_copy(source, dest, link):
+    """创建硬链接，失败（跨磁盘、不支持、源文件只读）时复制；返回 "link" / "copy" """
+    if link and os.access(source, os.W_OK):
+        try:
+            os.link(source, dest)
+            return "link"
+        except OSError:
+            pass
+    shutil.copyfile(source, dest)
+    return "copy"
+
+
+def _needs_conversion(name, options):
+    """是否需要解码后重新编码：无法直接读取的格式、需要缩小、或与统一格式不同"""
+    if needs_transcode(name) or options.target_size is not None:
+        return True
+    ext = os.path.splitext(name)[1].lower().lstrip(".")
+    return options.image_format is not None and ext not in (options.image_format, "jpeg" if options.image_format == "jpg" else None)
+
+
+def _transcode(source, dest, options):
+    """解码、缩小、编码；图片已足够小且格式相同时不重新编码，直接链接或复制"""
+    image = decode(source)
+    resized = False
+    if options.target_size:
+        height, width = image.shape[:2]
+        size = fit_size(width, height, *options.target_size)
+        if size != (width, height):
+            image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+            resized = True
+    same_format = os.path.splitext(source)[1].lower() == os.path.splitext(dest)[1].lower()
+    if not resized and same_format and not needs_transcode(source):
+        return "linked" if _link_or_copy(source, dest, options.link) == "link" else "copied"
+    write_image(dest, image)
+    return "transcoded"
+
+
+@tracing.traced("sample.import_images", cat="io")
+def import_images(sources, dest_folder, options=None, workers=None, progress=None):
+    """
+    并行导入图片
+
+    Args:
+        sources: 源图片路径列表（无法导入的文件会被跳过）
+        dest_folder: 目标样本组目录
+        options: ImportOptions
+        workers: 线程数，默认按 CPU 数
+        progress: 进度回调 progress(已完成数, 总数, 源路径)
+
+    Returns:
+        {"imported": [目标文件名], "linked": 数, "copied": 数, "transcoded": 数, "failed": [(源路径, 错误)]}
+    """
+    options = options or ImportOptions()
+    sources = [source for source in sources if is_importable(os.path.basename(source))]
+    workers = workers or min(16, (os.cpu_count() or 1) * 2) # 复制主要受磁盘限制，线程数可多于 CPU 数
+    os.makedirs(dest_folder, exist_ok=True)
+    reserved = {name.lower() for name in os.listdir(dest_folder)}
+    result = {"imported": [], "linked": 0, "copied": 0, "transcoded": 0, "failed": []}
+
+    def import_one(source):
+        name = os.path.basename(source)
+        transcode = _needs_conversion(name, options)
+        existing = join_path(dest_folder, name)
+        if not transcode and os.path.exists(existing) and os.path.samefile(source, existing):
+            return name, "linked" # 源文件已在样本组中
+        if transcode:
+            base, ext = os.path.splitext(name)
+            image_format = options.image_format or (TRANSCODE_FORMAT if needs_transcode(name) else ext.lstrip("."))
+            name = f"{base}.{image_format}"
+        name = _unique_name(name, reserved)
+        dest = join_path(dest_folder, name)
+        if transcode:
+            return name, _transcode(source, dest, options)
+        return name, "linked" if _link_or_copy(source, dest, options.link) == "link" else "copied"
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="import") as executor:
+        futures = {executor.submit(import_one, source): source for source in sources}
+        for done, future in enumerate(as_completed(futures), 1):
+            source = futures[future]
+            try:
+                name, kind = future.result()
+                result["imported"].append(name)
+                result[kind] += 1
+            except Exception as e:
+                logger.warning(f"导入图片失败: {source}: {str(e)}")
+                result["failed"].append((source, str(e)))
+            if progress:
+                progress(done, len(sources), source)
+    return result
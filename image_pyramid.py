@@ -0,0 +1,279 @@
+"""
+图像金字塔与分块显示（样本编辑区）
+
+大图（2000 万像素以上）整张绘制时，每次缩放、旋转都要变换全分辨率图像。这里改为：
+    - 后台线程解码原图并逐级缩小一半生成多级图像（mip），缩小的各级切成 TILE_SIZE 的分块（QImage），
+      原分辨率一级不另存分块，绘制时才从原图截取
+    - 视图绘制时按当前缩放比例选择最接近的一级，只绘制可见区域内的分块，分块转为 QPixmap 后缓存
+    - 最近打开的几张图片的金字塔按 (路径, 修改时间) 缓存，来回切换样本无需重新构建
+图像项的坐标始终为原图像素坐标，裁剪、保存仍使用原分辨率图像
+"""
+import logging
+import math
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PySide6.QtCore import QRect, QRectF, QSize, Qt, Signal
+from PySide6.QtGui import QColor, QImage, QImageReader, QPainter, QPixmap
+from PySide6.QtWidgets import QGraphicsItem, QGraphicsObject, QStyleOptionGraphicsItem
+
+import tracing
+
+logger = logging.getLogger(__name__)
+
+TILE_SIZE = 256 # 分块边长（像素）
+MIN_LEVEL_SIZE = 256 # 最小一级图像的长边不小于该值
+PYRAMID_CACHE_SIZE = 3 # 缓存的金字塔数量（每个约为原图解码后大小的 4/3）
+TILE_CACHE_SIZE = 256 # 每个图像项缓存的分块 QPixmap 数量
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="pyramid")
+_pyramid_cache = OrderedDict() # {(路径, 修改时间): ImagePyramid}
+_cache_lock = threading.Lock()
+
+
+class ImagePyramid:
+    """
+    一张图像的多级分块：第 0 级为原分辨率，之后每级宽高减半
+
+    第 0 级的分块按需从原图 image 截取，只有缩小的各级另存分块，总内存约为原图解码后大小的 4/3
+    """
+    def __init__(self, image):
+        if image.format() not in (QImage.Format_RGB32, QImage.Format_ARGB32_Premultiplied):
+            image = image.convertToFormat(QImage.Format_ARGB32_Premultiplied if image.hasAlphaChannel()
+                                          else QImage.Format_RGB32)
+        self.image = image # 原分辨率图像（第 0 级分块、裁剪、保存使用）
+        self.levels = [None] # [{(列, 行): QImage}]，第 0 级不保存分块
+        level_image = image
+        while max(level_image.width(), level_image.height()) > MIN_LEVEL_SIZE * 2:
+            level_image = level_image.scaled(max(level_image.width() // 2, 1), max(level_image.height() // 2, 1),
+                                             Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+            self.levels.append(self._split(level_image))
+
+    @staticmethod
+    def _split(image):
+        tiles = {}
+        for row in range(math.ceil(image.height() / TILE_SIZE)):
+            for col in range(math.ceil(image.width() / TILE_SIZE)):
+                x, y = col * TILE_SIZE, row * TILE_SIZE
+                tiles[(col, row)] = image.copy(x, y, min(TILE_SIZE, image.width() - x), min(TILE_SIZE, image.height() - y))
+        return tiles
+
+    def tile(self, level, col, row):
+        """第 level 级 (列, 行) 处的分块，超出图像范围时返回 None"""
+        if level > 0:
+            return self.levels[level].get((col, row))
+        x, y = col * TILE_SIZE, row * TILE_SIZE
+        if col < 0 or row < 0 or x >= self.image.width() or y >= self.image.height():
+            return None
+        return self.image.copy(x, y, min(TILE_SIZE, self.image.width() - x), min(TILE_SIZE, self.image.height() - y))
+
+    def size(self):
+        return self.image.size()
+
+
+@tracing.traced("sample.build_pyramid", cat="image")
+def build_pyramid(source):
+    """由图片路径或 QImage 构建金字塔，读取失败时返回 None"""
+    image = QImageReader(source).read() if isinstance(source, str) else source
+    if image.isNull():
+        return None
+    return ImagePyramid(image)
+
+
+def _cache_key(path):
+    try:
+        return path, os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+def cached_pyramid(path):
+    """已缓存的金字塔，没有时返回 None"""
+    key = _cache_key(path)
+    with _cache_lock:
+        pyramid = _pyramid_cache.get(key)
+        if pyramid is not None:
+            _pyramid_cache.move_to_end(key)
+        return pyramid
+
+
+def _load_pyramid(path):
+    pyramid = cached_pyramid(path)
+    if pyramid is None:
+        pyramid = build_pyramid(path)
+        key = _cache_key(path)
+        if pyramid is not None and key is not None:
+            with _cache_lock:
+                _pyramid_cache[key] = pyramid
+                while len(_pyramid_cache) > PYRAMID_CACHE_SIZE:
+                    _pyramid_cache.popitem(last=False)
+    return pyramid
+
+
+class TiledImageItem(QGraphicsObject):
+    """
+    分块绘制的图像项，可替代 QGraphicsPixmapItem 显示任意尺寸的图像
+
+    创建后立即按图片头信息确定尺寸（视图可以马上 fitInView），金字塔在后台构建完成后再绘制；
+    裁剪只设置显示区域 clip（原图坐标），不复制图像，也不重建金字塔
+    """
+    pyramid_ready = Signal(object) # 后台构建完成（跨线程，排队到界面线程）
+
+    def __init__(self, source=None, parent=None):
+        """
+        Args:
+            source: 图片路径或 QImage
+        """
+        super().__init__(parent)
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption) # 绘制时提供可见区域 exposedRect
+        self.pyramid = None
+        self.source = None
+        self.image_size = QSize()
+        self.clip = None # 显示区域（原图坐标），None 表示整张图
+        self.tile_cache = OrderedDict() # {(级别, 列, 行): QPixmap}
+        self.generation = 0 # 每次设置新图像加一，丢弃过期的后台结果
+        self.pyramid_ready.connect(self._on_pyramid_ready)
+        if source is not None:
+            self.set_source(source)
+
+    # -------------------- 图像 --------------------
+    def set_source(self, source):
+        """设置图片路径或 QImage，金字塔在后台线程中构建（已缓存时立即使用）"""
+        self.generation += 1
+        generation = self.generation
+        self.source = source
+        if isinstance(source, str):
+            size = QImageReader(source).size()
+            pyramid = cached_pyramid(source)
+            task = lambda: _load_pyramid(source)
+        else:
+            size = source.size()
+            pyramid = None
+            task = lambda: build_pyramid(source)
+        self.prepareGeometryChange()
+        self.image_size = size if size.isValid() else QSize()
+        self.clip = None
+        self.tile_cache.clear()
+        self.pyramid = pyramid
+        if pyramid is None:
+            _executor.submit(self._build, task, generation)
+        self.update()
+
+    def _build(self, task, generation):
+        try:
+            pyramid = task()
+            self.pyramid_ready.emit((generation, pyramid))
+        except RuntimeError:
+            pass # 构建完成前图像项已被删除
+        except Exception as e:
+            logger.error(f"构建图像金字塔失败: {str(e)}")
+
+    def _on_pyramid_ready(self, result):
+        generation, pyramid = result
+        if generation != self.generation:
+            return
+        if pyramid is None:
+            logger.warning("读取图片失败，无法显示")
+            return
+        if pyramid.size() != self.image_size:
+            self.prepareGeometryChange()
+            self.image_size = pyramid.size()
+        self.pyramid = pyramid
+        self.tile_cache.clear()
+        self.update()
+
+    def is_ready(self):
+        return self.pyramid is not None
+
+    def width(self):
+        return self.image_size.width()
+
+    def height(self):
+        return self.image_size.height()
+
+    def full_image(self):
+        """整张原分辨率图像，金字塔尚未构建完成时直接读取原图"""
+        if self.pyramid is not None:
+            return self.pyramid.image
+        if isinstance(self.source, QImage):
+            return self.source
+        return QImageReader(self.source).read() if self.source else QImage()
+
+    def image(self):
+        """当前显示区域的原分辨率图像（保存使用）"""
+        image = self.full_image()
+        return image.copy(self.clip) if self.clip is not None else image
+
+    def set_clip(self, rect):
+        """
+        设置显示区域（原图坐标），None 表示整张图
+
+        Returns:
+            实际的显示区域 QRect（与图像范围取交集）
+        """
+        self.prepareGeometryChange()
+        full = QRect(0, 0, self.image_size.width(), self.image_size.height())
+        self.clip = None if rect is None else QRect(rect).intersected(full)
+        self.update()
+        return self.clip
+
+    def clone(self, clip=None):
+        """共享同一金字塔的图像项（用于裁剪预览）"""
+        item = TiledImageItem()
+        item.source = self.source
+        item.image_size = QSize(self.image_size)
+        if self.pyramid is not None:
+            item.pyramid = self.pyramid
+        elif self.source is not None:
+            item.set_source(self.source)
+        item.set_clip(clip)
+        return item
+
+    # -------------------- 绘制 --------------------
+    def boundingRect(self):
+        if self.clip is not None:
+            return QRectF(self.clip)
+        return QRectF(0, 0, self.image_size.width(), self.image_size.height())
+
+    def paint(self, painter, option, widget=None):
+        if self.pyramid is None:
+            painter.fillRect(self.boundingRect(), QColor(240, 240, 240)) # 加载中的占位
+            return
+        # 屏幕上 1 个像素对应的原图像素数，决定使用哪一级
+        lod = QStyleOptionGraphicsItem.levelOfDetailFromTransform(painter.worldTransform())
+        level = 0 if lod >= 1 else min(int(math.log2(1 / lod)), len(self.pyramid.levels) - 1)
+        factor = 1 << level # 该级 1 个像素对应的原图像素数
+        tile_span = TILE_SIZE * factor # 该级分块在原图坐标中的边长
+        exposed = option.exposedRect.intersected(self.boundingRect())
+        if exposed.isEmpty():
+            return
+        painter.setRenderHint(QPainter.SmoothPixmapTransform, lod < 4)
+        if self.clip is not None:
+            painter.setClipRect(self.boundingRect(), Qt.IntersectClip)
+        first_col, last_col = int(exposed.left() // tile_span), int(math.ceil(exposed.right() / tile_span))
+        first_row, last_row = int(exposed.top() // tile_span), int(math.ceil(exposed.bottom() / tile_span))
+        for row in range(first_row, last_row):
+            for col in range(first_col, last_col):
+                pixmap = self._tile_pixmap(level, col, row)
+                if pixmap is None:
+                    continue
+                target = QRectF(col * tile_span, row * tile_span, pixmap.width() * factor, pixmap.height() * factor)
+                painter.drawPixmap(target, pixmap, QRectF(pixmap.rect()))
+
+    def _tile_pixmap(self, level, col, row):
+        """分块的 QPixmap（界面线程中创建并缓存），超出图像范围时返回 None"""
+        key = (level, col, row)
+        pixmap = self.tile_cache.get(key)
+        if pixmap is None:
+            tile = self.pyramid.tile(level, col, row)
+            if tile is None:
+                return None
+            pixmap = QPixmap.fromImage(tile)
+            self.tile_cache[key] = pixmap
+            while len(self.tile_cache) > TILE_CACHE_SIZE:
+                self.tile_cache.popitem(last=False)
+        else:
+            self.tile_cache.move_to_end(key)
+        return pixmap
@@ -0,0 +1,79 @@
+import importlib
+import sys
+import threading
+import types
+
+
+# 启动后在后台线程中预热的重量级模块（只预热与 GUI 线程无关的模块）
+WARM_UP_MODULES = [
+    "cv2",
+    "numpy",
+    "requests",
+    "matplotlib",
+    "sklearn.cluster",
+    "reportlab.platypus",
+]
+
+
+class LazyModule(types.ModuleType):
+    """
+    模块代理：第一次访问属性时才真正导入模块，之后直接转发到真实模块
+    """
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__["_lazy_module"] = None
+
+    def _load(self):
+        module = self.__dict__["_lazy_module"]
+        if module is None:
+            module = importlib.import_module(self.__name__)
+            self.__dict__["_lazy_module"] = module
+        return module
+
+    def __getattr__(self, item):
+        return getattr(self._load(), item)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__["_lazy_module"] is not None else "not loaded"
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+
+def lazy_import(name):
+    """
+    延迟导入模块，用法: cv2 = lazy_import("cv2")
+
+    如果模块已被导入，直接返回真实模块
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name)
+
+
+def warm_up_modules(names=None, on_done=None):
+    """
+    在后台守护线程中预先导入重量级模块，使功能第一次使用时不再卡顿
+
+    Args:
+        names: 需要预热的模块名列表，默认为 WARM_UP_MODULES
+        on_done: 预热完成后的回调（在后台线程中调用）
+
+    Returns:
+        预热线程
+    """
+    names = WARM_UP_MODULES if names is None else names
+
+    def run():
+        for name in names:
+            try:
+                importlib.import_module(name)
+            except Exception as e:
+                print(f"预热模块失败: {name}: {str(e)}")
+        if on_done:
+            on_done()
+
+    thread = threading.Thread(target=run, name="module-warm-up", daemon=True)
+    thread.start()
+    return thread
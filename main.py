@@ -8,6 +8,7 @@ from model_handler import ModelHandler
 from sample_handler import SampleHandler
 from utils import FloatingTimer, join_path, WatermarkWidget
 from http_server import is_sample_group_uploaded
+from trace_panel import install_trace_tools
 
 
 class MainWindow(QMainWindow):
@@ -65,6 +66,9 @@ class MainWindow(QMainWindow):
         self.watermark.resize(self.ui.size())
         self.watermark.raise_()  # 确保在最上层
 
+        # 启用追踪时安装卡顿监测和统计面板（Ctrl+Shift+T）
+        install_trace_tools(self.ui)
+
 
     def on_tab_changed(self, index):
         """
@@ -0,0 +1,701 @@
+"""
+本地模拟推理服务器：实现 todo.md 中列出的全部接口（样本组、样本、模型、训练/推理进度、结果图、大模型推理），
+用于在没有 GPU 服务器时离线测试和压测 HttpServer、UploadSampleGroup_HTTP、HttpDetectSamples、TrainingProgressDialog
+
+可配置网络延迟、带宽、错误率，结果热图由程序合成（只依赖标准库）
+
+用法:
+    python mock_server.py --port 20060 --latency 0.05 --bandwidth 10000000 --error-rate 0.01
+    然后将 config.HOSTNAME 设为 127.0.0.1（或调用 use_mock_server()）
+"""
+import argparse
+import json
+import math
+import os
+import random
+import struct
+import threading
+import time
+import uuid
+import zlib
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+# -------------------- 合成图片 --------------------
+def encode_png(width, height, rows):
+    """
+    将 RGB 像素行编码为 PNG
+
+    Args:
+        rows: 每行 width * 3 字节的 bytes 列表
+    """
+    raw = b"".join(b"\x00" + row for row in rows)
+
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw, 6)) + chunk(b"IEND", b"")
+
+
+def _jet(v):
+    """0~1 映射为 jet 色带 (r, g, b)"""
+    r = min(max(1.5 - abs(4 * v - 3), 0), 1)
+    g = min(max(1.5 - abs(4 * v - 2), 0), 1)
+    b = min(max(1.5 - abs(4 * v - 1), 0), 1)
+    return int(r * 255), int(g * 255), int(b * 255)
+
+
+JET_LUT = [bytes(_jet(i / 255)) for i in range(256)]
+
+
+def synthetic_anomaly_map(name, score, size):
+    """
+    根据图片名生成确定性的异常强度图（0~255），得分越高热点越强
+
+    Returns:
+        size * size 的强度值列表（按行展开）
+    """
+    rng = random.Random(zlib.crc32(name.encode("utf-8")))
+    cx, cy = rng.uniform(0.2, 0.8) * size, rng.uniform(0.2, 0.8) * size
+    sigma = rng.uniform(0.05, 0.15) * size
+    peak = min(max(score + 0.5, 0.05), 1.0)
+    inv = 1.0 / (2 * sigma * sigma)
+    gx = [math.exp(-(x - cx) ** 2 * inv) for x in range(size)]
+    values = []
+    for y in range(size):
+        wy = math.exp(-(y - cy) ** 2 * inv) * peak * 255
+        values.extend(int(wy * g) for g in gx)
+    return values
+
+
+def synthetic_result_image(name, score, suffix, size):
+    """
+    合成五种结果图: _0 前景分割图, _1/_2 结果图, _3/_4 异常图
+    """
+    if suffix == 0:
+        # 前景为去掉 10% 边框的矩形区域
+        margin = size // 10
+        inner = b"\x00\x00\x00" * margin + b"\xff\xff\xff" * (size - 2 * margin) + b"\x00\x00\x00" * margin
+        rows = [inner if margin <= y < size - margin else b"\x00\x00\x00" * size for y in range(size)]
+        return encode_png(size, size, rows)
+    values = synthetic_anomaly_map(name, score, size)
+    rows = []
+    for y in range(size):
+        line = values[y * size:(y + 1) * size]
+        if suffix in (1, 2):
+            # 灰色背景上叠加红色热点
+            row = b"".join(bytes((min(128 + v, 255), max(128 - v // 2, 0), max(128 - v // 2, 0))) for v in line)
+        else:
+            row = b"".join(JET_LUT[v] for v in line)
+        rows.append(row)
+    return encode_png(size, size, rows)
+
+
+def synthetic_sample_image(index, size=64):
+    """合成一张样本图（用于压测时批量生成上传数据）"""
+    rng = random.Random(index)
+    base = rng.randint(60, 200)
+    rows = [bytes(base + (x * y + index) % 40 for x in range(size) for _ in range(3)) for y in range(size)]
+    return encode_png(size, size, rows)
+
+
+def write_sample_images(folder, count, size=64):
+    """在目录中生成 count 张样本图，返回文件路径列表"""
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for i in range(count):
+        path = os.path.join(folder, f"sample_{i:05d}.png")
+        with open(path, "wb") as f:
+            f.write(synthetic_sample_image(i, size))
+        paths.append(path)
+    return paths
+
+
+# -------------------- 服务器状态 --------------------
+class MockState:
+    """
+    模拟服务器的状态：样本组、样本文件、模型以及按时间推进的训练 / 推理过程
+    """
+    def __init__(self, epoch_interval=0.2, total_epochs=50, infer_interval=0.1,
+                 latency=0.0, jitter=0.0, bandwidth=None, error_rate=0.0, heatmap_size=224, seed=None):
+        """
+        Args:
+            epoch_interval: 每轮训练耗时（秒）
+            total_epochs: 训练总轮数
+            infer_interval: 每张图推理耗时（秒）
+            latency: 每个请求的固定延迟（秒）
+            jitter: 延迟的随机抖动上限（秒）
+            bandwidth: 上下行带宽限制（字节/秒），None 表示不限
+            error_rate: 随机返回 500 错误的概率（事件流除外）
+            heatmap_size: 合成结果图的边长
+            seed: 随机种子（错误注入和抖动）
+        """
+        self.epoch_interval = epoch_interval
+        self.total_epochs = total_epochs
+        self.infer_interval = infer_interval
+        self.latency = latency
+        self.jitter = jitter
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.heatmap_size = heatmap_size
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock) # 状态变化时通知事件流
+        self.groups = {} # {group_id: {"id", "group_name"}}
+        self.group_files = {} # {group_id: [服务器文件名]}
+        self.files = {} # {服务器文件名: 图片内容}
+        self.results = {} # {结果图别名前缀: (原图名, 得分)}
+        self.models = {} # {model_id: 模型信息}
+        self.next_group_id = 1
+        self.next_model_id = 1
+        self.stats = {} # {接口: {"count", "errors", "bytes_in", "bytes_out", "seconds"}}
+
+    # -------------------- 统计 --------------------
+    def record(self, endpoint, bytes_in, bytes_out, seconds, error=False):
+        with self.lock:
+            item = self.stats.setdefault(endpoint, {"count": 0, "errors": 0, "bytes_in": 0, "bytes_out": 0, "seconds": 0.0})
+            item["count"] += 1
+            item["errors"] += int(error)
+            item["bytes_in"] += bytes_in
+            item["bytes_out"] += bytes_out
+            item["seconds"] += seconds
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats = {}
+
+    # -------------------- 样本组 --------------------
+    def add_group(self, group_name):
+        with self.lock:
+            group_id = self.next_group_id
+            self.next_group_id += 1
+            self.groups[group_id] = {"id": group_id, "group_name": group_name}
+            self.group_files[group_id] = []
+            return group_id
+
+    def delete_group(self, group_id):
+        with self.lock:
+            self.groups.pop(group_id)
+            self.group_files.pop(group_id, None)
+
+    def clear_group(self, group_id):
+        with self.lock:
+            self.group_files[group_id] = []
+
+    def get_group_list(self):
+        with self.lock:
+            return list(self.groups.values())
+
+    def upload_sample(self, filename, content, group_id=None):
+        with self.lock:
+            filename = f"{uuid.uuid4()}-{filename}"
+            self.files[filename] = content
+            if group_id is not None:
+                self.group_files[group_id].append(filename)
+            return filename
+
+    def get_sample_list(self, group_id):
+        with self.lock:
+            return list(self.group_files.get(group_id, []))
+
+    def download_sample(self, filename):
+        """下载样本或结果图，结果图在第一次下载时合成"""
+        with self.lock:
+            content = self.files.get(filename)
+            if content is not None:
+                return content
+            alias, _, suffix = filename.rpartition("_")
+            result = self.results.get(alias)
+            if result is None or suffix not in {f"{i}.png" for i in range(5)}:
+                raise KeyError(filename)
+        origin_name, score = result
+        content = synthetic_result_image(origin_name, score, int(suffix[0]), self.heatmap_size)
+        with self.lock:
+            self.files[filename] = content
+        return content
+
+    # -------------------- 模型 --------------------
+    def add_model(self, model):
+        with self.lock:
+            model_id = self.next_model_id
+            self.next_model_id += 1
+            self.models[model_id] = dict(model, id=model_id, status=0, train_begin=None, train_end=None,
+                                         train_images=[], infer_begin=None, infer_images=[], infer_results=[],
+                                         infer_group=None, pre_status=0)
+            return model_id
+
+    def delete_model(self, model_id):
+        with self.lock:
+            self.models.pop(model_id)
+
+    def update_model(self, model_id, model):
+        with self.lock:
+            self.models[model_id].update({k: v for k, v in model.items() if k not in ("id", "status")})
+
+    def list_model(self):
+        with self.lock:
+            self._advance()
+            return [self._public_model(m) for m in self.models.values()]
+
+    def _public_model(self, model):
+        return {k: v for k, v in model.items()
+                if k in ("id", "name", "input_h", "input_w", "end_acc", "layers", "patchsize", "embed_dimension", "status")}
+
+    def train_model(self, model_id, group_id=None):
+        with self.changed:
+            model = self.models[model_id]
+            model["status"] = 1
+            model["train_begin"] = time.time()
+            model["train_end"] = None
+            model["train_images"] = list(self.group_files.get(group_id, []))
+            self.changed.notify_all()
+
+    def finish_model(self, model_id):
+        """结束训练：冻结在当前轮数"""
+        with self.changed:
+            model = self.models[model_id]
+            if model["status"] == 1:
+                model["train_end"] = time.time()
+                model["status"] = 2
+            self.changed.notify_all()
+
+    def infer_model(self, model_id, group_id=None):
+        with self.changed:
+            model = self.models[model_id]
+            model["pre_status"] = model["status"]
+            model["status"] = 3
+            model["infer_begin"] = time.time()
+            model["infer_group"] = group_id
+            model["infer_images"] = list(self.group_files.get(group_id, []))
+            model["infer_results"] = []
+            self.changed.notify_all()
+
+    def anomaly_gpt_infer(self, img_list):
+        """模拟大模型推理：返回描述文本，并生成 __1.png 结果图"""
+        answers = []
+        for name in img_list:
+            score = self.mock_score(name)
+            stem = os.path.splitext(name)[0]
+            content = synthetic_result_image(name, score, 1, self.heatmap_size)
+            with self.lock:
+                self.files[f"{stem}__1.png"] = content
+            if score > 0:
+                answers.append(f"Yes. There is an anomaly in the image, located around the highlighted region (score {score:.2f}).")
+            else:
+                answers.append("No. There is no anomaly in the image.")
+        return answers
+
+    # -------------------- 进度模拟 --------------------
+    def _advance(self):
+        """根据当前时间推进训练 / 推理状态（调用者需持有锁）"""
+        now = time.time()
+        for model in self.models.values():
+            if model["status"] == 1 and model["train_begin"] is not None:
+                if now - model["train_begin"] >= self.total_epochs * self.epoch_interval:
+                    model["status"] = 2
+                    model["train_end"] = model["train_begin"] + self.total_epochs * self.epoch_interval
+            if model["status"] == 3 and model["infer_begin"] is not None:
+                done = self._infer_done(model)
+                # 逐张登记推理结果，别名前缀与真实服务器一样与原图名无关
+                for name in model["infer_images"][len(model["infer_results"]):done]:
+                    alias = uuid.uuid4().hex
+                    score = self.mock_score(name)
+                    self.results[alias] = (name, score)
+                    model["infer_results"].append({
+                        "id": model["infer_group"], "bm_score": 0, "score": score, "model_id": model["id"],
+                        "img_filename": name, "result_name": alias
+                    })
+                if done >= len(model["infer_images"]):
+                    model["status"] = model["pre_status"]
+
+    def _epoch_count(self, model):
+        if model["train_begin"] is None:
+            return 0
+        end = model["train_end"] or time.time()
+        return min(self.total_epochs, int((end - model["train_begin"]) / self.epoch_interval))
+
+    def _infer_done(self, model):
+        if model["infer_begin"] is None:
+            return 0
+        return min(len(model["infer_images"]), int((time.time() - model["infer_begin"]) / self.infer_interval))
+
+    def train_info(self, model_id):
+        """已训练的图像列表：按训练轮数比例返回"""
+        with self.lock:
+            self._advance()
+            model = self.models[model_id]
+            images = model["train_images"]
+            done = len(images) * self._epoch_count(model) // max(self.total_epochs, 1)
+            return images[:done]
+
+    def train_process(self, model_id):
+        with self.lock:
+            self._advance()
+            model = self.models[model_id]
+            count = self._epoch_count(model)
+            epochs = list(range(1, count + 1))
+            begin = model["train_begin"] or 0
+            return {
+                "p_true": [0.4 / (1 + 0.2 * e) for e in epochs],
+                "p_fake": [0.2 / (1 + 0.1 * e) for e in epochs],
+                "loss": [],
+                "epoch": epochs,
+                "distance_loss": [],
+                "begin_time": begin,
+                "end_time": begin + count * self.epoch_interval
+            }
+
+    def infer_info(self, model_id):
+        with self.lock:
+            self._advance()
+            return [{k: v for k, v in r.items() if k != "result_name"} for r in self.models[model_id]["infer_results"]]
+
+    def infer_process(self, model_id):
+        with self.lock:
+            self._advance()
+            model = self.models[model_id]
+            results = model["infer_results"]
+            images = model["infer_images"]
+            return {
+                "inferPercentage": len(results) / len(images) if images else 0,
+                "have_infer_img_list": [
+                    {"img_filename": r["img_filename"], "result_name": r["result_name"], "score": r["score"]}
+                    for r in results
+                ]
+            }
+
+    def mock_score(self, name):
+        """根据文件名得到稳定的伪得分，分布与真实服务器相近（可为负数）"""
+        return (zlib.crc32(name.encode("utf-8")) % 1000) / 1000.0 - 0.45
+
+    def version(self, kind, model_id):
+        """进度版本号：数据变化时递增，用于 ETag 和事件流"""
+        with self.lock:
+            self._advance()
+            model = self.models[model_id]
+            if kind == "train_process":
+                return f"{self._epoch_count(model)}-{model['status']}"
+            return f"{len(model['infer_results'])}-{model['status']}"
+
+    def status(self, model_id):
+        with self.lock:
+            self._advance()
+            return self.models[model_id]["status"]
+
+
+# -------------------- 请求处理 --------------------
+class MockRequestHandler(BaseHTTPRequestHandler):
+    """
+    路由表形式的请求处理：ROUTES 中的 (方法, 路径前缀) 映射到处理函数名，
+    以 / 结尾的前缀表示路径中带参数（如 /delete_model/{model_id}）
+    """
+    protocol_version = "HTTP/1.1"
+    state = None # 由 create_server 注入
+    ROUTES = [
+        ("POST", "/anomaly_gpt_infer", "handle_anomaly_gpt_infer"),
+        # 模型
+        ("POST", "/add_model", "handle_add_model"),
+        ("DELETE", "/delete_model/", "handle_delete_model"),
+        ("POST", "/update_model/", "handle_update_model"),
+        ("GET", "/list_model", "handle_list_model"),
+        ("POST", "/train_info/", "handle_train_info"),
+        ("POST", "/infer_info/", "handle_infer_info"),
+        ("POST", "/train_process/", "handle_train_process"),
+        ("POST", "/infer_process/", "handle_infer_process"),
+        ("POST", "/train_model/", "handle_train_model"),
+        ("POST", "/finish_model/", "handle_finish_model"),
+        ("POST", "/infer_model/", "handle_infer_model"),
+        ("GET", "/events/", "handle_events"),
+        # 样本组
+        ("POST", "/upload_sample", "handle_upload_sample"),
+        ("GET", "/download_sample", "handle_download_sample"),
+        ("GET", "/get_sample_list/", "handle_get_sample_list"),
+        ("POST", "/add_group", "handle_add_group"),
+        ("DELETE", "/delete_group/", "handle_delete_group"),
+        ("POST", "/clear_group/", "handle_clear_group"),
+        ("DELETE", "/clear_group/", "handle_clear_group"),
+        ("GET", "/get_group_list", "handle_get_group_list"),
+    ]
+
+    def log_message(self, format, *args):
+        pass # 关闭每个请求的控制台输出
+
+    # -------------------- 请求分发 --------------------
+    def dispatch(self, method):
+        parsed = urlparse(self.path)
+        self.query = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        self.body = None
+        self.bytes_in = 0
+        self.bytes_out = 0
+        for route_method, prefix, handler_name in self.ROUTES:
+            if route_method == method and (parsed.path == prefix or
+                                           (prefix.endswith("/") and parsed.path.startswith(prefix))):
+                self.route_arg = parsed.path[len(prefix):] if prefix.endswith("/") else ""
+                start = time.perf_counter()
+                error = False
+                try:
+                    if handler_name != "handle_events":
+                        error = self.simulate_network()
+                    if not error:
+                        getattr(self, handler_name)()
+                except (KeyError, ValueError):
+                    error = True
+                    self.send_json({"detail": "Not found"}, status=404)
+                self.state.record(prefix.rstrip("/"), self.bytes_in, self.bytes_out, time.perf_counter() - start, error)
+                return
+        self.read_body()
+        self.send_json({"detail": "Not Found"}, status=404)
+
+    def simulate_network(self):
+        """模拟延迟并按错误率注入 500 错误，返回是否已注入错误"""
+        state = self.state
+        delay = state.latency + (state.random.uniform(0, state.jitter) if state.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+        if state.error_rate and state.random.random() < state.error_rate:
+            self.read_body() # 读掉请求体，保持连接可复用
+            self.send_json({"detail": "Injected error"}, status=500)
+            return True
+        return False
+
+    def throttle(self, size):
+        """按带宽限制等待传输 size 字节所需的时间"""
+        if self.state.bandwidth:
+            time.sleep(size / self.state.bandwidth)
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def do_DELETE(self):
+        self.dispatch("DELETE")
+
+    def read_body(self):
+        if self.body is None:
+            length = int(self.headers.get("Content-Length") or 0)
+            self.body = self.rfile.read(length) if length else b""
+            self.bytes_in += len(self.body)
+            self.throttle(len(self.body))
+        return self.body
+
+    def read_json(self):
+        body = self.read_body()
+        return json.loads(body) if body else {}
+
+    def send_bytes(self, body, content_type, status=200, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        # 分块写出以模拟带宽
+        chunk_size = 64 * 1024
+        for offset in range(0, len(body), chunk_size):
+            chunk = body[offset:offset + chunk_size]
+            self.throttle(len(chunk))
+            self.wfile.write(chunk)
+        self.bytes_out += len(body)
+
+    def send_json(self, data, status=200, etag=None):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_bytes(body, "application/json", status, {"ETag": etag} if etag else None)
+
+    def send_not_modified(self, etag):
+        self.send_response(304)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def group_id_param(self):
+        group_id = self.query.get("group_id")
+        return int(group_id) if group_id not in (None, "", "None") else None
+
+    # -------------------- 大模型 --------------------
+    def handle_anomaly_gpt_infer(self):
+        data = self.read_json()
+        self.send_json(self.state.anomaly_gpt_infer(data.get("img_list", [])))
+
+    # -------------------- 模型 --------------------
+    def handle_add_model(self):
+        self.send_json(self.state.add_model(self.read_json()))
+
+    def handle_delete_model(self):
+        self.state.delete_model(int(self.route_arg))
+        self.send_json({"message": "Model deleted successfully"})
+
+    def handle_update_model(self):
+        self.state.update_model(int(self.route_arg), self.read_json())
+        self.send_json({"message": "Model updated successfully"})
+
+    def handle_list_model(self):
+        self.send_json(self.state.list_model())
+
+    def handle_train_info(self):
+        self.send_json(self.state.train_info(int(self.route_arg)))
+
+    def handle_infer_info(self):
+        self.send_json(self.state.infer_info(int(self.route_arg)))
+
+    def handle_train_model(self):
+        model_id = int(self.route_arg)
+        self.state.train_model(model_id, self.group_id_param())
+        self.send_json({"message": "Model training started", "model_id": model_id})
+
+    def handle_finish_model(self):
+        self.state.finish_model(int(self.route_arg))
+        self.send_json({})
+
+    def handle_infer_model(self):
+        self.state.infer_model(int(self.route_arg), self.group_id_param())
+        self.send_json({})
+
+    # -------------------- 进度（支持 If-None-Match） --------------------
+    def send_progress(self, kind):
+        model_id = int(self.route_arg)
+        etag = f'"{self.state.version(kind, model_id)}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_not_modified(etag)
+            return
+        data = getattr(self.state, kind)(model_id)
+        self.send_json(data, etag=etag)
+
+    def handle_train_process(self):
+        self.send_progress("train_process")
+
+    def handle_infer_process(self):
+        self.send_progress("infer_process")
+
+    def handle_events(self):
+        """
+        SSE 事件流: GET /events/{train_process|infer_process}/{model_id}
+        每当进度版本变化时推送 {"version", "status", "data"}，任务结束后关闭连接
+        """
+        kind, _, model_id = self.route_arg.partition("/")
+        if kind not in ("train_process", "infer_process"):
+            raise KeyError(kind)
+        model_id = int(model_id)
+        self.state.status(model_id) # 模型不存在时抛出 KeyError
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        active_status = 1 if kind == "train_process" else 3
+        last_version = None
+        try:
+            while True:
+                version = self.state.version(kind, model_id)
+                status = self.state.status(model_id)
+                if version != last_version:
+                    payload = {"version": version, "status": status,
+                               "data": getattr(self.state, kind)(model_id)}
+                    event = f"id: {version}\ndata: {json.dumps(payload)}\n\n".encode("utf-8")
+                    self.wfile.write(event)
+                    self.wfile.flush()
+                    self.bytes_out += len(event)
+                    last_version = version
+                if status != active_status:
+                    break
+                with self.state.changed:
+                    self.state.changed.wait(timeout=min(self.state.epoch_interval, self.state.infer_interval))
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    # -------------------- 样本组 --------------------
+    def handle_upload_sample(self):
+        """解析 multipart/form-data 中的 file 字段"""
+        body = self.read_body()
+        header = f"Content-Type: {self.headers.get('Content-Type')}\r\n\r\n".encode("utf-8")
+        message = BytesParser(policy=default_policy).parsebytes(header + body)
+        for part in message.iter_parts():
+            if part.get_param("name", header="content-disposition") == "file":
+                filename = self.state.upload_sample(part.get_filename(), part.get_payload(decode=True),
+                                                    self.group_id_param())
+                self.send_json({"filename": filename})
+                return
+        self.send_json({"detail": "Missing file"}, status=422)
+
+    def handle_download_sample(self):
+        filename = self.read_json().get("filename") or self.query.get("filename")
+        try:
+            content = self.state.download_sample(filename)
+        except KeyError:
+            self.send_json({"detail": "Image not found"}, status=404)
+            return
+        self.send_bytes(content, "image/jpeg")
+
+    def handle_get_sample_list(self):
+        self.send_json(self.state.get_sample_list(int(self.route_arg)))
+
+    def handle_add_group(self):
+        self.send_json(self.state.add_group(self.read_json().get("group_name")))
+
+    def handle_delete_group(self):
+        self.state.delete_group(int(self.route_arg))
+        self.send_json({"message": "Model deleted successfully"})
+
+    def handle_clear_group(self):
+        self.state.clear_group(int(self.route_arg))
+        self.send_json({"message": "Group cleared successfully"})
+
+    def handle_get_group_list(self):
+        self.send_json(self.state.get_group_list())
+
+
+def create_server(host="127.0.0.1", port=20060, state=None):
+    """创建模拟服务器（不启动），返回 (server, state)"""
+    state = state or MockState()
+    handler = type("BoundMockRequestHandler", (MockRequestHandler,), {"state": state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server, state
+
+
+def start_in_background(host="127.0.0.1", port=0, state=None):
+    """
+    在后台线程中启动模拟服务器，port=0 时自动选择空闲端口
+
+    Returns:
+        (server, state)，结束时调用 server.shutdown()
+    """
+    server, state = create_server(host, port, state)
+    threading.Thread(target=server.serve_forever, name="mock-server", daemon=True).start()
+    return server, state
+
+
+def use_mock_server(server):
+    """将客户端配置指向模拟服务器"""
+    import config
+    config.HOSTNAME, config.PORT = server.server_address[:2]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地模拟推理服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=20060)
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求的固定延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="延迟的随机抖动上限（秒）")
+    parser.add_argument("--bandwidth", type=float, default=None, help="带宽限制（字节/秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="随机返回 500 的概率")
+    parser.add_argument("--epoch-interval", type=float, default=0.2, help="每轮训练耗时（秒）")
+    parser.add_argument("--total-epochs", type=int, default=50, help="训练总轮数")
+    parser.add_argument("--infer-interval", type=float, default=0.1, help="每张图推理耗时（秒）")
+    parser.add_argument("--heatmap-size", type=int, default=224, help="合成结果图边长")
+    args = parser.parse_args()
+    state = MockState(epoch_interval=args.epoch_interval, total_epochs=args.total_epochs,
+                      infer_interval=args.infer_interval, latency=args.latency, jitter=args.jitter,
+                      bandwidth=args.bandwidth, error_rate=args.error_rate, heatmap_size=args.heatmap_size)
+    server, _ = create_server(args.host, args.port, state)
+    print(f"模拟服务器已启动: http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
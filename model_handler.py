@@ -1,4 +1,5 @@
 import json
+import math
 import os
 import shutil
 import random
@@ -7,16 +8,21 @@ import time
 from datetime import datetime
 
 from PySide6.QtUiTools import QUiLoader
-from PySide6.QtWidgets import QWidget, QDialog, QMessageBox, QFileDialog, QVBoxLayout, QTreeWidgetItem, QListWidgetItem, QHBoxLayout, QLabel, QLineEdit, QPushButton, QComboBox, QRadioButton
+from PySide6.QtWidgets import QWidget, QDialog, QMessageBox, QFileDialog, QVBoxLayout, QTreeWidgetItem, QListWidgetItem, QHBoxLayout, QLabel, QLineEdit, QPushButton, QComboBox, QRadioButton, QDoubleSpinBox, QProgressBar, QSlider
 from PySide6.QtGui import QIcon, QPainter, QShortcut, QKeySequence
-from PySide6.QtCore import Qt, QTimer
-from PySide6.QtCharts import QChart, QChartView, QLineSeries, QValueAxis, QDateTimeAxis
+from PySide6.QtCore import Qt, QTimer, QPointF, QThread, Signal
 
 import config
-from http_server import HttpServer, PatchCoreParamMapper_Http, UploadSampleGroup_HTTP
-from sample_handler import GroupListItem, SampleGroupDialog
+import tracing
+from calibration import DEFAULT_TARGET_FRR, ThresholdCalibration, collect_test_set, format_metrics, image_curves, load_model_info
+from evaluation import propose_threshold
+from http_server import HttpServer, PatchCoreParamMapper_Http, ProgressSubscriber, UploadSampleGroup_HTTP, is_upload_size_sufficient
+from project_index import get_project_index
+from result_store import get_result_store
+from sample_handler import GroupListItem, SampleGroupDialog, snapshot_sample_group
 from ssh_server import PatchCoreParamMapper_SSH
-from utils import LoadingAnimation, check_model_group, check_sample_group, copy_image, get_model_status, show_message_box, update_metadata, join_path, is_image, create_file_dialog
+from upload_transform import upload_size
+from utils import LoadingAnimation, check_model_group, check_sample_group, copy_image, show_message_box, update_metadata, join_path, is_image, create_file_dialog
 
 
 
@@ -27,6 +33,7 @@ class ModelHandler:
     def __init__(self, ui):
         super().__init__()
         self.ui = ui
+        self.snapshot_worker = None # 训练前保存数据集版本的工作线程
         # 将所有子控件添加为实例属性
         for child in self.ui.findChildren(QWidget):
             setattr(self.ui, child.objectName(), child)
@@ -53,7 +60,7 @@ class ModelHandler:
         """
         上传样本组到服务器
         """
-        UploadSampleGroup_HTTP(self.ui, config.SAMPLE_GROUP).run()
+        UploadSampleGroup_HTTP(self.ui, config.SAMPLE_GROUP, upload_size()).run()  # 按当前模型输入尺寸缩小后上传
 
     def import_dir(self):
         """
@@ -254,6 +261,7 @@ class ModelHandler:
     def init_train_params(self):
         """初始化模型训练板块"""
         self.ui.trainButton.clicked.connect(self.train_model)
+        self.ui.calibrateButton.clicked.connect(self.calibrate_threshold)
         self.ui.viewParamsButton.clicked.connect(self.view_params)
         self.ui.editParamsButton.clicked.connect(self.edit_params)
         self.ui.setParamsButton.clicked.connect(self.set_params)
@@ -380,6 +388,8 @@ class ModelHandler:
         # 检查是否有选择模型和样本组
         if not check_model_group() or not check_sample_group():
             return
+        if self.snapshot_worker and self.snapshot_worker.isRunning():
+            return # 正在保存训练数据的版本，训练即将开始
         # 对接 http_server: 训练模型
         try:
             http_server = HttpServer()
@@ -407,8 +417,24 @@ class ModelHandler:
                 # 提示创建新样本组
                 show_message_box("错误", "样本组不存在于服务器，已删除本地样本组，请重新创建！", QMessageBox.Critical, self.ui)
                 return
-            # 启动训练
-            http_server.train_model(model_id, group_id)
+            # 样本组上次按更小的模型输入尺寸上传时，按当前尺寸重新上传
+            size = upload_size()
+            if not is_upload_size_sufficient(config.SAMPLE_GROUP, size):
+                if not UploadSampleGroup_HTTP(self.ui, config.SAMPLE_GROUP, size).run():
+                    return
+            # 在后台保存训练数据的版本，完成后启动训练
+            self.snapshot_training_data(lambda snapshot: self.start_training(model_id, group_id, snapshot))
+        except Exception as e:
+            show_message_box("错误", f"训练模型失败: {str(e)}", QMessageBox.Critical, self.ui)
+
+    def start_training(self, model_id, group_id, snapshot):
+        """
+        启动训练，训练数据的版本 snapshot 记录到 model.json 中
+        """
+        try:
+            HttpServer().train_model(model_id, group_id)
+            # 重新训练后，之前的评估指标和校准结果不再适用
+            self.update_model_info({"metrics": None, "calibration": None, "dataset_snapshot": snapshot})
             
             # 弹出训练进度对话框
             progress_dialog = TrainingProgressDialog(self.ui, model_id, config.MODEL_GROUP)
@@ -416,6 +442,32 @@ class ModelHandler:
         except Exception as e:
             show_message_box("错误", f"训练模型失败: {str(e)}", QMessageBox.Critical, self.ui)
 
+    def snapshot_training_data(self, on_finished):
+        """
+        在后台为当前样本组创建数据集版本，完成后调用 on_finished({"group", "id"})（失败时为 None）；
+        与上次训练的数据不同时在日志中记录差异
+        """
+        sample_group = config.SAMPLE_GROUP
+        def on_snapshot(manifest):
+            on_finished({"group": sample_group, "id": manifest["id"]} if manifest else None)
+        previous = load_model_info(config.MODEL_GROUP, "dataset_snapshot")
+        self.snapshot_worker = snapshot_sample_group(self.ui, sample_group, on_snapshot, compare_with=previous)
+
+    def calibrate_threshold(self):
+        """
+        在样本组的测试集上评估当前模型，并按目标误拒率校准缺陷判定阈值
+        """
+        if not check_model_group() or not check_sample_group():
+            return
+        if not collect_test_set(join_path(config.SAMPLE_PATH, config.SAMPLE_GROUP)):
+            show_message_box("错误", "样本组中没有测试集，请先在样本管理中生成测试集！", QMessageBox.Critical, self.ui)
+            return
+        if not self.is_model_trained():
+            show_message_box("错误", "模型尚未训练完成，请先训练模型！", QMessageBox.Critical, self.ui)
+            return
+        dialog = ThresholdCalibrationDialog(self.ui, config.MODEL_GROUP, config.SAMPLE_GROUP)
+        dialog.exec()
+
     def is_model_trained(self):
         """
         检查当前选择的模型组是否已经训练过
@@ -686,15 +738,9 @@ class ModelGroupDialog(QDialog):
         self.ui.listWidget.clear()
         # 获取模型文件夹路径
         # 获取模型文件夹下的所有子文件夹
-        model_groups = []
-        for item in os.listdir(config.MODEL_PATH):
-            item_path = join_path(config.MODEL_PATH, item)
-            if os.path.isdir(item_path):
-                # 检查模型文件夹中是否有文件
-                has_files = bool(os.listdir(item_path))
-                # 从本地获取模型组状态
-                status = get_model_status(item)
-                model_groups.append((item, has_files, status))
+        # 从项目索引中读取模型组及其状态，无需逐个打开 model.json
+        model_groups = [(entry.name, entry.has_files, entry.status, entry.metrics, entry.dataset_snapshot)
+                        for entry in get_project_index().model_groups()]
         # 对接 http_server: 如果模型组列表为空，则从服务器获取模型组列表
         if not model_groups:
             try:
@@ -703,7 +749,7 @@ class ModelGroupDialog(QDialog):
                 if group_list:
                     for group in group_list:
                         group_name = group.get("name")
-                        model_groups.append((group_name, True, group.get("status")))
+                        model_groups.append((group_name, True, group.get("status"), None, None))
             except Exception as e:
                 print(f"从http_server获取模型组失败: {str(e)}")
         # 如果没有模型组，显示提示
@@ -713,7 +759,7 @@ class ModelGroupDialog(QDialog):
             self.ui.listWidget.addItem(empty_item)
             return
         # 添加模型组到列表
-        for group_name, has_files, status in model_groups:
+        for group_name, has_files, status, metrics, snapshot in model_groups:
             # 根据文件夹中有无文件，设置图标
             icon = "ui/icon/non-empty_folder.svg" if has_files else "ui/icon/empty_folder.svg"
             
@@ -727,6 +773,9 @@ class ModelGroupDialog(QDialog):
             elif status == 2:
                 text = "已训练"
                 color = "#4CAF50"  # 绿色
+                # 已评估的模型显示主要指标
+                if metrics:
+                    text = f"已训练 · {format_metrics(metrics)}"
             elif status == 3:
                 text = "推理中"
                 color = "#FF9800"  # 黄色
@@ -735,6 +784,11 @@ class ModelGroupDialog(QDialog):
                 color = "#666"  # 灰色
                 
             item = GroupListItem(group_name, icon, text)
+            tooltip = [format_metrics(metrics, detailed=True)] if metrics else []
+            if snapshot:
+                tooltip.append(f"训练数据: {snapshot['group']} 版本 {snapshot['id']}")
+            if tooltip:
+                item.setToolTip("\n".join(tooltip))
             self.ui.listWidget.addItem(item)
             
             # 设置自定义widget到列表项
@@ -772,6 +826,9 @@ class TrainingProgressDialog(QDialog):
     """
     训练进度可视化对话框，用于实时显示模型训练信息
     """
+    MAX_CHART_POINTS = 1000  # 全部视图中每条曲线最多绘制的点数
+    RECENT_POINTS = 20  # 最近视图显示的点数
+
     def __init__(self, parent=None, model_id=None, model_name=None):
         super().__init__(parent)
         self.setWindowTitle("模型训练进度")
@@ -781,6 +838,11 @@ class TrainingProgressDialog(QDialog):
         self.http_server = HttpServer()
         self.stopped = False
         self.show_full_curve = True  # 默认显示全部曲线
+        # 已接收的曲线数据点，每次只追加新的轮次
+        self.curve_points = {"loss": [], "p_true": [], "p_fake": []}
+        self.curve_stride = 1  # 全部视图的抽稀步长，点数超过上限时翻倍
+        self.min_y = None  # 所有数据点的最小值（增量维护）
+        self.max_y = None  # 所有数据点的最大值（增量维护）
         
         # 创建主布局
         main_layout = QVBoxLayout()
@@ -837,25 +899,41 @@ class TrainingProgressDialog(QDialog):
         button_layout = QHBoxLayout()
         self.stop_button = QPushButton("停止训练")
         self.stop_button.clicked.connect(self.stop_training)
+        # 训练完成后可在测试集上评估模型，指标保存到模型组 model.json
+        self.evaluate_button = QPushButton("评估模型")
+        self.evaluate_button.setEnabled(False)
+        self.evaluate_button.clicked.connect(self.evaluate_model)
         button_layout.addStretch()
         button_layout.addWidget(self.stop_button)
+        button_layout.addWidget(self.evaluate_button)
         button_layout.addStretch()
         
         # 将所有布局添加到主布局
         info_layout.addLayout(left_info)
         info_layout.addLayout(right_info)
         main_layout.addLayout(info_layout)
+        self.metrics_label = QLabel("评估指标: 训练完成后点击“评估模型”在测试集上计算")
+        main_layout.addWidget(self.metrics_label)
         main_layout.addLayout(button_layout)
         
         self.setLayout(main_layout)
         
-        # 启动定时器，每秒更新一次
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.update_data)
-        self.timer.start(1000)
-        
         # 记录初始时间
         self.start_time = time.time()
+        self.begin_time = ""
+        self.model_status = None
+        
+        # 订阅训练进度，数据变化时才更新图表
+        self.subscriber = ProgressSubscriber("train_process", model_id, model_name)
+        self.subscriber.progress_signal.connect(self.update_data)
+        self.subscriber.status_signal.connect(self.on_model_status)
+        self.subscriber.error_signal.connect(lambda e: print(f"获取训练进度失败: {e}"))
+        self.subscriber.start()
+        
+        # 本地计时器只刷新训练总时间，不访问服务器
+        self.clock_timer = QTimer(self)
+        self.clock_timer.timeout.connect(self.update_status)
+        self.clock_timer.start(1000)
         
         # 创建加载动画，设置为对话框的子部件
         self.loading = LoadingAnimation(self)
@@ -871,11 +949,14 @@ class TrainingProgressDialog(QDialog):
             self.view_toggle_button.setText("切换为最近视图")
         else:
             self.view_toggle_button.setText("切换为全部视图")
-        # 强制更新图表
-        self.update_data()
+        # 用已有数据重绘图表，无需重新请求
+        self.rebuild_series()
+        self.update_axes()
         
     def create_chart(self):
         """创建图表"""
+        # 打开训练进度窗口时才加载 QtCharts
+        from PySide6.QtCharts import QChart, QChartView, QLineSeries, QValueAxis
         # 创建图表和视图
         self.chart = QChart()
         self.chart.setTitle("训练损失与概率")
@@ -937,43 +1018,30 @@ class TrainingProgressDialog(QDialog):
         self.chart.legend().setAlignment(Qt.AlignBottom)
         self.chart_view.setMinimumHeight(300)
         
-    def update_data(self):
-        """获取并更新训练数据"""
-        if self.stopped:
-            return
-            
+    @tracing.traced("train.update_data", cat="poll")
+    def update_data(self, train_process=None):
+        """
+        更新训练数据
+
+        Args:
+            train_process: 订阅线程推送的训练进度，为 None 时主动获取一次
+        """
         try:
-            # 获取训练进度信息
-            train_process = self.http_server.train_process(self.model_id)
+            if train_process is None:
+                train_process = self.http_server.train_process(self.model_id)
             
             # 如果获取到数据，关闭加载动画
             if train_process and hasattr(self, 'loading') and self.loading.isVisible():
                 self.loading.close_animation()
                 
-            # 更新图表数据
+            # 只追加新的轮次到图表
             epochs = train_process.get("epoch", [0])
             losses = train_process.get("loss", [])
             p_trues = train_process.get("p_true", [0])
             p_fakes = train_process.get("p_fake", [0])
-            begin_time = train_process.get("begin_time", "")
-            end_time = train_process.get("end_time", "")
-            
-            # 清除当前所有数据点
-            self.loss_series.clear()
-            self.p_true_series.clear()
-            self.p_fake_series.clear()
-            
-            # 添加所有数据点
-            for i, epoch in enumerate(epochs):
-                # p_true和p_fake数据
-                if i < len(p_trues):
-                    self.p_true_series.append(epoch, p_trues[i])
-                if i < len(p_fakes):
-                    self.p_fake_series.append(epoch, p_fakes[i])
-                
-                # loss数据（如果存在）
-                if i < len(losses):
-                    self.loss_series.append(epoch, losses[i])
+            self.begin_time = train_process.get("begin_time", "")
+            self.append_curve_data(epochs, {"loss": losses, "p_true": p_trues, "p_fake": p_fakes})
+            self.update_axes()
             
             # 获取最新的数据点用于显示
             latest_epoch = epochs[-1] if epochs else 0
@@ -981,146 +1049,223 @@ class TrainingProgressDialog(QDialog):
             latest_p_true = p_trues[-1] if p_trues else 0.0
             latest_p_fake = p_fakes[-1] if p_fakes else 0.0
             
-            # 调整X轴范围
-            start_epoch = epochs[0] if epochs else 0
-            
-            if self.show_full_curve:
-                # 显示全部曲线
-                if latest_epoch > 10:
-                    # 计算合适的刻度间隔，确保刻度数量在5-10之间
-                    tick_interval = max(1, (latest_epoch - start_epoch) // 10)
-                    tick_count = (latest_epoch - start_epoch) // tick_interval + 1
-                    
-                    # 确保刻度数量合理
-                    if tick_count > 15:
-                        tick_interval = (latest_epoch - start_epoch) // 10
-                        tick_count = 11
-                    
-                    self.axis_x.setRange(start_epoch, latest_epoch)
-                    self.axis_x.setTickCount(tick_count)
-                else:
-                    self.axis_x.setRange(0, 10)
-                    self.axis_x.setTickCount(11)
-            else:
-                # 只显示最近20个点
-                window_size = min(20, len(epochs))
-                if window_size > 0 and latest_epoch > 10:
-                    start_idx = max(0, len(epochs) - window_size)
-                    recent_start = epochs[start_idx]
-                    self.axis_x.setRange(recent_start, latest_epoch)
-                    self.axis_x.setTickCount(min(11, window_size + 1))
-                else:
-                    self.axis_x.setRange(0, 10)
-                    self.axis_x.setTickCount(11)
-            
-            # 调整Y轴范围
-            all_values = p_trues + p_fakes
-            if losses:
-                all_values += losses
-                
-            max_y = max(all_values + [0.1]) if all_values else 0.1
-            min_y = min(all_values + [0.0]) if all_values else 0.0
-            
-            # 在最小值和最大值基础上留出一定的空间
-            y_range = max_y - min_y
-            self.axis_y.setRange(max(0, min_y - y_range * 0.1), max_y * 1.1)
-            
-            # 确保Y轴有足够的刻度以显示数据
-            if max_y > 0.5:
-                self.axis_y.setTickCount(6)  # 减少刻度数
-            else:
-                self.axis_y.setTickCount(6)  # 减少刻度数
-                
-            # 根据数值范围调整小数点格式
-            if max_y < 0.01:
-                self.axis_y.setLabelFormat("%.4f")  # 更多小数位
-            elif max_y < 0.1:
-                self.axis_y.setLabelFormat("%.3f")
-            else:
-                self.axis_y.setLabelFormat("%.2f")
-            
             # 更新标签信息
             self.epoch_label.setText(f"当前轮数: {latest_epoch}")
             self.loss_label.setText(f"损失值: {latest_loss:.4f}")
             self.p_true_label.setText(f"真实样本概率: {latest_p_true:.4f}")
             self.p_fake_label.setText(f"生成样本概率: {latest_p_fake:.4f}")
             
-            # 更新时间信息
-            current_time = time.time()
-            
             # 更新开始时间
-            if begin_time:
-                if isinstance(begin_time, (int, float)):
+            if self.begin_time:
+                if isinstance(self.begin_time, (int, float)):
                     # 如果是时间戳，转换为可读格式
-                    begin_time_str = datetime.fromtimestamp(begin_time).strftime("%Y-%m-%d %H:%M:%S")
+                    begin_time_str = datetime.fromtimestamp(self.begin_time).strftime("%Y-%m-%d %H:%M:%S")
                     self.begin_time_label.setText(f"开始时间: {begin_time_str}")
                 else:
-                    self.begin_time_label.setText(f"开始时间: {begin_time}")
-            
-            # 检查模型状态并更新结束时间和训练状态
-            training_complete = False
-            try:
-                model_status = self.http_server.get_model_status(self.model_name)
-                
-                # 状态为2表示训练完成，或者手动停止训练时
-                if model_status == 2 or self.stopped:
-                    training_complete = True
-                    # 设置结束时间为当前时间，如果之前没有设置过
-                    if not hasattr(self, 'actual_end_time'):
-                        self.actual_end_time = current_time
-                        # 格式化结束时间
-                        end_time_str = datetime.fromtimestamp(self.actual_end_time).strftime("%Y-%m-%d %H:%M:%S")
-                        self.end_time_label.setText(f"结束时间: {end_time_str}")
-                    
-                    # 更新状态标签
-                    if self.stopped:
-                        self.status_label.setText("状态: 已手动停止训练")
-                        self.status_label.setStyleSheet("color: orange; font-weight: bold;")
-                    else:
-                        self.status_label.setText("状态: 训练已完成")
-                        self.status_label.setStyleSheet("color: green; font-weight: bold;")
-                    
-                    # 禁用停止按钮
-                    self.stop_button.setEnabled(False)
-                    # 停止定时器
-                    self.timer.stop()
-                else:
-                    # 训练仍在进行中，显示实时状态
-                    self.status_label.setText("状态: 训练中")
-                    self.status_label.setStyleSheet("color: blue; font-weight: bold;")
-                    # 确保停止按钮可用
-                    self.stop_button.setEnabled(True)
-                    self.end_time_label.setText("结束时间: --")
-            except Exception as e:
-                print(f"获取模型状态失败: {str(e)}")
-                
-            # 计算训练总时间
-            if training_complete and hasattr(self, 'actual_end_time'):
-                # 使用实际结束时间计算
-                if isinstance(begin_time, (int, float)):
-                    total_seconds = int(self.actual_end_time - begin_time)
-                else:
-                    total_seconds = int(self.actual_end_time - self.start_time)
-            else:
-                # 使用当前时间计算训练中的总时间
-                if isinstance(begin_time, (int, float)):
-                    total_seconds = int(current_time - begin_time)
-                else:
-                    total_seconds = int(current_time - self.start_time)
+                    self.begin_time_label.setText(f"开始时间: {self.begin_time}")
             
-            # 显示训练总时间
-            minutes, seconds = divmod(total_seconds, 60)
-            hours, minutes = divmod(minutes, 60)
-            if hours > 0:
-                self.total_time_label.setText(f"训练总时间: {hours}小时{minutes}分{seconds}秒")
-            else:
-                self.total_time_label.setText(f"训练总时间: {minutes}分{seconds}秒")
+            self.update_status()
                 
         except Exception as e:
             print(f"更新训练数据失败: {str(e)}")
             import traceback
             traceback.print_exc()
+
+    def on_model_status(self, model_status):
+        """订阅线程推送的模型状态变化"""
+        self.model_status = model_status
+        self.update_status()
+
+    def update_status(self):
+        """根据模型状态更新结束时间、训练状态和训练总时间"""
+        current_time = time.time()
+        # 状态为2表示训练完成，或者手动停止训练时
+        training_complete = self.model_status == 2 or self.stopped
+        if training_complete:
+            # 设置结束时间为当前时间，如果之前没有设置过
+            if not hasattr(self, 'actual_end_time'):
+                self.actual_end_time = current_time
+                # 格式化结束时间
+                end_time_str = datetime.fromtimestamp(self.actual_end_time).strftime("%Y-%m-%d %H:%M:%S")
+                self.end_time_label.setText(f"结束时间: {end_time_str}")
+            
+            # 更新状态标签
+            if self.stopped:
+                self.status_label.setText("状态: 已手动停止训练")
+                self.status_label.setStyleSheet("color: orange; font-weight: bold;")
+            else:
+                self.status_label.setText("状态: 训练已完成")
+                self.status_label.setStyleSheet("color: green; font-weight: bold;")
+            
+            # 禁用停止按钮，训练完成时允许评估
+            self.stop_button.setEnabled(False)
+            self.evaluate_button.setEnabled(not self.stopped)
+            # 停止订阅和计时
+            self.stop_subscription()
+        else:
+            # 训练仍在进行中，显示实时状态
+            self.status_label.setText("状态: 训练中")
+            self.status_label.setStyleSheet("color: blue; font-weight: bold;")
+            # 确保停止按钮可用
+            self.stop_button.setEnabled(True)
+            self.end_time_label.setText("结束时间: --")
+            
+        # 计算训练总时间
+        begin_time = self.begin_time
+        if training_complete and hasattr(self, 'actual_end_time'):
+            # 使用实际结束时间计算
+            if isinstance(begin_time, (int, float)):
+                total_seconds = int(self.actual_end_time - begin_time)
+            else:
+                total_seconds = int(self.actual_end_time - self.start_time)
+        else:
+            # 使用当前时间计算训练中的总时间
+            if isinstance(begin_time, (int, float)):
+                total_seconds = int(current_time - begin_time)
+            else:
+                total_seconds = int(current_time - self.start_time)
+        
+        # 显示训练总时间
+        minutes, seconds = divmod(max(total_seconds, 0), 60)
+        hours, minutes = divmod(minutes, 60)
+        if hours > 0:
+            self.total_time_label.setText(f"训练总时间: {hours}小时{minutes}分{seconds}秒")
+        else:
+            self.total_time_label.setText(f"训练总时间: {minutes}分{seconds}秒")
+
+    def evaluate_model(self):
+        """在样本组测试集上评估训练好的模型（与阈值校准共用），完成后显示指标"""
+        if not check_sample_group():
+            return
+        if not collect_test_set(join_path(config.SAMPLE_PATH, config.SAMPLE_GROUP)):
+            show_message_box("错误", "样本组中没有测试集，请先在样本管理中生成测试集！", QMessageBox.Critical, self)
+            return
+        ThresholdCalibrationDialog(self, self.model_name, config.SAMPLE_GROUP).exec()
+        metrics = load_model_info(self.model_name, "metrics")
+        if metrics:
+            self.metrics_label.setText(format_metrics(metrics, detailed=True))
+
+    def stop_subscription(self):
+        """停止进度订阅线程和计时器"""
+        self.clock_timer.stop()
+        if self.subscriber is not None:
+            self.subscriber.shutdown()
+            self.subscriber = None
     
+    def series_map(self):
+        """曲线名称到 QLineSeries 的映射"""
+        return {"loss": self.loss_series, "p_true": self.p_true_series, "p_fake": self.p_fake_series}
+
+    def reset_curves(self):
+        """清空已接收的曲线数据（服务器数据被重置时调用）"""
+        for key in self.curve_points:
+            self.curve_points[key] = []
+        for series in self.series_map().values():
+            series.clear()
+        self.curve_stride = 1
+        self.min_y = self.max_y = None
+
+    def append_curve_data(self, epochs, values):
+        """
+        只处理上次之后新增的轮次：追加到曲线、增量更新最值，每次刷新的开销与总轮数无关
+
+        Args:
+            epochs: 服务器返回的完整轮次列表
+            values: {"loss": [...], "p_true": [...], "p_fake": [...]}
+        """
+        # 服务器数据比已接收的少，说明重新开始了训练
+        if any(len(values[key]) < len(self.curve_points[key]) for key in self.curve_points):
+            self.reset_curves()
+        new_points = {}
+        for key, points in self.curve_points.items():
+            count = min(len(epochs), len(values[key]))
+            new = [QPointF(epochs[i], values[key][i]) for i in range(len(points), count)]
+            for point in new:
+                y = point.y()
+                self.min_y = y if self.min_y is None else min(self.min_y, y)
+                self.max_y = y if self.max_y is None else max(self.max_y, y)
+            points.extend(new)
+            new_points[key] = new
+        if not any(new_points.values()):
+            return
+        if not self.show_full_curve:
+            self.rebuild_series()
+            return
+        # 全部视图：点数超过上限时步长翻倍并重建（均摊开销为常数），否则只追加新点
+        longest = max(len(points) for points in self.curve_points.values())
+        if (longest + self.curve_stride - 1) // self.curve_stride > self.MAX_CHART_POINTS:
+            while (longest + self.curve_stride - 1) // self.curve_stride > self.MAX_CHART_POINTS:
+                self.curve_stride *= 2
+            self.rebuild_series()
+            return
+        for key, series in self.series_map().items():
+            start = len(self.curve_points[key]) - len(new_points[key])
+            kept = [point for i, point in enumerate(new_points[key], start) if i % self.curve_stride == 0]
+            if kept:
+                series.append(kept)
+
+    def rebuild_series(self):
+        """根据当前视图模式重建曲线：全部视图按步长抽稀，最近视图只保留最近的点"""
+        for key, series in self.series_map().items():
+            points = self.curve_points[key]
+            if self.show_full_curve:
+                series.replace(points[::self.curve_stride])
+            else:
+                series.replace(points[-self.RECENT_POINTS:])
+
+    def update_axes(self):
+        """根据已接收的数据和增量维护的最值调整坐标轴"""
+        points = max(self.curve_points.values(), key=len)
+        if not points:
+            return
+        start_epoch = int(points[0].x())
+        latest_epoch = int(points[-1].x())
+        
+        # 调整X轴范围
+        if self.show_full_curve:
+            # 显示全部曲线
+            if latest_epoch > 10:
+                # 计算合适的刻度间隔，确保刻度数量在5-10之间
+                tick_interval = max(1, (latest_epoch - start_epoch) // 10)
+                tick_count = (latest_epoch - start_epoch) // tick_interval + 1
+                
+                # 确保刻度数量合理
+                if tick_count > 15:
+                    tick_count = 11
+                
+                self.axis_x.setRange(start_epoch, latest_epoch)
+                self.axis_x.setTickCount(tick_count)
+            else:
+                self.axis_x.setRange(0, 10)
+                self.axis_x.setTickCount(11)
+        else:
+            # 只显示最近的点
+            window_size = min(self.RECENT_POINTS, len(points))
+            if window_size > 0 and latest_epoch > 10:
+                recent_start = int(points[-window_size].x())
+                self.axis_x.setRange(recent_start, latest_epoch)
+                self.axis_x.setTickCount(min(11, window_size + 1))
+            else:
+                self.axis_x.setRange(0, 10)
+                self.axis_x.setTickCount(11)
+        
+        # 调整Y轴范围（使用增量维护的最值，无需遍历全部数据）
+        max_y = max(self.max_y, 0.1)
+        min_y = min(self.min_y, 0.0)
+        
+        # 在最小值和最大值基础上留出一定的空间
+        y_range = max_y - min_y
+        self.axis_y.setRange(max(0, min_y - y_range * 0.1), max_y * 1.1)
+        self.axis_y.setTickCount(6)  # 减少刻度数，避免拥挤
+            
+        # 根据数值范围调整小数点格式
+        if max_y < 0.01:
+            self.axis_y.setLabelFormat("%.4f")  # 更多小数位
+        elif max_y < 0.1:
+            self.axis_y.setLabelFormat("%.3f")
+        else:
+            self.axis_y.setLabelFormat("%.2f")
+
     def stop_training(self):
         """停止训练"""
         confirm = QMessageBox.question(
@@ -1159,5 +1304,200 @@ class TrainingProgressDialog(QDialog):
     
     def closeEvent(self, event):
         """关闭窗口事件"""
-        self.timer.stop()
-        event.accept()
\ No newline at end of file
+        self.stop_subscription()
+        event.accept()
+
+
+class CalibrationWorker(QThread):
+    """
+    执行阈值校准（上传测试集、推理、计算指标）的工作线程
+    """
+    progress_signal = Signal(str, int, int)
+    finished_signal = Signal(dict)
+    error_signal = Signal(str)
+
+    def __init__(self, model_name, sample_group):
+        super().__init__()
+        self.model_name = model_name
+        self.sample_group = sample_group
+
+    def run(self):
+        try:
+            calibration = ThresholdCalibration(self.model_name, self.sample_group,
+                                               progress=self.progress_signal.emit).run()
+            self.finished_signal.emit(calibration)
+        except Exception as e:
+            self.error_signal.emit(str(e))
+
+
+class ThresholdCalibrationDialog(QDialog):
+    """
+    阈值校准对话框：显示测试集上的 ROC / PR 曲线和指标，按目标误拒率给出并应用判定阈值
+    """
+    def __init__(self, parent=None, model_name=None, sample_group=None):
+        super().__init__(parent)
+        self.setWindowTitle("阈值校准")
+        self.resize(900, 560)
+        self.model_name = model_name
+        self.sample_group = sample_group
+        self.calibration = load_model_info(model_name, "calibration") # 上次校准的结果
+        self.metrics = load_model_info(model_name, "metrics")
+        self.proposal = None
+        self.worker = None
+
+        main_layout = QVBoxLayout()
+        title_label = QLabel(f"模型 [{model_name}] 在样本组 [{sample_group}] 测试集上的校准")
+        title_label.setStyleSheet("font-size: 16px; font-weight: bold;")
+        title_label.setAlignment(Qt.AlignCenter)
+        main_layout.addWidget(title_label)
+
+        # ROC / PR 曲线
+        self.create_charts()
+        chart_layout = QHBoxLayout()
+        chart_layout.addWidget(self.roc_view)
+        chart_layout.addWidget(self.pr_view)
+        main_layout.addLayout(chart_layout)
+
+        # 指标和建议阈值
+        self.metrics_label = QLabel("尚未校准，点击“开始校准”在测试集上评估模型")
+        self.metrics_label.setWordWrap(True)
+        main_layout.addWidget(self.metrics_label)
+
+        # 目标误拒率，修改后立即重新计算建议阈值（无需重新推理）
+        control_layout = QHBoxLayout()
+        control_layout.addWidget(QLabel("目标误拒率(%):"))
+        self.frr_spin = QDoubleSpinBox()
+        self.frr_spin.setRange(0.0, 50.0)
+        self.frr_spin.setSingleStep(0.5)
+        self.frr_spin.setDecimals(1)
+        self.frr_spin.setValue(DEFAULT_TARGET_FRR * 100)
+        self.frr_spin.valueChanged.connect(self.update_proposal)
+        control_layout.addWidget(self.frr_spin)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(0)
+        control_layout.addWidget(self.progress_bar, 1)
+        self.start_button = QPushButton("开始校准")
+        self.start_button.clicked.connect(self.start_calibration)
+        control_layout.addWidget(self.start_button)
+        self.apply_button = QPushButton("应用阈值")
+        self.apply_button.setEnabled(False)
+        self.apply_button.clicked.connect(self.apply_threshold)
+        control_layout.addWidget(self.apply_button)
+        main_layout.addLayout(control_layout)
+
+        self.setLayout(main_layout)
+        if self.calibration:
+            self.show_calibration()
+
+    def create_charts(self):
+        """创建 ROC 和 PR 图表"""
+        # 打开校准窗口时才加载 QtCharts
+        from PySide6.QtCharts import QChart, QChartView, QLineSeries, QScatterSeries, QValueAxis
+        self.charts = {}
+        for key, title, x_title, y_title in (("roc", "ROC 曲线", "误检率", "检出率"),
+                                              ("pr", "PR 曲线", "查全率", "查准率")):
+            chart = QChart()
+            chart.setTitle(title)
+            chart.legend().setVisible(False)
+            chart.setBackgroundVisible(False)
+            series = QLineSeries()
+            point = QScatterSeries() # 建议阈值对应的工作点
+            point.setMarkerSize(10)
+            chart.addSeries(series)
+            chart.addSeries(point)
+            axis_x, axis_y = QValueAxis(), QValueAxis()
+            for axis, axis_title, alignment in ((axis_x, x_title, Qt.AlignBottom), (axis_y, y_title, Qt.AlignLeft)):
+                axis.setTitleText(axis_title)
+                axis.setRange(0, 1)
+                axis.setTickCount(6)
+                axis.setLabelFormat("%.1f")
+                chart.addAxis(axis, alignment)
+                series.attachAxis(axis)
+                point.attachAxis(axis)
+            view = QChartView(chart)
+            view.setRenderHint(QPainter.Antialiasing)
+            view.setMinimumHeight(300)
+            self.charts[key] = (series, point)
+            setattr(self, f"{key}_view", view)
+
+    def start_calibration(self):
+        """在工作线程中执行校准"""
+        self.start_button.setEnabled(False)
+        self.apply_button.setEnabled(False)
+        self.progress_bar.setValue(0)
+        self.worker = CalibrationWorker(self.model_name, self.sample_group)
+        self.worker.progress_signal.connect(self.on_progress)
+        self.worker.finished_signal.connect(self.on_finished)
+        self.worker.error_signal.connect(self.on_error)
+        self.worker.start()
+
+    def on_progress(self, stage, done, total):
+        self.progress_bar.setFormat(f"{stage} {done}/{total}")
+        self.progress_bar.setValue(int(done / total * 100) if total else 0)
+
+    def on_finished(self, calibration):
+        self.calibration = calibration
+        self.metrics = load_model_info(self.model_name, "metrics")
+        self.start_button.setEnabled(True)
+        self.progress_bar.setFormat("校准完成")
+        self.progress_bar.setValue(100)
+        self.show_calibration()
+
+    def on_error(self, message):
+        self.start_button.setEnabled(True)
+        self.progress_bar.setFormat("校准失败")
+        show_message_box("错误", f"阈值校准失败: {message}", QMessageBox.Critical, self)
+
+    def show_calibration(self):
+        """绘制曲线并按当前目标误拒率计算建议阈值"""
+        (fpr, tpr), (recall, precision) = image_curves(self.calibration)
+        for key, (x, y) in (("roc", (fpr, tpr)), ("pr", (recall, precision))):
+            series, _ = self.charts[key]
+            series.replace([QPointF(float(a), float(b)) for a, b in zip(x, y)])
+        self.update_proposal()
+
+    def update_proposal(self):
+        """按目标误拒率重新选取阈值，并更新指标文字和曲线上的工作点"""
+        if not self.calibration:
+            return
+        scores = self.calibration["scores"]
+        self.proposal = propose_threshold(scores["good"], scores["defect"], self.frr_spin.value() / 100)
+        self.apply_button.setEnabled(self.proposal is not None)
+        lines = [format_metrics(self.metrics, detailed=True)] if self.metrics else []
+        if self.proposal:
+            threshold = self.proposal["threshold"]
+            lines.append(f"建议阈值: {threshold:.4f}（当前 {config.DEFECT_THRESHOLD:.4f}）　"
+                         f"实际误拒率: {self.proposal['frr']:.2%}　漏检率: {self.proposal['miss_rate']:.2%}")
+            # 工作点：得分 > 阈值判为异常
+            good, defect = scores["good"], scores["defect"]
+            point_fpr = sum(score > threshold for score in good) / len(good)
+            point_tpr = self.proposal["recall"]
+            detected = sum(score > threshold for score in defect)
+            precision = detected / (detected + point_fpr * len(good)) if detected else 1.0
+            self.charts["roc"][1].replace([QPointF(point_fpr, point_tpr)])
+            self.charts["pr"][1].replace([QPointF(point_tpr, precision)])
+        self.metrics_label.setText("\n".join(lines))
+
+    def apply_threshold(self):
+        """将建议阈值设为项目的缺陷判定阈值"""
+        if not self.proposal:
+            return
+        # 阈值刻度为 0.01，向上取整保证误拒率不超过目标
+        threshold = math.ceil(self.proposal["threshold"] * 100 - 1e-9) / 100
+        config.DEFECT_THRESHOLD = threshold
+        update_metadata('defect_threshold', threshold)
+        if config.DETECT_SAMPLE_GROUP:
+            get_result_store().apply_threshold(config.DETECT_SAMPLE_GROUP, threshold)
+        # 同步检测页的阈值滑动条
+        slider = self.parent().window().findChild(QSlider, "thresholdSlider") if self.parent() else None
+        if slider is not None:
+            slider.setValue(int(round(threshold * 100)))
+        show_message_box("阈值设置", f"已应用新阈值: {threshold:.2f}", QMessageBox.Information, self)
+        self.update_proposal()
+
+    def reject(self):
+        if self.worker and self.worker.isRunning():
+            show_message_box("提示", "校准正在进行中，请等待完成后再关闭", QMessageBox.Warning, self)
+            return
+        super().reject()
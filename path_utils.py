@@ -0,0 +1,28 @@
+"""
+路径与文件名工具（不依赖 Qt，界面和命令行工具共用）
+"""
+import os
+
+# OpenCV / Qt 可以直接解码的图片格式
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.tif', '.tiff', '.webp', '.jp2', '.j2k')
+# 需要可选依赖解码、导入时转换为训练格式的图片（HEIC / 相机 RAW / PSD / DPX，见 config.IMAGE_FORMATS）
+TRANSCODE_EXTENSIONS = ('.heic', '.heif', '.raw', '.cr2', '.nef', '.arw', '.dng', '.psd', '.dpx')
+
+
+def is_image(file_name: str) -> bool:
+    """
+    判断文件是否为可以直接读取的图片文件
+    """
+    return file_name.lower().endswith(IMAGE_EXTENSIONS)
+
+def needs_transcode(file_name: str) -> bool:
+    """
+    判断图片是否需要在导入时转换格式（OpenCV / Qt 无法直接读取）
+    """
+    return file_name.lower().endswith(TRANSCODE_EXTENSIONS)
+
+def join_path(*args) -> str:
+    """
+    拼接跨平台路径，强制args之中及其之间的分隔符为 /
+    """
+    return os.path.join(*args).replace("\\", "/")
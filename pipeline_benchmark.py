@@ -0,0 +1,306 @@
+"""
+端到端流程基准测试（无界面运行）
+
+使用本地模拟服务器和合成数据集（默认 100 / 1000 / 10000 张图），依次计时以下阶段：
+    open_project  打开项目（读取元数据、建立项目索引）
+    load_images   LoadImages 加载样本组列表
+    upload        UploadSampleGroup_HTTP 上传样本组
+    detect        HttpDetectSamples 推理并下载、显示全部结果
+    analyze       DefectTextureAnalyzer.generate_report 生成分析报告
+    export_pdf    build_pdf_report 导出 PDF（同时记录 PDF 文件大小）
+每种数据规模在独立子进程中运行，记录各阶段耗时和进程峰值内存，
+结果与 pipeline_baseline.json 中的基线比较，超过容差则以非零状态码退出
+
+用法:
+    python pipeline_benchmark.py                       # 运行全部规模并与基线比较
+    python pipeline_benchmark.py --sizes 100 1000      # 只运行指定规模
+    python pipeline_benchmark.py --update-baseline     # 运行并写入新的基线
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+APP_DIR = os.path.dirname(os.path.realpath(__file__))
+BASELINE_FILE = os.path.join(APP_DIR, "pipeline_baseline.json")
+DEFAULT_SIZES = [100, 1000, 10000]
+STAGES = ["open_project", "load_images", "upload", "detect", "analyze", "export_pdf"]
+# 相对基线允许的性能波动
+TOLERANCE = 0.25
+# 耗时很短的阶段允许的绝对波动（秒），避免计时噪声导致误报
+MIN_SLACK = 0.05
+GROUP_NAME = "bench_group"
+MODEL_NAME = "bench_model"
+
+
+def peak_rss_mb():
+    """进程峰值内存（MB），无法获取时返回 None"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 单位为 KB，macOS 为字节
+        return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / 1024 / 1024
+    except ImportError:
+        return None
+
+
+def make_dataset(folder, count, size=128):
+    """
+    生成 count 张互不相同的合成样本图（在同一张底图上改变一行像素，避免逐像素生成的开销）
+    """
+    from mock_server import encode_png
+    os.makedirs(folder, exist_ok=True)
+    rng = random.Random(0)
+    base_rows = [bytes(rng.randint(80, 170) for _ in range(size * 3)) for _ in range(size)]
+    for i in range(count):
+        rows = list(base_rows)
+        row = i % size
+        rows[row] = bytes((i * 7 + x) % 256 for x in range(size * 3))
+        with open(os.path.join(folder, f"sample_{i:05d}.png"), "wb") as f:
+            f.write(encode_png(size, size, rows))
+
+
+def create_project(work_dir, count):
+    """在 work_dir 中创建带一个样本组的合成项目，返回项目路径"""
+    import config
+    project_path = os.path.join(work_dir, "bench_project").replace("\\", "/")
+    os.makedirs(project_path, exist_ok=True)
+    metadata = {
+        "project_name": "bench_project",
+        "project_path": project_path,
+        "description": f"pipeline benchmark ({count} images)",
+        "create_time": time.strftime("%Y-%m-%d %H:%M:%S")
+    }
+    with open(os.path.join(project_path, config.PROJECT_METADATA_FILE), "w", encoding="utf-8") as f:
+        json.dump(metadata, f, ensure_ascii=False, indent=4)
+    make_dataset(os.path.join(project_path, config.SAMPLE_FOLDER, GROUP_NAME), count)
+    os.makedirs(os.path.join(project_path, config.MODEL_FOLDER, MODEL_NAME), exist_ok=True)
+    os.makedirs(os.path.join(project_path, config.DETECT_FOLDER, GROUP_NAME), exist_ok=True)
+    return project_path
+
+
+def start_modal_dismisser(app):
+    """
+    无界面运行时自动关闭模态对话框（相当于操作员点击默认按钮），避免流程阻塞在提示框上
+    """
+    from PySide6.QtCore import QTimer
+    from PySide6.QtWidgets import QMessageBox
+
+    def dismiss():
+        widget = app.activeModalWidget()
+        if isinstance(widget, QMessageBox):
+            button = widget.defaultButton()
+            if button:
+                button.click()
+            else:
+                widget.accept()
+
+    timer = QTimer()
+    timer.timeout.connect(dismiss)
+    timer.start(50)
+    return timer
+
+
+def run_pipeline(count, work_dir, mock_options, timeout=3600):
+    """
+    在当前进程中运行一次完整流程（由子进程调用）
+
+    Returns:
+        {"images", "stages": {阶段: 秒}, "rss_mb": {阶段: 峰值MB}, "peak_rss_mb", "server": 模拟服务器统计}
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    sys.path.insert(0, APP_DIR)
+    from PySide6.QtWidgets import QApplication, QLabel, QListWidget, QTextBrowser, QWidget
+
+    import config
+    from mock_server import MockState, start_in_background, use_mock_server
+
+    app = QApplication.instance() or QApplication([])
+    dismisser = start_modal_dismisser(app)
+    server, state = start_in_background(state=MockState(**mock_options))
+    use_mock_server(server)
+    project_path = create_project(work_dir, count)
+
+    stages = {}
+    rss = {}
+
+    @contextmanager
+    def stage(name):
+        start = time.perf_counter()
+        yield
+        stages[name] = time.perf_counter() - start
+        rss[name] = peak_rss_mb()
+        print(f"[{count}] {name}: {stages[name]:.3f}s")
+
+    # 界面替身：只提供各流程用到的控件
+    ui = QWidget()
+    for name in ("sampleList", "detectList"):
+        setattr(ui, name, QListWidget(ui))
+    ui.detectColumn = QWidget(ui)
+    ui.toolbarWidget = QWidget(ui)
+    ui.resultLabel = QLabel(ui)
+    ui.resultLabel.resize(900, 300)
+    ui.resultBrowser = QTextBrowser(ui)
+
+    with stage("open_project"):
+        from utils import get_metadata_store
+        from project_index import get_project_index
+        config.PROJECT_METADATA_PATH = os.path.join(project_path, config.PROJECT_METADATA_FILE).replace("\\", "/")
+        config.PROJECT_METADATA = get_metadata_store().refresh()
+        config.SAMPLE_PATH = os.path.join(project_path, config.SAMPLE_FOLDER).replace("\\", "/")
+        config.MODEL_PATH = os.path.join(project_path, config.MODEL_FOLDER).replace("\\", "/")
+        config.DETECT_PATH = os.path.join(project_path, config.DETECT_FOLDER).replace("\\", "/")
+        get_project_index()
+
+    with stage("load_images"):
+        from sample_handler import LoadImages
+        LoadImages(ui, os.path.join(config.SAMPLE_PATH, GROUP_NAME), "sampleList").load_with_animation()
+
+    from http_server import HttpDetectSamples, HttpServer, UploadSampleGroup_HTTP
+    http_server = HttpServer()
+    http_server.add_group(GROUP_NAME)
+    http_server.add_model({"name": MODEL_NAME, "input_h": 224, "input_w": 224, "end_acc": 0.5,
+                           "layers": "['layer2', 'layer3']", "patchsize": 3, "embed_dimension": 1024})
+    config.SAMPLE_GROUP = config.DETECT_SAMPLE_GROUP = GROUP_NAME
+    config.MODEL_GROUP = MODEL_NAME
+
+    with stage("upload"):
+        UploadSampleGroup_HTTP(ui, GROUP_NAME).run()
+
+    with stage("detect"):
+        detector = HttpDetectSamples(ui)
+        detector.detect_samples()
+        deadline = time.time() + timeout
+        while detector.model_id is not None and time.time() < deadline:
+            app.processEvents()
+            time.sleep(0.001)
+        if detector.model_id is not None:
+            raise RuntimeError("检测超时")
+
+    with stage("analyze"):
+        from detect_report import DefectTextureAnalyzer
+        analyzer = DefectTextureAnalyzer(config.DETECT_PATH, GROUP_NAME)
+        analyzer.threshold = config.DEFECT_THRESHOLD
+        analyzer.eps = 0.5
+        analyzer.min_samples = 3
+        analyzer.grid_size = 3
+        report_info = analyzer.generate_report()
+
+    pdf_stats = None
+    with stage("export_pdf"):
+        if report_info:
+            from detect_report import build_pdf_report
+            pdf_stats = build_pdf_report(report_info["report_data"], os.path.dirname(report_info["report_file"]),
+                                         report_info.get("chart_file"), report_info.get("histogram_chart"),
+                                         report_info.get("pie_chart"))
+
+    dismisser.stop()
+    server.shutdown()
+    return {
+        "images": count,
+        "stages": stages,
+        "rss_mb": rss,
+        "peak_rss_mb": peak_rss_mb(),
+        "server": state.stats,
+        "pdf_size_kb": pdf_stats["size"] / 1024 if pdf_stats else None,
+    }
+
+
+def run_size(count, mock_options, keep=False):
+    """在子进程中运行一种数据规模，返回结果字典"""
+    work_dir = tempfile.mkdtemp(prefix=f"pipeline_bench_{count}_")
+    result_file = os.path.join(work_dir, "result.json")
+    try:
+        subprocess.run([sys.executable, os.path.realpath(__file__), "--run-one", str(count),
+                        "--work-dir", work_dir, "--result-file", result_file,
+                        "--mock-options", json.dumps(mock_options)], cwd=APP_DIR, check=True)
+        with open(result_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    finally:
+        if not keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def compare_with_baseline(results, baseline):
+    """与基线比较，返回回归描述列表"""
+    regressions = []
+    for size, result in results.items():
+        base = baseline.get(size)
+        if not base:
+            continue
+        for name, seconds in result["stages"].items():
+            limit = base.get("stages", {}).get(name)
+            if limit is not None and seconds > max(limit * (1 + TOLERANCE), limit + MIN_SLACK):
+                regressions.append(f"[{size}] {name}: {seconds:.3f}s > 基线 {limit:.3f}s (+{TOLERANCE:.0%})")
+        peak, base_peak = result.get("peak_rss_mb"), base.get("peak_rss_mb")
+        if peak and base_peak and peak > base_peak * (1 + TOLERANCE):
+            regressions.append(f"[{size}] peak_rss_mb: {peak:.1f} > 基线 {base_peak:.1f} (+{TOLERANCE:.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端流程基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="数据集图片数量")
+    parser.add_argument("--latency", type=float, default=0.0, help="模拟服务器每个请求的延迟（秒）")
+    parser.add_argument("--bandwidth", type=float, default=None, help="模拟服务器带宽（字节/秒）")
+    parser.add_argument("--infer-interval", type=float, default=0.001, help="模拟服务器每张图推理耗时（秒）")
+    parser.add_argument("--update-baseline", action="store_true", help="将本次结果写入基线文件")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    parser.add_argument("--keep", action="store_true", help="保留生成的临时项目目录")
+    # 子进程内部参数
+    parser.add_argument("--run-one", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--work-dir", help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    parser.add_argument("--mock-options", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        result = run_pipeline(args.run_one, args.work_dir, json.loads(args.mock_options))
+        with open(args.result_file, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False)
+        # 跳过 Qt 对象析构，直接结束子进程
+        os._exit(0)
+
+    mock_options = {"latency": args.latency, "bandwidth": args.bandwidth,
+                    "infer_interval": args.infer_interval, "heatmap_size": 224}
+    results = {str(size): run_size(size, mock_options, args.keep) for size in args.sizes}
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=4))
+    else:
+        print(f"{'规模':>8}  " + "  ".join(f"{name:>12}" for name in STAGES) + f"  {'峰值内存MB':>10}")
+        for size, result in results.items():
+            cells = "  ".join(f"{result['stages'].get(name, float('nan')):12.3f}" for name in STAGES)
+            print(f"{size:>8}  {cells}  {result['peak_rss_mb'] or 0:10.1f}")
+
+    baseline = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    if args.update_baseline or not baseline:
+        for size, result in results.items():
+            baseline[size] = {"stages": result["stages"], "peak_rss_mb": result["peak_rss_mb"]}
+        with open(BASELINE_FILE, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=4)
+        print(f"已写入基线: {BASELINE_FILE}")
+        return 0
+    regressions = compare_with_baseline(results, baseline)
+    for regression in regressions:
+        print(f"性能回归: {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
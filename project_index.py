@@ -0,0 +1,208 @@
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+from PySide6.QtCore import QObject, QFileSystemWatcher, Signal
+
+import config
+from utils import get_model_info, is_image, join_path
+
+
+@dataclass
+class GroupEntry:
+    """
+    样本组 / 检测组的索引信息
+    """
+    name: str
+    path: str
+    image_count: int = 0 # 图片数量（不含 .hashes.json、.edits.json 等附属文件和子目录）
+    total_size: int = 0 # 图片总字节数
+    mtime: float = 0.0 # 最近一次修改时间
+
+
+@dataclass
+class ModelEntry:
+    """
+    模型组的索引信息
+    """
+    name: str
+    path: str
+    has_files: bool = False
+    status: int = -1 # 与 model.json 中的 status 一致，-1 表示无模型信息
+    metrics: Optional[dict] = None # model.json 中的评估指标记录
+    dataset_snapshot: Optional[dict] = None # model.json 中训练数据的版本 {"group", "id"}
+
+
+class ProjectIndex(QObject):
+    """
+    项目文件索引：打开项目时扫描一次样本组、检测组和模型组，
+    之后由 QFileSystemWatcher 只重扫发生变化的目录，各对话框直接查询索引
+    """
+    changed = Signal(str) # 索引发生变化，参数为变化的目录路径
+
+    def __init__(self, project_path):
+        super().__init__()
+        self.project_path = project_path
+        self.sample_root = join_path(project_path, config.SAMPLE_FOLDER)
+        self.model_root = join_path(project_path, config.MODEL_FOLDER)
+        self.detect_root = join_path(project_path, config.DETECT_FOLDER)
+        self.samples = {} # {组名: GroupEntry}
+        self.detects = {} # {组名: GroupEntry}
+        self.models = {} # {模型组名: ModelEntry}
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.on_directory_changed)
+        self.watcher.fileChanged.connect(self.on_file_changed)
+        self.rebuild()
+
+    # -------------------- 扫描 --------------------
+    def rebuild(self):
+        """全量重建索引"""
+        self.samples = self._scan_groups(self.sample_root)
+        self.detects = self._scan_groups(self.detect_root)
+        self.models = self._scan_models()
+        # 重新设置监视列表
+        watched = self.watcher.directories() + self.watcher.files()
+        if watched:
+            self.watcher.removePaths(watched)
+        paths = [root for root in (self.sample_root, self.model_root, self.detect_root) if os.path.isdir(root)]
+        paths += [entry.path for entry in self.samples.values()]
+        paths += [entry.path for entry in self.detects.values()]
+        for entry in self.models.values():
+            paths.append(entry.path)
+            model_info_path = join_path(entry.path, config.MODEL_INFO_FILE)
+            if os.path.exists(model_info_path):
+                paths.append(model_info_path)
+        if paths:
+            self.watcher.addPaths(paths)
+        print(f"项目索引已建立: {len(self.samples)} 个样本组, {len(self.detects)} 个检测组, {len(self.models)} 个模型组")
+
+    def _scan_group(self, name, path):
+        """扫描单个组目录（一次 scandir 得到文件名、大小和修改时间）"""
+        entry = GroupEntry(name, path)
+        try:
+            entry.mtime = os.stat(path).st_mtime
+            with os.scandir(path) as it:
+                for item in it:
+                    if item.is_file() and is_image(item.name):
+                        item_stat = item.stat()
+                        entry.image_count += 1
+                        entry.total_size += item_stat.st_size
+                        entry.mtime = max(entry.mtime, item_stat.st_mtime)
+        except OSError:
+            pass
+        return entry
+
+    def _scan_groups(self, root):
+        groups = {}
+        if not os.path.isdir(root):
+            return groups
+        with os.scandir(root) as it:
+            for item in it:
+                if item.is_dir():
+                    groups[item.name] = self._scan_group(item.name, join_path(root, item.name))
+        return groups
+
+    def _scan_model(self, name, path):
+        entry = ModelEntry(name, path)
+        try:
+            entry.has_files = any(True for _ in os.scandir(path))
+        except OSError:
+            entry.has_files = False
+        model_info = get_model_info(name) or {}
+        entry.status = model_info.get("status", -1)
+        entry.metrics = model_info.get("metrics")
+        entry.dataset_snapshot = model_info.get("dataset_snapshot")
+        return entry
+
+    def _scan_models(self):
+        models = {}
+        if not os.path.isdir(self.model_root):
+            return models
+        with os.scandir(self.model_root) as it:
+            for item in it:
+                if item.is_dir():
+                    models[item.name] = self._scan_model(item.name, join_path(self.model_root, item.name))
+        return models
+
+    # -------------------- 增量更新 --------------------
+    def on_directory_changed(self, path):
+        """目录内容变化时，只重扫该目录"""
+        path = join_path(path)
+        parent, name = os.path.split(path)
+        if path in (self.sample_root, self.detect_root, self.model_root):
+            # 组的新增或删除，重建对应的一级索引
+            self.rebuild()
+        elif parent == self.sample_root:
+            self._update_group(self.samples, name, path)
+        elif parent == self.detect_root:
+            self._update_group(self.detects, name, path)
+        elif parent == self.model_root:
+            self._update_model(name, path)
+        self.changed.emit(path)
+
+    def on_file_changed(self, path):
+        """model.json 变化时，更新模型状态"""
+        path = join_path(path)
+        model_path = os.path.dirname(path)
+        self._update_model(os.path.basename(model_path), model_path)
+        self.changed.emit(path)
+
+    def _update_group(self, groups, name, path):
+        if os.path.isdir(path):
+            groups[name] = self._scan_group(name, path)
+        else:
+            groups.pop(name, None)
+
+    def _update_model(self, name, path):
+        if not os.path.isdir(path):
+            self.models.pop(name, None)
+            return
+        self.models[name] = self._scan_model(name, path)
+        # model.json 可能被替换或新建，重新加入监视
+        model_info_path = join_path(path, config.MODEL_INFO_FILE)
+        if os.path.exists(model_info_path) and model_info_path not in self.watcher.files():
+            self.watcher.addPath(model_info_path)
+
+    def invalidate(self, path):
+        """
+        主动通知索引某个目录已变化（适用于程序自身刚写完文件、不想等待文件系统通知的情况）
+        """
+        self.on_directory_changed(path)
+
+    # -------------------- 查询 --------------------
+    def sample_groups(self):
+        """样本组列表 [GroupEntry]，按组名排序"""
+        return [self.samples[name] for name in sorted(self.samples)]
+
+    def sample_group(self, name):
+        return self.samples.get(name)
+
+    def detect_groups(self):
+        """检测组列表 [GroupEntry]，按组名排序"""
+        return [self.detects[name] for name in sorted(self.detects)]
+
+    def model_groups(self):
+        """模型组列表 [ModelEntry]，按组名排序"""
+        return [self.models[name] for name in sorted(self.models)]
+
+    def model_status(self, name):
+        entry = self.models.get(name)
+        return entry.status if entry else -1
+
+    def image_count(self, sample_group):
+        """样本组中的图片数量，组不存在时返回 0"""
+        entry = self.samples.get(sample_group)
+        return entry.image_count if entry else 0
+
+
+_project_index = None
+
+def get_project_index():
+    """
+    获取当前项目的文件索引，项目切换时自动重建
+    """
+    global _project_index
+    project_path = config.PROJECT_METADATA['project_path']
+    if _project_index is None or _project_index.project_path != project_path:
+        _project_index = ProjectIndex(project_path)
+    return _project_index
@@ -0,0 +1,247 @@
+"""
+缺陷分析报告的统计图表
+
+图表使用 matplotlib 的面向对象接口（Figure + Agg 画布）绘制，不经过 pyplot 的全局状态：
+    - 各图表相互独立，提交到常驻的子进程池中并行绘制，报告的图表耗时约等于最慢的一张
+    - 中文字体在每个进程中只查找、设置一次（setup_fonts）
+    - 输出格式和分辨率由 config.REPORT_CHART_FORMAT / REPORT_CHART_DPI 配置
+子进程不可用时（进程池损坏等）退回在当前进程中依次绘制
+绘制函数只接收可序列化的数据（列表、路径），背景图在子进程中读取
+
+本模块不依赖 Qt
+"""
+import functools
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+import config
+import tracing
+from lazy_import import lazy_import
+
+cv2 = lazy_import("cv2")
+logger = logging.getLogger(__name__)
+
+CJK_FONTS = ('SimHei', 'Microsoft YaHei', 'SimSun', 'Arial Unicode MS', 'Noto Sans CJK SC', 'WenQuanYi Micro Hei')
+CHART_WORKERS = 3 # 子进程数（报告共三张图）
+PIE_COLORS = ['#1976D2', '#4CAF50', '#FF9800', '#9C27B0', '#F44336', '#00BCD4', '#FFEB3B']
+
+_pool = None
+
+
+@functools.lru_cache(maxsize=None)
+def setup_fonts():
+    """
+    设置中文字体（每个进程只执行一次）：只保留系统中实际存在的字体，避免每次绘制时逐个查找缺失的字体
+
+    Returns:
+        使用的中文字体列表
+    """
+    import matplotlib
+    from matplotlib import font_manager
+    available = {font.name for font in font_manager.fontManager.ttflist}
+    fonts = [name for name in CJK_FONTS if name in available]
+    if not fonts:
+        logger.warning("未找到中文字体，图表中的中文可能无法显示")
+    matplotlib.rcParams['font.sans-serif'] = fonts + [name for name in matplotlib.rcParams['font.sans-serif'] if name not in fonts]
+    matplotlib.rcParams['font.family'] = 'sans-serif'
+    matplotlib.rcParams['axes.unicode_minus'] = False # 解决负号显示问题
+    return fonts
+
+
+def _new_figure(figsize):
+    setup_fonts()
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    figure = Figure(figsize=figsize)
+    FigureCanvasAgg(figure)
+    return figure
+
+
+def _save(figure, path, dpi, **kwargs):
+    figure.savefig(path, dpi=dpi, **kwargs)
+    return path
+
+
+def _error_chart(path, dpi, message):
+    """绘制失败时输出一张带错误信息的图"""
+    figure = _new_figure((10, 6))
+    ax = figure.add_subplot(1, 1, 1)
+    ax.text(0.5, 0.5, f"Error generating chart: {message}", ha='center', va='center', fontsize=12)
+    ax.axis('off')
+    return _save(figure, path, dpi)
+
+
+# -------------------- 各图表 --------------------
+def draw_position_chart(path, dpi, title, heatmap, clusters, background_paths):
+    """
+    缺陷位置分布热图
+
+    Args:
+        heatmap: 50x50 的缺陷频率（已平滑）
+        clusters: 聚类结果 [{"center": [x, y], "count": n}]，坐标为 0~1 的相对位置
+        background_paths: 依次尝试作为背景的图片路径
+    """
+    figure = _new_figure((10, 10))
+    figure.suptitle(title, fontsize=16)
+    ax = figure.add_subplot(1, 1, 1)
+    ax.set_title("缺陷位置分布热图")
+
+    background_width, background_height = 50, 50 # 没有背景图时的默认尺寸
+    for background_path in background_paths:
+        if not background_path or not os.path.exists(background_path):
+            continue
+        try:
+            background = cv2.imdecode(np.fromfile(background_path, np.uint8), cv2.IMREAD_COLOR)
+            background = cv2.cvtColor(background, cv2.COLOR_BGR2RGB)
+            background_height, background_width = background.shape[:2]
+            ax.imshow(background, aspect='auto')
+            break
+        except Exception as e:
+            logger.error(f"加载背景图像失败: {background_path}: {str(e)}")
+    else:
+        ax.set_facecolor('white')
+        ax.set_xlim(0, background_width)
+        ax.set_ylim(0, background_height)
+
+    im = ax.imshow(np.asarray(heatmap), cmap='hot', interpolation='nearest', alpha=0.7,
+                   extent=[0, background_width, background_height, 0])
+    figure.colorbar(im, ax=ax, label='缺陷频率')
+
+    # 标注缺陷聚类中心
+    for i, cluster in enumerate(clusters):
+        x = cluster['center'][0] * background_width
+        y = cluster['center'][1] * background_height
+        ax.plot(x, y, 'go', markersize=18, alpha=0.7)
+        ax.annotate(f"C{i+1}: {cluster['count']}个", xy=(x, y), xytext=(x+30, y+30), color='white',
+                    fontweight='bold', fontsize=18, bbox=dict(facecolor='black', alpha=0.5))
+
+    figure.tight_layout(rect=[0, 0, 1, 0.95])
+    return _save(figure, path, dpi)
+
+
+def _draw_distribution(ax, title, xlabel, normal, anomaly, bin_edges, histogram, empty_text):
+    """
+    一个区域特征的分布：有正常 / 异常区域的取值时分别绘制（相同分箱，可比较），否则绘制总体直方图
+    """
+    ax.set_title(title)
+    if normal or anomaly:
+        values = normal + anomaly
+        bin_range = (min(values), max(values))
+        if normal:
+            ax.hist(normal, bins=20, range=bin_range, alpha=0.7, color='green',
+                    density=True, label='正常区域', edgecolor='black', linewidth=0.5)
+        if anomaly:
+            ax.hist(anomaly, bins=20, range=bin_range, alpha=0.7, color='red',
+                    density=True, label='异常区域', edgecolor='black', linewidth=0.5)
+        ax.legend()
+    elif len(bin_edges) >= 2:
+        bin_centers = [(bin_edges[i] + bin_edges[i+1]) / 2 for i in range(len(bin_edges) - 1)]
+        total = sum(histogram)
+        frequency = [count / total for count in histogram] if total > 0 else histogram
+        ax.bar(bin_centers, frequency, width=(bin_edges[1] - bin_edges[0]) * 0.8,
+               color='lightgray', alpha=0.7, label='总体分布')
+        ax.legend()
+    else:
+        ax.text(0.5, 0.5, empty_text, ha='center', va='center')
+    ax.grid(True, alpha=0.3)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel('出现频率')
+
+
+def draw_histogram_chart(path, dpi, patch_stats):
+    """网格区域特征统计直方图：亮度（均值）、纹理复杂度（方差）、边缘密度"""
+    figure = _new_figure((8, 10))
+    panels = (
+        ('区域亮度分布', '亮度值', 'means', 'mean_bin_edges', 'mean_histogram', '无均值数据'),
+        ('区域纹理复杂度分布', '纹理复杂度值', 'variances', 'variance_bin_edges', 'variance_histogram', '无方差数据'),
+        ('区域边缘密度分布', '边缘密度值', 'edges', 'edges_bin_edges', 'edges_histogram', '无边缘密度数据'),
+    )
+    for index, (title, xlabel, key, edges_key, histogram_key, empty_text) in enumerate(panels, 1):
+        _draw_distribution(figure.add_subplot(3, 1, index), title, xlabel,
+                           patch_stats.get(f'normal_{key}', []), patch_stats.get(f'anomaly_{key}', []),
+                           patch_stats.get(edges_key, []), patch_stats.get(histogram_key, []), empty_text)
+    figure.tight_layout()
+    return _save(figure, path, dpi)
+
+
+def draw_pie_chart(path, dpi, type_counts):
+    """缺陷类型分布饼图（基于样本数量）"""
+    figure = _new_figure((7, 5))
+    ax = figure.add_subplot(1, 1, 1)
+    labels = list(type_counts.keys())
+    ax.pie(list(type_counts.values()), labels=labels, colors=PIE_COLORS[:len(labels)], autopct='%1.1f%%',
+           shadow=False, startangle=90, textprops={'fontsize': 10})
+    ax.axis('equal')
+    ax.set_title('缺陷类型分布（基于样本数量）', fontsize=12)
+    return _save(figure, path, dpi, bbox_inches='tight')
+
+
+def _render(draw, path, dpi, args):
+    """在子进程中绘制一张图表，失败时输出错误图"""
+    try:
+        return draw(path, dpi, *args)
+    except Exception as e:
+        logger.error(f"生成图表 {os.path.basename(path)} 时出错: {str(e)}")
+        return _error_chart(path, dpi, str(e))
+
+
+# -------------------- 并行绘制 --------------------
+def _prepare_worker():
+    """子进程初始化：导入 matplotlib、OpenCV，设置字体，并绘制一张小图完成字体和 Agg 渲染的首次加载"""
+    from io import BytesIO
+    cv2.imdecode # 触发延迟导入
+    figure = _new_figure((1, 1))
+    figure.text(0.5, 0.5, "缺陷 0.5")
+    figure.savefig(BytesIO(), format="png", dpi=10)
+
+
+def get_chart_pool():
+    """图表绘制进程池（常驻，子进程启动时即完成导入和字体设置）"""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=CHART_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+                                    initializer=_prepare_worker)
+    return _pool
+
+
+def warm_up():
+    """提前启动全部子进程，与报告的数据分析同时进行"""
+    try:
+        pool = get_chart_pool()
+        for _ in range(CHART_WORKERS):
+            pool.submit(os.getpid)
+    except Exception as e:
+        logger.warning(f"启动图表进程失败: {str(e)}")
+
+
+def chart_path(folder, name):
+    """图表文件路径（扩展名由 config.REPORT_CHART_FORMAT 决定）"""
+    return os.path.join(folder, f"{name}.{config.REPORT_CHART_FORMAT}")
+
+
+@tracing.traced("report.charts", cat="report")
+def render_charts(jobs):
+    """
+    并行绘制图表
+
+    Args:
+        jobs: {名称: (绘制函数, 输出路径, 参数元组)}
+
+    Returns:
+        {名称: 图表路径}，绘制失败的图表输出错误图
+    """
+    global _pool
+    dpi = config.REPORT_CHART_DPI
+    try:
+        pool = get_chart_pool()
+        futures = {name: pool.submit(_render, draw, path, dpi, args) for name, (draw, path, args) in jobs.items()}
+        return {name: future.result() for name, future in futures.items()}
+    except (BrokenProcessPool, OSError, RuntimeError) as e:
+        logger.warning(f"图表进程不可用，改为在当前进程中绘制: {str(e)}")
+        _pool = None
+        return {name: _render(draw, path, dpi, args) for name, (draw, path, args) in jobs.items()}
@@ -0,0 +1,286 @@
+"""
+PDF 报告的排版工具
+
+导出 PDF 时的耗时和文件大小主要来自嵌入的图片，因此：
+    - 图片按在页面上的显示尺寸和目标打印分辨率（config.REPORT_PDF_DPI）缩小，重新编码为 JPEG 写入临时目录，
+      reportlab 直接写入 JPEG 数据，不再解码、压缩整幅 PNG
+    - 中文字体和段落样式每个进程只注册、创建一次（register_fonts / get_styles）
+    - 内容以生成器的形式逐段提供（FlowableStream），排好的内容即写入页面并释放，
+      缺陷样本附录的图片在线程池中提前少量准备，不会一次全部加载
+    - 附录最多包含 config.REPORT_APPENDIX_MAX_IMAGES 张缺陷样本，报告规模不随样本数无限增长
+需要 reportlab（未安装时导入本模块会抛出 ImportError）
+
+本模块不依赖 Qt
+"""
+import functools
+import logging
+import os
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import cm, inch
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Table, TableStyle
+
+import config
+import tracing
+from lazy_import import lazy_import
+
+cv2 = lazy_import("cv2")
+logger = logging.getLogger(__name__)
+
+CN_FONTS = (('SimSun', 'simsun.ttc'), ('SimHei', 'simhei.ttf'))
+STREAM_WINDOW = 16 # FlowableStream 中预先取出的内容数（需大于连续 keepWithNext 的内容数）
+PREFETCH = 4 # 附录图片提前准备的数量
+
+
+@functools.lru_cache(maxsize=None)
+def register_fonts():
+    """
+    注册中文字体（每个进程只执行一次）
+
+    Returns:
+        正文使用的字体名，未找到中文字体时为 Helvetica
+    """
+    try:
+        for name, file_name in CN_FONTS:
+            pdfmetrics.registerFont(TTFont(name, file_name))
+        return CN_FONTS[0][0]
+    except Exception:
+        logger.warning("未找到中文字体，使用默认字体")
+        return 'Helvetica'
+
+
+@functools.lru_cache(maxsize=None)
+def get_styles():
+    """报告使用的段落样式（只创建一次）"""
+    font_name = register_fonts()
+    styles = getSampleStyleSheet()
+    styles.add(ParagraphStyle(name='ReportTitle', fontName=font_name, fontSize=18, alignment=1, spaceAfter=12))
+    styles.add(ParagraphStyle(name='ReportHeading1', fontName=font_name, fontSize=16, spaceAfter=10))
+    styles.add(ParagraphStyle(name='ReportHeading2', fontName=font_name, fontSize=14, spaceAfter=12, spaceBefore=12))
+    styles.add(ParagraphStyle(name='ReportNormal', fontName=font_name, fontSize=12, leading=16))
+    styles.add(ParagraphStyle(name='ImageCaption', fontName=font_name, fontSize=10, alignment=1, spaceAfter=20,
+                              textColor=colors.gray))
+    styles.add(ParagraphStyle(name='ReportItalic', fontName=font_name, fontSize=10, leading=14, italic=True,
+                              textColor=colors.darkgrey))
+    styles.add(ParagraphStyle(name='ReportNote', fontName=font_name, fontSize=9, leading=12, italic=True,
+                              textColor=colors.grey))
+    styles.add(ParagraphStyle(name='ReportBold', fontName=font_name, fontSize=12, leading=16, fontWeight='bold'))
+    return styles
+
+
+# -------------------- 图片 --------------------
+def encode_image(path, width, height=None, dpi=None, quality=None):
+    """
+    按显示尺寸和打印分辨率缩小图片并编码为 JPEG（只缩不放）
+
+    Args:
+        path: 图片路径
+        width: 页面上的显示宽度（pt）
+        height: 显示高度（pt），None 表示按宽高比计算
+        dpi: 打印分辨率，默认 config.REPORT_PDF_DPI
+        quality: JPEG 质量，默认 config.REPORT_PDF_JPEG_QUALITY
+
+    Returns:
+        (JPEG 数据, 显示宽度, 显示高度)，无法读取时抛出异常
+    """
+    dpi = dpi or config.REPORT_PDF_DPI
+    quality = quality or config.REPORT_PDF_JPEG_QUALITY
+    with tracing.span("report.pdf_image", cat="image"):
+        image = cv2.imdecode(np.fromfile(path, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise RuntimeError(f"无法读取图片: {path}")
+        image_height, image_width = image.shape[:2]
+        if height is None:
+            height = width * image_height / image_width
+        target_width = max(1, round(width / inch * dpi))
+        target_height = max(1, round(height / inch * dpi))
+        if image_width > target_width or image_height > target_height:
+            image = cv2.resize(image, (min(image_width, target_width), min(image_height, target_height)),
+                               interpolation=cv2.INTER_AREA)
+        ok, data = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ok:
+            raise RuntimeError(f"图片编码失败: {path}")
+        return data.tobytes(), width, height
+
+
+def report_image(path, folder, width, height=None):
+    """
+    嵌入报告的图片：缩小、重新编码为 JPEG 后写入临时目录 folder，无法读取时抛出异常
+
+    以 .jpg 文件的形式交给 reportlab 时，JPEG 数据原样写入 PDF；
+    若传入内存中的图片，reportlab 会为计算摘要而完整解码并缓存像素数据
+    """
+    data, width, height = encode_image(path, width, height)
+    fd, jpeg_path = tempfile.mkstemp(suffix=".jpg", dir=folder)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    return Image(jpeg_path, width=width, height=height)
+
+
+def prefetch(function, items, window=PREFETCH):
+    """
+    在线程池中按顺序处理 items，最多提前 window 个，逐个产出 function(item) 的结果（异常作为结果产出）
+    """
+    with ThreadPoolExecutor(max_workers=window, thread_name_prefix="pdf_image") as executor:
+        pending = deque()
+        items = iter(items)
+        try:
+            for item in items:
+                pending.append(executor.submit(function, item))
+                if len(pending) >= window:
+                    yield _result(pending.popleft())
+            while pending:
+                yield _result(pending.popleft())
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def _result(future):
+    try:
+        return future.result()
+    except Exception as e:
+        return e
+
+
+# -------------------- 流式排版 --------------------
+class FlowableStream(list):
+    """
+    按需从生成器中取出排版内容的列表
+
+    reportlab 的排版循环每次处理列表开头的内容并将其删除；本列表在被询问长度时才从生成器补充内容，
+    列表中只保留少量尚未排版的内容，已排版的内容（及其图片数据）随即释放
+    """
+    def __init__(self, flowables, window=STREAM_WINDOW):
+        super().__init__()
+        self._source = iter(flowables)
+        self._window = window
+
+    def __len__(self):
+        while self._source is not None and super().__len__() < self._window:
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                self._source = None
+        return super().__len__()
+
+
+def build_pdf(filename, flowables, title=""):
+    """
+    排版并写入 PDF
+
+    Args:
+        filename: 输出文件路径
+        flowables: 排版内容的可迭代对象（可以是生成器）
+        title: PDF 文档标题
+
+    Returns:
+        {"path": 路径, "size": 文件字节数, "pages": 页数, "seconds": 耗时}
+    """
+    start = time.perf_counter()
+    doc = SimpleDocTemplate(
+        filename,
+        pagesize=A4,
+        rightMargin=1*cm,
+        leftMargin=1*cm,
+        topMargin=2*cm,
+        bottomMargin=2*cm,
+        title=title,
+        pageCompression=1
+    )
+    with tracing.span("report.pdf_build", cat="report"):
+        doc.build(FlowableStream(flowables))
+    stats = {
+        "path": filename,
+        "size": os.path.getsize(filename),
+        "pages": doc.page,
+        "seconds": time.perf_counter() - start,
+    }
+    logger.info(f"PDF报告已生成: {filename}（{format_size(stats['size'])}，{stats['pages']}页，"
+                f"用时{stats['seconds']:.2f}秒）")
+    return stats
+
+
+def format_size(size):
+    """文件大小的显示文本"""
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GB"
+
+
+# -------------------- 缺陷样本附录 --------------------
+SEVERITY_ORDER = {"严重损坏": 4, "中度缺陷": 3, "轻度异常": 2, "轻微污染": 1}
+APPENDIX_IMAGE_WIDTH = 9*cm
+
+
+def select_appendix_samples(texture_analysis, limit):
+    """
+    选出附录中展示的缺陷样本：按主要缺陷类型的严重程度、缺陷区域数排序，最多 limit 个
+
+    Returns:
+        [(热图文件名, 主要缺陷类型, 缺陷区域数)]
+    """
+    defect_counts = {}
+    for defect in texture_analysis.get('defect_details', []):
+        defect_counts[defect['image']] = defect_counts.get(defect['image'], 0) + 1
+    image_main_type = texture_analysis.get('image_main_type', {})
+    samples = [(name, image_main_type.get(name, ""), count) for name, count in defect_counts.items()]
+    samples.sort(key=lambda sample: (-SEVERITY_ORDER.get(sample[1], 0), -sample[2], sample[0]))
+    return samples[:limit]
+
+
+def _result_image_path(heatmap_path):
+    """热图（xxx_3.png）对应的检测结果图（xxx_1.png），不存在时为 None"""
+    base, ext = os.path.splitext(heatmap_path)
+    if not base.endswith("_3"):
+        return None
+    path = base[:-2] + "_1" + ext
+    return path if os.path.exists(path) else None
+
+
+def _sample_images(args):
+    """准备一个附录样本的图片，依次为检测结果图、热图"""
+    result_path, folder, (name, _, _) = args
+    heatmap_path = os.path.join(result_path, name)
+    paths = [path for path in (_result_image_path(heatmap_path), heatmap_path) if path and os.path.exists(path)]
+    return [report_image(path, folder, APPENDIX_IMAGE_WIDTH) for path in paths]
+
+
+def appendix_flowables(result_path, samples, styles, folder):
+    """
+    缺陷样本附录的排版内容（生成器）：每个样本一行，检测结果图与热图并排，下方为说明
+
+    图片在线程池中提前 PREFETCH 个准备，排版到哪里才准备到哪里；folder 为图片的临时目录
+    """
+    font_name = register_fonts()
+    jobs = ((result_path, folder, sample) for sample in samples)
+    for (name, main_type, count), images in zip(samples, prefetch(_sample_images, jobs)):
+        if isinstance(images, Exception) or not images:
+            logger.warning(f"附录图片加载失败: {name}: {images}")
+            yield Paragraph(f"{name}：图片加载失败", styles['ReportNormal'])
+            continue
+        table = Table([images], colWidths=[APPENDIX_IMAGE_WIDTH + 0.2*cm] * len(images))
+        table.setStyle(TableStyle([('VALIGN', (0, 0), (-1, -1), 'MIDDLE'), ('FONTNAME', (0, 0), (-1, -1), font_name)]))
+        yield table
+        yield Paragraph(f"{name}（{main_type or '未分类'}，{count}个缺陷区域）", styles['ImageCaption'])
+
+
+def resolve_result_path(report_data, report_path):
+    """报告对应的检测结果图目录：报告数据中记录的目录，旧报告按默认目录结构推断"""
+    result_path = report_data.get('result_path')
+    if result_path and os.path.isdir(result_path):
+        return result_path
+    detect_path = os.path.dirname(os.path.abspath(report_path))
+    candidate = os.path.join(detect_path, 'results')
+    return candidate if os.path.isdir(candidate) else detect_path
@@ -0,0 +1,190 @@
+"""
+检测结果合成图（原图 / 检测结果 / 热力图 横向拼接）
+
+合成在线程池中用 QImage 完成（QImage 和在 QImage 上绘制都可以在非 GUI 线程中进行），界面线程只做 QPixmap 转换：
+    - 大图按目标宽度的 2 倍缩小解码（QImageReader.setScaledSize），再平滑缩放到目标宽度
+    - 合成图保存为低压缩级别的 PNG，或无损 WebP（config.COMBINED_IMAGE_FORMAT）
+    - 按显示尺寸缩放后的合成图保存在内存 LRU 中，键为 (合成图路径, 显示宽, 显示高)，
+      检测过程中合成完成即放入，之后切换查看结果时不需要再次解码
+"""
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PySide6.QtCore import QObject, QSize, Qt, Signal
+from PySide6.QtGui import QColor, QFont, QImage, QImageReader, QPainter
+
+import config
+import tracing
+from path_utils import join_path
+
+logger = logging.getLogger(__name__)
+
+COMBINED_SUFFIX = "_combined"
+TITLES = ("原图", "检测结果", "热力图")
+TITLE_HEIGHT = 30 # 标题高度
+CACHE_SIZE = 64 # 内存中保留的显示尺寸合成图数量
+SAVE_QUALITY = {
+    "png": 80, # PNG 的 quality 越高压缩级别越低，80 对应很低的 zlib 压缩级别，写入快
+    "webp": 100, # WebP 的 quality 为 100 时使用无损编码
+}
+
+
+def combined_path(detect_path, base_name, image_format=None):
+    """合成图的保存路径"""
+    image_format = (image_format or config.COMBINED_IMAGE_FORMAT).lower()
+    return join_path(detect_path, f"{base_name}{COMBINED_SUFFIX}.{image_format}")
+
+
+def find_combined(detect_path, base_name):
+    """查找已有的合成图（优先当前格式，兼容其它格式保存的旧结果），不存在时返回 None"""
+    formats = [config.COMBINED_IMAGE_FORMAT.lower()] + [fmt for fmt in SAVE_QUALITY if fmt != config.COMBINED_IMAGE_FORMAT.lower()]
+    for image_format in formats:
+        path = combined_path(detect_path, base_name, image_format)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def read_scaled(path, width):
+    """
+    读取图片并缩放到指定宽度；原图远大于目标时先在解码阶段缩小，读取失败时返回白色占位图
+    """
+    image = QImage()
+    if path and os.path.exists(path):
+        reader = QImageReader(path)
+        reader.setAutoTransform(True)
+        size = reader.size()
+        if size.isValid() and size.width() > width * 2:
+            reader.setScaledSize(size.scaled(width * 2, size.height(), Qt.KeepAspectRatio))
+        image = reader.read()
+    if image.isNull():
+        image = QImage(200, 200, QImage.Format_RGB32)
+        image.fill(Qt.white)
+    return image.scaledToWidth(width, Qt.SmoothTransformation)
+
+
+@tracing.traced("detect.combine_images", cat="image")
+def compose(paths, width):
+    """
+    将三张图像水平合并为一张图像，总宽度为 width，高度按等比例缩放，上方绘制标题
+
+    Args:
+        paths: (原图, 检测结果图, 热力图) 路径
+        width: 合成图宽度（通常为结果标签的宽度）
+    """
+    single_width = max(width // 3, 1)
+    images = [read_scaled(path, single_width) for path in paths]
+    max_height = max(image.height() for image in images)
+    result = QImage(width, max_height + TITLE_HEIGHT, QImage.Format_RGB32)
+    result.fill(QColor(Qt.white))
+    painter = QPainter(result)
+    painter.setRenderHint(QPainter.TextAntialiasing)
+    font = QFont()
+    font.setBold(True)
+    font.setPointSize(12)
+    painter.setFont(font)
+    for i, image in enumerate(images):
+        x_offset = i * single_width
+        painter.drawText(x_offset, 0, single_width, TITLE_HEIGHT, Qt.AlignCenter, TITLES[i])
+        # 垂直居中绘制图像
+        painter.drawImage(x_offset, TITLE_HEIGHT + (max_height - image.height()) // 2, image)
+    painter.end()
+    return result
+
+
+def fit_to(image, size):
+    """按显示尺寸等比缩放（已经合适时不缩放）"""
+    if image.width() <= size.width() and image.height() <= size.height() and \
+            (image.width() == size.width() or image.height() == size.height()):
+        return image
+    return image.scaled(size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+
+class ResultCompositor(QObject):
+    """
+    合成图的线程池和显示尺寸 LRU 缓存
+    """
+    composed = Signal(str, QImage) # 合成完成 (合成图路径, 显示尺寸的合成图)，在界面线程中接收
+
+    def __init__(self, workers=2, cache_size=CACHE_SIZE):
+        super().__init__()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="compositor")
+        self.cache_size = cache_size
+        self.cache = OrderedDict() # {(合成图路径, 宽, 高): QImage}
+        self.lock = threading.Lock()
+
+    # -------------------- 缓存 --------------------
+    def _cache_get(self, key):
+        with self.lock:
+            image = self.cache.get(key)
+            if image is not None:
+                self.cache.move_to_end(key)
+            return image
+
+    def _cache_put(self, key, image):
+        with self.lock:
+            self.cache[key] = image
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def invalidate(self, path):
+        """删除某张合成图的全部缓存"""
+        with self.lock:
+            for key in [key for key in self.cache if key[0] == path]:
+                del self.cache[key]
+
+    # -------------------- 合成 --------------------
+    def submit(self, original_path, result_path, heatmap_path, save_path, label_size):
+        """
+        在线程池中合成并保存，完成后发出 composed 信号
+
+        Args:
+            save_path: 合成图保存路径（见 combined_path）
+            label_size: 显示区域尺寸 QSize，合成图宽度取其宽度，缓存按该尺寸缩放
+        """
+        label_size = QSize(label_size)
+        return self.executor.submit(self._compose_and_save, (original_path, result_path, heatmap_path),
+                                    save_path, label_size)
+
+    def _compose_and_save(self, paths, save_path, label_size):
+        try:
+            image = compose(paths, label_size.width())
+            image_format = os.path.splitext(save_path)[1].lstrip(".").lower()
+            if not image.save(save_path, image_format.upper(), SAVE_QUALITY.get(image_format, -1)):
+                logger.warning(f"保存合成图失败: {save_path}")
+            display = fit_to(image, label_size)
+            self._cache_put((save_path, label_size.width(), label_size.height()), display)
+            self.composed.emit(save_path, display)
+        except Exception as e:
+            logger.error(f"合成检测结果图失败: {save_path}: {str(e)}")
+
+    def display_image(self, path, label_size):
+        """
+        显示尺寸的合成图：优先取缓存，未命中时读取文件并缩放后放入缓存；读取失败返回 None
+        """
+        key = (path, label_size.width(), label_size.height())
+        image = self._cache_get(key)
+        if image is None:
+            image = QImage(path)
+            if image.isNull():
+                return None
+            image = fit_to(image, label_size)
+            self._cache_put(key, image)
+        return image
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+_result_compositor = None
+
+def get_result_compositor():
+    """获取全局的合成图线程池和缓存（检测过程和结果查看共用）"""
+    global _result_compositor
+    if _result_compositor is None:
+        _result_compositor = ResultCompositor()
+    return _result_compositor
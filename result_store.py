@@ -0,0 +1,216 @@
+"""
+检测结果存储（SQLite）
+
+每个项目一个数据库 <项目>/detect/results.db，表 results 按 (样本组, 原图名) 唯一，另有 (样本组, 得分) 索引：
+    - 推理结果到达一条写入一条（WAL 模式，程序中途崩溃也只丢失未提交的最后一次写入）
+    - 按原图名查询、按得分范围查询都走索引，无需遍历全部结果
+    - 第一次打开时自动导入各检测组目录下旧的 detect_list.json（导入后重命名为 detect_list.json.migrated）
+返回的记录格式与原 detect_list.json 一致: {file_name, score, status, alias_name, origin_name}
+
+本模块不依赖 Qt，界面和无界面的批量检测（batch_detect）共用
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import config
+from path_utils import join_path
+
+logger = logging.getLogger(__name__)
+
+DB_FILE = "results.db"
+LEGACY_FILE = "detect_list.json"
+RECORD_FIELDS = ("file_name", "score", "status", "alias_name", "origin_name")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    group_name  TEXT NOT NULL,
+    origin_name TEXT NOT NULL,
+    file_name   TEXT,
+    alias_name  TEXT,
+    score       REAL NOT NULL DEFAULT 0,
+    status      TEXT,
+    updated_at  REAL,
+    PRIMARY KEY (group_name, origin_name)
+);
+CREATE INDEX IF NOT EXISTS idx_results_score ON results (group_name, score);
+"""
+
+
+def status_of(score, threshold=None):
+    """按阈值判定状态"""
+    threshold = config.DEFECT_THRESHOLD if threshold is None else threshold
+    return "异常" if score > threshold else "正常"
+
+
+def to_score(value):
+    """得分可能是字符串，无法解析时记为 0"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class ResultStore:
+    """
+    一个项目的检测结果库，连接可在多个线程间共享（内部加锁）
+    """
+    def __init__(self, detect_path):
+        self.detect_path = detect_path
+        self.db_path = join_path(detect_path, DB_FILE)
+        os.makedirs(detect_path, exist_ok=True)
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.migrate_legacy()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    # -------------------- 写入 --------------------
+    def upsert(self, group_name, records):
+        """
+        写入（或覆盖同名原图的）检测记录，一次调用一个事务
+
+        Args:
+            group_name: 检测样本组名
+            records: 记录列表，格式同 detect_list.json 的条目
+        """
+        now = time.time()
+        rows = []
+        for record in records:
+            score = to_score(record.get("score"))
+            rows.append((group_name, record["origin_name"], record.get("file_name"), record.get("alias_name"),
+                         score, record.get("status") or status_of(score), now))
+        if not rows:
+            return
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO results (group_name, origin_name, file_name, alias_name, score, status, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def delete(self, group_name, origin_names):
+        """删除指定原图的检测记录"""
+        with self.lock, self.conn:
+            self.conn.executemany("DELETE FROM results WHERE group_name = ? AND origin_name = ?",
+                                  [(group_name, name) for name in origin_names])
+
+    def clear_group(self, group_name):
+        """删除样本组的全部检测记录"""
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM results WHERE group_name = ?", (group_name,))
+
+    def apply_threshold(self, group_name, threshold):
+        """按新阈值重新判定样本组全部记录的状态（一条 SQL 完成）"""
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE results SET status = CASE WHEN score > ? THEN '异常' ELSE '正常' END "
+                              "WHERE group_name = ?", (threshold, group_name))
+
+    # -------------------- 查询 --------------------
+    def _fetch(self, sql, params):
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [{field: row[field] for field in RECORD_FIELDS} for row in rows]
+
+    def get(self, group_name, origin_name):
+        """按原图名查询一条记录，不存在时返回 None"""
+        records = self._fetch("SELECT * FROM results WHERE group_name = ? AND origin_name = ?", (group_name, origin_name))
+        return records[0] if records else None
+
+    def get_many(self, group_name, origin_names):
+        """按原图名批量查询，返回顺序与输入一致（忽略不存在的）"""
+        found = {}
+        names = list(origin_names)
+        for start in range(0, len(names), 500): # 避免超过 SQLite 参数个数上限
+            chunk = names[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for record in self._fetch(f"SELECT * FROM results WHERE group_name = ? AND origin_name IN ({placeholders})",
+                                      [group_name, *chunk]):
+                found[record["origin_name"]] = record
+        return [found[name] for name in names if name in found]
+
+    def list(self, group_name, min_score=None, max_score=None, order_by_score=False):
+        """
+        查询样本组的检测记录，可按得分范围过滤（min_score < score <= max_score）
+
+        Args:
+            group_name: 检测样本组名
+            min_score: 得分下限（不含），None 表示不限
+            max_score: 得分上限（含），None 表示不限
+            order_by_score: 为 True 时按得分从高到低排序，否则按原图名排序
+        """
+        sql = "SELECT * FROM results WHERE group_name = ?"
+        params = [group_name]
+        if min_score is not None:
+            sql += " AND score > ?"
+            params.append(min_score)
+        if max_score is not None:
+            sql += " AND score <= ?"
+            params.append(max_score)
+        sql += " ORDER BY score DESC" if order_by_score else " ORDER BY origin_name"
+        return self._fetch(sql, params)
+
+    def count(self, group_name, min_score=None):
+        """样本组的记录数，给出 min_score 时只统计得分高于它的记录"""
+        sql = "SELECT COUNT(*) FROM results WHERE group_name = ?"
+        params = [group_name]
+        if min_score is not None:
+            sql += " AND score > ?"
+            params.append(min_score)
+        with self.lock:
+            return self.conn.execute(sql, params).fetchone()[0]
+
+    def score_pairs(self, group_name):
+        """按得分升序返回 (原图名列表, 得分列表)，直接使用得分索引的顺序"""
+        with self.lock:
+            rows = self.conn.execute("SELECT origin_name, score FROM results WHERE group_name = ? ORDER BY score",
+                                     (group_name,)).fetchall()
+        return [row[0] for row in rows], [row[1] for row in rows]
+
+    def origin_names(self, group_name):
+        """样本组中已有检测结果的原图名集合"""
+        with self.lock:
+            rows = self.conn.execute("SELECT origin_name FROM results WHERE group_name = ?", (group_name,)).fetchall()
+        return {row[0] for row in rows}
+
+    # -------------------- 迁移 --------------------
+    def migrate_legacy(self):
+        """导入各检测组目录下旧的 detect_list.json，导入后重命名，避免重复导入"""
+        try:
+            groups = [name for name in os.listdir(self.detect_path) if os.path.isdir(join_path(self.detect_path, name))]
+        except OSError:
+            return
+        for group_name in groups:
+            legacy_path = join_path(self.detect_path, group_name, LEGACY_FILE)
+            if not os.path.exists(legacy_path):
+                continue
+            try:
+                with open(legacy_path, "r", encoding="utf-8") as f:
+                    records = [record for record in json.load(f) if record.get("origin_name")]
+                self.upsert(group_name, records)
+                os.replace(legacy_path, legacy_path + ".migrated")
+                logger.info(f"已导入 {len(records)} 条旧检测结果: {legacy_path}")
+            except (OSError, ValueError, sqlite3.Error) as e:
+                logger.error(f"导入旧检测结果失败: {legacy_path}: {str(e)}")
+
+
+_result_store = None
+
+def get_result_store(detect_path=None):
+    """
+    获取项目的检测结果库，检测目录（默认 config.DETECT_PATH）变化时自动重建
+    """
+    global _result_store
+    path = detect_path or config.DETECT_PATH
+    if _result_store is None or _result_store.detect_path != path:
+        if _result_store is not None:
+            _result_store.close()
+        _result_store = ResultStore(path)
+    return _result_store
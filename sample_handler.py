@@ -1,21 +1,33 @@
-import cv2
+import logging
 import os
 import shutil
 import random
 import numpy as np
 import json
 import threading
-from PySide6.QtCore import Qt, QRectF, QPointF, QRect, QTimer
-from PySide6.QtGui import QPixmap, QColor, QPen, QPainter, QIcon, QFont, QFontMetrics, QBrush, QTransform, QImage, QShortcut, QKeySequence, QRegularExpressionValidator
+from PySide6.QtCore import Qt, QRectF, QPointF, QRect, QSize, QThread, QTimer, Signal
+from PySide6.QtGui import QPixmap, QColor, QPen, QPainter, QIcon, QFont, QFontMetrics, QBrush, QTransform, QImage, QImageReader, QShortcut, QKeySequence, QRegularExpressionValidator
 from PySide6.QtWidgets import QHBoxLayout, QLabel, QVBoxLayout, QCheckBox, QWidget, QListWidgetItem, \
-    QGraphicsPixmapItem, QGraphicsBlurEffect, QGraphicsRectItem, QGraphicsScene, QGraphicsView, \
+    QGraphicsBlurEffect, QGraphicsRectItem, QGraphicsScene, QGraphicsView, \
     QFileDialog, QAbstractItemView, QMessageBox, QDialog
 from PySide6.QtUiTools import QUiLoader
 
 import config
+import tracing
+from dataset_snapshot import create_snapshot, diff_snapshots, format_diff, load_snapshot
+from dedup import find_duplicates, removable
+from edit_stack import clear_edits, export_image, fuse, get_edits, has_edits, load_edited, push_edits, rendered_path
+from lazy_import import lazy_import
 from http_server import HttpServer, UploadSampleGroup_HTTP
 from ssh_server import SSHServer, UploadSampleGroup_SSH
-from utils import LoadingAnimation, check_sample_group, copy_image, create_file_dialog, is_image, join_path, ProgressDialog, show_message_box, update_metadata
+from upload_transform import upload_size
+from image_import import OUTPUT_FORMATS, ImportOptions, import_images, is_importable
+from image_pyramid import TiledImageItem
+from project_index import get_project_index
+from utils import LoadingAnimation, check_sample_group, create_file_dialog, is_image, join_path, ProgressDialog, show_message_box, update_metadata
+
+cv2 = lazy_import("cv2") # 仅在编辑、增强样本时才加载 OpenCV
+logger = logging.getLogger(__name__)
 
 
 
@@ -87,7 +99,7 @@ class SampleHandler:
             show_message_box("错误", "请先创建或导入样本组！", QMessageBox.Critical, self.ui)
             return False
         # 检查是否导入样本
-        if type >= 2 and not os.listdir(self.group_path):
+        if type >= 2 and not get_project_index().image_count(self.sample_group):
             show_message_box("提示", "请先导入样本！", QMessageBox.Information, self.ui)
             return False
         # 检查是否选择样本图片
@@ -137,9 +149,9 @@ class SampleHandler:
                 # 对接 http_server: 创建样本组
                 try:
                     group_id = HttpServer().add_group(text)
-                    print(f"http_server创建样本组成功 ID={group_id}")
+                    logger.debug(f"http_server创建样本组成功 ID={group_id}")
                 except Exception as e:
-                    print(f"http_server创建样本组失败: {str(e)}")
+                    logger.error(f"http_server创建样本组失败: {str(e)}")
                 # 创建训练集
                 os.makedirs(train_path)
                 # 更新数据
@@ -186,12 +198,12 @@ class SampleHandler:
                     # 下载每个样本并更新进度
                     for index, sample in enumerate(samples):
                         http_server.save_downloaded_sample(sample, self.group_path)
-                        print(f"http_server下载样本成功: {sample}")
+                        logger.debug(f"http_server下载样本成功: {sample}")
                         # 更新进度
                         progress = int((index + 1) / len(samples) * 100)
                         progress_dialog.setValue(progress)
                 except Exception as e:
-                    print(f"从http_server加载图片失败: {str(e)}")
+                    logger.error(f"从http_server加载图片失败: {str(e)}")
             # 加载样本组中的图片
             LoadImages(self.ui, self.group_path, 'imageList').load_with_progress()
             # 更新按钮显示状态
@@ -232,9 +244,9 @@ class SampleHandler:
                 try:
                     group_id = HttpServer().get_group_id(sample_group)
                     HttpServer().delete_group(group_id)
-                    print(f"http_server删除样本组成功 ID={group_id}")
+                    logger.debug(f"http_server删除样本组成功 ID={group_id}")
                 except Exception as e:
-                    print(f"http_server删除样本组失败: {str(e)}")
+                    logger.error(f"http_server删除样本组失败: {str(e)}")
                 # 如果删除的是当前样本组，清空当前样本组
                 if self.sample_group == sample_group:
                     config.SAMPLE_GROUP = self.sample_group = None
@@ -251,7 +263,7 @@ class SampleHandler:
         """
         上传样本组到服务器
         """
-        UploadSampleGroup_HTTP(self.ui, self.sample_group).run()
+        UploadSampleGroup_HTTP(self.ui, self.sample_group, upload_size()).run()  # 按当前模型输入尺寸缩小后上传
         # UploadSampleGroup_SSH(self.ui).run()
 
 
@@ -270,6 +282,10 @@ class SampleHandler:
         self.ui.selectAllButton.clicked.connect(self.select_all_images)  # 绑定全选按钮事件
         self.ui.selectButton.clicked.connect(self.select_enabled)
         self.ui.completeButton.clicked.connect(self.select_disabled)
+        self.ui.dedupButton.clicked.connect(lambda: self.find_duplicate_images())  # 绑定去重按钮事件
+        self.dedup_worker = None
+        self.import_worker = None
+        self.snapshot_worker = None
         # 加载图片
         if self.sample_group:
             LoadImages(self.ui, self.group_path, 'imageList').load_with_progress() # 加载图片列表
@@ -310,6 +326,7 @@ class SampleHandler:
         修改按钮显示状态，True为默认状态
         """
         self.ui.selectButton.setVisible(state)
+        self.ui.dedupButton.setVisible(state)
         self.ui.importButton.setVisible(state)
         self.ui.addButton.setVisible(state)
         self.ui.deleteButton.setVisible(not state)
@@ -348,10 +365,11 @@ class SampleHandler:
         """
         selected_items = self.ui.imageList.selectedItems()
         for item in selected_items:
-            print(f"删除图片: {item.image_path}")
+            logger.debug(f"删除图片: {item.image_path}")
             image_path = item.image_path
             if os.path.exists(image_path):
                 os.remove(image_path)  # 删除文件
+            clear_edits(image_path)  # 删除编辑记录
             # self.ui.imageList.takeItem(self.ui.imageList.row(item))  # 从列表中移除项
         LoadImages(self.ui, self.group_path, 'imageList').load_with_animation()  # 重新加载图片列表
         self.clear_detail_frame()  # 清除detailFrame
@@ -368,12 +386,9 @@ class SampleHandler:
         # 打开文件夹选择对话框
         folder = create_file_dialog(title="选择图片文件夹", is_folder=True)
         if folder:
-            # 遍历文件夹中的所有图片文件
-            for file_name in os.listdir(folder):
-                if is_image(file_name):
-                    file_path = join_path(folder, file_name)
-                    copy_image(file_path, self.group_path)
-            LoadImages(self.ui, self.group_path, 'imageList').load_with_progress()  # 重新加载图片列表
+            # 文件夹中的所有图片文件
+            files = [join_path(folder, file_name) for file_name in os.listdir(folder) if is_importable(file_name)]
+            self.start_import(files)
 
     def import_images(self):
         """
@@ -391,9 +406,111 @@ class SampleHandler:
         )
         
         if files:
-            for file_path in files:
-                copy_image(file_path, self.group_path)
+            self.start_import(files)
+
+    def start_import(self, files):
+        """
+        选择导入选项后在后台导入图片（复制 / 硬链接 / 转换），完成后重新加载列表并检查近似重复
+        """
+        if not files:
+            show_message_box("提示", "没有可导入的图片", QMessageBox.Information, self.ui)
+            return
+        if self.import_worker and self.import_worker.isRunning():
+            return
+        dialog = ImportOptionsDialog(self.ui)
+        if dialog.exec() != QDialog.Accepted:
+            return
+        options = dialog.get_options()
+        update_metadata('import_options', options.to_dict())  # 下次导入时沿用
+        progress_dialog = ProgressDialog(self.ui, {
+            "title": "导入图片",
+            "text": "正在导入图片..."
+        })
+        progress_dialog.show()
+        def on_progress(done, total, source):
+            progress_dialog.setLabelText(f"正在导入：{done}/{total}\n{os.path.basename(source)}")
+            progress_dialog.setValue(int(done / total * 100) if total else 100)
+        def on_finished(result):
+            progress_dialog.close()
+            logger.info(f"导入 {len(result['imported'])} 张图片（硬链接 {result['linked']}，复制 {result['copied']}，"
+                        f"转换 {result['transcoded']}），失败 {len(result['failed'])} 张")
             LoadImages(self.ui, self.group_path, 'imageList').load_with_progress()  # 重新加载图片列表
+            if result["failed"]:
+                details = "\n".join(f"{os.path.basename(source)}: {error}" for source, error in result["failed"][:10])
+                more = f"\n...（共 {len(result['failed'])} 张）" if len(result["failed"]) > 10 else ""
+                show_message_box("警告", f"以下图片导入失败：\n{details}{more}", QMessageBox.Warning, self.ui)
+            self.find_duplicate_images(result["imported"])  # 检查导入的图片是否与已有图片近似重复
+        def on_error(message):
+            progress_dialog.close()
+            LoadImages(self.ui, self.group_path, 'imageList').load_with_progress()
+            show_message_box("错误", f"导入图片失败: {message}", QMessageBox.Critical, self.ui)
+        self.import_worker = ImportWorker(files, self.group_path, options)
+        self.import_worker.progress_signal.connect(on_progress)
+        self.import_worker.finished_signal.connect(on_finished)
+        self.import_worker.error_signal.connect(on_error)
+        self.import_worker.start()
+
+    def find_duplicate_images(self, names=None):
+        """
+        在后台查找样本组中的近重复图片，完成后询问是否删除
+
+        Args:
+            names: 只检查这些（刚导入的）图片与已有图片是否近似重复，None 表示检查整个样本组
+        """
+        if names is None and not self.check_before_operate(2):
+            return
+        if names is not None and not names or self.dedup_worker and self.dedup_worker.isRunning():
+            return  # 没有导入图片，或上一次查找尚未完成
+        progress_dialog = ProgressDialog(self.ui, {
+            "title": "查找近重复图片",
+            "text": "正在计算图片哈希..."
+        })
+        progress_dialog.show()
+        def on_progress(stage, done, total):
+            progress_dialog.setLabelText(f"{stage}：{done}/{total}")
+            progress_dialog.setValue(int(done / total * 100) if total else 100)
+        def on_finished(groups):
+            progress_dialog.close()
+            self.prune_duplicates(groups, names)
+        def on_error(message):
+            progress_dialog.close()
+            show_message_box("错误", f"查找近重复图片失败: {message}", QMessageBox.Critical, self.ui)
+        self.dedup_worker = DedupWorker(self.group_path, names)
+        self.dedup_worker.progress_signal.connect(on_progress)
+        self.dedup_worker.finished_signal.connect(on_finished)
+        self.dedup_worker.error_signal.connect(on_error)
+        self.dedup_worker.start()
+
+    def prune_duplicates(self, groups, names=None):
+        """
+        确认后删除近重复图片（每组保留一张；检查导入图片时只删除导入的图片）
+        """
+        duplicates = removable(groups, names)
+        if not duplicates:
+            if names is None:
+                show_message_box("提示", "样本组中没有近重复图片", QMessageBox.Information, self.ui)
+            return
+        examples = "\n".join(f"{group[0]} ≈ {', '.join(group[1:4])}{' ...' if len(group) > 4 else ''}" for group in groups[:5])
+        text = "导入的图片中" if names is not None else "样本组中"
+        confirm = QMessageBox.question(
+            self.ui,
+            "近重复图片",
+            f"{text}有 {len(duplicates)} 张图片与其它图片近似重复（共 {len(groups)} 组），例如：\n{examples}\n\n"
+            f"近重复图片不增加训练信息，却会增大模型记忆库和上传时间。是否删除（每组保留一张）？",
+            QMessageBox.Yes | QMessageBox.No,
+            QMessageBox.No
+        )
+        if confirm == QMessageBox.No:
+            return
+        for name in duplicates:
+            image_path = join_path(self.group_path, name)
+            logger.debug(f"删除近重复图片: {image_path}")
+            if os.path.exists(image_path):
+                os.remove(image_path)
+            clear_edits(image_path)
+        LoadImages(self.ui, self.group_path, 'imageList').load_with_animation()  # 重新加载图片列表
+        self.clear_detail_frame()
+        show_message_box("删除成功", f"已删除 {len(duplicates)} 张近重复图片", QMessageBox.Information, self.ui)
 
 
 
@@ -415,11 +532,11 @@ class SampleHandler:
         self.ui.scaleDownButton.clicked.connect(self.scale_down)
         self.ui.rotateLeftButton.clicked.connect(self.rotate_left)
         self.ui.rotateRightButton.clicked.connect(self.rotate_right)
+        self.ui.restoreButton.clicked.connect(self.restore_original)
         # 初始化裁剪框默认按钮状态
         self.restoreButtonState()
         
         # 初始化变量
-        self.ui.pixmap = None
         self.ui.crop_rect = None
         self.ui.cropped_item = None
         self.ui.image_item = None
@@ -467,13 +584,13 @@ class SampleHandler:
             image_path = self.image_path
         # 清除之前的图片信息
         self.clear_detail_frame()
-        # 创建图片项
-        self.ui.pixmap = QPixmap(image_path)
-        self.ui.image_item = QGraphicsPixmapItem(self.ui.pixmap)
+        # 创建分块图片项（只读取图片头得到尺寸，金字塔在后台构建）；有编辑记录时显示渲染后的图片
+        with tracing.span("sample.load_detail_image", cat="image"):
+            self.ui.image_item = TiledImageItem(rendered_path(image_path))
         self.ui.scene.addItem(self.ui.image_item)
-        print(f"图片路径: {image_path}\n尺寸: {self.ui.pixmap.width()}x{self.ui.pixmap.height()}px")
+        logger.debug(f"图片路径: {image_path}\n尺寸: {self.ui.image_item.width()}x{self.ui.image_item.height()}px")
         # 设置裁剪区域大小
-        self.ui.sampleView.setSceneRect(self.ui.pixmap.rect())
+        self.ui.sampleView.setSceneRect(self.ui.image_item.boundingRect())
         self.ui.sampleView.fitInView(self.ui.image_item, Qt.KeepAspectRatio)  # 确保视图适应图片
         # 重置裁剪框默认按钮状态
         self.restoreButtonState()
@@ -491,9 +608,9 @@ class SampleHandler:
             self.ui.scene.removeItem(self.ui.crop_rect)
             self.ui.crop_rect = None
             
-        # 创建新的裁剪框，确保它总是基于当前图像尺寸
-        self.ui.crop_rect = ResizableRectItem(self, self.ui.image_item.pos().x(), self.ui.image_item.pos().y(),
-                                           self.ui.image_item.pixmap().width(), self.ui.image_item.pixmap().height())
+        # 创建新的裁剪框，确保它总是基于当前图像显示区域
+        image_rect = self.ui.image_item.mapRectToScene(self.ui.image_item.boundingRect())
+        self.ui.crop_rect = ResizableRectItem(self, image_rect.x(), image_rect.y(), image_rect.width(), image_rect.height())
         self.ui.scene.addItem(self.ui.crop_rect)
         
         # 隐藏裁剪按钮，显示接受和拒绝按钮
@@ -501,22 +618,27 @@ class SampleHandler:
         self.ui.acceptButton.setVisible(True)
         self.ui.rejectButton.setVisible(True)
 
+    def crop_source_rect(self):
+        """
+        裁剪框在原图坐标中的区域
+        """
+        scene_rect = self.ui.crop_rect.mapRectToScene(self.ui.crop_rect.rect())
+        return self.ui.image_item.mapRectFromScene(scene_rect).toRect()
+
     def crop_image(self):
         """
         裁剪图像
         """
         if self.ui.crop_rect:
             # 获取裁剪区域
-            rect = QRectF(self.ui.crop_rect.pos(), self.ui.crop_rect.rect().size())
+            rect = self.crop_source_rect()
             # 创建模糊效果
             blur_effect = QGraphicsBlurEffect()
             blur_effect.setBlurRadius(10)  # 设置模糊半径
             self.ui.image_item.setGraphicsEffect(blur_effect)  # 将模糊效果应用到图像上
-            # 裁剪图像
-            cropped_pixmap = self.ui.pixmap.copy(rect.toRect())
-            self.ui.cropped_item = QGraphicsPixmapItem(cropped_pixmap)  # 创建裁剪后的图像
-            self.ui.cropped_item.setPos(rect.topLeft())  # 设置裁剪图像的位置为裁剪框的位置
-            self.ui.cropped_item.setGraphicsEffect(None)  # 移除模糊效果
+            # 裁剪预览：与原图共享金字塔，只绘制裁剪区域内的分块
+            self.ui.cropped_item = self.ui.image_item.clone(rect)
+            self.ui.cropped_item.setTransform(self.ui.image_item.sceneTransform())
             # 添加裁剪后的图像
             self.ui.scene.addItem(self.ui.cropped_item)
 
@@ -525,12 +647,8 @@ class SampleHandler:
         接受裁剪
         """
         if self.ui.crop_rect:
-            # 获取裁剪区域
-            rect = QRectF(self.ui.crop_rect.pos(), self.ui.crop_rect.rect().size())
-            cropped_pixmap = self.ui.pixmap.copy(rect.toRect()) # 裁剪图像
-            # 将裁剪后的图像显示在界面上，并设置位置
-            self.ui.image_item.setPixmap(cropped_pixmap)
-            self.ui.image_item.setPos(rect.topLeft())
+            # 只改变显示区域，保存时再从原图中裁剪
+            self.ui.image_item.set_clip(self.crop_source_rect())
             # 清除裁剪框
             self.ui.scene.removeItem(self.ui.crop_rect)
             self.ui.crop_rect = None
@@ -563,23 +681,29 @@ class SampleHandler:
         """
         self.reject_crop()
         if self.ui.image_item and self.image_path:
-            # 重新加载原始图片并恢复位置
-            self.ui.pixmap = QPixmap(self.image_path)
-            self.ui.image_item.setPixmap(self.ui.pixmap)
+            # 恢复整张原始图片和位置（金字塔不变，无需重新加载）
+            self.ui.image_item.set_clip(None)
             self.ui.image_item.setPos(0, 0)  # 重置位置到原点
             self.ui.image_item.setScale(1.0)  # 重置缩放比例
             self.ui.image_item.setRotation(0)  # 重置旋转角度
             # 重置视图尺寸
-            self.ui.sampleView.setSceneRect(self.ui.pixmap.rect())
+            self.ui.sampleView.setSceneRect(self.ui.image_item.boundingRect())
             self.ui.sampleView.fitInView(self.ui.image_item, Qt.KeepAspectRatio)
 
     def save_image(self):
         """
-        保存裁剪后的图像
+        保存裁剪、旋转后的图像：只在编辑记录中追加操作，原图不变
         """
         # 保存图像
         if self.ui.image_item and self.image_path:
-            self.ui.image_item.pixmap().save(self.image_path) # 保存图像
+            # 显示区域为当前编辑结果上的坐标，先裁剪再按图像项的旋转角度旋转（与显示一致）
+            clip = self.ui.image_item.clip
+            ops = []
+            if clip is not None and clip != QRect(0, 0, self.ui.image_item.width(), self.ui.image_item.height()):
+                ops.append({"op": "crop", "rect": [clip.x(), clip.y(), clip.width(), clip.height()]})
+            if self.ui.image_item.rotation():
+                ops.append({"op": "rotate", "angle": self.ui.image_item.rotation()})
+            push_edits(self.image_path, *ops)
             self.refresh_image_item(self.image_path) # 刷新这个选中项的图片
             self.refresh_detail_frame() # 刷新详细图像
             # 显示保存成功提示
@@ -603,10 +727,32 @@ class SampleHandler:
         """
         if not image_path:
             image_path = self.image_path
-        auto_pixmap = QPixmap(image_path).scaled(100, 100, Qt.KeepAspectRatio)
+        auto_pixmap = edited_thumbnail(image_path)
         selected_items = self.ui.imageList.selectedItems()[0]
         selected_items.image_label.setPixmap(auto_pixmap)
 
+    def show_save_buttons(self):
+        """
+        旋转后显示保存 / 取消按钮（正在调整裁剪框时不改变按钮状态）
+        """
+        if not self.ui.crop_rect:
+            self.ui.cancelButton.setVisible(True)
+            self.ui.saveButton.setVisible(True)
+
+    def restore_original(self):
+        """
+        撤销当前图片的全部编辑，恢复原图（编辑只保存在编辑记录中，原图文件始终未被修改）
+        """
+        # 检查是否存在样本组和图片项
+        if not self.check_before_operate():
+            return
+        if not has_edits(self.image_path):
+            show_message_box("提示", "当前图片没有编辑记录", QMessageBox.Information, self.ui)
+            return
+        clear_edits(self.image_path)
+        self.refresh_image_item(self.image_path)
+        self.refresh_detail_frame()
+
     def scale_up(self):
         # 检查是否存在样本组和图片项
         if not self.check_before_operate():
@@ -627,6 +773,7 @@ class SampleHandler:
             return
         if self.ui.image_item:
             self.ui.image_item.setRotation(self.ui.image_item.rotation() - 10)
+            self.show_save_buttons()
 
     def rotate_right(self):
         # 检查是否存在样本组和图片项
@@ -634,6 +781,7 @@ class SampleHandler:
             return
         if self.ui.image_item:
             self.ui.image_item.setRotation(self.ui.image_item.rotation() + 10)
+            self.show_save_buttons()
 
 
 
@@ -671,7 +819,7 @@ class SampleHandler:
         for item in selected_items:
             # 读取图像
             image_path = item.image_path
-            image = cv2.imread(image_path)
+            image = load_edited(image_path, cv2.IMREAD_COLOR) # 在当前编辑结果上检测
             if image is None:
                 continue
 
@@ -741,13 +889,11 @@ class SampleHandler:
                     x_max = min(image.shape[1], x_max + padding)
                     y_max = min(image.shape[0], y_max + padding)
                     
-                    # 裁剪图像
-                    cropped_image = image[y_min:y_max, x_min:x_max]
-                    
                     # 保存裁剪后的图像
-                    if self.ui.coverOption.isChecked(): # 覆盖原图
-                        cv2.imwrite(image_path, cropped_image)
+                    if self.ui.coverOption.isChecked(): # 覆盖原图：只记录背景框，上传或导出时再与其它编辑一起渲染
+                        push_edits(image_path, {"op": "background", "rect": [x_min, y_min, x_max - x_min, y_max - y_min]})
                     elif self.ui.saveAsOption.isChecked(): # 另存为
+                        cropped_image = image[y_min:y_max, x_min:x_max]
                         cropped_image_path = image_path.replace(".", "_cropped.")
                         cv2.imwrite(cropped_image_path, cropped_image)
         
@@ -774,7 +920,7 @@ class SampleHandler:
         selected_items = self.ui.imageList.selectedItems()
         for item in selected_items:
             image_path = item.image_path
-            image = cv2.imread(image_path)
+            image = load_edited(image_path, cv2.IMREAD_COLOR)
             augmented_images = []  # 存储增强后的图像
 
             # 随机数据增强
@@ -795,7 +941,7 @@ class SampleHandler:
             for augmented_image, suffix in augmented_images:
                 augmented_image_path = image_path.replace(".", f"_{suffix}.")
                 cv2.imwrite(augmented_image_path, augmented_image)
-                print(f"保存增强后的图像: {augmented_image_path}")
+                logger.debug(f"保存增强后的图像: {augmented_image_path}")
 
         LoadImages(self.ui, self.group_path, 'imageList').load_with_animation()  # 重新加载图片列表
         self.select_disabled()
@@ -814,7 +960,7 @@ class SampleHandler:
         保持物体特征不变，只改变视角
         """
         angle = random.choice([90, 180, 270])
-        print(f"旋转角度: {angle}")
+        logger.debug(f"旋转角度: {angle}")
         if angle == 90:
             return cv2.rotate(image, cv2.ROTATE_90_CLOCKWISE), "rotated90"
         elif angle == 180:
@@ -838,7 +984,7 @@ class SampleHandler:
         范围控制在[-30, 30]，避免过度偏离正常样本
         """
         value = random.randint(-30, 30)  # 保持较小的变化范围
-        print(f"正样本亮度调整值: {value}")
+        logger.debug(f"正样本亮度调整值: {value}")
         hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
         h, s, v = cv2.split(hsv)
         v = v.astype(np.int16)  # Convert to int16 to prevent overflow
@@ -854,7 +1000,7 @@ class SampleHandler:
         范围控制在[-20, 20]，避免过度偏离正常样本
         """
         value = random.randint(-20, 20)  # 保持较小的变化范围
-        print(f"正样本色调调整值: {value}")
+        logger.debug(f"正样本色调调整值: {value}")
         hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
         h, s, v = cv2.split(hsv)
         h = h.astype(np.int16)  # Convert to int16 to prevent overflow
@@ -864,7 +1010,7 @@ class SampleHandler:
         final_hsv = cv2.merge((h, s, v))
         return cv2.cvtColor(final_hsv, cv2.COLOR_HSV2BGR), "color_normal"
 
-    def generate_test_set(self):
+    def generate_test_set(self, overwrite=False):
         """
         准备MVTec格式的测试集：
         1. 将部分训练样本复制到test/good文件夹
@@ -873,6 +1019,9 @@ class SampleHandler:
         
         伪缺陷样本会明显偏离正常样本的特征，模拟实际缺陷
         每种缺陷类型都有独立的子文件夹
+
+        Args:
+            overwrite: 已确认覆盖已有测试集，且覆盖前的数据集版本已保存（保存完成后再次调用）
         """
         # 检查是否存在样本组和图片项
         if not self.check_before_operate(2):
@@ -906,14 +1055,21 @@ class SampleHandler:
         test_paths.append(ground_truth_base)  # 添加ground_truth目录到检查列表
         
         if any(os.path.exists(path) and len(os.listdir(path)) > 0 for path in test_paths):
-            confirm = QMessageBox.question(
-                self.ui,
-                "确认覆盖",
-                "已存在测试集数据，是否覆盖？",
-                QMessageBox.Yes | QMessageBox.No,
-                QMessageBox.No
-            )
-            if confirm == QMessageBox.No:
+            if not overwrite:
+                if self.snapshot_worker and self.snapshot_worker.isRunning():
+                    return
+                confirm = QMessageBox.question(
+                    self.ui,
+                    "确认覆盖",
+                    "已存在测试集数据，是否覆盖？",
+                    QMessageBox.Yes | QMessageBox.No,
+                    QMessageBox.No
+                )
+                if confirm == QMessageBox.No:
+                    return
+                # 覆盖前在后台保存数据集版本（旧测试集仍可恢复），完成后继续生成
+                self.snapshot_worker = snapshot_sample_group(self.ui, config.SAMPLE_GROUP,
+                                                             lambda manifest: self.generate_test_set(overwrite=True))
                 return
             # 清空测试集文件夹
             for path in test_paths:
@@ -953,7 +1109,7 @@ class SampleHandler:
         for image_name in test_images:
             src_path = join_path(train_path, image_name)
             dst_path = join_path(test_good_path, image_name)
-            shutil.copy(src_path, dst_path)  # 复制而不是移动
+            export_image(src_path, dst_path)  # 复制编辑后的图片而不是移动
             
         # 生成伪缺陷样本
         # 选择部分训练图片作为生成伪缺陷样本的基础
@@ -976,7 +1132,7 @@ class SampleHandler:
         
         for image_index, image_name in enumerate(defect_base_images):
             image_path = join_path(train_path, image_name)
-            image = cv2.imread(image_path)
+            image = load_edited(image_path, cv2.IMREAD_COLOR)
             if image is None:
                 continue
                 
@@ -1734,6 +1890,70 @@ class SampleHandler:
 
 
 
+def snapshot_sample_group(parent, sample_group, on_finished, compare_with=None):
+    """
+    在后台为样本组创建数据集版本（只处理有变化的文件），显示进度；
+    完成后调用 on_finished(清单)，失败时记录日志并调用 on_finished(None)
+
+    Args:
+        compare_with: 与之比较的版本 {"group", "id"}，内容不同时在日志中记录差异
+
+    Returns:
+        SnapshotWorker，调用者需保留引用直到完成
+    """
+    progress_dialog = ProgressDialog(parent, {
+        "title": "保存数据集版本",
+        "text": "正在保存数据集版本..."
+    })
+    progress_dialog.show()
+    def on_progress(done, total):
+        progress_dialog.setLabelText(f"正在保存有变化的文件：{done}/{total}")
+        progress_dialog.setValue(int(done / total * 100) if total else 100)
+    def on_done(manifest):
+        progress_dialog.close()
+        on_finished(manifest)
+    def on_error(message):
+        progress_dialog.close()
+        logger.error(f"保存数据集版本失败: {message}")
+        on_finished(None)
+    worker = SnapshotWorker(sample_group, compare_with)
+    worker.progress_signal.connect(on_progress)
+    worker.finished_signal.connect(on_done)
+    worker.error_signal.connect(on_error)
+    worker.start()
+    return worker
+
+
+def edited_thumbnail(image_path, size=100):
+    """
+    图片缩略图；有编辑记录时把融合后的变换直接用于缩小解码的原图，不渲染整张图
+    """
+    ops = get_edits(image_path)
+    if not ops:
+        return QPixmap(image_path).scaled(size, size, Qt.KeepAspectRatio)
+    reader = QImageReader(image_path)
+    full_size = reader.size()
+    if not full_size.isValid():
+        return QPixmap()
+    matrix, width, height = fuse(ops, full_size.width(), full_size.height())
+    scale = min(1.0, size / max(width, height, 1))
+    # 按缩略图比例的 2 倍缩小解码，再变换到缩略图坐标
+    decode_scale = min(1.0, scale * 2)
+    reader.setScaledSize(QSize(max(1, round(full_size.width() * decode_scale)), max(1, round(full_size.height() * decode_scale))))
+    image = reader.read()
+    if image.isNull():
+        return QPixmap()
+    transform = np.diag([scale, scale, 1.0]) @ matrix @ np.diag([full_size.width() / image.width(), full_size.height() / image.height(), 1.0])
+    result = QImage(max(1, round(width * scale)), max(1, round(height * scale)), QImage.Format_RGB32)
+    result.fill(Qt.white)
+    painter = QPainter(result)
+    painter.setRenderHint(QPainter.SmoothPixmapTransform)
+    painter.setTransform(QTransform(transform[0, 0], transform[1, 0], transform[0, 1], transform[1, 1], transform[0, 2], transform[1, 2]))
+    painter.drawImage(0, 0, image)
+    painter.end()
+    return QPixmap.fromImage(result)
+
+
 class CustomListWidgetItem(QListWidgetItem):
     """
     自定义 QListWidgetItem，用于存储图片路径和复选框控件
@@ -1742,6 +1962,8 @@ class CustomListWidgetItem(QListWidgetItem):
         super().__init__(*args, **kwargs)
         self.image_path = image_path
         self.image_label = QLabel()
+        self.status_label = QLabel() # 检测状态徽标，检测列表中使用
+        self.status_label.setVisible(False)
         self.checkbox = QCheckBox()
         self.checkbox.setVisible(False) # 初始状态下隐藏复选框
         self.setToolTip(image_path) # 鼠标悬浮时显示路径
@@ -1763,7 +1985,8 @@ class CustomListWidgetItem(QListWidgetItem):
         image_layout.setAlignment(Qt.AlignLeft)  # 确保内容靠左对齐
         
         # 添加图片
-        pixmap = QPixmap(self.image_path).scaled(100, 100, Qt.KeepAspectRatio)  # 设定图片缩放
+        with tracing.span("sample.thumbnail", cat="image"):
+            pixmap = edited_thumbnail(self.image_path)  # 设定图片缩放（应用编辑记录）
         self.image_label.setPixmap(pixmap)
         self.image_label.setAlignment(Qt.AlignCenter)  # 图片居中
         image_layout.addWidget(self.image_label)
@@ -1782,6 +2005,7 @@ class CustomListWidgetItem(QListWidgetItem):
         name_label.setText(elidedText)
         
         image_layout.addWidget(name_label)
+        image_layout.addWidget(self.status_label)
         
         # 将垂直布局添加到水平布局中
         item_layout.addLayout(image_layout, 1)  # 使用拉伸因子1，允许布局扩展
@@ -1795,6 +2019,18 @@ class CustomListWidgetItem(QListWidgetItem):
         item_widget.setLayout(item_layout)
         return item_widget
 
+    def set_status(self, status):
+        """
+        设置检测状态徽标："异常" / "正常"，None 表示未检测（隐藏徽标）
+        """
+        if status is None:
+            self.status_label.setVisible(False)
+            return
+        color = "#e74c3c" if status == "异常" else "#27ae60"
+        self.status_label.setText(status)
+        self.status_label.setStyleSheet(f"color: white; background-color: {color}; border-radius: 3px; padding: 0px 4px;")
+        self.status_label.setVisible(True)
+
 
 class ResizableRectItem(QGraphicsRectItem):
     """
@@ -1902,6 +2138,75 @@ class ResizableRectItem(QGraphicsRectItem):
 
 
 
+class ImportWorker(QThread):
+    """
+    导入图片的工作线程（线程池中并行复制 / 硬链接 / 转换）
+    """
+    progress_signal = Signal(int, int, str)
+    finished_signal = Signal(dict)
+    error_signal = Signal(str)
+
+    def __init__(self, files, group_path, options):
+        super().__init__()
+        self.files = files
+        self.group_path = group_path
+        self.options = options
+
+    def run(self):
+        try:
+            result = import_images(self.files, self.group_path, self.options, progress=self.progress_signal.emit)
+            self.finished_signal.emit(result)
+        except Exception as e:
+            self.error_signal.emit(str(e))
+
+
+class DedupWorker(QThread):
+    """
+    查找近重复图片的工作线程（计算哈希、多索引检索）
+    """
+    progress_signal = Signal(str, int, int)
+    finished_signal = Signal(list)
+    error_signal = Signal(str)
+
+    def __init__(self, group_path, names=None):
+        super().__init__()
+        self.group_path = group_path
+        self.names = names
+
+    def run(self):
+        try:
+            groups = find_duplicates(self.group_path, self.names, progress=self.progress_signal.emit)
+            self.finished_signal.emit(groups)
+        except Exception as e:
+            self.error_signal.emit(str(e))
+
+
+class SnapshotWorker(QThread):
+    """
+    创建数据集版本的工作线程（计算有变化文件的哈希、写入文件库）
+    """
+    progress_signal = Signal(int, int)
+    finished_signal = Signal(dict)
+    error_signal = Signal(str)
+
+    def __init__(self, sample_group, compare_with=None):
+        super().__init__()
+        self.sample_group = sample_group
+        self.compare_with = compare_with
+
+    def run(self):
+        try:
+            manifest = create_snapshot(self.sample_group, progress=self.progress_signal.emit)
+            previous = self.compare_with
+            if previous and previous["id"] != manifest["id"]:
+                old = load_snapshot(previous["group"], previous["id"])
+                if old is not None:
+                    logger.info(f"样本组 {self.sample_group} 相对版本 {previous['id']}：{format_diff(diff_snapshots(old, manifest))}")
+            self.finished_signal.emit(manifest)
+        except Exception as e:
+            self.error_signal.emit(str(e))
+
+
 class LoadImages:
     """加载图片列表的类，提供两种加载方式：进度条和加载动画"""
     def __init__(self, ui, path, list_name):
@@ -1921,9 +2226,10 @@ class LoadImages:
         progress_dialog.show()
         # QCoreApplication.processEvents() # 确保进度条显示！！！（现已移至ProgressDialog）
         
-        # 重新获取图片列表
+        # 重新获取图片列表，同时刷新该组在项目索引中的记录
         self.list_widget.clear()
         images = [f for f in os.listdir(self.group_path) if is_image(f)]
+        get_project_index().invalidate(self.group_path)
         total_images = len(images)
         # 处理空图片列表情况
         if total_images == 0:
@@ -1946,9 +2252,10 @@ class LoadImages:
         loading.show()
         # QCoreApplication.processEvents()  # 确保动画显示！！！（现已移至LoadingAnimation）
 
-        # 重新获取图片列表
+        # 重新获取图片列表，同时刷新该组在项目索引中的记录
         self.list_widget.clear()
         images = [f for f in os.listdir(self.group_path) if is_image(f)]
+        get_project_index().invalidate(self.group_path)
         # 添加所有图片到列表
         for index, image in enumerate(images):
             image_path = join_path(self.group_path, image)
@@ -1999,24 +2306,19 @@ class SampleGroupDialog(QDialog):
         # 清空列表
         self.ui.listWidget.clear()
         # 获取样本文件夹下的所有子文件夹
-        sample_groups = []
-        for item in os.listdir(config.SAMPLE_PATH):
-            item_path = join_path(config.SAMPLE_PATH, item)
-            if os.path.isdir(item_path):
-                # 检查good文件夹中是否有图片文件
-                image_count = len([f for f in os.listdir(item_path) if is_image(f)])
-                sample_groups.append((item, image_count))
+        # 从项目索引中读取样本组及图片数量，无需重新扫描目录
+        sample_groups = [(entry.name, entry.image_count) for entry in get_project_index().sample_groups()]
         # 对接 http_server: 如果样本组列表为空，则从服务器获取样本组列表
         if not sample_groups:
             try:
                 group_list = HttpServer().get_group_list()
-                print(f"http_server获取样本组列表成功: {group_list}")
+                logger.debug(f"http_server获取样本组列表成功: {group_list}")
                 if group_list:
                     for group in group_list:
                         group_name = group.get("group_name")
                         sample_groups.append((group_name, -1))
             except Exception as e:
-                print(f"从http_server获取样本组失败: {str(e)}")
+                logger.error(f"从http_server获取样本组失败: {str(e)}")
         # 如果没有样本组，显示提示
         if not sample_groups:
             empty_item = QListWidgetItem("没有找到样本组")
@@ -2091,6 +2393,62 @@ class GroupListItem(QListWidgetItem):
     #     """返回自定义小部件，用于在列表中显示"""
     #     return self.custom_widget
 
+class ImportOptionsDialog(QDialog):
+    """
+    导入选项对话框：硬链接、统一格式、缩小到模型输入尺寸（选项保存在项目元数据中）
+    """
+    PRESET_SIZES = (224, 448, 1024) # 低 / 中等 / 高精度的输入尺寸
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.ui = QUiLoader().load('ui/import_options.ui')
+        self.setWindowTitle(self.ui.windowTitle())
+        self.setFixedSize(self.ui.width(), self.ui.height())
+        main_layout = QVBoxLayout(self)
+        main_layout.setContentsMargins(0, 0, 0, 0)
+        main_layout.addWidget(self.ui)
+        self.ui.confirmButton.clicked.connect(self.accept)
+        self.ui.cancelButton.clicked.connect(self.reject)
+
+        # 可选尺寸：当前模型的输入尺寸 + 各精度预设
+        sizes = []
+        if config.MODEL_PARAMS and config.MODEL_PARAMS.get('input_w') and config.MODEL_PARAMS.get('input_h'):
+            model_size = (int(config.MODEL_PARAMS['input_w']), int(config.MODEL_PARAMS['input_h']))
+            sizes.append((f"{model_size[0]}×{model_size[1]}（当前模型）", model_size))
+        sizes += [(f"{size}×{size}", (size, size)) for size in self.PRESET_SIZES]
+        for text, size in sizes:
+            self.ui.sizeComboBox.addItem(text, size)
+        for image_format in OUTPUT_FORMATS:
+            self.ui.formatComboBox.addItem(image_format.upper(), image_format)
+
+        # 恢复上次的选项
+        options = ImportOptions.from_dict((config.PROJECT_METADATA or {}).get('import_options'))
+        self.ui.linkCheckBox.setChecked(options.link)
+        self.ui.formatCheckBox.setChecked(options.image_format is not None)
+        if options.image_format is not None:
+            self.ui.formatComboBox.setCurrentIndex(max(self.ui.formatComboBox.findData(options.image_format), 0))
+        self.ui.resizeCheckBox.setChecked(options.target_size is not None)
+        if options.target_size is not None:
+            sizes = [tuple(self.ui.sizeComboBox.itemData(i)) for i in range(self.ui.sizeComboBox.count())]
+            index = sizes.index(options.target_size) if options.target_size in sizes else -1
+            if index < 0:
+                self.ui.sizeComboBox.addItem(f"{options.target_size[0]}×{options.target_size[1]}", options.target_size)
+                index = self.ui.sizeComboBox.count() - 1
+            self.ui.sizeComboBox.setCurrentIndex(index)
+        self.ui.formatCheckBox.toggled.connect(self.ui.formatComboBox.setEnabled)
+        self.ui.resizeCheckBox.toggled.connect(self.ui.sizeComboBox.setEnabled)
+        self.ui.formatComboBox.setEnabled(self.ui.formatCheckBox.isChecked())
+        self.ui.sizeComboBox.setEnabled(self.ui.resizeCheckBox.isChecked())
+
+    def get_options(self):
+        """获取选择的导入选项"""
+        return ImportOptions(
+            link=self.ui.linkCheckBox.isChecked(),
+            image_format=self.ui.formatComboBox.currentData() if self.ui.formatCheckBox.isChecked() else None,
+            target_size=tuple(self.ui.sizeComboBox.currentData()) if self.ui.resizeCheckBox.isChecked() else None
+        )
+
+
 class NewSampleGroupDialog(QDialog):
     """
     自定义美化的新建样本组对话框 - 使用UI文件加载
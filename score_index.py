@@ -0,0 +1,110 @@
+"""
+检测得分的有序索引
+
+得分按升序保存在 numpy 数组中，阈值相关的查询都用二分查找（searchsorted）完成，与结果数量无关地快速响应：
+    - counts(t): 异常（score > t）/ 正常数量
+    - names_in_range(a, b): 得分在 (a, b] 内的图片，即阈值从 a 移到 b 时状态发生翻转的图片
+    - histogram(): 得分直方图（缓存，数据变化时重算）
+检测过程中新到达的结果用 update() 批量合并，无需重建
+
+本模块不依赖 Qt
+"""
+import numpy as np
+
+from result_store import to_score
+
+HISTOGRAM_BINS = 50
+
+
+class ScoreIndex:
+    """
+    一次检测（一个检测样本组）的得分有序索引
+    """
+    def __init__(self, names=(), scores=()):
+        scores = np.asarray(scores, dtype=np.float64)
+        order = np.argsort(scores, kind="stable")
+        self.scores = scores[order]
+        self.names = np.asarray(names, dtype=object)[order]
+        self.score_of = dict(zip(self.names.tolist(), self.scores.tolist())) # {原图名: 得分}，用于覆盖旧结果
+        self._histogram = None
+
+    @classmethod
+    def from_store(cls, result_store, group_name):
+        """从检测结果库加载（按得分索引顺序读取）"""
+        names, scores = result_store.score_pairs(group_name)
+        return cls(names, scores)
+
+    def __len__(self):
+        return len(self.scores)
+
+    # -------------------- 查询 --------------------
+    def count_defects(self, threshold):
+        """得分高于阈值的数量"""
+        return len(self.scores) - int(np.searchsorted(self.scores, threshold, side="right"))
+
+    def counts(self, threshold):
+        """(异常数量, 正常数量)"""
+        defects = self.count_defects(threshold)
+        return defects, len(self.scores) - defects
+
+    def names_in_range(self, low=None, high=None):
+        """得分在 (low, high] 内的原图名，low / high 为 None 表示不限"""
+        start = 0 if low is None else int(np.searchsorted(self.scores, low, side="right"))
+        end = len(self.scores) if high is None else int(np.searchsorted(self.scores, high, side="right"))
+        return self.names[start:end].tolist() if end > start else []
+
+    def score_range(self):
+        """(最低分, 最高分)，没有数据时返回 None"""
+        if not len(self.scores):
+            return None
+        return float(self.scores[0]), float(self.scores[-1])
+
+    def histogram(self, bins=HISTOGRAM_BINS):
+        """
+        得分直方图
+
+        Returns:
+            (各区间数量 counts, 区间边界 edges)，没有数据时返回 None
+        """
+        if not len(self.scores):
+            return None
+        if self._histogram is None or len(self._histogram[0]) != bins:
+            low, high = self.score_range()
+            if high <= low:
+                high = low + 1e-6
+            self._histogram = np.histogram(self.scores, bins=bins, range=(low, high))
+        return self._histogram
+
+    # -------------------- 更新 --------------------
+    def update(self, records):
+        """
+        合并新到达的检测记录，同名原图的旧得分被覆盖
+
+        Args:
+            records: [{'origin_name', 'score', ...}]
+        """
+        new_scores = {record["origin_name"]: to_score(record.get("score")) for record in records}
+        if not new_scores:
+            return
+        # 删除被覆盖的旧记录：在旧得分的相等区间内定位
+        stale = []
+        for name in new_scores:
+            old_score = self.score_of.get(name)
+            if old_score is None:
+                continue
+            start = int(np.searchsorted(self.scores, old_score, side="left"))
+            end = int(np.searchsorted(self.scores, old_score, side="right"))
+            stale.extend(start + offset for offset in np.flatnonzero(self.names[start:end] == name))
+        if stale:
+            self.scores = np.delete(self.scores, stale)
+            self.names = np.delete(self.names, stale)
+        # 按插入位置一次性插入
+        names = np.asarray(list(new_scores.keys()), dtype=object)
+        scores = np.fromiter(new_scores.values(), dtype=np.float64, count=len(new_scores))
+        order = np.argsort(scores, kind="stable")
+        names, scores = names[order], scores[order]
+        positions = np.searchsorted(self.scores, scores, side="right")
+        self.scores = np.insert(self.scores, positions, scores)
+        self.names = np.insert(self.names, positions, names)
+        self.score_of.update(new_scores)
+        self._histogram = None
@@ -1,18 +1,123 @@
+import hashlib
 import os
-import paramiko
+import queue
+import shlex
+import stat
+import tarfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from PySide6.QtWidgets import QFileDialog, QMessageBox
 from PySide6.QtCore import QTimer
 from PySide6.QtGui import QPixmap
 from PySide6.QtCore import Qt
 
 import config
+from edit_stack import rendered_path
+from lazy_import import lazy_import
 from utils import show_message_box, ProgressDialog, is_image, join_path
 
+paramiko = lazy_import("paramiko") # 仅在使用 SSH 功能时才加载
+
+
+def _zstandard():
+    """可选依赖 zstandard（zstd 压缩的批量传输），只在选择 zstd 时才导入，未安装时返回 None"""
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+class SFTPChannelPool:
+    """
+    SFTP 通道池：在同一条 SSH 连接上打开多个 SFTP 通道，供多线程并行传输
+    """
+    def __init__(self, ssh_client, channel_count=4):
+        self.channel_count = max(1, channel_count)
+        self.transport = ssh_client.get_transport()
+        self.channels = queue.Queue()
+        self.all_channels = []
+        for _ in range(self.channel_count):
+            sftp_client = paramiko.SFTPClient.from_transport(self.transport)
+            self.channels.put(sftp_client)
+            self.all_channels.append(sftp_client)
+
+    @contextmanager
+    def acquire(self):
+        """借出一个空闲通道，用完后自动归还"""
+        sftp_client = self.channels.get()
+        try:
+            yield sftp_client
+        finally:
+            self.channels.put(sftp_client)
+
+    def close(self):
+        """关闭所有通道"""
+        for sftp_client in self.all_channels:
+            try:
+                sftp_client.close()
+            except Exception:
+                pass
+        self.all_channels = []
+        self.channels = queue.Queue()
+
+
+class _ChannelWriter:
+    """
+    将写入的数据直接发送到 SSH exec 通道的 stdin，统计实际发送的字节数
+    """
+    def __init__(self, channel):
+        self.channel = channel
+        self.sent_bytes = 0
+        self.discarded = False
+
+    def discard(self):
+        """放弃发送：之后写入的数据（如压缩流回收时补写的归档结尾）全部丢弃"""
+        self.discarded = True
+
+    def write(self, data):
+        if self.discarded:
+            return len(data)
+        self.channel.sendall(data)
+        self.sent_bytes += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class _HashingReader:
+    """
+    读取本地文件的同时计算哈希，并按字节回调进度（打包时只需读一遍文件）
+    """
+    def __init__(self, file, on_read=None):
+        self.file = file
+        self.hasher = hashlib.sha256()
+        self.on_read = on_read
+
+    def read(self, size=-1):
+        data = self.file.read(size)
+        if data:
+            self.hasher.update(data)
+            if self.on_read:
+                self.on_read(len(data))
+        return data
+
 
 class SSHServer:
-    def __init__(self):
+    # 大文件读取时并发的预取请求数
+    PREFETCH_REQUESTS = 64
+
+    def __init__(self, channel_count=4):
         self.ssh_client = None # SSH 客户端，用于执行命令
         self.sftp_client = None # SFTP 客户端，用于传输文件
+        self.channel_count = channel_count # 并行传输的通道数
+        self.channel_pool = None # SFTP 通道池，首次并行传输时创建
 
     def connect_to_server(self):
         """连接远程服务器"""
@@ -27,6 +132,12 @@ class SSHServer:
             print(f"连接服务器失败：{str(e)}")
             raise # 继续抛出异常
 
+    def get_channel_pool(self):
+        """获取 SFTP 通道池（懒加载，连接期间持续复用）"""
+        if self.channel_pool is None:
+            self.channel_pool = SFTPChannelPool(self.ssh_client, self.channel_count)
+        return self.channel_pool
+
     def upload_file(self, local_file_path, remote_file_path):
         """上传文件到远程服务器"""
         try:
@@ -35,32 +146,249 @@ class SSHServer:
         except Exception as e:
             print(f"文件上传失败：{str(e)}")
             raise # 继续抛出异常
-    
-    def upload_directory(self, local_path, remote_path):
-        """递归上传整个目录"""
-        # root, dirs, files 分别是当前目录、子目录、子文件
-        for root, dirs, files in os.walk(local_path):
-            # 创建对应的远程目录
-            remote_dir = root.replace(local_path, remote_path, 1)
+
+    def upload_files(self, file_pairs):
+        """
+        通过通道池并行上传多个文件
+
+        Args:
+            file_pairs: [(本地路径, 远程路径), ...]
+
+        Returns:
+            生成器，每完成一个文件产出 (本地路径, 远程路径, 异常或None)，在调用线程中迭代即可更新进度
+        """
+        pool = self.get_channel_pool()
+
+        def put(local_file_path, remote_file_path):
+            with pool.acquire() as sftp_client:
+                # confirm=False 省去上传后的 stat 往返，对大量小文件影响明显
+                sftp_client.put(local_file_path, remote_file_path, confirm=False)
+
+        with ThreadPoolExecutor(max_workers=pool.channel_count) as executor:
+            futures = {executor.submit(put, local, remote): (local, remote) for local, remote in file_pairs}
+            for future in as_completed(futures):
+                local, remote = futures[future]
+                error = future.exception()
+                if error:
+                    print(f"文件上传失败：{local} -> {remote}: {str(error)}")
+                yield local, remote, error
+
+    def make_remote_dirs(self, remote_dirs):
+        """按层级顺序创建远程目录，已存在则跳过"""
+        for remote_dir in sorted(set(remote_dirs), key=lambda d: d.count("/")):
             try:
                 self.sftp_client.mkdir(remote_dir)
             except IOError:
                 pass  # 目录已存在则跳过
-            # 上传所有文件
+
+    def collect_upload_pairs(self, local_path, remote_path, file_filter=None, source=None):
+        """
+        遍历本地目录，得到需创建的远程目录列表和 (本地文件, 远程文件) 列表
+
+        Args:
+            source: 本地文件路径映射函数（例如换成编辑后的渲染结果），远程文件名不变
+        """
+        remote_dirs = []
+        file_pairs = []
+        # root, dirs, files 分别是当前目录、子目录、子文件
+        for root, dirs, files in os.walk(local_path):
+            remote_dir = join_path(root.replace(local_path, remote_path, 1))
+            remote_dirs.append(remote_dir)
             for file in files:
-                local_file = os.path.join(root, file)
-                remote_file = os.path.join(remote_dir, file)
-                self.upload_file(local_file, remote_file)
+                if file_filter and not file_filter(file):
+                    continue
+                local_file = join_path(root, file)
+                file_pairs.append((source(local_file) if source else local_file, join_path(remote_dir, file)))
+        return remote_dirs, file_pairs
+
+    def upload_directory(self, local_path, remote_path):
+        """递归上传整个目录（目录串行创建，文件经通道池并行上传）"""
+        remote_dirs, file_pairs = self.collect_upload_pairs(local_path, remote_path)
+        self.make_remote_dirs(remote_dirs)
+        errors = [error for _, _, error in self.upload_files(file_pairs) if error]
+        if errors:
+            raise errors[0]
+
+    def upload_directory_as_archive(self, local_path, remote_path, compression="gzip", file_filter=None,
+                                    progress_callback=None, verify=True, source=None):
+        """
+        将本地目录打包为 tar 流，经 exec 通道直接输送给远程 `tar -x` 解包，避免逐文件的 SFTP 往返
+
+        归档先解包到远程的临时目录（与目标目录同级），只有本地完整发送、远程解包成功且哈希校验通过后，
+        才以硬链接的方式合并到目标目录；本地读取失败时不写归档结尾、直接关闭通道并删除临时目录，
+        不完整的归档不会进入目标目录
+
+        Args:
+            local_path: 本地目录
+            remote_path: 远程目录（不存在则创建）
+            compression: 压缩方式，可选 "zstd"、"gzip" 或 None；本地未安装 zstandard 时退回 gzip
+            file_filter: 文件名过滤函数，None 表示上传全部文件
+            progress_callback: 进度回调 callback(已读取字节数, 总字节数)
+            verify: 是否在合并前校验每个文件的 sha256
+            source: 本地文件路径映射函数（见 collect_upload_pairs）
+
+        Returns:
+            {
+                "files": 上传文件数,
+                "bytes": 原始字节数,
+                "wire_bytes": 实际发送字节数,
+                "mismatched": 校验失败或缺失的文件相对路径列表（非空时不合并到目标目录）
+            }
+        """
+        zstandard = _zstandard() if compression == "zstd" else None
+        if compression == "zstd" and zstandard is None:
+            print("未安装 zstandard，批量传输改用 gzip 压缩")
+            compression = "gzip"
+        _, file_pairs = self.collect_upload_pairs(local_path, ".", file_filter, source)
+        total_bytes = sum(os.path.getsize(local) for local, _ in file_pairs)
+
+        # 远程解包命令（解包到临时目录）
+        staging_path = f"{remote_path.rstrip('/')}.upload-{uuid.uuid4().hex}"
+        staging_dir = shlex.quote(staging_path)
+        if compression == "zstd":
+            extract = f"zstd -dc | tar -xf - -C {staging_dir}"
+        elif compression == "gzip":
+            extract = f"tar -xzf - -C {staging_dir}"
+        else:
+            extract = f"tar -xf - -C {staging_dir}"
+        channel = self.ssh_client.get_transport().open_session()
+        channel.exec_command(f"mkdir -p {staging_dir} && {extract}")
+
+        # 边读文件边打包、压缩、发送，同时计算本地哈希
+        writer = _ChannelWriter(channel)
+        read_bytes = 0
+        def on_read(size):
+            nonlocal read_bytes
+            read_bytes += size
+            if progress_callback:
+                progress_callback(read_bytes, total_bytes)
+
+        local_hashes = {}
+        compressor = None
+        if compression == "zstd":
+            compressor = zstandard.ZstdCompressor(level=3).stream_writer(writer, closefd=False)
+            tar = tarfile.open(fileobj=compressor, mode="w|", bufsize=1 << 20)
+        elif compression == "gzip":
+            tar = tarfile.open(fileobj=writer, mode="w|gz", bufsize=1 << 20)
+        else:
+            tar = tarfile.open(fileobj=writer, mode="w|", bufsize=1 << 20)
+        try:
+            for local_file, arcname in file_pairs:
+                arcname = arcname[2:] if arcname.startswith("./") else arcname
+                tarinfo = tar.gettarinfo(local_file, arcname)
+                with open(local_file, "rb") as f:
+                    reader = _HashingReader(f, on_read)
+                    tar.addfile(tarinfo, reader) # 读到的字节数少于 tarinfo.size 时抛出 OSError
+                local_hashes[arcname] = reader.hasher.hexdigest()
+            tar.close()
+            if compressor:
+                compressor.close()
+        except Exception:
+            # 不写归档结尾，直接断开：远程临时目录中的内容作废
+            writer.discard()
+            channel.close()
+            self.remove_remote_dir(staging_path)
+            raise
+        channel.shutdown_write()
+        exit_status = channel.recv_exit_status()
+        if exit_status != 0:
+            error = channel.makefile_stderr("rb").read().decode(errors="replace")
+            self.remove_remote_dir(staging_path)
+            raise Exception(f"远程解包失败({exit_status}): {error}")
+        print(f"批量上传: {local_path} -> {remote_path}, {len(file_pairs)} 个文件, "
+              f"{total_bytes} 字节, 实际发送 {writer.sent_bytes} 字节")
+
+        mismatched = self.verify_remote_hashes(staging_path, local_hashes) if verify else []
+        if mismatched:
+            self.remove_remote_dir(staging_path)
+        else:
+            # 同一文件系统内硬链接合并，不复制数据
+            remote_dir = shlex.quote(remote_path)
+            self.run_remote_command(f"mkdir -p {remote_dir} && cp -alf {staging_dir}/. {remote_dir}/ "
+                                    f"&& rm -rf {staging_dir}")
+        return {
+            "files": len(file_pairs),
+            "bytes": total_bytes,
+            "wire_bytes": writer.sent_bytes,
+            "mismatched": mismatched
+        }
+
+    def run_remote_command(self, command):
+        """执行远程命令，退出状态非 0 时抛出异常"""
+        stdin, stdout, stderr = self.ssh_client.exec_command(command)
+        exit_status = stdout.channel.recv_exit_status()
+        if exit_status != 0:
+            error = stderr.read().decode(errors="replace")
+            raise Exception(f"远程命令失败({exit_status}): {command}: {error}")
+
+    def remove_remote_dir(self, remote_path):
+        """删除远程目录（清理失败只记录，不覆盖原来的错误）"""
+        try:
+            self.run_remote_command(f"rm -rf {shlex.quote(remote_path)}")
+        except Exception as e:
+            print(f"删除远程目录失败: {remote_path}: {str(e)}")
+
+    def verify_remote_hashes(self, remote_path, local_hashes):
+        """
+        在远程批量计算 sha256 并与本地哈希比对
+
+        Args:
+            remote_path: 远程目录
+            local_hashes: {相对路径: sha256}
+
+        Returns:
+            校验失败或缺失的文件相对路径列表
+        """
+        command = f"cd {shlex.quote(remote_path)} && find . -type f -print0 | xargs -0 -r sha256sum"
+        stdin, stdout, stderr = self.ssh_client.exec_command(command)
+        remote_hashes = {}
+        for line in stdout.read().decode(errors="replace").splitlines():
+            digest, _, name = line.partition("  ")
+            if name.startswith("./"):
+                name = name[2:]
+            remote_hashes[name] = digest
+        mismatched = [name for name, digest in local_hashes.items() if remote_hashes.get(name) != digest]
+        if mismatched:
+            print(f"哈希校验失败: {len(mismatched)} 个文件，例如 {mismatched[:5]}")
+        return mismatched
 
     def download_file(self, remote_file_path, local_file_path):
-        """从远程服务器下载文件"""
+        """从远程服务器下载文件（大文件使用并发预取读取）"""
         try:
-            self.sftp_client.get(remote_file_path, local_file_path)
+            with open(local_file_path, 'wb') as f:
+                self.sftp_client.getfo(remote_file_path, f, prefetch=True,
+                                       max_concurrent_prefetch_requests=self.PREFETCH_REQUESTS)
             print(f"下载文件: {remote_file_path} -> {local_file_path}")
         except Exception as e:
             print(f"文件下载失败：{str(e)}")
             raise
 
+    def download_files(self, file_pairs):
+        """
+        通过通道池并行下载多个文件
+
+        Args:
+            file_pairs: [(远程路径, 本地路径), ...]
+
+        Returns:
+            生成器，每完成一个文件产出 (远程路径, 本地路径, 异常或None)
+        """
+        pool = self.get_channel_pool()
+
+        def get(remote_file_path, local_file_path):
+            with pool.acquire() as sftp_client, open(local_file_path, 'wb') as f:
+                sftp_client.getfo(remote_file_path, f, prefetch=True,
+                                  max_concurrent_prefetch_requests=self.PREFETCH_REQUESTS)
+
+        with ThreadPoolExecutor(max_workers=pool.channel_count) as executor:
+            futures = {executor.submit(get, remote, local): (remote, local) for remote, local in file_pairs}
+            for future in as_completed(futures):
+                remote, local = futures[future]
+                error = future.exception()
+                if error:
+                    print(f"文件下载失败：{remote} -> {local}: {str(error)}")
+                yield remote, local, error
+
     def listdir(self, remote_path):
         """列出远程目录下的文件"""
         try:
@@ -70,6 +398,37 @@ class SSHServer:
             print(f"列出目录失败：{str(e)}")
             raise
 
+    def listdir_attr(self, remote_path):
+        """列出远程目录下的文件及其属性（文件名、大小、修改时间在一次往返中返回）"""
+        try:
+            return self.sftp_client.listdir_attr(remote_path)
+        except Exception as e:
+            print(f"列出目录失败：{str(e)}")
+            raise
+
+    def get_newest_file(self, remote_path, exclude=(), suffixes=None):
+        """
+        获取远程目录下修改时间最晚的文件名，只需一次 listdir_attr 往返
+
+        Args:
+            remote_path: 远程目录
+            exclude: 需要跳过的文件名集合
+            suffixes: 允许的文件后缀元组（小写），None 表示不限制
+
+        Returns:
+            最新的文件名，没有符合条件的文件则返回 None
+        """
+        newest = None
+        for attr in self.listdir_attr(remote_path):
+            name = attr.filename
+            if name in exclude or not stat.S_ISREG(attr.st_mode or 0):
+                continue
+            if suffixes and not name.lower().endswith(suffixes):
+                continue
+            if newest is None or attr.st_mtime > newest.st_mtime:
+                newest = attr
+        return newest.filename if newest else None
+
     def stat(self, remote_path):
         """获取远程文件信息"""
         try:
@@ -81,6 +440,9 @@ class SSHServer:
 
     def close_connection(self):
         """关闭连接"""
+        if self.channel_pool:
+            self.channel_pool.close()
+            self.channel_pool = None
         if self.sftp_client:
             self.sftp_client.close()
         if self.ssh_client:
@@ -149,10 +511,12 @@ class SSHServer:
 
 class UploadSampleGroup_SSH:
     """上传样本组到服务器的线程"""
-    def __init__(self, ui):
+    def __init__(self, ui, bulk=False, compression="gzip"):
         self.local_sample_path = config.SAMPLE_PATH
         self.remote_sample_path = config.SERVER_SAMPLE_PATH
         self.ui = ui
+        self.bulk = bulk # 是否以 tar 流的方式批量上传
+        self.compression = compression # 批量上传的压缩方式："zstd"、"gzip" 或 None
         self.total_files = 0  # 总文件数
         self.uploaded_files = 0  # 已上传文件数
 
@@ -171,34 +535,35 @@ class UploadSampleGroup_SSH:
         return count
 
     def upload_directory_with_progress(self, server, local_path, remote_path):
-        """递归上传整个目录，并更新进度条"""
-        # 确保远程目录存在
-        try:
-            server.sftp_client.mkdir(remote_path)
-        except IOError:
-            pass  # 目录已存在则跳过
-        # 遍历本地目录
-        for item in os.listdir(local_path):
-            local_item_path = join_path(local_path, item)
-            remote_item_path = join_path(remote_path, item)
-
-            if os.path.isdir(local_item_path):
-                # 如果是目录，递归上传
-                try:
-                    server.sftp_client.mkdir(remote_item_path)
-                except IOError:
-                    pass  # 目录已存在则跳过
-                self.upload_directory_with_progress(server, local_item_path, remote_item_path)
-            elif os.path.isfile(local_item_path) and is_image(item):
-                # 如果是图片文件，上传
-                try:
-                    server.upload_file(local_item_path, remote_item_path)
-                    self.uploaded_files += 1
-                    # 更新进度条
-                    progress = int(self.uploaded_files / self.total_files * 100)
-                    self.progressDialog.setValue(progress)
-                except Exception as e:
-                    show_message_box("错误", f"上传失败: {str(e)}", QMessageBox.Critical)
+        """递归上传整个目录，并更新进度条（文件经通道池并行上传）"""
+        # 先按层级创建所有远程目录，再并行上传图片文件
+        remote_dirs, file_pairs = server.collect_upload_pairs(local_path, remote_path, file_filter=is_image,
+                                                              source=rendered_path) # 有编辑记录时上传渲染后的图片
+        server.make_remote_dirs(remote_dirs)
+        # 在当前线程中逐个取回完成结果，安全地更新进度条
+        for local_item_path, remote_item_path, error in server.upload_files(file_pairs):
+            if error:
+                show_message_box("错误", f"上传失败: {str(error)}", QMessageBox.Critical)
+                continue
+            self.uploaded_files += 1
+            progress = int(self.uploaded_files / self.total_files * 100)
+            self.progressDialog.setValue(progress)
+
+    def upload_directory_bulk(self, server, local_path, remote_path):
+        """以 tar 流批量上传整个目录，按字节更新进度条，上传后校验文件哈希"""
+        def on_progress(done_bytes, total_bytes):
+            if total_bytes:
+                self.progressDialog.setValue(int(done_bytes / total_bytes * 100))
+        result = server.upload_directory_as_archive(
+            local_path, remote_path,
+            compression=self.compression,
+            file_filter=is_image,
+            progress_callback=on_progress,
+            source=rendered_path
+        )
+        self.uploaded_files = result["files"]
+        if result["mismatched"]:
+            raise Exception(f"{len(result['mismatched'])} 个文件校验失败，例如: {result['mismatched'][0]}")
 
     def run(self):
         # 连接服务器
@@ -218,7 +583,10 @@ class UploadSampleGroup_SSH:
             self.progressDialog.setLabelText(f"正在上传 {self.total_files} 个文件...")
             # 上传整个样本组文件夹
             self.uploaded_files = 0
-            self.upload_directory_with_progress(server, self.local_sample_path, self.remote_sample_path)
+            if self.bulk:
+                self.upload_directory_bulk(server, self.local_sample_path, self.remote_sample_path)
+            else:
+                self.upload_directory_with_progress(server, self.local_sample_path, self.remote_sample_path)
             # 上传成功
             show_message_box("成功", "样本组上传成功", QMessageBox.Information)
         except Exception as e:
@@ -326,6 +694,29 @@ class PatchCoreParamMapper_SSH:
     
     
 
+def test_channel_scaling(local_dir, remote_dir, channel_counts=(1, 2, 4, 8)):
+    """
+    测试不同通道数下的上传吞吐量（可将 config.SERVER_* 指向本机 OpenSSH 进行离线测试）
+    测试流程: 对每个通道数 connect -> upload_directory -> 统计耗时 -> close
+    """
+    _, file_pairs = SSHServer().collect_upload_pairs(local_dir, remote_dir)
+    total_bytes = sum(os.path.getsize(local) for local, _ in file_pairs)
+    print(f"======= 开始测试通道池吞吐量: {len(file_pairs)} 个文件, {total_bytes / 1024 / 1024:.2f} MB =======")
+    for channel_count in channel_counts:
+        server = SSHServer(channel_count=channel_count)
+        server.connect_to_server()
+        try:
+            server.get_channel_pool() # 通道建立不计入传输时间
+            start = time.perf_counter()
+            server.upload_directory(local_dir, f"{remote_dir}_{channel_count}")
+            elapsed = time.perf_counter() - start
+            print(f"通道数={channel_count}: 耗时 {elapsed:.2f}s, "
+                  f"{len(file_pairs) / elapsed:.1f} 文件/s, {total_bytes / 1024 / 1024 / elapsed:.2f} MB/s")
+        finally:
+            server.close_connection()
+    print("\n======= 测试完成 =======")
+
+
 if __name__ == "__main__":
     # Create a server instance（自动连接服务器）
     server = SSHServer()
@@ -372,17 +763,14 @@ class DefectSamples:
         """获取检测结果"""
         try:
             result_dir = config.SERVER_DOWNLOAD_PATH
-            files = self.server.listdir(result_dir)
-
-            # 过滤新的图片文件
-            new_files = [f for f in files if f not in self.processed_files
-                        and f.lower().endswith(('.png', '.jpg', '.jpeg'))]
-
-            if new_files:
-                # 获取最新的文件：按时间排序，返回修改时间最晚的
-                newest_file = max(new_files, key=lambda x:
-                self.server.stat(join_path(result_dir, x)).st_mtime)
+            # 一次 listdir_attr 往返即可得到文件名和修改时间，取最新的新图片
+            newest_file = self.server.get_newest_file(
+                result_dir,
+                exclude=self.processed_files,
+                suffixes=('.png', '.jpg', '.jpeg')
+            )
 
+            if newest_file:
                 # 下载最新的文件
                 local_path = join_path(config.PROJECT_METADATA['project_path'], 'results', newest_file)
                 os.makedirs(os.path.dirname(local_path), exist_ok=True)
@@ -1,4 +1,5 @@
 import json
+import multiprocessing
 import os
 from pathlib import Path  # 用于处理文件路径
 from PySide6.QtCore import QDateTime, Signal, Qt, QSize, QEvent
@@ -8,8 +9,9 @@ from PySide6.QtWidgets import (QApplication, QFileDialog, QMainWindow, QDialog,
 from PySide6.QtUiTools import QUiLoader
 
 import config
-from main import MainWindow
-from utils import join_path, show_message_box, check_and_create_path, FloatingTimer, create_file_dialog
+import tracing
+from lazy_import import warm_up_modules
+from utils import join_path, show_message_box, check_and_create_path, FloatingTimer, create_file_dialog, get_metadata_store
 
 # 在程序启动时设置工作目录为应用程序所在目录!!!
 os.chdir(os.path.dirname(os.path.realpath(__file__)))
@@ -342,10 +344,9 @@ class StartWindow(QMainWindow):
             metadata_path = config.PROJECT_METADATA_PATH = join_path(folder, config.PROJECT_METADATA_FILE)
             if os.path.exists(metadata_path):
                 try:
-                    # 读取 metadata.json
-                    with open(metadata_path, "r", encoding="utf-8") as f:
-                        config.PROJECT_METADATA = json.load(f)
-                        print("项目信息：", config.PROJECT_METADATA)
+                    # 读取 metadata.json（之后的修改由元数据存储合并写回）
+                    config.PROJECT_METADATA = get_metadata_store().refresh()
+                    print("项目信息：", config.PROJECT_METADATA)
                     
                     # 添加到最近项目列表
                     self.add_to_recent_projects(folder)
@@ -390,13 +391,21 @@ class StartWindow(QMainWindow):
         """
         跳转到主窗口，显示项目的详细信息
         """
+        # 打开项目时才加载主窗口及其依赖
+        from main import MainWindow
         # 创建主窗口并传递计时器
         self.main_window = MainWindow(floating_timer=self.floating_timer)
         self.main_window.ui.show()  # 显示主窗口
         self.ui.close()  # 关闭开始窗口
+        # 主窗口显示后，在后台预热分析、报告等功能所需的重量级模块
+        warm_up_modules()
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support() # 打包后报告图表子进程（spawn）需要
+    # 配置分级日志和性能追踪（默认只输出警告及以上，追踪关闭）
+    tracing.setup_logging()
+    tracing.init_from_config()
     app = QApplication([])
 
     window = StartWindow()
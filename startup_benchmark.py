@@ -0,0 +1,118 @@
+"""
+启动耗时基准测试
+
+1. 使用 `python -X importtime` 导入 start.py，统计累计耗时最高的模块，
+   并检查重量级模块（matplotlib、sklearn、reportlab、cv2、openai）是否被提前加载
+2. 多次在新进程中导入 start.py，记录墙钟时间的中位数
+3. 与 startup_baseline.json 中的基线比较，超过容差则以非零状态码退出
+
+用法:
+    python startup_benchmark.py                  # 运行并与基线比较
+    python startup_benchmark.py --update-baseline # 运行并写入新的基线
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+APP_DIR = os.path.dirname(os.path.realpath(__file__))
+BASELINE_FILE = os.path.join(APP_DIR, "startup_baseline.json")
+ENTRY_MODULE = "start"
+# 启动阶段不应加载的重量级模块
+FORBIDDEN_MODULES = ["matplotlib", "sklearn", "reportlab", "cv2", "openai", "paramiko", "PySide6.QtCharts"]
+# 相对基线允许的性能波动
+TOLERANCE = 0.2
+
+
+def profile_imports(entry_module=ENTRY_MODULE):
+    """
+    使用 -X importtime 导入入口模块，返回 [(模块名, 自身耗时us, 累计耗时us)]
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {entry_module}"],
+        cwd=APP_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"导入 {entry_module} 失败:\n{result.stderr[-2000:]}")
+    records = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        records.append((name.strip(), int(self_us), int(cumulative_us)))
+    return records
+
+
+def measure_wall_clock(entry_module=ENTRY_MODULE, repeat=5):
+    """在新进程中多次导入入口模块，返回墙钟时间（秒）的中位数"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", f"import {entry_module}"], cwd=APP_DIR, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def run_benchmark(repeat=5, top=15):
+    """运行基准测试，返回结果字典"""
+    records = profile_imports()
+    loaded = {name for name, _, _ in records}
+    eager_modules = [name for name in FORBIDDEN_MODULES if name in loaded]
+    top_modules = sorted(records, key=lambda r: r[2], reverse=True)[:top]
+    return {
+        "wall_clock_s": measure_wall_clock(repeat=repeat),
+        "import_total_us": sum(self_us for _, self_us, _ in records),
+        "module_count": len(records),
+        "eager_heavy_modules": eager_modules,
+        "top_modules": [{"name": n, "self_us": s, "cumulative_us": c} for n, s, c in top_modules],
+    }
+
+
+def compare_with_baseline(result, baseline):
+    """与基线比较，返回回归描述列表"""
+    regressions = []
+    if result["eager_heavy_modules"]:
+        regressions.append(f"启动时加载了重量级模块: {result['eager_heavy_modules']}")
+    for key in ("wall_clock_s", "import_total_us"):
+        if key in baseline and result[key] > baseline[key] * (1 + TOLERANCE):
+            regressions.append(f"{key}: {result[key]:.3f} > 基线 {baseline[key]:.3f} (+{TOLERANCE:.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="应用启动耗时基准测试")
+    parser.add_argument("--update-baseline", action="store_true", help="将本次结果写入基线文件")
+    parser.add_argument("--repeat", type=int, default=5, help="墙钟测试重复次数")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    args = parser.parse_args()
+
+    result = run_benchmark(repeat=args.repeat)
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=4))
+    else:
+        print(f"墙钟时间(中位数): {result['wall_clock_s']:.3f}s")
+        print(f"导入耗时合计: {result['import_total_us'] / 1000:.1f}ms, 模块数: {result['module_count']}")
+        print("累计耗时最高的模块:")
+        for record in result["top_modules"]:
+            print(f"  {record['cumulative_us'] / 1000:8.1f}ms  {record['name']}")
+
+    if args.update_baseline or not os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, "w", encoding="utf-8") as f:
+            json.dump({k: result[k] for k in ("wall_clock_s", "import_total_us")}, f, indent=4)
+        print(f"已写入基线: {BASELINE_FILE}")
+        baseline = {}
+    else:
+        with open(BASELINE_FILE, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    regressions = compare_with_baseline(result, baseline)
+    for regression in regressions:
+        print(f"性能回归: {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
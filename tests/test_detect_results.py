@@ -0,0 +1,58 @@
+"""检测结束时结果库的同步：只删除不在本次检测中的记录"""
+import uuid
+
+import pytest
+
+pytest.importorskip("PySide6")
+
+import http_server
+from http_server import HttpDetectSamples
+from result_store import ResultStore
+
+GROUP = "detect_group"
+
+
+def server_name(name):
+    """服务器上传时给样本名加的 uuid 前缀（见 mock_server.MockState.upload_sample）"""
+    return f"{uuid.uuid4()}-{name}"
+
+
+def make_detector(store, image_list):
+    detector = HttpDetectSamples.__new__(HttpDetectSamples) # 不创建界面和结果合成器
+    detector.subscriber = None
+    detector.processed_files = set()
+    detector.result_store = store
+    detector.detect_group = GROUP
+    detector.image_list = image_list
+    detector.on_finished = None
+    detector.model_id = detector.group_id = None
+    return detector
+
+
+def detect(store, names):
+    image_list = [{"img_filename": server_name(name), "result_name": uuid.uuid4().hex, "score": 0.5}
+                  for name in names]
+    make_detector(store, image_list).end_detection()
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(http_server, "show_message_box", lambda *args, **kwargs: None)
+    monkeypatch.setattr(HttpDetectSamples, "enable_ui_controls", lambda self: None)
+    store = ResultStore(str(tmp_path))
+    yield store
+    store.close()
+
+
+def test_rows_survive_second_detection(store):
+    names = ["000.png", "001.png", "002.png"]
+    detect(store, names)
+    assert store.origin_names(GROUP) == set(names)
+    detect(store, names)
+    assert store.origin_names(GROUP) == set(names)
+
+
+def test_rows_of_removed_images_are_pruned(store):
+    detect(store, ["000.png", "001.png", "002.png"])
+    detect(store, ["000.png", "002.png"])
+    assert store.origin_names(GROUP) == {"000.png", "002.png"}
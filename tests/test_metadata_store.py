@@ -0,0 +1,55 @@
+"""项目元数据存储：修改检测、深拷贝、外部修改的合并"""
+import json
+
+import pytest
+
+pytest.importorskip("PySide6")
+
+from utils import MetadataStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    path = tmp_path / "metadata.json"
+    path.write_text(json.dumps({"upload_sizes": {"a": [256, 256]}}), encoding="utf-8")
+    store = MetadataStore(str(path))
+    yield store
+    store.close()
+
+
+def read(store):
+    with open(store.metadata_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_value_changed_in_place_is_flushed(store):
+    upload_sizes = store.get("upload_sizes")
+    upload_sizes["b"] = [0, 0]
+    store.set("upload_sizes", upload_sizes)
+    upload_sizes["b"] = [512, 512]
+    store.set("upload_sizes", upload_sizes)
+    store.flush()
+    assert read(store)["upload_sizes"] == {"a": [256, 256], "b": [512, 512]}
+
+
+def test_get_and_set_do_not_share_objects(store):
+    value = {"x": [1]}
+    store.set("key", value)
+    value["x"].append(2)
+    assert store.get("key") == {"x": [1]}
+    store.get("key")["x"].append(3)
+    assert store.get("key") == {"x": [1]}
+
+
+def test_flush_merges_external_changes_without_touching_data(store):
+    data = store.data
+    store.set("sample_group", "g")
+    external = read(store)
+    external["model_group"] = "m"
+    with open(store.metadata_path, "w", encoding="utf-8") as f:
+        json.dump(external, f)
+    store.mtime = -1 # 确保被视为外部修改（文件系统时间精度不足时）
+    store.flush()
+    assert read(store) == {"upload_sizes": {"a": [256, 256]}, "sample_group": "g", "model_group": "m"}
+    assert "model_group" not in store.data
+    assert store.refresh() is data and data["model_group"] == "m"
@@ -0,0 +1,49 @@
+"""项目索引的图片计数：附属文件（.hashes.json、.edits.json）和子目录不计入"""
+import pytest
+
+pytest.importorskip("PySide6")
+
+from PySide6.QtCore import QCoreApplication
+
+import config
+import http_server
+import project_index
+from project_index import ProjectIndex
+
+GROUP = "group"
+IMAGES = ("000.png", "001.jpg", "002.png")
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    app = QCoreApplication.instance() or QCoreApplication([]) # QFileSystemWatcher 需要
+    group_path = tmp_path / config.SAMPLE_FOLDER / GROUP
+    (group_path / "ground_truth").mkdir(parents=True)
+    for name in IMAGES:
+        (group_path / name).write_bytes(b"image")
+    (group_path / ".hashes.json").write_text("{}", encoding="utf-8")
+    (group_path / ".edits.json").write_text("{}", encoding="utf-8")
+    index = ProjectIndex(str(tmp_path))
+    monkeypatch.setattr(project_index, "get_project_index", lambda: index)
+    yield index
+
+
+class FakeHttpServer:
+    sample_count = len(IMAGES)
+
+    def get_group_id(self, sample_group):
+        return 1
+
+    def get_sample_list(self, group_id):
+        return [f"prefix-{index}.png" for index in range(self.sample_count)]
+
+
+def test_image_count_ignores_sidecars(index):
+    assert index.image_count(GROUP) == len(IMAGES)
+
+
+def test_uploaded_group_with_sidecars(index, monkeypatch):
+    monkeypatch.setattr(http_server, "HttpServer", FakeHttpServer)
+    assert http_server.is_sample_group_uploaded(GROUP)
+    monkeypatch.setattr(FakeHttpServer, "sample_count", len(IMAGES) - 1)
+    assert not http_server.is_sample_group_uploaded(GROUP)
@@ -0,0 +1,195 @@
+"""SSH 传输：tar 流批量上传（远程命令在本机 shell 中执行）与 SFTP 通道池并行传输"""
+import hashlib
+import os
+import shutil
+import subprocess
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("PySide6")
+
+import ssh_server
+from ssh_server import SSHServer
+
+
+class LocalChannel:
+    """exec 通道：命令在本机 shell 中执行，发送的数据写入其标准输入"""
+    def __init__(self):
+        self.process = None
+
+    def exec_command(self, command):
+        self.process = subprocess.Popen(command, shell=True, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def sendall(self, data):
+        self.process.stdin.write(data)
+
+    def shutdown_write(self):
+        self.process.stdin.close()
+
+    def close(self):
+        if not self.process.stdin.closed:
+            self.process.stdin.close()
+        self.process.wait()
+
+    def recv_exit_status(self):
+        return self.process.wait()
+
+    def makefile_stderr(self, mode):
+        return self.process.stderr
+
+
+class LocalStream:
+    def __init__(self, data, exit_status=0):
+        self.data = data
+        self.channel = self
+        self.exit_status = exit_status
+
+    def read(self):
+        return self.data
+
+    def recv_exit_status(self):
+        return self.exit_status
+
+
+class LocalSSHClient:
+    def get_transport(self):
+        return self
+
+    def open_session(self):
+        return LocalChannel()
+
+    def exec_command(self, command):
+        result = subprocess.run(command, shell=True, capture_output=True)
+        return None, LocalStream(result.stdout, result.returncode), LocalStream(result.stderr)
+
+
+@pytest.fixture
+def server():
+    server = SSHServer()
+    server.ssh_client = LocalSSHClient()
+    return server
+
+
+@pytest.fixture
+def local_dir(tmp_path):
+    folder = tmp_path / "local"
+    (folder / "sub").mkdir(parents=True)
+    for index, name in enumerate(("000.png", "001.png", "sub/002.png")):
+        (folder / name).write_bytes(os.urandom(1000 + index))
+    return folder
+
+
+def remote_files(remote_dir):
+    files = {}
+    for root, _, names in os.walk(remote_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            with open(path, "rb") as f:
+                files[os.path.relpath(path, remote_dir).replace(os.sep, "/")] = hashlib.sha256(f.read()).hexdigest()
+    return files
+
+
+def staging_dirs(remote_dir):
+    parent, name = os.path.split(str(remote_dir))
+    return [entry for entry in os.listdir(parent) if entry.startswith(name + ".upload-")]
+
+
+@pytest.mark.parametrize("compression", ["gzip", None, "zstd"])
+def test_archive_upload(server, local_dir, tmp_path, monkeypatch, compression):
+    monkeypatch.setattr(ssh_server, "_zstandard", lambda: None) # 未安装 zstandard 时退回 gzip
+    remote_dir = tmp_path / "remote" / "group"
+    result = server.upload_directory_as_archive(str(local_dir), str(remote_dir), compression=compression)
+    assert result["files"] == 3 and result["mismatched"] == []
+    assert remote_files(remote_dir) == remote_files(local_dir)
+    assert staging_dirs(remote_dir) == []
+
+
+def test_read_failure_aborts_without_partial_upload(server, local_dir, tmp_path, monkeypatch):
+    class TruncatingReader(ssh_server._HashingReader):
+        def read(self, size=-1):
+            if self.file.name.endswith("001.png"):
+                return b"" # 文件在读取中途变短
+            return super().read(size)
+
+    monkeypatch.setattr(ssh_server, "_HashingReader", TruncatingReader)
+    remote_dir = tmp_path / "remote" / "group"
+    with pytest.raises(OSError):
+        server.upload_directory_as_archive(str(local_dir), str(remote_dir), compression=None)
+    assert not remote_dir.exists()
+    assert staging_dirs(remote_dir) == []
+
+
+class FakeSFTPClient:
+    """SFTP 通道：远程路径即本机路径；同一通道被两个线程同时使用时记录下来"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.overlapped = False
+        self.transferred = 0
+        self.closed = False
+
+    def use(self, transfer):
+        if not self.lock.acquire(blocking=False):
+            self.overlapped = True
+            self.lock.acquire()
+        try:
+            time.sleep(0.005) # 让其他线程有机会争用同一通道
+            transfer()
+            self.transferred += 1
+        finally:
+            self.lock.release()
+
+    def put(self, local_file_path, remote_file_path, confirm=True):
+        assert confirm is False
+        self.use(lambda: shutil.copyfile(local_file_path, remote_file_path))
+
+    def getfo(self, remote_file_path, f, prefetch=True, max_concurrent_prefetch_requests=None):
+        def transfer():
+            with open(remote_file_path, "rb") as remote_file:
+                shutil.copyfileobj(remote_file, f)
+        self.use(transfer)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def pool_server(monkeypatch):
+    channels = []
+    def from_transport(transport):
+        channels.append(FakeSFTPClient())
+        return channels[-1]
+
+    monkeypatch.setattr(ssh_server, "paramiko", SimpleNamespace(SFTPClient=SimpleNamespace(from_transport=from_transport)))
+    server = SSHServer(channel_count=3)
+    server.ssh_client = SimpleNamespace(get_transport=lambda: object(), close=lambda: None)
+    yield server, channels
+    server.close_connection()
+    assert channels and all(channel.closed for channel in channels)
+
+
+def test_channel_pool_upload_and_download(pool_server, tmp_path):
+    server, channels = pool_server
+    for folder in ("local", "remote", "back"):
+        (tmp_path / folder).mkdir()
+    names = [f"{index:03d}.png" for index in range(20)]
+    for name in names:
+        (tmp_path / "local" / name).write_bytes(os.urandom(500))
+
+    upload_pairs = [(str(tmp_path / "local" / name), str(tmp_path / "remote" / name)) for name in names]
+    upload_pairs.append((str(tmp_path / "local" / "missing.png"), str(tmp_path / "remote" / "missing.png")))
+    results = list(server.upload_files(upload_pairs))
+    assert sorted(local for local, _, _ in results) == sorted(local for local, _ in upload_pairs)
+    assert [os.path.basename(local) for local, _, error in results if error] == ["missing.png"]
+
+    download_pairs = [(str(tmp_path / "remote" / name), str(tmp_path / "back" / name)) for name in names]
+    assert all(error is None for _, _, error in server.download_files(download_pairs))
+    assert remote_files(tmp_path / "back") == remote_files(tmp_path / "local")
+
+    # 通道在连接期间复用，且同一通道不会被并发使用
+    assert len(channels) == 3
+    assert not any(channel.overlapped for channel in channels)
+    assert sum(channel.transferred for channel in channels) == 2 * len(names)
+    assert sum(1 for channel in channels if channel.transferred) > 1
@@ -0,0 +1,123 @@
+import time
+
+from PySide6.QtCore import QObject, QTimer, Qt
+from PySide6.QtGui import QKeySequence, QShortcut
+from PySide6.QtWidgets import QDialog, QFileDialog, QHBoxLayout, QHeaderView, QLabel, QPushButton, QTableWidget, \
+    QTableWidgetItem, QVBoxLayout
+
+import tracing
+
+
+class UIStallMonitor(QObject):
+    """
+    GUI 线程卡顿监测：定时器按固定间隔触发，实际触发时间比预期晚超过阈值时记录一次 ui.stall
+    """
+    INTERVAL_MS = 50 # 检测间隔
+    STALL_THRESHOLD = 0.1 # 超过该延迟（秒）视为卡顿
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.last_tick = time.perf_counter()
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.on_tick)
+        self.timer.start(self.INTERVAL_MS)
+
+    def on_tick(self):
+        now = time.perf_counter()
+        expected = self.last_tick + self.INTERVAL_MS / 1000
+        if now - expected > self.STALL_THRESHOLD:
+            tracing.record_span("ui.stall", expected, now, cat="ui")
+        self.last_tick = now
+
+
+class TraceStatsPanel(QDialog):
+    """
+    应用内性能统计面板：每秒刷新各 span 的次数、平均 / P95 / 最大耗时以及计数器，可导出 Chrome trace
+    """
+    SPAN_COLUMNS = ["名称", "次数", "平均(ms)", "P95(ms)", "最大(ms)", "合计(ms)"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("性能统计")
+        self.resize(720, 520)
+        layout = QVBoxLayout(self)
+
+        self.span_table = QTableWidget(0, len(self.SPAN_COLUMNS))
+        self.span_table.setHorizontalHeaderLabels(self.SPAN_COLUMNS)
+        self.span_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.span_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.span_table, 3)
+
+        layout.addWidget(QLabel("计数器"))
+        self.counter_table = QTableWidget(0, 2)
+        self.counter_table.setHorizontalHeaderLabels(["名称", "累计值"])
+        self.counter_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.counter_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.counter_table, 1)
+
+        button_layout = QHBoxLayout()
+        export_button = QPushButton("导出 Chrome Trace")
+        export_button.clicked.connect(self.export_trace)
+        clear_button = QPushButton("清空")
+        clear_button.clicked.connect(self.clear)
+        button_layout.addStretch()
+        button_layout.addWidget(export_button)
+        button_layout.addWidget(clear_button)
+        layout.addLayout(button_layout)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    def refresh(self):
+        """按合计耗时从高到低刷新表格"""
+        data = tracing.snapshot()
+        spans = sorted(data["spans"].items(), key=lambda item: item[1]["total_ms"], reverse=True)
+        self.span_table.setRowCount(len(spans))
+        for row, (name, stats) in enumerate(spans):
+            values = [name, str(stats["count"])] + [f"{stats[key]:.1f}" for key in ("avg_ms", "p95_ms", "max_ms", "total_ms")]
+            for column, value in enumerate(values):
+                self.span_table.setItem(row, column, QTableWidgetItem(value))
+        counters = sorted(data["counters"].items())
+        self.counter_table.setRowCount(len(counters))
+        for row, (name, value) in enumerate(counters):
+            self.counter_table.setItem(row, 0, QTableWidgetItem(name))
+            self.counter_table.setItem(row, 1, QTableWidgetItem(f"{value:,}"))
+
+    def export_trace(self):
+        path, _ = QFileDialog.getSaveFileName(self, "导出 Chrome Trace", "trace.json", "JSON文件 (*.json)")
+        if path:
+            count = tracing.export_chrome_trace(path)
+            self.setWindowTitle(f"性能统计 - 已导出 {count} 个事件")
+
+    def clear(self):
+        tracing.reset()
+        self.refresh()
+
+    def showEvent(self, event):
+        self.refresh()
+        self.refresh_timer.start(1000)
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.refresh_timer.stop()
+        super().hideEvent(event)
+
+
+def install_trace_tools(window):
+    """
+    追踪启用时，为窗口安装 GUI 卡顿监测和统计面板快捷键（Ctrl+Shift+T）
+    """
+    if not tracing.is_enabled():
+        return
+    window.ui_stall_monitor = UIStallMonitor(window)
+
+    def show_panel():
+        panel = getattr(window, "trace_stats_panel", None)
+        if panel is None:
+            panel = window.trace_stats_panel = TraceStatsPanel(window)
+        panel.show()
+        panel.raise_()
+
+    window.trace_shortcut = QShortcut(QKeySequence("Ctrl+Shift+T"), window)
+    window.trace_shortcut.activated.connect(show_panel)
@@ -0,0 +1,226 @@
+"""
+轻量级追踪与分级日志
+
+- span(name): 记录一段耗时的上下文管理器，未启用追踪时返回共享的空对象，几乎没有开销
+- count(name, value): 累加计数器（如各接口的收发字节数）
+- snapshot(): 各 span 和计数器的滚动统计，供应用内统计面板显示
+- export_chrome_trace(path): 导出 Chrome trace JSON，可用 chrome://tracing 或 Perfetto 打开
+- setup_logging(level): 配置分级日志，替代散落各处的 print
+
+本模块不依赖 Qt，可在无界面的命令行工具中使用
+"""
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import config
+
+MAX_EVENTS = 200000 # 内存中保留的 trace 事件上限，超出后丢弃最早的事件
+RECENT_SAMPLES = 200 # 滚动统计（P95）使用的最近样本数
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+_enabled = False
+_lock = threading.Lock()
+_events = deque(maxlen=MAX_EVENTS)
+_span_stats = {} # {span 名称: SpanStats}
+_counters = {} # {计数器名称: 累计值}
+_thread_names = {} # {线程ID: 线程名}，导出时用于标注各线程
+_pid = os.getpid()
+_origin = time.perf_counter()
+
+
+class SpanStats:
+    """
+    单个 span 的统计：总次数、总耗时、最大耗时，以及最近若干次耗时（用于 P95）
+    """
+    __slots__ = ("count", "total", "max", "recent")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+    def add(self, duration):
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+        self.recent.append(duration)
+
+    def summary(self):
+        recent = sorted(self.recent)
+        p95 = recent[min(len(recent) - 1, int(len(recent) * 0.95))] if recent else 0.0
+        return {
+            "count": self.count,
+            "total_ms": self.total * 1000,
+            "avg_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "p95_ms": p95 * 1000,
+            "max_ms": self.max * 1000,
+        }
+
+
+class _NullSpan:
+    """未启用追踪时使用的空 span"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """
+    一段耗时记录，退出时写入事件列表和统计
+    """
+    __slots__ = ("name", "cat", "args", "start")
+
+    def __init__(self, name, cat, args):
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def set(self, **args):
+        """补充 span 的参数（如响应字节数、状态码）"""
+        self.args.update(args)
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        record_span(self.name, self.start, time.perf_counter(), self.cat, self.args)
+        return False
+
+
+# -------------------- 开关 --------------------
+def enable(flag=True):
+    """启用或关闭追踪"""
+    global _enabled
+    _enabled = flag
+
+
+def is_enabled():
+    return _enabled
+
+
+def init_from_config():
+    """根据 config.TRACE_ENABLED 或环境变量 VISIOCRAFT_TRACE 启用追踪"""
+    flag = os.environ.get("VISIOCRAFT_TRACE")
+    enable(flag not in ("", "0", "false") if flag is not None else config.TRACE_ENABLED)
+    return _enabled
+
+
+def reset():
+    """清空已记录的事件和统计"""
+    with _lock:
+        _events.clear()
+        _span_stats.clear()
+        _counters.clear()
+
+
+# -------------------- 记录 --------------------
+def span(name, cat="app", **args):
+    """
+    记录一段耗时，用法:
+        with tracing.span("http.list_model", cat="http") as sp:
+            ...
+            sp.set(bytes=len(content))
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return Span(name, cat, args)
+
+
+def record_span(name, start, end, cat="app", args=None):
+    """记录一段已结束的耗时（start、end 为 time.perf_counter() 的值）"""
+    if not _enabled:
+        return
+    duration = end - start
+    thread = threading.current_thread()
+    event = {"name": name, "cat": cat, "ph": "X", "pid": _pid, "tid": thread.ident,
+             "ts": (start - _origin) * 1e6, "dur": duration * 1e6}
+    if args:
+        event["args"] = args
+    with _lock:
+        _events.append(event)
+        _thread_names[thread.ident] = thread.name
+        stats = _span_stats.get(name)
+        if stats is None:
+            stats = _span_stats[name] = SpanStats()
+        stats.add(duration)
+
+
+def count(name, value=1):
+    """累加计数器，同时记录一个 Chrome trace 计数事件"""
+    if not _enabled:
+        return
+    with _lock:
+        total = _counters[name] = _counters.get(name, 0) + value
+        _events.append({"name": name, "ph": "C", "pid": _pid, "ts": (time.perf_counter() - _origin) * 1e6,
+                        "args": {"value": total}})
+
+
+def traced(name=None, cat="app"):
+    """装饰器：记录函数每次调用的耗时"""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with Span(span_name, cat, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# -------------------- 导出 --------------------
+def snapshot():
+    """
+    当前统计快照
+
+    Returns:
+        {"spans": {名称: {"count", "total_ms", "avg_ms", "p95_ms", "max_ms"}}, "counters": {名称: 累计值}}
+    """
+    with _lock:
+        return {
+            "spans": {name: stats.summary() for name, stats in _span_stats.items()},
+            "counters": dict(_counters),
+        }
+
+
+def export_chrome_trace(path):
+    """导出 Chrome trace JSON 文件，返回导出的事件数"""
+    with _lock:
+        events = list(_events)
+        names = dict(_thread_names)
+    metadata = [{"name": "thread_name", "ph": "M", "pid": _pid, "tid": tid, "args": {"name": name}}
+                for tid, name in names.items()]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+    return len(events)
+
+
+# -------------------- 日志 --------------------
+def setup_logging(level=None):
+    """
+    配置分级日志，级别优先取参数，其次是环境变量 VISIOCRAFT_LOG_LEVEL，最后是 config.LOG_LEVEL
+    """
+    level = level or os.environ.get("VISIOCRAFT_LOG_LEVEL") or config.LOG_LEVEL
+    logging.basicConfig(level=getattr(logging, str(level).upper(), logging.WARNING), format=LOG_FORMAT, force=True)
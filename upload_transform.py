@@ -0,0 +1,156 @@
+"""
+上传前的样本缩小
+
+服务器训练时把样本缩放到模型输入尺寸（224 / 448 / 1024），上传 500 万～2000 万像素的原图时，绝大部分像素传过去就被丢弃。
+上传训练样本前先在线程池中把图片（应用编辑后）缩小到输入尺寸的 config.UPLOAD_RESIZE_MARGIN 倍，
+用 INTER_AREA 插值，再按 config.UPLOAD_FORMAT / UPLOAD_QUALITY 编码：
+    - 结果按 (原图内容哈希, 编辑, 目标尺寸, 格式, 质量) 缓存在项目目录 cache/upload 中，重复上传不再重新编码；
+      原图只读取一次，哈希与解码共用同一份数据
+    - 已经足够小、没有编辑、格式相同的图片直接上传原图，不重新编码
+    - 上传文件名保持不变（服务器按内容解码），服务器上的样本与本地一一对应
+缓存总大小超过 UPLOAD_CACHE_LIMIT 时删除最久未使用的文件
+
+本模块不依赖 Qt
+"""
+import hashlib
+import json
+import logging
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import config
+import tracing
+from edit_stack import apply_edits, cache_folder, get_edits, rendered_path
+from image_import import fit_size
+from lazy_import import lazy_import
+from path_utils import join_path
+
+cv2 = lazy_import("cv2")
+logger = logging.getLogger(__name__)
+
+UPLOAD_CACHE_FOLDER = "upload" # 缓存目录（与编辑渲染缓存同级）
+UPLOAD_CACHE_LIMIT = 2 * 1024 ** 3 # 缓存总大小上限（字节）
+
+
+def upload_size(params=None):
+    """
+    由模型参数得到上传尺寸 (宽, 高)：输入尺寸乘以余量；没有模型参数或关闭缩小时返回 None（上传原图）
+    """
+    params = config.MODEL_PARAMS if params is None else params
+    margin = config.UPLOAD_RESIZE_MARGIN
+    if not params or not margin or margin <= 0 or not params.get('input_w') or not params.get('input_h'):
+        return None
+    return math.ceil(int(params['input_w']) * margin), math.ceil(int(params['input_h']) * margin)
+
+
+def covers(uploaded_size, size):
+    """已上传的尺寸（None 为原图）是否足够用于需要的尺寸 size（None 为原图）"""
+    if uploaded_size is None:
+        return True
+    return size is not None and uploaded_size[0] >= size[0] and uploaded_size[1] >= size[1]
+
+
+def upload_cache_folder():
+    return join_path(os.path.dirname(cache_folder()), UPLOAD_CACHE_FOLDER)
+
+
+def _encode_params(image_format, quality):
+    if image_format in ("jpg", "jpeg"):
+        return [cv2.IMWRITE_JPEG_QUALITY, quality]
+    if image_format == "webp":
+        return [cv2.IMWRITE_WEBP_QUALITY, quality]
+    return [cv2.IMWRITE_PNG_COMPRESSION, 1]
+
+
+@tracing.traced("sample.prepare_upload", cat="image")
+def prepare_upload(image_path, size, image_format=None, quality=None):
+    """
+    准备一张待上传的图片
+
+    Args:
+        image_path: 样本组中的原图路径（可能有编辑记录）
+        size: 上传尺寸 (宽, 高)，缩小后宽、高都不小于该值；None 表示上传编辑后的原分辨率图片
+        image_format: 编码格式，默认 config.UPLOAD_FORMAT
+        quality: 编码质量，默认 config.UPLOAD_QUALITY
+
+    Returns:
+        实际上传的文件路径（原图、编辑渲染结果或缩小后的缓存文件）
+    """
+    if size is None:
+        return rendered_path(image_path)
+    image_format = (image_format or config.UPLOAD_FORMAT).lower().lstrip(".")
+    quality = quality or config.UPLOAD_QUALITY
+    data = np.fromfile(image_path, dtype=np.uint8)
+    ops = get_edits(image_path)
+    key = hashlib.blake2b(data, digest_size=16)
+    key.update(json.dumps([ops, list(size), image_format, quality]).encode("utf-8"))
+    folder = upload_cache_folder()
+    path = join_path(folder, f"{key.hexdigest()}.{image_format}")
+    if os.path.exists(path):
+        os.utime(path) # 记录最近使用时间
+        return path
+    image = cv2.imdecode(data, cv2.IMREAD_COLOR)
+    if image is None:
+        raise IOError(f"图片解码失败: {image_path}")
+    if ops:
+        image = apply_edits(image, ops)
+    height, width = image.shape[:2]
+    target = fit_size(width, height, *size)
+    same_format = os.path.splitext(image_path)[1].lower().lstrip(".") in (image_format, "jpeg" if image_format == "jpg" else None)
+    if target == (width, height) and not ops and same_format:
+        return image_path # 已经足够小，直接上传原图
+    if target != (width, height):
+        image = cv2.resize(image, target, interpolation=cv2.INTER_AREA)
+    ok, encoded = cv2.imencode(f".{image_format}", image, _encode_params(image_format, quality))
+    if not ok:
+        raise IOError(f"图片编码失败: {image_path}")
+    os.makedirs(folder, exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.{id(encoded)}.tmp"
+    encoded.tofile(temp_path)
+    os.replace(temp_path, path)
+    return path
+
+
+def prepare_uploads(image_paths, size, workers=None):
+    """
+    在线程池中准备一批待上传的图片，按输入顺序逐个产出 (原图路径, 上传路径 或 异常)；
+    调用方上传前一张时后面的图片已在后台缩小
+    """
+    workers = workers or min(8, os.cpu_count() or 1)
+    def task(image_path):
+        try:
+            return prepare_upload(image_path, size)
+        except Exception as e:
+            return e
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upload")
+    try:
+        for image_path, result in zip(image_paths, executor.map(task, image_paths)):
+            yield image_path, result
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True) # 调用方中途停止时不再处理剩余图片
+    if size is not None:
+        prune_upload_cache()
+
+
+def prune_upload_cache(limit=UPLOAD_CACHE_LIMIT):
+    """缓存总大小超过 limit 时按最近使用时间删除最旧的文件"""
+    folder = upload_cache_folder()
+    if not os.path.isdir(folder):
+        return
+    entries = []
+    for entry in os.scandir(folder):
+        if entry.is_file():
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= limit:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
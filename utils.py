@@ -1,12 +1,16 @@
+import atexit
+import copy
 import json
 import os
 import shutil
+import threading
 
 from PySide6.QtCore import QCoreApplication, Qt, QTimer, QDateTime, QPoint, QSize
 from PySide6.QtGui import QMovie, QPainter, QLinearGradient, QColor, QPen, QFont, QFontMetrics
 from PySide6.QtWidgets import QMessageBox, QVBoxLayout, QLabel, QWidget, QApplication, QProgressDialog, QPushButton, QFileDialog
 
 import config
+from path_utils import is_image, join_path
 
 
 
@@ -221,30 +225,141 @@ def check_and_create_path(path: str) -> bool:
         show_message_box("错误", "无法创建该路径！", QMessageBox.Critical)
         return False
 
-def is_image(file_name: str) -> bool:
+class MetadataStore:
     """
-    判断文件是否为图片文件
+    项目元数据存储：元数据常驻内存，修改只标记脏键，
+    经过防抖延时（或程序退出时）再一次性原子写回 metadata.json
+
+    set 保存值的深拷贝、get 返回深拷贝，调用者原地修改取到的值再写回时也能发现变化；
+    data 即 config.PROJECT_METADATA，只在界面线程中（reload / set）修改，写盘的计时器线程只读取
+    """
+    FLUSH_DELAY = 1.0 # 防抖延时（秒），期间的连续修改合并为一次写入
+
+    def __init__(self, metadata_path):
+        self.metadata_path = metadata_path
+        self.data = {}
+        self.dirty_keys = set()
+        self.mtime = None # 上次读写时文件的修改时间，用于发现外部修改
+        self.lock = threading.RLock()
+        self.flush_timer = None
+        self.reload()
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.metadata_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _read_merged(self):
+        """磁盘上的元数据，尚未写回的修改覆盖在读取结果之上；返回 (元数据, 文件修改时间)"""
+        mtime = self._file_mtime()
+        data = {}
+        if mtime is not None:
+            with open(self.metadata_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        for key in self.dirty_keys:
+            data[key] = self.data.get(key)
+        return data, mtime
+
+    def reload(self):
+        """从磁盘重新读取元数据，尚未写回的修改覆盖在读取结果之上"""
+        with self.lock:
+            data, mtime = self._read_merged()
+            # 原地更新，保证 config.PROJECT_METADATA 引用的始终是同一个字典
+            self.data.clear()
+            self.data.update(data)
+            self.mtime = mtime
+            return self.data
+
+    def refresh(self):
+        """如果文件被外部修改（修改时间变化），则重新加载"""
+        with self.lock:
+            if self._file_mtime() != self.mtime:
+                print(f"检测到元数据被外部修改，重新加载: {self.metadata_path}")
+                self.reload()
+            return self.data
+
+    def get(self, key, default=None):
+        """读取一个键（深拷贝，修改返回值不影响存储）"""
+        with self.lock:
+            return copy.deepcopy(self.data.get(key, default))
+
+    def set(self, key, value):
+        """修改一个键（保存深拷贝），不立即写盘"""
+        with self.lock:
+            if key in self.data and self.data[key] == value:
+                return
+            self.data[key] = copy.deepcopy(value)
+            self.dirty_keys.add(key)
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self.flush_timer:
+            self.flush_timer.cancel()
+        self.flush_timer = threading.Timer(self.FLUSH_DELAY, self.flush)
+        self.flush_timer.daemon = True
+        self.flush_timer.start()
+
+    def flush(self):
+        """将脏键写回磁盘：先写临时文件再原子替换，写入中途崩溃也不会损坏原文件"""
+        with self.lock:
+            if self.flush_timer:
+                self.flush_timer.cancel()
+                self.flush_timer = None
+            if not self.dirty_keys:
+                return
+            # 写回前检查外部修改，避免覆盖他人的改动；合并结果只写盘，不修改界面线程使用的 data，
+            # 修改时间保持不变，界面线程下次 refresh 时重新加载
+            external = self._file_mtime() != self.mtime
+            data = self._read_merged()[0] if external else self.data
+            tmp_path = f"{self.metadata_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.metadata_path)
+            if not external:
+                self.mtime = self._file_mtime()
+            self.dirty_keys.clear()
+
+    def close(self):
+        """关闭存储（写回所有未保存的修改）"""
+        self.flush()
+
+
+_metadata_store = None
+
+def get_metadata_store():
+    """
+    获取当前项目的元数据存储，项目切换（config.PROJECT_METADATA_PATH 变化）时自动重建
     """
-    return file_name.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.tiff'))
+    global _metadata_store
+    path = config.PROJECT_METADATA_PATH
+    if _metadata_store is None or _metadata_store.metadata_path != path:
+        if _metadata_store is not None:
+            _metadata_store.close()
+        _metadata_store = MetadataStore(path)
+        config.PROJECT_METADATA = _metadata_store.data
+    return _metadata_store
 
-def join_path(*args) -> str:
+def flush_metadata():
+    """立即写回未保存的元数据（程序退出时自动调用）"""
+    if _metadata_store is not None:
+        _metadata_store.flush()
+
+atexit.register(flush_metadata)
+
+def get_metadata(key, default=None):
     """
-    拼接跨平台路径，强制args之中及其之间的分隔符为 /
+    读取项目元数据（深拷贝，可原地修改后经 update_metadata 写回）
     """
-    return os.path.join(*args).replace("\\", "/")
+    return get_metadata_store().get(key, default)
 
 def update_metadata(key, value):
     """
-    更新项目元数据
+    更新项目元数据（只修改内存，由 MetadataStore 合并延时写盘）
     """
-    metadata_path = config.PROJECT_METADATA_PATH
-    if os.path.exists(metadata_path):
-        with open(metadata_path, 'r', encoding='utf-8') as f:
-            metadata = json.load(f)
-        metadata[key] = value
-        with open(metadata_path, 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, ensure_ascii=False, indent=4)
-    config.PROJECT_METADATA = metadata
+    get_metadata_store().set(key, value)
 
 def copy_image(file_path, dest_path):
     """
@@ -284,16 +399,22 @@ def check_model_group():
     print(f"模型组存在: {config.MODEL_GROUP}")
     return True
 
+def get_model_info(model_group):
+    """
+    从本地读取模型组信息（model.json），不存在时返回 None
+    """
+    model_info_path = join_path(config.MODEL_PATH, model_group, config.MODEL_INFO_FILE)
+    if os.path.exists(model_info_path):
+        with open(model_info_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return None
+
 def get_model_status(model_group):
         """
         从本地获取模型组状态
         """
-        model_info_path = join_path(config.MODEL_PATH, model_group, config.MODEL_INFO_FILE)
-        if os.path.exists(model_info_path):
-            with open(model_info_path, 'r', encoding='utf-8') as f:
-                model_info = json.load(f)
-                return model_info.get("status")
-        return -1
+        model_info = get_model_info(model_group)
+        return model_info.get("status") if model_info is not None else -1
 
 def load_metadata():
     """
@@ -301,19 +422,18 @@ def load_metadata():
     """    
     if os.path.exists(config.PROJECT_METADATA_PATH):
         try:
-            with open(config.PROJECT_METADATA_PATH, 'r', encoding='utf-8') as file:
-                metadata = json.load(file)
-                config.PROJECT_METADATA = metadata
-                print(f"加载项目元数据: {config.PROJECT_METADATA}")
-                # 同步配置信息
-                config.SAMPLE_GROUP = metadata.get('sample_group')
-                config.MODEL_GROUP = metadata.get('model_group')
-                config.MODEL_PARAMS = metadata.get('model_params')
-                config.DETECT_SAMPLE_GROUP = metadata.get('detect_sample_group')
-                # 加载阈值设置
-                if 'defect_threshold' in metadata:
-                    config.DEFECT_THRESHOLD = metadata.get('defect_threshold')
-                    print(f"加载缺陷检测阈值: {config.DEFECT_THRESHOLD}")
+            metadata = get_metadata_store().refresh()
+            config.PROJECT_METADATA = metadata
+            print(f"加载项目元数据: {config.PROJECT_METADATA}")
+            # 同步配置信息
+            config.SAMPLE_GROUP = metadata.get('sample_group')
+            config.MODEL_GROUP = metadata.get('model_group')
+            config.MODEL_PARAMS = metadata.get('model_params')
+            config.DETECT_SAMPLE_GROUP = metadata.get('detect_sample_group')
+            # 加载阈值设置
+            if 'defect_threshold' in metadata:
+                config.DEFECT_THRESHOLD = metadata.get('defect_threshold')
+                print(f"加载缺陷检测阈值: {config.DEFECT_THRESHOLD}")
         except Exception as e:
             print(f"加载元数据失败: {str(e)}")
             config.PROJECT_METADATA = None